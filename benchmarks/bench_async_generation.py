@@ -0,0 +1,116 @@
+# benchmarks/bench_async_generation.py
+"""
+Throughput of the sync vs async quotation/suggestion paths against a stubbed provider.
+
+The stub sleeps for a fixed latency per call (time.sleep for sync, asyncio.sleep for async),
+so the numbers show how many generations each execution model can keep in flight.
+
+Usage:
+    python -m benchmarks.bench_async_generation --requests 50 --latency 0.5 --threads 4
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, List, Optional
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src.models import AIConfigState
+from src.llm.llm_providers import invalidate_llm_instances
+from src.llm.rate_limiter import set_rate_limiting_enabled, reset_rate_limiters
+from src.core.itinerary_generator import generate_places_suggestion_llm, agenerate_places_suggestion_llm
+from src.core.quotation_graph_builder import run_quotation_generation_graph, arun_quotation_generation_graph
+
+ENQUIRY = {"destination": "Kerala", "num_days": 5, "traveler_count": 2, "trip_type": "Leisure", "client_name_actual": "Bench"}
+VENDOR_REPLY = "Package cost INR 45,000 per person. Hotels: Taj Kumarakom (2N), Spice Village (2N). Inclusions: breakfast, transfers."
+STUB_QUOTATION_JSON = json.dumps({
+    "client_name": "Mr./Ms. Bench",
+    "destination_summary": "Kerala",
+    "detailed_itinerary": [{"day_number": f"Day {i}", "title": "Sightseeing", "description": "Explore."} for i in range(1, 6)],
+    "hotel_details": [{"destination_location": "Kumarakom", "hotel_name": "Taj Kumarakom", "nights": "2"}],
+    "inclusions": ["Breakfast"], "exclusions": ["Flights"],
+})
+
+
+class StubLatencyChatModel(BaseChatModel):
+    """Returns canned text after a fixed delay; JSON when the prompt asks for the quotation structure."""
+    latency_seconds: float = 0.5
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-latency"
+
+    def _reply_for(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt_text = " ".join(str(m.content) for m in messages)
+        text = STUB_QUOTATION_JSON if "Output JSON Structure" in prompt_text else "Parsed vendor info: INR 45,000 per person."
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_seconds)
+        return self._reply_for(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency_seconds)
+        return self._reply_for(messages)
+
+
+def _report(label: str, n: int, elapsed: float, failures: int):
+    print(f"{label:<42} {n:>5} req  {elapsed:>8.2f} s  {n / elapsed:>8.2f} req/s  failures={failures}")
+
+
+def run_benchmark(n_requests: int, latency: float, threads: int, include_quotation: bool, rate_limit: bool = False):
+    # The stub never throttles, so the adaptive limiter is off unless explicitly benchmarked.
+    set_rate_limiting_enabled(rate_limit)
+    reset_rate_limiters()
+    os.environ.setdefault("GROQ_API_KEY", "benchmark-stub-key")
+    ai_conf = AIConfigState(selected_ai_provider="Groq", selected_model_for_provider="llama3-8b-8192")
+    stub = StubLatencyChatModel(latency_seconds=latency)
+
+    with patch("src.llm.llm_providers._create_llm_instance", return_value=stub):
+        invalidate_llm_instances()
+        print(f"Stub latency per LLM call: {latency:.2f}s | N={n_requests} | sync thread pool={threads}\n")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(lambda _: generate_places_suggestion_llm(ENQUIRY, "Groq", ai_conf), range(n_requests)))
+        _report(f"sync suggestions ({threads} script threads)", n_requests, time.perf_counter() - start, sum(1 for r in results if r[1]))
+
+        async def _suggestions():
+            return await asyncio.gather(*(agenerate_places_suggestion_llm(ENQUIRY, "Groq", ai_conf) for _ in range(n_requests)))
+        start = time.perf_counter()
+        results = asyncio.run(_suggestions())
+        _report("async suggestions (1 event loop)", n_requests, time.perf_counter() - start, sum(1 for r in results if r[1]))
+
+        if not include_quotation:
+            return
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(lambda _: run_quotation_generation_graph(ENQUIRY, VENDOR_REPLY, "Backwaters", "Groq", ai_conf), range(n_requests)))
+        _report(f"sync quotation graph ({threads} script threads)", n_requests, time.perf_counter() - start, sum(1 for r in results if r[1].get("error")))
+
+        async def _quotations():
+            return await asyncio.gather(*(arun_quotation_generation_graph(ENQUIRY, VENDOR_REPLY, "Backwaters", "Groq", ai_conf) for _ in range(n_requests)))
+        start = time.perf_counter()
+        results = asyncio.run(_quotations())
+        _report("async quotation graph (1 event loop)", n_requests, time.perf_counter() - start, sum(1 for r in results if r[1].get("error")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50, help="Concurrent generations per scenario")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub provider latency per LLM call (seconds)")
+    parser.add_argument("--threads", type=int, default=4, help="Thread pool size for the sync baseline")
+    parser.add_argument("--skip-quotation", action="store_true", help="Only benchmark places suggestions")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the adaptive per-provider rate limiter enabled")
+    args = parser.parse_args()
+    run_benchmark(args.requests, args.latency, args.threads, not args.skip_quotation, args.rate_limit)
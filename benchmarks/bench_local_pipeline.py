@@ -0,0 +1,98 @@
+# benchmarks/bench_local_pipeline.py
+"""
+Offline load test / profile of the full quotation pipeline (quotation_generation_graph_compiled)
+using the "Local" provider: no network and no API keys.
+
+Synthetic mode simulates provider latency from --ttft and --tokens-per-second; replay mode serves a
+cassette recorded from real providers (set LLM_CASSETTE_RECORD_PATH while using the app) with its
+original latency profile.
+
+Usage:
+    python -m benchmarks.bench_local_pipeline --requests 20 --concurrency 4
+    python -m benchmarks.bench_local_pipeline --mode replay --cassette benchmarks/cassettes/llm_cassette.jsonl
+    python -m benchmarks.bench_local_pipeline --requests 5 --profile
+"""
+import os
+import sys
+import time
+import pstats
+import cProfile
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models import AIConfigState
+from src.llm.llm_providers import invalidate_llm_instances
+from src.llm.rate_limiter import set_rate_limiting_enabled, reset_rate_limiters
+from src.llm.response_cache import configure_response_cache
+from src.core.quotation_graph_builder import quotation_generation_graph_compiled, _initial_quotation_state
+
+ENQUIRY = {"destination": "Kerala", "num_days": 5, "traveler_count": 2, "trip_type": "Leisure", "client_name_actual": "Bench"}
+VENDOR_REPLY = "Package cost INR 45,000 per person. Hotels: Taj Kumarakom Resort (2N), Spice Village Resort (2N). Inclusions: breakfast, transfers."
+AI_SUGGESTIONS = "- Alleppey houseboat\n- Munnar tea gardens\n- Fort Kochi heritage walk"
+
+
+def _run_once(ai_conf: AIConfigState) -> tuple[float, bool]:
+    start = time.perf_counter()
+    final_state = quotation_generation_graph_compiled.invoke(
+        _initial_quotation_state(ENQUIRY, VENDOR_REPLY, AI_SUGGESTIONS, "Local", ai_conf)
+    )
+    failed = bool(final_state.get("structured_quotation_data", {}).get("error")) or not final_state.get("pdf_output_bytes")
+    return time.perf_counter() - start, failed
+
+
+def run_benchmark(mode: str, n_requests: int, concurrency: int, ttft: float, tokens_per_second: float,
+                  cassette: str | None, profile: bool, rate_limit: bool):
+    set_rate_limiting_enabled(rate_limit)
+    reset_rate_limiters()
+    configure_response_cache(enabled=False) # Every request must reach the (local) provider
+    invalidate_llm_instances()
+
+    # The pooled Local client reads these when it is created (see create_local_chat_model).
+    os.environ["LOCAL_LLM_TTFT_SECONDS"] = str(ttft)
+    os.environ["LOCAL_LLM_TOKENS_PER_SECOND"] = str(tokens_per_second)
+    if cassette:
+        os.environ["LOCAL_LLM_CASSETTE_PATH"] = cassette
+
+    ai_conf = AIConfigState(selected_ai_provider="Local", selected_model_for_provider=mode)
+    print(f"Local provider mode={mode} | N={n_requests} | concurrency={concurrency} | ttft={ttft}s | {tokens_per_second} tok/s\n")
+
+    profiler = cProfile.Profile() if profile else None
+    if profiler:
+        profiler.enable()
+    start = time.perf_counter()
+    if profiler:
+        # cProfile only sees the thread it was enabled in, so profiled runs are sequential.
+        results = [_run_once(ai_conf) for _ in range(n_requests)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda _: _run_once(ai_conf), range(n_requests)))
+    elapsed = time.perf_counter() - start
+    if profiler:
+        profiler.disable()
+
+    latencies = sorted(r[0] for r in results)
+    p95 = latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))]
+    print(f"{'quotation graph (Local ' + mode + ')':<42} {n_requests:>5} req  {elapsed:>8.2f} s  {n_requests / elapsed:>8.2f} req/s  "
+          f"p50={statistics.median(latencies):.2f}s  p95={p95:.2f}s  failures={sum(1 for r in results if r[1])}")
+
+    if profiler:
+        print("\nTop functions by cumulative time:")
+        pstats.Stats(profiler).strip_dirs().sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["synthetic", "replay"], default="synthetic")
+    parser.add_argument("--requests", type=int, default=20, help="Quotations to generate")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent graph runs (threads)")
+    parser.add_argument("--ttft", type=float, default=0.3, help="Synthetic time to first token (seconds)")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Synthetic output token rate")
+    parser.add_argument("--cassette", help="JSONL cassette for replay mode")
+    parser.add_argument("--profile", action="store_true", help="Run sequentially under cProfile and print the hottest functions")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the adaptive per-provider rate limiter enabled")
+    args = parser.parse_args()
+    run_benchmark(args.mode, args.requests, args.concurrency, args.ttft, args.tokens_per_second,
+                  args.cassette, args.profile, args.rate_limit)
@@ -0,0 +1,88 @@
+# benchmarks/bench_segmented_itinerary.py
+"""
+Two-stage vs segmented quotation graph latency as the trip gets longer.
+
+The two-stage graph writes every itinerary day in the one structuring call, so its latency grows
+linearly with the number of days. The segmented graph (ai_conf.segmented_itinerary) asks for a short
+skeleton (city, title and a one-line outline per day) and then writes the days in parallel calls of
+at most ITINERARY_SEGMENT_MAX_DAYS days, so only the short skeleton grows with the trip length.
+Long two-stage answers may also hit the output limit: days_written shows how many days came back.
+
+Runs offline on the "Local" provider by default, re-using the first recorded vendor reply
+(benchmarks/data/vendor_replies.jsonl) with each trip length. Pass --provider with API keys set to
+measure a real provider; its rate limits then decide how many segments really run at once.
+
+Usage:
+    python -m benchmarks.bench_segmented_itinerary
+    python -m benchmarks.bench_segmented_itinerary --days 5 15 30 --ttft 0.5 --tokens-per-second 80
+    python -m benchmarks.bench_segmented_itinerary --provider Groq --model llama3-8b-8192
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models import AIConfigState
+from src.llm.llm_providers import invalidate_llm_instances
+from src.llm.rate_limiter import set_rate_limiting_enabled, reset_rate_limiters
+from src.llm.response_cache import configure_response_cache
+from src.core.quotation_graph_builder import quotation_graph_for, _initial_quotation_state
+from src.utils.vendor_reply_dataset import VENDOR_REPLIES_PATH, load_vendor_replies
+from benchmarks.bench_single_pass import AI_SUGGESTIONS
+
+
+def _run_once(enquiry: dict, vendor_reply: str, provider: str, ai_conf: AIConfigState) -> dict:
+    start = time.perf_counter()
+    final_state = quotation_graph_for(ai_conf).invoke(
+        _initial_quotation_state(enquiry, vendor_reply, AI_SUGGESTIONS, provider, ai_conf)
+    )
+    elapsed = time.perf_counter() - start
+    structured_data = final_state.get("structured_quotation_data") or {}
+    metadata = final_state.get("generation_metadata") or {}
+    return {
+        "latency": elapsed,
+        "calls": len(metadata.get("llm_calls", [])),
+        "days": len(structured_data.get("detailed_itinerary") or []),
+        "failed": bool(structured_data.get("error")) or bool(metadata.get("itinerary_segment_errors")),
+    }
+
+
+def run_benchmark(dataset: str, day_counts: list[int], repeats: int, provider: str, model: str | None,
+                  ttft: float, tokens_per_second: float):
+    set_rate_limiting_enabled(provider != "Local") # Real providers keep their limits
+    reset_rate_limiters()
+    configure_response_cache(enabled=False)
+    invalidate_llm_instances()
+    os.environ["LOCAL_LLM_TTFT_SECONDS"] = str(ttft)
+    os.environ["LOCAL_LLM_TOKENS_PER_SECOND"] = str(tokens_per_second)
+    os.environ["LOCAL_LLM_DAY_DETAIL_SENTENCES"] = "4" # Synthetic days as long as real ones
+
+    record = load_vendor_replies(dataset)[0]
+    model = model or ("synthetic" if provider == "Local" else None)
+    print(f"Trip lengths {day_counts} x {repeats} | provider={provider} model={model or 'default'}\n")
+
+    for num_days in day_counts:
+        enquiry = {**record["enquiry"], "num_days": num_days}
+        for label, segmented in (("two-stage", False), ("segmented", True)):
+            ai_conf = AIConfigState(selected_ai_provider=provider, selected_model_for_provider=model,
+                                    segmented_itinerary=segmented)
+            results = [_run_once(enquiry, record["vendor_reply"], provider, ai_conf) for _ in range(repeats)]
+            print(f"days={num_days:>3}  {label:<10} p50={statistics.median(r['latency'] for r in results):6.2f}s  "
+                  f"calls/run={statistics.mean(r['calls'] for r in results):4.1f}  "
+                  f"days_written={results[0]['days']:>3}  failures={sum(1 for r in results if r['failed'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=VENDOR_REPLIES_PATH, help="JSONL of recorded vendor replies (the first is used)")
+    parser.add_argument("--days", type=int, nargs="+", default=[5, 10, 20, 30], help="Trip lengths to compare")
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per trip length and graph")
+    parser.add_argument("--provider", default="Local", help="Provider to benchmark (needs its API key unless Local)")
+    parser.add_argument("--model", help="Model name; defaults to synthetic for Local, else the provider default")
+    parser.add_argument("--ttft", type=float, default=0.3, help="Synthetic time to first token (seconds)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Synthetic output token rate")
+    args = parser.parse_args()
+    run_benchmark(args.dataset, args.days, args.repeats, args.provider, args.model, args.ttft, args.tokens_per_second)
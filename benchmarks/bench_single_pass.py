@@ -0,0 +1,108 @@
+# benchmarks/bench_single_pass.py
+"""
+Two-stage vs single-pass quotation graph on recorded vendor replies (benchmarks/data/vendor_replies.jsonl).
+
+The two-stage graph parses the vendor reply into a record and then structures that record into the
+quotation JSON (two LLM round-trips, or one when the rule-based pre-parser reads the reply, see
+VENDOR_PREPARSE_ENABLED); the single-pass graph (ai_conf.single_pass_quotation) goes
+from the raw reply to the JSON in one call. For each graph this reports latency, LLM calls, prompt
+and completion tokens, and field accuracy against the expected values recorded with each reply
+(price, currency, hotel names, one itinerary entry per day).
+
+Runs offline on the "Local" provider by default. Synthetic answers are built from the prompt, so
+synthetic accuracy only checks the plumbing; replay a cassette recorded from a real provider (or pass
+--provider with API keys set) to compare the prompts themselves.
+
+Usage:
+    python -m benchmarks.bench_single_pass
+    python -m benchmarks.bench_single_pass --repeats 3 --ttft 0.5 --tokens-per-second 80
+    python -m benchmarks.bench_single_pass --mode replay --cassette benchmarks/cassettes/llm_cassette.jsonl
+    python -m benchmarks.bench_single_pass --provider Groq --model llama3-70b-8192
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models import AIConfigState
+from src.llm.llm_providers import invalidate_llm_instances
+from src.llm.rate_limiter import set_rate_limiting_enabled, reset_rate_limiters
+from src.llm.response_cache import configure_response_cache
+from src.core.quotation_graph_builder import quotation_graph_for, _initial_quotation_state
+from src.utils.vendor_reply_dataset import VENDOR_REPLIES_PATH, load_vendor_replies, quotation_field_checks
+
+AI_SUGGESTIONS = "- Signature sightseeing of the destination\n- Local food experience\n- Evening at leisure"
+
+
+def _run_once(record: dict, provider: str, ai_conf: AIConfigState) -> dict:
+    start = time.perf_counter()
+    final_state = quotation_graph_for(ai_conf).invoke(
+        _initial_quotation_state(record["enquiry"], record["vendor_reply"], AI_SUGGESTIONS, provider, ai_conf)
+    )
+    elapsed = time.perf_counter() - start
+    structured_data = final_state.get("structured_quotation_data") or {}
+    calls = (final_state.get("generation_metadata") or {}).get("llm_calls", [])
+    failed = bool(structured_data.get("error")) or not final_state.get("pdf_output_bytes")
+    checks = [False] if failed else quotation_field_checks(structured_data, record)
+    return {
+        "latency": elapsed,
+        "calls": len(calls),
+        "prompt_tokens": sum(c.get("prompt_tokens") or 0 for c in calls),
+        "completion_tokens": sum(c.get("completion_tokens") or 0 for c in calls),
+        "failed": failed,
+        "checks_passed": sum(checks),
+        "checks_total": len(quotation_field_checks({}, record)), # A failed run scores zero on every field
+    }
+
+
+def _report(label: str, results: list[dict]):
+    latencies = sorted(r["latency"] for r in results)
+    p95 = latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))]
+    accuracy = sum(r["checks_passed"] for r in results) / max(1, sum(r["checks_total"] for r in results))
+    print(f"{label:<12} runs={len(results):>3}  p50={statistics.median(latencies):.2f}s  p95={p95:.2f}s  "
+          f"calls/run={statistics.mean(r['calls'] for r in results):.1f}  "
+          f"prompt_tok/run={statistics.mean(r['prompt_tokens'] for r in results):.0f}  "
+          f"completion_tok/run={statistics.mean(r['completion_tokens'] for r in results):.0f}  "
+          f"field_accuracy={accuracy:.1%}  failures={sum(1 for r in results if r['failed'])}")
+
+
+def run_benchmark(dataset: str, repeats: int, provider: str, model: str | None, mode: str,
+                  ttft: float, tokens_per_second: float, cassette: str | None):
+    set_rate_limiting_enabled(False)
+    reset_rate_limiters()
+    configure_response_cache(enabled=False) # Both graphs must reach the provider
+    invalidate_llm_instances()
+
+    # The pooled Local client reads these when it is created (see create_local_chat_model).
+    os.environ["LOCAL_LLM_TTFT_SECONDS"] = str(ttft)
+    os.environ["LOCAL_LLM_TOKENS_PER_SECOND"] = str(tokens_per_second)
+    if cassette:
+        os.environ["LOCAL_LLM_CASSETTE_PATH"] = cassette
+
+    records = load_vendor_replies(dataset)
+    model = model or (mode if provider == "Local" else None)
+    print(f"{len(records)} recorded vendor replies x {repeats} | provider={provider} model={model or 'default'}\n")
+
+    for label, single_pass in (("two-stage", False), ("single-pass", True)):
+        ai_conf = AIConfigState(selected_ai_provider=provider, selected_model_for_provider=model,
+                                single_pass_quotation=single_pass)
+        results = [_run_once(record, provider, ai_conf) for _ in range(repeats) for record in records]
+        _report(label, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=VENDOR_REPLIES_PATH, help="JSONL of recorded vendor replies with expected fields")
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per vendor reply and graph")
+    parser.add_argument("--provider", default="Local", help="Provider to benchmark (needs its API key unless Local)")
+    parser.add_argument("--model", help="Model name; defaults to --mode for Local, else the provider default")
+    parser.add_argument("--mode", choices=["synthetic", "replay"], default="synthetic", help="Local provider mode")
+    parser.add_argument("--ttft", type=float, default=0.3, help="Synthetic time to first token (seconds)")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Synthetic output token rate")
+    parser.add_argument("--cassette", help="JSONL cassette for replay mode")
+    args = parser.parse_args()
+    run_benchmark(args.dataset, args.repeats, args.provider, args.model, args.mode,
+                  args.ttft, args.tokens_per_second, args.cassette)
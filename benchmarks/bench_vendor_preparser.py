@@ -0,0 +1,145 @@
+# benchmarks/bench_vendor_preparser.py
+"""
+Rule-based vendor reply pre-parser (src/core/vendor_preparser.py) vs the parsing LLM call.
+
+For every recorded reply (benchmarks/data/vendor_replies.jsonl and vendor_reply_corpus.jsonl) this
+runs the rules and the graph's parse_vendor_reply stage, and reports:
+
+- hit rate: replies the rules are confident about (the LLM call is skipped for those), and the
+  time per reply of the rules vs the LLM stage;
+- agreement between the two parses on the hits, per field: price, currency, price basis, hotel
+  names, inclusions and exclusions;
+- accuracy of both against the values recorded with each reply, on the hits and on all replies.
+
+Runs offline on the "Local" provider by default. Synthetic LLM answers are built from the prompt
+with simple rules of their own, so their agreement only checks the plumbing; replay a cassette
+recorded from a real provider (or pass --provider with API keys set) for a meaningful comparison.
+
+Usage:
+    python -m benchmarks.bench_vendor_preparser
+    python -m benchmarks.bench_vendor_preparser --threshold 0.7 --show-misses
+    python -m benchmarks.bench_vendor_preparser --provider Groq --model llama3-70b-8192
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models import AIConfigState
+from src.llm.llm_providers import invalidate_llm_instances
+from src.llm.rate_limiter import set_rate_limiting_enabled, reset_rate_limiters
+from src.llm.response_cache import configure_response_cache
+from src.core.vendor_parse_memo import configure_vendor_parse_memo
+from src.core.vendor_preparser import configure_vendor_preparser, preparse_vendor_reply, vendor_preparse_threshold
+from src.core.quotation_graph_builder import parse_vendor_reply_node, _initial_quotation_state
+from src.utils.vendor_reply_dataset import (
+    VENDOR_REPLIES_PATH, VENDOR_REPLY_CORPUS_PATH, load_vendor_replies, digits, same_hotel, parsed_reply_checks
+)
+from benchmarks.bench_single_pass import AI_SUGGESTIONS
+
+AGREEMENT_FIELDS = ("price", "currency", "price_basis", "hotels", "inclusions", "exclusions")
+
+
+def _hotels_match(names: list[str], other_names: list[str]) -> bool:
+    return len(names) == len(other_names) and all(any(same_hotel(n, o) for o in other_names) for n in names)
+
+
+def _items(values: list[str] | None) -> set[str]:
+    return {re.sub(r"\W+", " ", value).strip().casefold() for value in values or [] if value.strip()}
+
+
+def _field_agrees(field: str, rules: dict, llm: dict) -> bool:
+    if field == "price":
+        return digits(rules.get("price")) == digits(llm.get("price"))
+    if field == "hotels":
+        return _hotels_match([h.get("name") or "" for h in rules.get("hotels") or []],
+                             [h.get("name") or "" for h in llm.get("hotels") or []])
+    if field in ("inclusions", "exclusions"):
+        rule_items, llm_items = _items(rules.get(field)), _items(llm.get(field))
+        # Same items, however the list was split: compare the words they cover
+        return set(" ".join(rule_items).split()) == set(" ".join(llm_items).split())
+    return str(rules.get(field) or "").casefold() == str(llm.get(field) or "").casefold()
+
+
+def _llm_parse(record: dict, provider: str, ai_conf: AIConfigState) -> tuple[dict | None, float]:
+    state = _initial_quotation_state(record["enquiry"], record["vendor_reply"], AI_SUGGESTIONS, provider, ai_conf)
+    start = time.perf_counter()
+    result = parse_vendor_reply_node(state)
+    return result.get("parsed_vendor_info"), time.perf_counter() - start
+
+
+def _accuracy(results: list[dict], key: str) -> str:
+    checks = [check for r in results for check in parsed_reply_checks(r[key] or {}, r["record"])]
+    return f"{sum(checks) / max(1, len(checks)):.1%}"
+
+
+def run_benchmark(datasets: list[str], threshold: float, provider: str, model: str | None, mode: str,
+                  ttft: float, tokens_per_second: float, cassette: str | None, show_misses: bool):
+    set_rate_limiting_enabled(False)
+    reset_rate_limiters()
+    configure_response_cache(enabled=False) # Every reply must reach the provider
+    configure_vendor_parse_memo(enabled=False)
+    configure_vendor_preparser(enabled=False) # The LLM stage is measured on its own
+    invalidate_llm_instances()
+
+    # The pooled Local client reads these when it is created (see create_local_chat_model).
+    os.environ["LOCAL_LLM_TTFT_SECONDS"] = str(ttft)
+    os.environ["LOCAL_LLM_TOKENS_PER_SECOND"] = str(tokens_per_second)
+    if cassette:
+        os.environ["LOCAL_LLM_CASSETTE_PATH"] = cassette
+
+    records = [record for dataset in datasets for record in load_vendor_replies(dataset)]
+    model = model or (mode if provider == "Local" else None)
+    ai_conf = AIConfigState(selected_ai_provider=provider, selected_model_for_provider=model)
+    print(f"{len(records)} recorded vendor replies | threshold={threshold} | provider={provider} model={model or 'default'}\n")
+
+    results = []
+    for record in records:
+        start = time.perf_counter()
+        rules_record, confidence = preparse_vendor_reply(record["vendor_reply"])
+        rules_seconds = time.perf_counter() - start
+        llm_parsed, llm_seconds = _llm_parse(record, provider, ai_conf)
+        results.append({"record": record, "confidence": confidence, "hit": confidence >= threshold,
+                        "rules": rules_record.model_dump(exclude_none=True), "llm": llm_parsed,
+                        "rules_seconds": rules_seconds, "llm_seconds": llm_seconds})
+
+    hits = [r for r in results if r["hit"]]
+    print(f"hit rate={len(hits)}/{len(results)} ({len(hits) / max(1, len(results)):.0%})  "
+          f"rules={statistics.mean(r['rules_seconds'] for r in results) * 1e6:.0f}us/reply  "
+          f"llm_stage={statistics.mean(r['llm_seconds'] for r in results) * 1e3:.0f}ms/reply  "
+          f"llm_failures={sum(1 for r in results if r['llm'] is None)}")
+    compared = [r for r in hits if r["llm"] is not None]
+    if compared:
+        agreement = "  ".join(f"{field}={sum(_field_agrees(field, r['rules'], r['llm']) for r in compared) / len(compared):.0%}"
+                              for field in AGREEMENT_FIELDS)
+        print(f"agreement with the LLM parse on {len(compared)} hits: {agreement}")
+    print(f"accuracy on hits:        rules={_accuracy(hits, 'rules')}  llm={_accuracy(hits, 'llm')}")
+    print(f"accuracy on all replies: rules={_accuracy(results, 'rules')}  llm={_accuracy(results, 'llm')}  "
+          f"rules+llm fallback={_accuracy([{**r, 'used': r['rules'] if r['hit'] else r['llm']} for r in results], 'used')}")
+    if show_misses:
+        for r in results:
+            if not r["hit"]:
+                print(f"  miss {r['record'].get('id', '?'):<28} confidence={r['confidence']:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", action="append", help="JSONL of recorded vendor replies (repeatable); "
+                                                           "defaults to vendor_replies.jsonl and vendor_reply_corpus.jsonl")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="Confidence needed to skip the LLM; defaults to VENDOR_PREPARSE_CONFIDENCE_THRESHOLD")
+    parser.add_argument("--provider", default="Local", help="Provider of the parsing stage (needs its API key unless Local)")
+    parser.add_argument("--model", help="Model name; defaults to --mode for Local, else the provider default")
+    parser.add_argument("--mode", choices=["synthetic", "replay"], default="synthetic", help="Local provider mode")
+    parser.add_argument("--ttft", type=float, default=0.3, help="Synthetic time to first token (seconds)")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Synthetic output token rate")
+    parser.add_argument("--cassette", help="JSONL cassette for replay mode")
+    parser.add_argument("--show-misses", action="store_true", help="List the replies left to the LLM")
+    args = parser.parse_args()
+    threshold = args.threshold if args.threshold is not None else vendor_preparse_threshold()
+    run_benchmark(args.dataset or [VENDOR_REPLIES_PATH, VENDOR_REPLY_CORPUS_PATH], threshold, args.provider, args.model, args.mode,
+                  args.ttft, args.tokens_per_second, args.cassette, args.show_misses)
@@ -1,6 +1,8 @@
 -- Drop all database objects in reverse order of creation to handle dependencies
 
 -- First drop RLS policies
+DROP POLICY IF EXISTS "Public anon access for vendor_reply_parses" ON public.vendor_reply_parses;
+DROP POLICY IF EXISTS "Public anon access for llm_calls" ON public.llm_calls;
 DROP POLICY IF EXISTS "Public anon access for quotations" ON public.quotations;
 DROP POLICY IF EXISTS "Public anon access for vendor_replies" ON public.vendor_replies;
 DROP POLICY IF EXISTS "Public anon access for itineraries" ON public.itineraries;
@@ -8,12 +10,16 @@ DROP POLICY IF EXISTS "Public anon access for enquiries" ON public.enquiries;
 DROP POLICY IF EXISTS "Public anon access for clients" ON public.clients;
 
 -- Then drop indexes
+DROP INDEX IF EXISTS public.idx_vendor_reply_parses_vendor_reply_id;
+DROP INDEX IF EXISTS public.idx_llm_calls_enquiry_id;
 DROP INDEX IF EXISTS public.idx_quotations_enquiry_id;
 DROP INDEX IF EXISTS public.idx_vendor_replies_enquiry_id;
 DROP INDEX IF EXISTS public.idx_itineraries_enquiry_id;
 DROP INDEX IF EXISTS public.idx_clients_enquiry_id;
 
 -- Finally drop tables in reverse order of creation
+DROP TABLE IF EXISTS public.vendor_reply_parses;
+DROP TABLE IF EXISTS public.llm_calls;
 DROP TABLE IF EXISTS public.quotations;
 DROP TABLE IF EXISTS public.vendor_replies;
 DROP TABLE IF EXISTS public.itineraries;
@@ -81,6 +81,53 @@ CREATE INDEX idx_clients_enquiry_id ON public.clients(enquiry_id);
 COMMENT ON TABLE public.clients IS 'Stores client/customer information for enquiries.';
 COMMENT ON COLUMN public.clients.enquiry_id IS 'Foreign key linking to the parent enquiry.';
 
+-- Create llm_calls table (per-call LLM telemetry)
+CREATE TABLE public.llm_calls (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    enquiry_id UUID NOT NULL REFERENCES public.enquiries(id) ON DELETE CASCADE,
+    created_at TIMESTAMPTZ DEFAULT now() NOT NULL,
+    stage TEXT, -- Node / call site, e.g. 'places_suggestion', 'parse_vendor_reply', 'structure_quotation'
+    provider TEXT NOT NULL,
+    model TEXT,
+    cache_hit BOOLEAN DEFAULT false NOT NULL,
+    hedged BOOLEAN DEFAULT false NOT NULL,
+    queue_seconds NUMERIC,
+    time_to_first_token_seconds NUMERIC,
+    latency_seconds NUMERIC,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    tokens_estimated BOOLEAN DEFAULT false NOT NULL,
+    estimated_cost_usd NUMERIC, -- NULL when the model's price is unknown
+    finish_reason TEXT, -- Normalised provider stop reason; 'length' means the output limit was hit
+    continuations INTEGER DEFAULT 0 NOT NULL, -- Follow-up requests that resumed a truncated answer
+    error_type TEXT -- NULL for successful calls
+);
+
+-- Optional: Index on enquiry_id for faster lookups
+CREATE INDEX idx_llm_calls_enquiry_id ON public.llm_calls(enquiry_id);
+
+COMMENT ON TABLE public.llm_calls IS 'Stores latency, token usage and estimated cost of each LLM call made for an enquiry.';
+COMMENT ON COLUMN public.llm_calls.enquiry_id IS 'Foreign key linking to the parent enquiry.';
+COMMENT ON COLUMN public.llm_calls.queue_seconds IS 'Time spent waiting for a rate-limiter slot before the call was sent.';
+
+-- Create vendor_reply_parses table (memoised output of the vendor reply parsing LLM step)
+CREATE TABLE public.vendor_reply_parses (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    vendor_reply_id UUID REFERENCES public.vendor_replies(id) ON DELETE CASCADE, -- NULL when parsed outside the app (e.g. a CSV batch)
+    created_at TIMESTAMPTZ DEFAULT now() NOT NULL,
+    memo_key TEXT NOT NULL UNIQUE, -- Hash of (vendor reply text, destination, num_days, parse model, parse format)
+    parse_model TEXT NOT NULL, -- 'provider/model', or 'routed' when the model router picked it
+    parsed_text TEXT NOT NULL, -- Compact text given to the structuring prompt
+    parsed_data JSONB -- ParsedVendorReply record (price, currency, hotels, inclusions, ...); NULL if the answer was not one
+);
+
+-- Optional: Index on vendor_reply_id for faster lookups
+CREATE INDEX idx_vendor_reply_parses_vendor_reply_id ON public.vendor_reply_parses(vendor_reply_id);
+
+COMMENT ON TABLE public.vendor_reply_parses IS 'Stores parsed vendor replies so later quotation attempts for the same reply skip the parsing LLM call.';
+COMMENT ON COLUMN public.vendor_reply_parses.memo_key IS 'Lookup key; temperature and the structuring provider are deliberately not part of it.';
+COMMENT ON COLUMN public.vendor_reply_parses.parsed_data IS 'Queryable vendor offer, e.g. parsed_data->>''currency'' or jsonb_array_length(parsed_data->''hotels'').';
+
 -- Enable RLS and create policies for all tables
 ALTER TABLE public.itineraries ENABLE ROW LEVEL SECURITY;
 CREATE POLICY "Public anon access for itineraries"
@@ -121,3 +168,19 @@ FOR ALL
 TO anon
 USING (true)
 WITH CHECK (true);
+
+ALTER TABLE public.llm_calls ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Public anon access for llm_calls"
+ON public.llm_calls
+FOR ALL
+TO anon
+USING (true)
+WITH CHECK (true);
+
+ALTER TABLE public.vendor_reply_parses ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Public anon access for vendor_reply_parses"
+ON public.vendor_reply_parses
+FOR ALL
+TO anon
+USING (true)
+WITH CHECK (true);
@@ -0,0 +1,314 @@
+# src/core/batch_quotations.py
+"""
+Batch quotation runs: quote many enquiries (latest itinerary + latest vendor reply each) without
+the Streamlit UI, e.g. at month-end when vendor replies have arrived overnight.
+
+Items come from Supabase (load_batch_items_from_supabase) or a CSV export (load_batch_items_from_csv)
+and run through run_quotation_generation_graph on a thread pool. Provider limits are enforced by
+the shared per-(provider, model) rate limiter and circuit breakers in src/llm, so extra workers
+wait for a slot instead of tripping 429s. Each finished item is appended to a JSONL state file;
+re-running with the same file skips items already done (a newer vendor reply counts as a new item)
+and retries the failures. Items of a --no-save run are recorded as "generated", not "done": a later
+saving run still quotes, uploads and records them.
+
+Usage:
+    python -m src.core.batch_quotations --provider Groq --replies-since 2026-10-01
+    python -m src.core.batch_quotations --csv month_end.csv --workers 8 --report report.json
+    python -m src.core.batch_quotations --csv month_end.csv --provider Local --model synthetic --no-save
+"""
+import os
+import csv
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from src.models import AIConfigState, BatchQuotationItem, BatchItemResult
+from src.core.quotation_graph_builder import run_quotation_generation_graph
+from src.core.quotation_persistence import is_storable_quotation, save_quotation_pdf, save_llm_calls
+from src.llm.telemetry import capture_llm_calls
+from src.utils.constants import BATCH_QUOTATION_WORKERS, BATCH_QUOTATION_STATE_FILE
+
+CSV_REQUIRED_COLUMNS = ("enquiry_id", "destination", "num_days", "traveler_count", "vendor_reply_text")
+
+
+def batch_item_key(item: BatchQuotationItem) -> str:
+    """Enquiry + vendor reply version, so a reply that arrives after a run is quoted again on resume."""
+    reply_version = item.vendor_reply_id or hashlib.sha256(item.vendor_reply_text.encode("utf-8")).hexdigest()[:16]
+    return f"{item.enquiry_id}:{reply_version}"
+
+
+def _enquiry_details_for_graph(enquiry: dict, client_name: str | None) -> dict:
+    details = dict(enquiry)
+    details["client_name_actual"] = client_name or "Valued Client"
+    return details
+
+
+def _as_naive_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def _created_after(row: dict, since: datetime | None) -> bool:
+    if since is None:
+        return True
+    try:
+        created_at = datetime.fromisoformat(str(row.get("created_at", "")).replace("Z", "+00:00"))
+    except ValueError:
+        return True # Unknown age: quote it rather than silently dropping it
+    return _as_naive_utc(created_at) >= _as_naive_utc(since)
+
+
+def load_batch_items_from_supabase(
+    enquiry_ids: list[str] | None = None,
+    replies_since: datetime | None = None
+) -> tuple[list[BatchQuotationItem], list[str]]:
+    """
+    One item per enquiry that has a vendor reply (optionally only replies created since `replies_since`).
+    Returns (items, errors); enquiries that cannot be loaded are reported in errors and left out.
+    """
+    from src.utils.supabase_utils import (
+        get_enquiries, get_enquiry_by_id, get_client_by_enquiry_id,
+        get_itinerary_by_enquiry_id, get_vendor_reply_by_enquiry_id
+    )
+
+    errors = []
+    if enquiry_ids:
+        enquiries = []
+        for enquiry_id in enquiry_ids:
+            enquiry, error_msg = get_enquiry_by_id(enquiry_id)
+            if enquiry:
+                enquiries.append(enquiry)
+            else:
+                errors.append(f"{enquiry_id}: {error_msg or 'enquiry not found'}")
+    else:
+        enquiries, error_msg = get_enquiries()
+        if error_msg:
+            return [], [f"Could not load enquiries: {error_msg}"]
+
+    items = []
+    for enquiry in enquiries:
+        enquiry_id = enquiry["id"]
+        vendor_reply, error_msg = get_vendor_reply_by_enquiry_id(enquiry_id)
+        if error_msg:
+            errors.append(f"{enquiry_id}: {error_msg}")
+            continue
+        if not vendor_reply or not vendor_reply.get("reply_text") or not _created_after(vendor_reply, replies_since):
+            continue # Nothing (new) to quote
+        itinerary, _ = get_itinerary_by_enquiry_id(enquiry_id)
+        client, _ = get_client_by_enquiry_id(enquiry_id)
+        items.append(BatchQuotationItem(
+            enquiry_id=enquiry_id,
+            enquiry_details=_enquiry_details_for_graph(enquiry, (client or {}).get("name")),
+            itinerary_text=(itinerary or {}).get("itinerary_text") or "Itinerary suggestions not available.",
+            vendor_reply_text=vendor_reply["reply_text"],
+            itinerary_id=(itinerary or {}).get("id"),
+            vendor_reply_id=vendor_reply.get("id")
+        ))
+    return items, errors
+
+
+def load_batch_items_from_csv(path: str) -> tuple[list[BatchQuotationItem], list[str]]:
+    """
+    Items from a CSV with the columns enquiry_id, destination, num_days, traveler_count and
+    vendor_reply_text, plus optional trip_type, client_name, itinerary_text, itinerary_id and
+    vendor_reply_id. Returns (items, errors); invalid rows are reported by line number.
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in CSV_REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            return [], [f"{path}: missing column(s) {', '.join(missing)}"]
+        rows = list(reader)
+
+    items, errors = [], []
+    for line_number, row in enumerate(rows, start=2):
+        row = {key: (value or "").strip() for key, value in row.items() if key}
+        try:
+            enquiry = {
+                "id": row["enquiry_id"],
+                "destination": row["destination"],
+                "num_days": int(row["num_days"]),
+                "traveler_count": int(row["traveler_count"]),
+                "trip_type": row.get("trip_type") or "Leisure",
+            }
+        except ValueError as e:
+            errors.append(f"{path}:{line_number}: {e}")
+            continue
+        if not row["enquiry_id"] or not row["vendor_reply_text"]:
+            errors.append(f"{path}:{line_number}: enquiry_id and vendor_reply_text are required")
+            continue
+        items.append(BatchQuotationItem(
+            enquiry_id=row["enquiry_id"],
+            enquiry_details=_enquiry_details_for_graph(enquiry, row.get("client_name")),
+            itinerary_text=row.get("itinerary_text") or "Itinerary suggestions not available.",
+            vendor_reply_text=row["vendor_reply_text"],
+            itinerary_id=row.get("itinerary_id") or None,
+            vendor_reply_id=row.get("vendor_reply_id") or None
+        ))
+    return items, errors
+
+
+def load_batch_state(state_path: str) -> dict[str, BatchItemResult]:
+    """Latest result per item key from a state file (missing file: empty)."""
+    results = {}
+    if not state_path or not os.path.exists(state_path):
+        return results
+    with open(state_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                try:
+                    result = BatchItemResult.model_validate_json(line)
+                except ValueError:
+                    continue # A line cut off by a crash mid-write
+                results[result.item_key] = result
+    return results
+
+
+def _append_batch_state(state_path: str, result: BatchItemResult):
+    with open(state_path, "a", encoding="utf-8") as f:
+        f.write(result.model_dump_json() + "\n")
+
+
+def quote_batch_item(item: BatchQuotationItem, provider: str, ai_conf: AIConfigState, save: bool = True) -> BatchItemResult:
+    """Generates (and with `save`, uploads and records) one quotation. Never raises: failures are in the result."""
+    start = time.perf_counter()
+    result = BatchItemResult(item_key=batch_item_key(item), enquiry_id=item.enquiry_id, status="failed")
+    try:
+        with capture_llm_calls() as llm_calls:
+            pdf_bytes, structured_data = run_quotation_generation_graph(
+                item.enquiry_details, item.vendor_reply_text, item.itinerary_text, provider, ai_conf,
+                vendor_reply_id=item.vendor_reply_id
+            )
+        result.llm_calls = len(llm_calls)
+        if save:
+            save_llm_calls(item.enquiry_id, llm_calls)
+
+        if not is_storable_quotation(pdf_bytes, structured_data):
+            result.error = str((structured_data or {}).get("error") or "No valid PDF was generated.")
+        elif save:
+            quotation_row, error_msg = save_quotation_pdf(
+                item.enquiry_id, pdf_bytes, structured_data,
+                itinerary_used_id=item.itinerary_id, vendor_reply_used_id=item.vendor_reply_id
+            )
+            if error_msg:
+                result.error = error_msg
+            else:
+                result.status = "done"
+                result.quotation_id = quotation_row.get("id")
+                result.pdf_storage_path = quotation_row.get("pdf_storage_path")
+        else:
+            result.status = "generated"
+    except Exception as e: # One bad enquiry must not stop the batch
+        result.error = f"{type(e).__name__}: {e}"
+    result.seconds = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_quotation_batch(
+    items: list[BatchQuotationItem],
+    provider: str,
+    ai_conf: AIConfigState,
+    max_workers: int = BATCH_QUOTATION_WORKERS,
+    save: bool = True,
+    state_path: str | None = BATCH_QUOTATION_STATE_FILE,
+    on_result: Callable[[BatchItemResult], None] | None = None
+) -> dict[str, Any]:
+    """
+    Quotes `items` with up to max_workers concurrent graph runs. With state_path, items already
+    done in an earlier run are skipped and every new result is appended to it as soon as it finishes.
+    Items only generated by an earlier run with save=False are skipped by another such run but
+    quoted again when saving.
+    Returns a report: counts per status, elapsed seconds, throughput and the per-item results.
+    """
+    previous = load_batch_state(state_path)
+    results, pending, seen_keys = [], [], set()
+    for item in items:
+        key = batch_item_key(item)
+        if key in seen_keys:
+            continue
+        seen_keys.add(key)
+        finished_statuses = ("done",) if save else ("done", "generated")
+        if key in previous and previous[key].status in finished_statuses:
+            results.append(previous[key].model_copy(update={"status": "skipped"}))
+        else:
+            pending.append(item)
+
+    print(f"[Batch Quotations] {len(pending)} to quote, {len(results)} already done, "
+          f"{max_workers} worker(s), provider {provider}.")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="batch-quote") as executor:
+        futures = [executor.submit(quote_batch_item, item, provider, ai_conf, save) for item in pending]
+        for finished, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results.append(result)
+            if state_path:
+                _append_batch_state(state_path, result)
+            detail = result.quotation_id or result.error or ""
+            print(f"[Batch Quotations] {finished}/{len(pending)} {result.status.upper()} enquiry {result.enquiry_id} "
+                  f"in {result.seconds:.1f}s ({result.llm_calls} LLM calls) {detail}")
+            if on_result:
+                on_result(result)
+    elapsed = time.perf_counter() - start
+
+    counts = {status: sum(1 for r in results if r.status == status) for status in ("done", "generated", "failed", "skipped")}
+    return {
+        **counts,
+        "total": len(results),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_minute": round((counts["done"] + counts["generated"]) / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        "results": [r.model_dump() for r in results],
+        "failures": [r.model_dump() for r in results if r.status == "failed"],
+    }
+
+
+def _print_report(report: dict):
+    print(f"\n[Batch Quotations] done={report['done']} generated={report['generated']} failed={report['failed']} "
+          f"skipped={report['skipped']} "
+          f"in {report['elapsed_seconds']:.1f}s ({report['throughput_per_minute']:.1f} quotations/min)")
+    for failure in report["failures"]:
+        print(f"  FAILED {failure['enquiry_id']}: {failure['error']}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="Load items from this CSV instead of Supabase")
+    parser.add_argument("--enquiry-ids", nargs="+", help="Only these enquiries (Supabase source)")
+    parser.add_argument("--replies-since", type=datetime.fromisoformat,
+                        help="Only enquiries whose latest vendor reply was created at/after this ISO date (Supabase source)")
+    parser.add_argument("--provider", default=AIConfigState().selected_ai_provider, help="LLM provider")
+    parser.add_argument("--model", help="Model name; defaults to the provider default")
+    parser.add_argument("--single-pass", action="store_true", help="Use the single-pass quotation graph")
+    parser.add_argument("--workers", type=int, default=BATCH_QUOTATION_WORKERS, help="Enquiries quoted concurrently")
+    parser.add_argument("--state-file", default=BATCH_QUOTATION_STATE_FILE, help="JSONL of per-item results used to resume")
+    parser.add_argument("--no-save", action="store_true", help="Generate only: no upload, no quotations rows")
+    parser.add_argument("--report", help="Write the JSON report to this path")
+    args = parser.parse_args(argv)
+
+    if args.csv:
+        items, load_errors = load_batch_items_from_csv(args.csv)
+    else:
+        items, load_errors = load_batch_items_from_supabase(args.enquiry_ids, args.replies_since)
+    for error in load_errors:
+        print(f"[Batch Quotations] Skipping: {error}")
+
+    ai_conf = AIConfigState(selected_ai_provider=args.provider, selected_model_for_provider=args.model,
+                            single_pass_quotation=args.single_pass)
+    report = run_quotation_batch(items, args.provider, ai_conf, max_workers=args.workers,
+                                 save=not args.no_save, state_path=args.state_file)
+    report["load_errors"] = load_errors
+    _print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["failed"] or load_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+# src/core/job_queue.py
+"""
+Durable background jobs: an in-process worker pool with its job records in SQLite.
+
+Long work (quotation generation with its uploads, DOCX conversion, places suggestions) is
+submitted here instead of running on the Streamlit script thread, so a rerun, tab switch or
+browser refresh does not kill it and the UI only polls the job record (see the Tab 3 jobs
+fragment). The job kinds and their handlers are registered by src/core/quotation_jobs.py.
+
+- Idempotent while in flight: submitting the same inputs (kind, payload, dependency) again returns
+  the job for them while it is still waiting, queued or running. Once it is done or failed, the next
+  submit creates a new job, so a repeated click runs again (and e.g. saves a new quotation row).
+- Restartable: jobs left queued or running when the server stopped are queued again on the next
+  start. Quotation jobs then resume from their graph checkpoints.
+- Dependencies: a job submitted with depends_on waits until that job is done (e.g. DOCX conversion
+  after its quotation) and fails if that job fails.
+- Progress: handlers report a message and an optional JSON preview, stored on the record.
+
+Records (including the produced file) are deleted JOB_QUEUE_TTL_SECONDS after their last update.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from src.models import JobRecord
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(".cache", "jobs.sqlite3"))
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "4"))
+JOB_QUEUE_TTL_SECONDS = float(os.getenv("JOB_QUEUE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+ACTIVE_JOB_STATUSES = ("waiting", "queued", "running")
+
+
+class JobContext:
+    """Passed to handlers: progress reporting and access to the output of the job they depend on."""
+
+    def __init__(self, queue: "JobQueue", job_id: str):
+        self._queue = queue
+        self.job_id = job_id
+
+    def progress(self, message: str, preview: dict | None = None):
+        self._queue._update_progress(self.job_id, message, preview)
+
+    def dependency(self) -> tuple[JobRecord | None, bytes | None]:
+        """(record, file) of the job this one depends on."""
+        job = self._queue.get(self.job_id)
+        if job is None or not job.depends_on:
+            return None, None
+        return self._queue.get(job.depends_on), self._queue.get_file(job.depends_on)
+
+
+# handler(payload, context) -> (result, file, error_message); a failed job may still keep a file (e.g. an error PDF)
+JobHandler = Callable[[dict, JobContext], tuple[dict | None, bytes | None, str | None]]
+
+
+def input_key_for(kind: str, payload: dict) -> str:
+    payload_json = json.dumps(payload, sort_keys=True, default=str)
+    return f"{kind}-{hashlib.sha256(payload_json.encode('utf-8')).hexdigest()[:32]}"
+
+
+class JobQueue:
+    """Job records in one SQLite file, executed by a thread pool of this process."""
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, max_workers: int = JOB_QUEUE_WORKERS,
+                 ttl_seconds: float = JOB_QUEUE_TTL_SECONDS):
+        self.path = path
+        self.max_workers = max(1, max_workers)
+        self.ttl_seconds = ttl_seconds
+        self.handlers: dict[str, JobHandler] = {}
+        self._lock = threading.RLock()
+        self._conn: sqlite3.Connection | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._started = False
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily so importing this module never touches the disk.
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY, input_key TEXT, kind TEXT NOT NULL, scope TEXT, status TEXT NOT NULL,"
+                " payload TEXT NOT NULL, depends_on TEXT, progress TEXT, preview TEXT, result TEXT,"
+                " error TEXT, file BLOB, attempts INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL, updated_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_jobs_scope ON jobs (scope, created_at);"
+                "CREATE INDEX IF NOT EXISTS idx_jobs_depends_on ON jobs (depends_on);"
+            )
+            if "input_key" not in {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN input_key TEXT") # Files written before in-flight idempotency
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_input_key ON jobs (input_key, status)")
+            pruned = self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (time.time() - self.ttl_seconds,)).rowcount
+            if pruned:
+                print(f"JOB_QUEUE: Pruned {pruned} expired job(s)")
+        return self._conn
+
+    def start(self):
+        """Queues again the jobs a stopped server left unfinished. Called on first submit/poll."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            conn = self._connection()
+            conn.execute("UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'", (time.time(),))
+            resumable = [row[0] for row in conn.execute("SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at")]
+            waiting = [row[0] for row in conn.execute("SELECT job_id FROM jobs WHERE status = 'waiting'")]
+        if resumable:
+            print(f"JOB_QUEUE: Resuming {len(resumable)} unfinished job(s)")
+        for job_id in resumable:
+            self._dispatch(job_id)
+        for job_id in waiting: # Their dependency may have finished just before the restart
+            self._release_if_ready(job_id)
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._started = False
+
+    def reopen(self, path: str):
+        """Points the queue at another file (e.g. a temp file in tests)."""
+        self.close()
+        self.path = path
+
+    # --- Submitting ---
+
+    def submit(self, kind: str, payload: dict, scope: str | None = None, depends_on: str | None = None) -> str:
+        """Returns the id of the unfinished job for these inputs, or of a new job when there is none."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        self.start()
+        input_key = input_key_for(kind, {"payload": payload, "depends_on": depends_on})
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                f"SELECT job_id FROM jobs WHERE input_key = ? AND status IN ({','.join('?' * len(ACTIVE_JOB_STATUSES))})"
+                " ORDER BY created_at DESC LIMIT 1", (input_key, *ACTIVE_JOB_STATUSES)
+            ).fetchone()
+            if row:
+                return row[0] # Same inputs still in flight (e.g. a double click or a rerun): that job is the answer
+            job_id = f"{input_key}-{uuid.uuid4().hex[:8]}"
+            conn.execute(
+                "INSERT INTO jobs (job_id, input_key, kind, scope, status, payload, depends_on, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, 'waiting', ?, ?, ?, ?)",
+                (job_id, input_key, kind, scope, json.dumps(payload, default=str), depends_on, now, now)
+            )
+        self._release_if_ready(job_id)
+        return job_id
+
+    def _release_if_ready(self, job_id: str):
+        """Moves a waiting job to the pool once its dependency is done (or fails it with its dependency)."""
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT status, depends_on FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if not row or row[0] != "waiting":
+                return
+            dependency_status = None
+            if row[1]:
+                dependency = conn.execute("SELECT status FROM jobs WHERE job_id = ?", (row[1],)).fetchone()
+                dependency_status = dependency[0] if dependency else "failed"
+            if dependency_status in (None, "done"):
+                conn.execute("UPDATE jobs SET status = 'queued', updated_at = ? WHERE job_id = ?", (time.time(), job_id))
+            elif dependency_status == "failed":
+                conn.execute("UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE job_id = ?",
+                             (f"Job {row[1]} it depends on failed.", time.time(), job_id))
+                return
+            else:
+                return # Released when the dependency finishes
+        self._dispatch(job_id)
+
+    def _dispatch(self, job_id: str):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job-worker")
+            self._executor.submit(self._execute, job_id)
+
+    # --- Running ---
+
+    def _execute(self, job_id: str):
+        with self._lock:
+            conn = self._connection()
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE job_id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            ).rowcount
+            row = conn.execute("SELECT kind, payload FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if not claimed or not row:
+            return # Already taken by another worker (e.g. dispatched twice around a restart)
+
+        kind, payload = row[0], json.loads(row[1])
+        print(f"JOB_QUEUE: Running {job_id}")
+        start = time.perf_counter()
+        try:
+            result, file_bytes, error_msg = self.handlers[kind](payload, JobContext(self, job_id))
+        except Exception as e: # A handler bug must fail its job, not the worker
+            result, file_bytes, error_msg = None, None, f"{type(e).__name__}: {e}"
+
+        status = "failed" if error_msg else "done"
+        with self._lock:
+            self._connection().execute(
+                "UPDATE jobs SET status = ?, result = ?, file = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, file_bytes, error_msg, time.time(), job_id)
+            )
+            dependents = [r[0] for r in self._connection().execute(
+                "SELECT job_id FROM jobs WHERE depends_on = ? AND status = 'waiting'", (job_id,))]
+        print(f"JOB_QUEUE: {status.upper()} {job_id} in {time.perf_counter() - start:.1f}s {error_msg or ''}")
+        for dependent_id in dependents:
+            self._release_if_ready(dependent_id)
+
+    def _update_progress(self, job_id: str, message: str, preview: dict | None):
+        with self._lock:
+            self._connection().execute(
+                "UPDATE jobs SET progress = ?, preview = COALESCE(?, preview), updated_at = ? WHERE job_id = ?",
+                (message, json.dumps(preview, default=str) if preview is not None else None, time.time(), job_id)
+            )
+
+    # --- Reading ---
+
+    def get(self, job_id: str) -> JobRecord | None:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT job_id, kind, scope, status, payload, depends_on, progress, preview, result, error,"
+                " attempts, created_at, updated_at FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return JobRecord(
+            job_id=row[0], kind=row[1], scope=row[2], status=row[3], payload=json.loads(row[4]),
+            depends_on=row[5], progress=row[6], preview=json.loads(row[7]) if row[7] else None,
+            result=json.loads(row[8]) if row[8] else None, error=row[9], attempts=row[10],
+            created_at=row[11], updated_at=row[12]
+        )
+
+    def get_file(self, job_id: str) -> bytes | None:
+        with self._lock:
+            row = self._connection().execute("SELECT file FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bytes(row[0]) if row and row[0] is not None else None
+
+    def list_job_ids(self, scope: str, statuses: tuple[str, ...] = ACTIVE_JOB_STATUSES) -> list[str]:
+        """Ids of the scope's jobs in the given statuses, oldest first (e.g. a reloaded page's running jobs)."""
+        self.start()
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT job_id FROM jobs WHERE scope = ? AND status IN ({','.join('?' * len(statuses))}) ORDER BY created_at",
+                (scope, *statuses)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def wait(self, job_id: str, timeout: float | None = None, poll_seconds: float = 0.05) -> JobRecord | None:
+        """Blocks until the job is done or failed (scripts and tests; the UI polls instead)."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            job = self.get(job_id)
+            if job is None or job.status not in ACTIVE_JOB_STATUSES:
+                return job
+            if deadline is not None and time.monotonic() > deadline:
+                return job
+            time.sleep(poll_seconds)
+
+    def clear(self) -> int:
+        """Deletes every job record (tests). Running jobs still finish but their record is gone."""
+        with self._lock:
+            return self._connection().execute("DELETE FROM jobs").rowcount
@@ -0,0 +1,232 @@
+# src/core/quotation_checkpoints.py
+"""
+Durable LangGraph checkpoints for the quotation graph, stored in SQLite.
+
+run_quotation_generation_graph runs the graph on a thread keyed by the enquiry and a hash of
+its inputs (quotation_thread_id), so every node's output is saved as it completes. When a run
+ends in an error, generating again with the same inputs resumes from the failed node with the
+earlier outputs (e.g. the parsed vendor reply) restored instead of paying for them again.
+
+QuotationCheckpointSaver is langgraph-checkpoint-sqlite's SqliteSaver with the file opened on
+first use, a quotation_runs table (last write per thread) for TTL pruning and listing, and async
+methods for the async graphs. list_quotation_runs() lists recent runs for debugging; see
+get_quotation_run_history() in quotation_graph_builder for a run's per-node state.
+"""
+from __future__ import annotations # The saver defines a list() method, which shadows list[...] in its body
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from collections.abc import AsyncIterator, Sequence
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+QUOTATION_CHECKPOINT_PATH = os.getenv("QUOTATION_CHECKPOINT_PATH", os.path.join(".cache", "quotation_checkpoints.sqlite3"))
+QUOTATION_CHECKPOINT_TTL_SECONDS = float(os.getenv("QUOTATION_CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+# Non-builtin types kept in the graph state that may be restored from a checkpoint
+CHECKPOINT_ALLOWED_MSGPACK_MODULES = [("src.models", "AIConfigState")]
+# ai_conf fields that change the graph's outputs, and therefore which run a retry may resume
+CHECKPOINT_AI_CONF_FIELDS = ("selected_model_for_provider", "temperature", "max_tokens",
+                             "single_pass_quotation", "segmented_itinerary", "model_routing_enabled")
+
+_checkpoints_enabled = os.getenv("QUOTATION_CHECKPOINTS_ENABLED", "true").lower() == "true"
+
+
+class QuotationCheckpointSaver(SqliteSaver):
+    """SqliteSaver on a file opened on first use, shared by threads, sessions and event loops."""
+
+    def __init__(self, path: str, ttl_seconds: float = QUOTATION_CHECKPOINT_TTL_SECONDS):
+        super().__init__(None, serde=JsonPlusSerializer(allowed_msgpack_modules=CHECKPOINT_ALLOWED_MSGPACK_MODULES))
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+
+    def setup(self) -> None:
+        # Called by SqliteSaver under its lock before every query: opened lazily so importing the
+        # graph module never touches the disk.
+        if self.is_setup:
+            return
+        if self.conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        if "checkpoint_type" in {row[1] for row in self.conn.execute("PRAGMA table_info(checkpoints)")}:
+            # Written by the earlier hand-rolled saver: its runs cannot be resumed by SqliteSaver
+            self.conn.executescript("DROP TABLE checkpoints; DROP TABLE IF EXISTS checkpoint_blobs;"
+                                    " DROP TABLE IF EXISTS checkpoint_writes;")
+            print("QUOTATION_CHECKPOINTS: Dropped checkpoints in the old format")
+        super().setup()
+        self.conn.execute("CREATE TABLE IF NOT EXISTS quotation_runs (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)")
+        self._prune_expired()
+        self.conn.commit()
+
+    def _prune_expired(self):
+        """Drops whole threads whose newest checkpoint is older than the TTL."""
+        expired = [row[0] for row in self.conn.execute(
+            "SELECT thread_id FROM quotation_runs WHERE updated_at < ?", (time.time() - self.ttl_seconds,))]
+        for thread_id in expired: # delete_thread would take the lock setup() already runs under
+            for table in ("checkpoints", "writes", "quotation_runs"):
+                self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+        if expired:
+            print(f"QUOTATION_CHECKPOINTS: Pruned {len(expired)} expired run(s)")
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+            self.is_setup = False
+
+    def reopen(self, path: str):
+        """Points the saver at another file (e.g. a temp file in tests); graphs compiled with it follow."""
+        self.close()
+        self.path = path
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        with self.cursor() as cur:
+            cur.execute("INSERT OR REPLACE INTO quotation_runs VALUES (?, ?)",
+                        (str(config["configurable"]["thread_id"]), time.time()))
+        return next_config
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM quotation_runs WHERE thread_id = ?", (str(thread_id),))
+
+    def thread_ids(self, limit: int | None = None) -> list[str]:
+        """Thread ids, most recently updated first."""
+        with self.cursor(transaction=False) as cur:
+            rows = cur.execute("SELECT thread_id FROM quotation_runs ORDER BY updated_at DESC"
+                               + (" LIMIT ?" if limit else ""), (limit,) if limit else ()).fetchall()
+        return [row[0] for row in rows]
+
+    def checkpoint_count(self, thread_id: str) -> int:
+        with self.cursor(transaction=False) as cur:
+            return cur.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+
+    def clear(self) -> int:
+        """Deletes every checkpoint; returns the number of runs removed."""
+        thread_ids = self.thread_ids()
+        for thread_id in thread_ids:
+            self.delete_thread(thread_id)
+        return len(thread_ids)
+
+    # --- Async ---
+    # SqliteSaver has none, and AsyncSqliteSaver binds its connection to one event loop while the
+    # async graphs run on several (asyncio.run per call, the hedging bridge loop). SQLite calls are
+    # short, so run the sync ones inline like InMemorySaver does.
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return self.delete_thread(thread_id)
+
+
+_quotation_checkpointer = QuotationCheckpointSaver(QUOTATION_CHECKPOINT_PATH)
+
+
+def get_quotation_checkpointer() -> QuotationCheckpointSaver:
+    return _quotation_checkpointer
+
+
+def quotation_checkpoints_enabled() -> bool:
+    return _checkpoints_enabled
+
+
+def configure_quotation_checkpoints(path: str | None = None, enabled: bool | None = None) -> QuotationCheckpointSaver:
+    """Re-points or toggles quotation checkpointing process-wide (e.g. a temp file in tests)."""
+    global _checkpoints_enabled
+    if enabled is not None:
+        _checkpoints_enabled = enabled
+    if path is not None:
+        _quotation_checkpointer.reopen(path)
+    return _quotation_checkpointer
+
+
+def clear_quotation_checkpoints() -> int:
+    removed = _quotation_checkpointer.clear()
+    print(f"QUOTATION_CHECKPOINTS: Cleared {removed} run(s)")
+    return removed
+
+
+def quotation_thread_id(enquiry_details: dict, vendor_reply_text: str, ai_suggested_itinerary_text: str,
+                        provider: str, ai_conf: Any) -> str:
+    """'<enquiry id>:<input hash>': retries with identical inputs and settings land on the same thread."""
+    fingerprint = {
+        "enquiry": enquiry_details,
+        "vendor_reply": vendor_reply_text,
+        "itinerary": ai_suggested_itinerary_text,
+        "provider": provider,
+        "ai_conf": {field: getattr(ai_conf, field, None) for field in CHECKPOINT_AI_CONF_FIELDS},
+    }
+    digest = hashlib.sha256(json.dumps(fingerprint, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:24]
+    return f"{enquiry_details.get('id') or 'no-enquiry'}:{digest}"
+
+
+def _run_status(values: dict) -> tuple[str, str | None]:
+    structured_data = values.get("structured_quotation_data") or {}
+    error_info = values.get("parsed_vendor_info_error") or {}
+    error = structured_data.get("error") or error_info.get("message")
+    if error:
+        return "failed", error
+    return ("completed", None) if values.get("pdf_output_bytes") else ("incomplete", None)
+
+
+def list_quotation_runs(enquiry_id: str | None = None, limit: int = 20) -> list[dict]:
+    """
+    Recent quotation runs, newest first: thread_id, enquiry_id, mode, updated_at, checkpoints,
+    status ("completed", "failed" or "incomplete" if the process stopped mid-run) and error.
+    """
+    runs = []
+    for thread_id in _quotation_checkpointer.thread_ids():
+        if enquiry_id and not thread_id.startswith(f"{enquiry_id}:"):
+            continue
+        latest = _quotation_checkpointer.get_tuple({"configurable": {"thread_id": thread_id}})
+        if latest is None:
+            continue
+        status, error = _run_status(latest.checkpoint["channel_values"])
+        runs.append({
+            "thread_id": thread_id,
+            "enquiry_id": thread_id.rsplit(":", 1)[0],
+            "mode": latest.metadata.get("quotation_mode"),
+            "updated_at": latest.checkpoint.get("ts"),
+            "checkpoints": _quotation_checkpointer.checkpoint_count(thread_id),
+            "status": status,
+            "error": error,
+        })
+        if len(runs) >= limit:
+            break
+    return runs
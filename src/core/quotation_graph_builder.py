@@ -1,40 +1,45 @@
 # src/core/quotation_graph_builder.py
 import os
+import copy
 import json
 import re 
+import time
+import asyncio
+import threading
 # import streamlit as st # Removed
-from typing import TypedDict, Dict, Any
+from typing import TypedDict, Dict, Any, Callable, Annotated
 
 from langgraph.graph import StateGraph, END
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
-from langchain_core.exceptions import OutputParserException, LangChainException
-import httpx # For HTTPStatusError
+from langgraph.types import Send
+from langgraph.config import get_stream_writer
 
-from src.llm.llm_providers import get_llm_instance
+from src.llm.llm_invocation import invoke_llm_prompt, ainvoke_llm_prompt, stream_llm_prompt, hedging_requested
+from src.llm.llm_providers import resolve_model_name, structured_output_format
+from src.llm.llm_resilience import classify_llm_error
 from src.llm.llm_prompts import (
     VENDOR_REPLY_PARSING_PROMPT_TEMPLATE_STRING,
-    QUOTATION_STRUCTURE_JSON_PROMPT_TEMPLATE_STRING
+    QUOTATION_STRUCTURE_JSON_PROMPT_TEMPLATE_STRING,
+    QUOTATION_SINGLE_PASS_JSON_PROMPT_TEMPLATE_STRING,
+    QUOTATION_SKELETON_JSON_PROMPT_TEMPLATE_STRING,
+    ITINERARY_SEGMENT_PROMPT_TEMPLATE_STRING
 )
 from src.utils.pdf_utils import create_pdf_quotation_bytes
+from src.utils.json_repair import loads_json_with_repair, loads_partial_json
+from src.utils.quotation_catalogue import merge_quotation_catalogue
+from src.utils.parsed_vendor_reply import PARSED_VENDOR_REPLY_SCHEMA, parse_vendor_reply_record, format_parsed_vendor_reply
+from src.models import QuotationData, QuotationItinerarySegment
+from src.core.quotation_checkpoints import get_quotation_checkpointer, quotation_checkpoints_enabled, quotation_thread_id
+from src.core.vendor_parse_memo import (
+    parse_model_id, vendor_parse_memo_key, lookup_parsed_vendor_reply, remember_parsed_vendor_reply
+)
+from src.core.vendor_preparser import PREPARSER_VERSION, confident_vendor_preparse
+from src.utils.constants import (
+    QUOTATION_OUTPUT_BASE_TOKENS, QUOTATION_OUTPUT_TOKENS_PER_DAY,
+    QUOTATION_OUTPUT_TOKENS_PER_LIST_ITEM, QUOTATION_OUTPUT_SAFETY_FACTOR,
+    QUOTATION_PREVIEW_MIN_INTERVAL_SECONDS, SKELETON_OUTPUT_TOKENS_PER_DAY, ITINERARY_SEGMENT_MAX_DAYS
+)
 from fpdf import FPDF
 
-# --- Helper Function for Error Message Extraction ---
-def _extract_error_message_from_payload(payload: Any) -> str | None:
-    """Helper to extract a user-friendly error message from common error structures."""
-    if isinstance(payload, dict):
-        if "error" in payload:
-            error_content = payload["error"]
-            if isinstance(error_content, dict) and "message" in error_content:
-                return error_content["message"]
-            elif isinstance(error_content, str): # Sometimes error is just a string
-                return error_content
-        elif "message" in payload: # Another common pattern
-            return payload["message"]
-    elif isinstance(payload, str): # If the payload itself is a string error
-        return payload
-    return None
-
 def create_error_pdf_instance():
     pdf = FPDF()
     pdf.add_page()
@@ -61,16 +66,29 @@ def sanitize_for_standard_font(text_string: str) -> str:
     return text_string.encode('latin-1', 'replace').decode('latin-1')
 
 
+def _collect_itinerary_segments(existing: list | None, update: list | None) -> list:
+    """Reducer for the parallel segment writers: results accumulate, None starts a new set."""
+    if update is None:
+        return []
+    return (existing or []) + update
+
+
 class QuotationGenerationState(TypedDict):
     enquiry_details: dict
     vendor_reply_text: str
+    vendor_reply_id: str | None # vendor_replies row the text came from; parses are memoized next to it
     ai_suggested_itinerary_text: str 
-    parsed_vendor_info_text: str 
+    parsed_vendor_info_text: str # Compact text of parsed_vendor_info, given to the structuring prompts
+    parsed_vendor_info: Dict[str, Any] | None # ParsedVendorReply record; None if the parse answer was not one
     parsed_vendor_info_error: Dict[str, Any] | None 
     structured_quotation_data: Dict[str, Any] 
     pdf_output_bytes: bytes
     ai_provider: str
     ai_conf: Any # Added
+    generation_metadata: Dict[str, Any] # Per-stage LLM call info (provider, model, latency, hedging)
+    stream_preview: bool # Stream the quotation JSON and emit partial previews (see run_quotation_generation_graph)
+    pdf_render_error: str | None # Set when rendering failed and pdf_output_bytes is an error document (a retry re-renders)
+    itinerary_segments: Annotated[list, _collect_itinerary_segments] # Segmented mode: day descriptions per parallel call
 
 def fetch_data_node(state: QuotationGenerationState):
     return {
@@ -80,299 +98,625 @@ def fetch_data_node(state: QuotationGenerationState):
         "ai_provider": state["ai_provider"],
         "ai_conf": state["ai_conf"], # Added
         "parsed_vendor_info_error": None, # Initialize error state for this stage
-        "structured_quotation_data": {} # Initialize for this stage
+        "structured_quotation_data": {}, # Initialize for this stage
+        "generation_metadata": {"llm_calls": []}
     }
 
-def parse_vendor_reply_node(state: QuotationGenerationState):
-    vendor_reply = state["vendor_reply_text"]
+
+def _with_llm_call(state: QuotationGenerationState, call_info: dict) -> dict:
+    """Returns generation_metadata with call_info appended to its llm_calls list."""
+    metadata = dict(state.get("generation_metadata") or {})
+    metadata["llm_calls"] = list(metadata.get("llm_calls", [])) + [call_info]
+    return metadata
+
+# Inputs that may be shrunk to fit the model's context window, lowest priority first (see token_budget).
+# Vendor figures are never truncated: if stripping email boilerplate is not enough the call fails.
+VENDOR_PARSE_TRIMMABLE_INPUTS = (("vendor_reply", "boilerplate"),)
+STRUCTURING_TRIMMABLE_INPUTS = (("ai_suggested_itinerary_text", "truncate"), ("vendor_parsed_text", "boilerplate"))
+SINGLE_PASS_TRIMMABLE_INPUTS = (("ai_suggested_itinerary_text", "truncate"), ("vendor_reply", "boilerplate"))
+SEGMENT_TRIMMABLE_INPUTS = (("ai_suggested_itinerary_text", "truncate"), ("vendor_parsed_text", "boilerplate"))
+# Sent as the provider's JSON schema where structured output is supported (see structured_output_format)
+QUOTATION_JSON_SCHEMA = QuotationData.model_json_schema()
+
+
+def _vendor_parse_error_payload(e: Exception, provider: str) -> dict:
+    """Maps an exception from the vendor-reply parsing chain to the node's error payload."""
+    error_payload = classify_llm_error(e, provider, "vendor reply parsing")
+    print(f"GraphNode: {error_payload['type']} (vendor reply, {provider}) - UserMsg: {error_payload['message']}, Details: {error_payload['details']}")
+    return error_payload
+
+
+def _vendor_parse_inputs(state: QuotationGenerationState) -> dict:
     enquiry_details = state["enquiry_details"]
+    return {
+        "vendor_reply": state["vendor_reply_text"],
+        "destination": enquiry_details.get("destination"),
+        "num_days": enquiry_details.get("num_days")
+    }
+
+
+def _vendor_parse_error_result(error_payload: dict) -> dict:
+    return {"parsed_vendor_info_text": f"Error: {error_payload['message']}", "parsed_vendor_info": None,
+            "parsed_vendor_info_error": error_payload}
+
+
+def _vendor_parse_prompt_spec(provider: str, ai_conf: Any) -> tuple[str, dict]:
+    """The parsing prompt with provider-native JSON output where supported (see _json_prompt_spec)."""
+    chain_kwargs = {}
+    response_format = structured_output_format(provider, resolve_model_name(provider, ai_conf.selected_model_for_provider),
+                                               "parsed_vendor_reply", PARSED_VENDOR_REPLY_SCHEMA)
+    if response_format is not None:
+        chain_kwargs["response_format"] = response_format
+    return VENDOR_REPLY_PARSING_PROMPT_TEMPLATE_STRING, chain_kwargs
+
+
+def _is_vendor_record_response(response_data: Any) -> bool:
+    """Hedge-leg validation: a response only wins if the parsed vendor record can be extracted from it."""
+    try:
+        parse_vendor_reply_record(copy.deepcopy(response_data))
+        return True
+    except Exception:
+        return False
+
+
+def _parsed_vendor_info(response_data: Any, call_info: dict) -> tuple[str, dict | None]:
+    """
+    (compact text, record dict) of the parsing answer. An answer that is not a record (a model
+    ignoring the JSON instructions) is passed on as it is: the structuring prompt can still read prose.
+    """
+    try:
+        record, json_repairs = parse_vendor_reply_record(response_data)
+    except Exception as e:
+        print(f"GraphNode: Vendor reply parse is not a record ({type(e).__name__}), passing the answer on as text.")
+        return _raw_output_for_error(response_data), None
+    if json_repairs:
+        call_info["json_repairs"] = json_repairs
+    return format_parsed_vendor_reply(record), record.model_dump(exclude_none=True)
+
+
+def _vendor_parse_memo_key(state: QuotationGenerationState) -> tuple[str, str]:
+    """(memo key, parse model id) of this state's vendor reply parse, see vendor_parse_memo."""
+    inputs = _vendor_parse_inputs(state)
+    parse_model = parse_model_id(state["ai_provider"], state["ai_conf"])
+    return vendor_parse_memo_key(inputs["vendor_reply"], inputs["destination"], inputs["num_days"], parse_model), parse_model
+
+
+def _vendor_parse_memo_hit(state: QuotationGenerationState, memoized: dict) -> dict:
+    print("GraphNode: Reusing memoized vendor reply parse, skipping the parsing LLM call.")
+    metadata = {**(state.get("generation_metadata") or {}), "vendor_parse_memo": "hit"}
+    return {"parsed_vendor_info_text": memoized["parsed_text"], "parsed_vendor_info": memoized.get("parsed_data"),
+            "parsed_vendor_info_error": None, "generation_metadata": metadata}
+
+
+def _vendor_preparse_hit(state: QuotationGenerationState) -> dict | None:
+    """The parse result from the rule-based pre-parser when it is confident, else None (parse with the LLM)."""
+    record, confidence = confident_vendor_preparse(state["vendor_reply_text"])
+    if record is None:
+        if confidence is not None:
+            print(f"GraphNode: Vendor reply pre-parse confidence {confidence:.2f} is below the threshold, parsing with the LLM.")
+        return None
+    print(f"GraphNode: Vendor reply pre-parsed by rules (confidence {confidence:.2f}), skipping the parsing LLM call.")
+    metadata = {**(state.get("generation_metadata") or {}),
+                "vendor_preparse": {"parser": PREPARSER_VERSION, "confidence": confidence}}
+    return {"parsed_vendor_info_text": format_parsed_vendor_reply(record), "parsed_vendor_info": record.model_dump(exclude_none=True),
+            "parsed_vendor_info_error": None, "generation_metadata": metadata}
+
+
+def parse_vendor_reply_node(state: QuotationGenerationState):
     provider = state["ai_provider"]
     ai_conf = state["ai_conf"] # Modified to use state
-    error_payload = None # This will hold the final error dict for the state
-    parsed_info_str = ""
+    preparsed = _vendor_preparse_hit(state)
+    if preparsed:
+        return preparsed
+    memo_key, parse_model = _vendor_parse_memo_key(state)
+    memoized = lookup_parsed_vendor_reply(memo_key, ai_conf)
+    if memoized:
+        return _vendor_parse_memo_hit(state, memoized)
 
     try:
-        # ai_conf = st.session_state.app_state.ai_config # Removed
-        llm = get_llm_instance(provider, ai_conf) # Uses ai_conf from state
-        prompt = ChatPromptTemplate.from_template(VENDOR_REPLY_PARSING_PROMPT_TEMPLATE_STRING)
-        parser = StrOutputParser() 
-        chain = prompt | llm | parser
-        parsed_info_str = chain.invoke({
-            "vendor_reply": vendor_reply,
-            "destination": enquiry_details.get("destination"),
-            "num_days": enquiry_details.get("num_days")
-        })
-    except ValueError as ve: 
-        user_message = f"LLM Configuration Error ({provider}) during vendor reply parsing: {ve}"
-        print(user_message)
-        error_payload = {"message": user_message, "details": str(ve), "type": "ConfigurationError", "raw_response": None, "status_code": None}
-    except httpx.HTTPStatusError as hse:
-        raw_response_str = hse.response.text
-        user_message = f"The AI service ({provider}) returned an HTTP error (Status: {hse.response.status_code}) during vendor reply parsing."
-        provider_extracted_message = raw_response_str # Default
-        try:
-            raw_json = hse.response.json()
-            msg_from_payload = _extract_error_message_from_payload(raw_json)
-            if msg_from_payload:
-                provider_extracted_message = msg_from_payload
-                user_message = f"The AI service ({provider}) reported (Status {hse.response.status_code}): {provider_extracted_message}"
-        except json.JSONDecodeError:
-            pass # Keep raw string as provider_extracted_message
-        
-        print(f"GraphNode: HTTPStatusError (vendor reply, {provider}) - UserMsg: {user_message}, Raw: {raw_response_str}")
-        error_payload = {
-            "message": user_message,
-            "details": f"Full details: {raw_response_str}",
-            "raw_response": raw_response_str, 
-            "type": "HttpError", 
-            "status_code": hse.response.status_code
-        }
-    except OutputParserException as ope:
-        user_message = f"LLM Output Parsing Error ({provider}) during vendor reply: {ope}"
-        print(user_message)
-        error_payload = {"message": user_message, "details": str(ope), "type": "OutputParsingError", "raw_response": None, "status_code": None}
-    except LangChainException as lce:
-        user_message = f"An AI processing error occurred with {provider} during vendor reply parsing."
-        details_for_log = str(lce)
-        error_type_for_log = "LangChainException"
-        status_code_for_log = None
-        raw_response_for_log = None
-
-        if hasattr(lce, 'args') and lce.args:
-            arg0 = lce.args[0]
-            if isinstance(arg0, str):
-                try:
-                    if "status_code=" in arg0 and "response=" in arg0:
-                        status_match = re.search(r"status_code=(\d+)", arg0)
-                        if status_match: status_code_for_log = int(status_match.group(1))
-                        
-                        json_start_index = arg0.find("b'{") # Works for b'{"..."}'
-                        if json_start_index == -1 : json_start_index = arg0.find("response='{") # Works for response='{"..."}'
-                        if json_start_index != -1 :
-                            # Adjust based on actual prefix (b' or response=')
-                            prefix_len = 2 if arg0[json_start_index:json_start_index+2] == "b'" else len("response='")
-                            
-                            # Find the end of the JSON-like string
-                            # This is heuristic, might need refinement for complex escaped strings
-                            temp_str = arg0[json_start_index + prefix_len:]
-                            balance = 0
-                            end_json_index = -1
-                            for i, char in enumerate(temp_str):
-                                if char == '{': balance +=1
-                                elif char == '}': balance -=1
-                                if balance == 0 and char == '}': # found the end of the main JSON object
-                                    end_json_index = i
-                                    break
-                            if end_json_index != -1:
-                                json_like_str = temp_str[:end_json_index+1]
-                                json_like_str = json_like_str.replace("\\'", "'") # Simple unescape for internal quotes
-                                
-                                error_payload_dict = json.loads(json_like_str)
-                                raw_response_for_log = json.dumps(error_payload_dict)
-                                extracted_provider_msg = _extract_error_message_from_payload(error_payload_dict)
-                                if extracted_provider_msg:
-                                    user_message = f"The AI service ({provider}) reported: {extracted_provider_msg}"
-                                    details_for_log = json.dumps(error_payload_dict)
-                                    error_type_for_log = "ProviderAPIError"
-                except (json.JSONDecodeError, IndexError, TypeError, re.error) as parse_err:
-                    print(f"QuotationGraphBuilder: Could not parse detailed error from LangChainException args (vendor reply): {parse_err}")
-                details_for_log = arg0 # Fallback if parsing fails
-            elif isinstance(arg0, dict):
-                raw_response_for_log = json.dumps(arg0)
-                extracted_provider_msg = _extract_error_message_from_payload(arg0)
-                if extracted_provider_msg:
-                    user_message = f"The AI service ({provider}) reported: {extracted_provider_msg}"
-                    details_for_log = json.dumps(arg0)
-                    error_type_for_log = "ProviderAPIError"
-        
-        print(f"GraphNode: LangChainExc (vendor reply, {provider}) - UserMsg: {user_message}, Details: {details_for_log}")
-        error_payload = {
-            "message": user_message, "details": details_for_log, "raw_response": raw_response_for_log,
-            "type": error_type_for_log, "status_code": status_code_for_log
-        }
+        response_data, call_info = invoke_llm_prompt(
+            _vendor_parse_prompt_spec, _vendor_parse_inputs(state), provider, ai_conf, # Uses ai_conf from state
+            validate=_is_vendor_record_response, stage="parse_vendor_reply", trimmable_inputs=VENDOR_PARSE_TRIMMABLE_INPUTS
+        )
     except Exception as e:
-        user_message = f"Unexpected Error ({provider}) parsing vendor reply: {e}"
-        print(user_message)
-        error_payload = {"message": user_message, "details": str(e), "type": "GenericError", "raw_response": None, "status_code": None}
-    
-    if error_payload:
-        return {"parsed_vendor_info_text": f"Error: {error_payload['message']}", "parsed_vendor_info_error": error_payload}
-    
-    return {"parsed_vendor_info_text": parsed_info_str, "parsed_vendor_info_error": None}
+        return _vendor_parse_error_result(_vendor_parse_error_payload(e, provider))
 
+    parsed_info_str, parsed_info = _parsed_vendor_info(response_data, call_info)
+    remember_parsed_vendor_reply(memo_key, parse_model, parsed_info_str, state.get("vendor_reply_id"), parsed_info)
+    return {"parsed_vendor_info_text": parsed_info_str, "parsed_vendor_info": parsed_info, "parsed_vendor_info_error": None,
+            "generation_metadata": _with_llm_call(state, call_info)}
 
-def structure_data_for_pdf_node(state: QuotationGenerationState):
+
+async def aparse_vendor_reply_node(state: QuotationGenerationState):
+    """Async variant of parse_vendor_reply_node, used by the async-compiled graph."""
+    provider = state["ai_provider"]
+    ai_conf = state["ai_conf"]
+    preparsed = _vendor_preparse_hit(state) # Microseconds of regex work: fine on the event loop
+    if preparsed:
+        return preparsed
+    memo_key, parse_model = _vendor_parse_memo_key(state)
+    # The memo store does blocking I/O (Supabase): keep it off the event loop
+    memoized = await asyncio.to_thread(lookup_parsed_vendor_reply, memo_key, ai_conf)
+    if memoized:
+        return _vendor_parse_memo_hit(state, memoized)
+
+    try:
+        response_data, call_info = await ainvoke_llm_prompt(
+            _vendor_parse_prompt_spec, _vendor_parse_inputs(state), provider, ai_conf,
+            validate=_is_vendor_record_response, stage="parse_vendor_reply", trimmable_inputs=VENDOR_PARSE_TRIMMABLE_INPUTS
+        )
+    except Exception as e:
+        return _vendor_parse_error_result(_vendor_parse_error_payload(e, provider))
+
+    parsed_info_str, parsed_info = _parsed_vendor_info(response_data, call_info)
+    await asyncio.to_thread(remember_parsed_vendor_reply, memo_key, parse_model, parsed_info_str,
+                            state.get("vendor_reply_id"), parsed_info)
+    return {"parsed_vendor_info_text": parsed_info_str, "parsed_vendor_info": parsed_info, "parsed_vendor_info_error": None,
+            "generation_metadata": _with_llm_call(state, call_info)}
+
+
+def _structuring_error_payload(e: Exception, provider: str, raw_llm_output_for_error: Any = "") -> dict:
+    """Maps an exception from the JSON structuring chain to the structured_quotation_data error payload."""
+    error_info = classify_llm_error(e, provider, "JSON structuring")
+    payload = {
+        "error": error_info["message"],
+        "details": error_info["details"],
+        # The provider's error body for HTTP errors, otherwise whatever the model produced
+        "raw_output": error_info["raw_response"] if error_info["type"] == "HttpError" else raw_llm_output_for_error or error_info["raw_response"],
+        "type": error_info["type"],
+        "status_code": error_info["status_code"],
+        "retryable": error_info["retryable"],
+    }
+    if error_info["type"] == "OutputParsingError":
+        payload["type"] = "JsonParsingError"
+        payload["error"] += f" Preview: '{str(raw_llm_output_for_error)[:200]}...'"
+    if "token_budget" in error_info:
+        payload["token_budget"] = error_info["token_budget"]
+    print(f"GraphNode: {payload['type']} (JSON structuring, {provider}) - UserMsg: {payload['error']}, Details: {payload['details']}")
+    return payload
+
+
+def _structuring_skip_result(state: QuotationGenerationState) -> dict | None:
+    """Returns the UpstreamError result when vendor parsing already failed, else None."""
     if state.get("parsed_vendor_info_error"):
         error_info = state["parsed_vendor_info_error"]
         err_msg = f"Skipped JSON structuring due to earlier vendor reply parsing error: {error_info.get('message')}"
         print(err_msg)
-        return {"structured_quotation_data": {
+        skipped = {
             "error": err_msg,
             "details": error_info.get('details'),
             "raw_output": error_info.get('raw_response'),
             "type": "UpstreamError"
-        }}
+        }
+        if error_info.get("token_budget"):
+            skipped["token_budget"] = error_info["token_budget"]
+        return {"structured_quotation_data": skipped}
+    return None
+
+
+def _json_prompt_spec(json_prompt_str: str, provider: str, ai_conf: Any) -> tuple[str, dict]:
+    """
+    Returns (prompt_template_str, get_llm_chain kwargs) for a quotation JSON call.
+    Depends on the provider, so a hedged backup gets its own provider-specific prompt.
+    The answer is always parsed locally (see _parse_quotation_response), so JSON-mode answers can
+    be continued and repaired like plain-text ones.
+    """
+    chain_kwargs = {}
+    # Provider-native JSON / JSON-schema output where supported. response_format is part of the
+    # pool key, so the shared plain-text client is never mutated.
+    response_format = structured_output_format(provider, resolve_model_name(provider, ai_conf.selected_model_for_provider),
+                                               "quotation", QUOTATION_JSON_SCHEMA)
+    if response_format is not None:
+        chain_kwargs["response_format"] = response_format
+    if provider == "Gemini":
+        json_prompt_str = json_prompt_str.replace("```json", "Please provide your response strictly in the following JSON format, ensuring all strings are correctly escaped:\n```json")
+    return json_prompt_str, chain_kwargs
+
 
+def _structuring_prompt_spec(provider: str, ai_conf: Any) -> tuple[str, dict]:
+    return _json_prompt_spec(QUOTATION_STRUCTURE_JSON_PROMPT_TEMPLATE_STRING, provider, ai_conf)
+
+
+def _single_pass_prompt_spec(provider: str, ai_conf: Any) -> tuple[str, dict]:
+    return _json_prompt_spec(QUOTATION_SINGLE_PASS_JSON_PROMPT_TEMPLATE_STRING, provider, ai_conf)
+
+
+def _skeleton_prompt_spec(provider: str, ai_conf: Any) -> tuple[str, dict]:
+    return _json_prompt_spec(QUOTATION_SKELETON_JSON_PROMPT_TEMPLATE_STRING, provider, ai_conf)
+
+
+def _structuring_inputs(state: QuotationGenerationState) -> dict:
     enquiry = state["enquiry_details"]
-    vendor_parsed_text = state["parsed_vendor_info_text"]
-    ai_suggested_itinerary_text = state["ai_suggested_itinerary_text"]
+    num_days_int = int(enquiry.get("num_days", 0))
+    num_nights = num_days_int - 1 if num_days_int > 0 else 0
+    return {
+        "destination": enquiry.get("destination", "N/A"),
+        "num_days": str(enquiry.get("num_days", "N/A")),
+        "num_nights": str(num_nights),
+        "traveler_count": str(enquiry.get("traveler_count", "N/A")),
+        "trip_type": enquiry.get("trip_type", "N/A"),
+        "client_name_placeholder": f"Mr./Ms. {enquiry.get('client_name_actual', 'Valued Client')}",
+        "ai_suggested_itinerary_text": state["ai_suggested_itinerary_text"],
+        "vendor_parsed_text": state["parsed_vendor_info_text"]
+    }
+
+
+def _single_pass_inputs(state: QuotationGenerationState) -> dict:
+    """The structuring inputs with the raw vendor reply in place of the parsed vendor text."""
+    inputs = _structuring_inputs(state)
+    del inputs["vendor_parsed_text"]
+    inputs["vendor_reply"] = state["vendor_reply_text"]
+    return inputs
+
+
+_LIST_ITEM_LINE = re.compile(r"^\s*([-*\u2022]|\d+[.)])\s+")
+
+
+def _expected_structuring_output_tokens(state: QuotationGenerationState,
+                                        tokens_per_day: int = QUOTATION_OUTPUT_TOKENS_PER_DAY) -> int:
+    """Rough size of the quotation JSON: grows with the trip length and with the vendor's listed items."""
+    try:
+        num_days = max(1, int(state["enquiry_details"].get("num_days", 1)))
+    except (TypeError, ValueError):
+        num_days = 1
+    vendor_text = state.get("parsed_vendor_info_text") or state.get("vendor_reply_text") or "" # Raw reply in single-pass mode
+    list_items = sum(1 for line in vendor_text.splitlines() if _LIST_ITEM_LINE.match(line))
+    expected = (QUOTATION_OUTPUT_BASE_TOKENS + num_days * tokens_per_day
+                + list_items * QUOTATION_OUTPUT_TOKENS_PER_LIST_ITEM)
+    return int(expected * QUOTATION_OUTPUT_SAFETY_FACTOR)
+
+
+def _is_structurable_response(response_data: Any) -> bool:
+    """Hedge-leg validation: a response only wins if the quotation JSON can be extracted from it."""
+    try:
+        _parse_quotation_response(copy.deepcopy(response_data))
+        return True
+    except Exception:
+        return False
+
+
+def _raw_output_for_error(response_data: Any) -> str:
+    if isinstance(response_data, dict):
+        return json.dumps(response_data, indent=2)
+    return response_data if isinstance(response_data, str) else ""
+
+
+def _parse_quotation_response(response_data: Any) -> tuple[dict, list[str]]:
+    """
+    Extracts the quotation JSON from the chain output, repairing malformed JSON locally, and
+    validates it against QuotationData. Returns (payload, repairs applied).
+    Raises json.JSONDecodeError / pydantic.ValidationError when nothing usable can be salvaged.
+    """
+    repairs = []
+    if isinstance(response_data, str):
+        structured_data_payload, repairs = loads_json_with_repair(response_data)
+    elif isinstance(response_data, dict): 
+        structured_data_payload = response_data
+    else:
+        raise TypeError(f"Unexpected LLM output type for JSON: {type(response_data)}")
+    if not isinstance(structured_data_payload, dict):
+        raise json.JSONDecodeError("Expected a JSON object.", _raw_output_for_error(response_data), 0)
+    return QuotationData.model_validate(structured_data_payload).model_dump(exclude_none=True), repairs
+
+
+def _reject_truncated_quotation(call_info: dict, json_repairs: list[str], raw_output: str):
+    """
+    Raises json.JSONDecodeError when an answer still cut off at max_tokens (after the continuations)
+    was only made parseable by closing its open string/brackets: the quotation would silently miss
+    its tail (later days, prices), so it is an error, not a quotation.
+    """
+    if call_info.get("finish_reason") != "length":
+        return
+    if any(repair in ("closed unterminated string", "dropped incomplete member") or repair.endswith("unclosed bracket(s)")
+           for repair in json_repairs):
+        raise json.JSONDecodeError("The quotation JSON was cut off at the output token limit and could not be completed.",
+                                   raw_output, len(raw_output))
+
+
+def _stream_quotation_json(state: QuotationGenerationState, prompt_spec, inputs: dict, stage: str,
+                           trimmable_inputs: tuple, expected_output_tokens: int) -> tuple[str, dict]:
+    """
+    Streams the quotation JSON, emitting {"quotation_preview": partial quotation dict} custom stream
+    events (graph.stream(stream_mode="custom")) as sections arrive, at most every
+    QUOTATION_PREVIEW_MIN_INTERVAL_SECONDS. Returns (full answer, call_info) like invoke_llm_prompt.
+    """
+    write_stream_event = get_stream_writer()
+    call_info = {}
+    chunks = []
+    last_preview, last_emitted_at = None, 0.0
+
+    def emit_preview():
+        nonlocal last_preview, last_emitted_at
+        preview = loads_partial_json("".join(chunks))
+        if isinstance(preview, dict) and preview and preview != last_preview:
+            write_stream_event({"quotation_preview": preview})
+            last_preview, last_emitted_at = preview, time.monotonic()
+
+    for chunk in stream_llm_prompt(
+        prompt_spec, inputs, state["ai_provider"], state["ai_conf"],
+        validate=_is_structurable_response, stage=stage, call_info=call_info,
+        trimmable_inputs=trimmable_inputs, expected_output_tokens=expected_output_tokens
+    ):
+        chunks.append(chunk)
+        if time.monotonic() - last_emitted_at >= QUOTATION_PREVIEW_MIN_INTERVAL_SECONDS:
+            emit_preview()
+    emit_preview()
+    return "".join(chunks), call_info
+
+
+def _structure_quotation(state: QuotationGenerationState, prompt_spec, inputs: dict, stage: str, trimmable_inputs: tuple,
+                         expected_output_tokens: int | None = None) -> dict:
+    """One LLM call producing the quotation JSON; failures become the structured_quotation_data error payload."""
     provider = state["ai_provider"]
-    
-    structured_data_payload = {} 
     raw_llm_output_for_error = ""
-    
-    try:
-        # ai_conf = st.session_state.app_state.ai_config # Removed
-        ai_conf = state["ai_conf"] # Modified to use state
-        llm = get_llm_instance(provider, ai_conf) # Uses ai_conf from state
-        num_days_int = int(enquiry.get("num_days", 0))
-        num_nights = num_days_int - 1 if num_days_int > 0 else 0
-        json_prompt_str = QUOTATION_STRUCTURE_JSON_PROMPT_TEMPLATE_STRING
-        current_model_name = ai_conf.selected_model_for_provider or "" # Modified to use ai_conf from state
-
-        if provider == "OpenRouter" and ("gpt" in current_model_name.lower() or \
-                                         "claude-3" in current_model_name.lower()):
-            llm_for_json = get_llm_instance(provider, ai_conf) # Uses ai_conf from state
-            if not hasattr(llm_for_json, 'model_kwargs') or llm_for_json.model_kwargs is None:
-                llm_for_json.model_kwargs = {}
-            llm_for_json.model_kwargs["response_format"] = {"type": "json_object"}
-            prompt = ChatPromptTemplate.from_template(json_prompt_str)
-            chain = prompt | llm_for_json | JsonOutputParser()
-        elif provider == "Gemini":
-            updated_json_prompt_str = json_prompt_str.replace("```json", "Please provide your response strictly in the following JSON format, ensuring all strings are correctly escaped:\n```json")
-            prompt = ChatPromptTemplate.from_template(updated_json_prompt_str)
-            chain = prompt | llm | StrOutputParser() 
-        else: 
-            prompt = ChatPromptTemplate.from_template(json_prompt_str)
-            chain = prompt | llm | StrOutputParser()
-
-        response_data = chain.invoke({
-            "destination": enquiry.get("destination", "N/A"),
-            "num_days": str(enquiry.get("num_days", "N/A")),
-            "num_nights": str(num_nights),
-            "traveler_count": str(enquiry.get("traveler_count", "N/A")),
-            "trip_type": enquiry.get("trip_type", "N/A"),
-            "client_name_placeholder": f"Mr./Ms. {enquiry.get('client_name_actual', 'Valued Client')}",
-            "ai_suggested_itinerary_text": ai_suggested_itinerary_text,
-            "vendor_parsed_text": vendor_parsed_text
-        })
+    generation_metadata = state.get("generation_metadata") or {}
+    if expected_output_tokens is None:
+        expected_output_tokens = _expected_structuring_output_tokens(state)
 
-        if isinstance(response_data, str):
-            raw_llm_output_for_error = response_data
-            match = re.search(r"```json\s*(\{.*?\})\s*```", response_data, re.DOTALL)
-            if match: potential_json_str = match.group(1)
-            else: 
-                cleaned_response = response_data.strip()
-                json_start_index = cleaned_response.find('{')
-                if json_start_index == -1: raise json.JSONDecodeError("No JSON object found.", cleaned_response, 0)
-                open_braces = 0; json_end_index = -1
-                for i in range(json_start_index, len(cleaned_response)):
-                    if cleaned_response[i] == '{': open_braces += 1
-                    elif cleaned_response[i] == '}':
-                        open_braces -= 1
-                        if open_braces == 0: json_end_index = i; break
-                if json_end_index == -1: raise json.JSONDecodeError("Incomplete JSON object.", cleaned_response, 0)
-                potential_json_str = cleaned_response[json_start_index : json_end_index + 1]
-            structured_data_payload = json.loads(potential_json_str)
-        elif isinstance(response_data, dict): 
-            structured_data_payload = response_data
-            raw_llm_output_for_error = json.dumps(response_data, indent=2)
+    try:
+        # A hedged call cannot stream: the preview is given up so the backup provider can race
+        if state.get("stream_preview") and not hedging_requested(provider, state["ai_conf"]):
+            response_data, call_info = _stream_quotation_json(state, prompt_spec, inputs, stage, trimmable_inputs,
+                                                              expected_output_tokens)
         else:
-            raise TypeError(f"Unexpected LLM output type for JSON: {type(response_data)}")
-
-        for key_list in ["inclusions", "exclusions", "standard_exclusions_list", "important_notes"]:
-            if key_list in structured_data_payload and isinstance(structured_data_payload[key_list], list):
-                structured_data_payload[key_list] = [str(item) for item in structured_data_payload[key_list]]
-        if "detailed_itinerary" in structured_data_payload and isinstance(structured_data_payload["detailed_itinerary"], list):
-            for item in structured_data_payload["detailed_itinerary"]:
-                if isinstance(item, dict):
-                    for k,v in item.items(): item[k] = str(v)
-        if "hotel_details" in structured_data_payload and isinstance(structured_data_payload["hotel_details"], list):
-            for item in structured_data_payload["hotel_details"]:
-                if isinstance(item, dict):
-                    for k,v in item.items(): item[k] = str(v)
-
-    except ValueError as ve: 
-        user_message = f"LLM Configuration Error ({provider}) during JSON structuring: {ve}"
-        print(user_message)
-        structured_data_payload = {"error": user_message, "details": str(ve), "type": "ConfigurationError", "raw_output": raw_llm_output_for_error, "status_code": None}
-    except httpx.HTTPStatusError as hse:
-        raw_response_str = hse.response.text
-        if not raw_llm_output_for_error: raw_llm_output_for_error = raw_response_str
-        user_message = f"The AI service ({provider}) returned an HTTP error (Status: {hse.response.status_code}) during JSON structuring."
-        provider_extracted_message = raw_response_str
-        try:
-            raw_json = hse.response.json()
-            msg_from_payload = _extract_error_message_from_payload(raw_json)
-            if msg_from_payload:
-                provider_extracted_message = msg_from_payload
-                user_message = f"The AI service ({provider}) reported (Status {hse.response.status_code}): {provider_extracted_message}"
-        except json.JSONDecodeError:
-            pass
-        print(f"GraphNode: HTTPStatusError (JSON structuring, {provider}) - UserMsg: {user_message}, Raw: {raw_response_str}")
-        structured_data_payload = {
-            "error": user_message, "details": f"Full details: {raw_response_str}", 
-            "raw_output": raw_response_str, "type": "HttpError", "status_code": hse.response.status_code
-        }
-    except (json.JSONDecodeError, OutputParserException) as jpe:
-        user_message = f"LLM JSON Parsing Error ({provider}): {jpe}. Preview: '{str(raw_llm_output_for_error)[:200]}...'"
-        print(user_message)
-        structured_data_payload = {"error": user_message, "details": str(jpe), "raw_output": raw_llm_output_for_error, "type": "JsonParsingError", "status_code": None}
-    except LangChainException as lce:
-        user_message = f"An AI processing error occurred with {provider} during JSON structuring."
-        details_for_log = str(lce)
-        error_type_for_log = "LangChainException"
-        status_code_for_log = None
-        # raw_llm_output_for_error will be used as raw_response_for_log if populated
-
-        if hasattr(lce, 'args') and lce.args:
-            arg0 = lce.args[0]
-            if isinstance(arg0, str):
-                try:
-                    if "status_code=" in arg0 and "response=" in arg0: # Check for LangChain's wrapped httpx error string
-                        status_match = re.search(r"status_code=(\d+)", arg0)
-                        if status_match: status_code_for_log = int(status_match.group(1))
-                        json_start_index = arg0.find("b'{")
-                        if json_start_index == -1 : json_start_index = arg0.find("response='{")
-                        if json_start_index != -1 :
-                            prefix_len = 2 if arg0[json_start_index:json_start_index+2] == "b'" else len("response='")
-                            temp_str = arg0[json_start_index + prefix_len:]
-                            balance = 0; end_json_index = -1
-                            for i, char in enumerate(temp_str):
-                                if char == '{': balance +=1
-                                elif char == '}': balance -=1
-                                if balance == 0 and char == '}': end_json_index = i; break
-                            if end_json_index != -1:
-                                json_like_str = temp_str[:end_json_index+1].replace("\\'", "'")
-                                error_payload_dict = json.loads(json_like_str)
-                                if not raw_llm_output_for_error: raw_llm_output_for_error = json.dumps(error_payload_dict) # Capture this as raw if not already set
-                                extracted_provider_msg = _extract_error_message_from_payload(error_payload_dict)
-                                if extracted_provider_msg:
-                                    user_message = f"The AI service ({provider}) reported: {extracted_provider_msg}"
-                                    details_for_log = json.dumps(error_payload_dict)
-                                    error_type_for_log = "ProviderAPIError"
-                except (json.JSONDecodeError, IndexError, TypeError, re.error) as parse_err:
-                    print(f"QuotationGraphBuilder: Could not parse detailed error from LangChainException args (JSON structuring): {parse_err}")
-                if details_for_log == str(lce) : details_for_log = arg0 # If not updated by parsing, use arg0
-            elif isinstance(arg0, dict):
-                if not raw_llm_output_for_error: raw_llm_output_for_error = json.dumps(arg0)
-                extracted_provider_msg = _extract_error_message_from_payload(arg0)
-                if extracted_provider_msg:
-                    user_message = f"The AI service ({provider}) reported: {extracted_provider_msg}"
-                    details_for_log = json.dumps(arg0)
-                    error_type_for_log = "ProviderAPIError"
-        
-        print(f"GraphNode: LangChainExc (JSON structuring, {provider}) - UserMsg: {user_message}, Details: {details_for_log}")
-        structured_data_payload = {
-            "error": user_message, "details": details_for_log, "raw_output": raw_llm_output_for_error,
-            "type": error_type_for_log, "status_code": status_code_for_log
-        }
+            response_data, call_info = invoke_llm_prompt(
+                prompt_spec, inputs, provider, state["ai_conf"],
+                validate=_is_structurable_response, stage=stage, trimmable_inputs=trimmable_inputs,
+                expected_output_tokens=expected_output_tokens
+            )
+        generation_metadata = _with_llm_call(state, call_info)
+        raw_llm_output_for_error = _raw_output_for_error(response_data)
+        structured_data_payload, json_repairs = _parse_quotation_response(response_data)
+        _reject_truncated_quotation(call_info, json_repairs, raw_llm_output_for_error)
+        structured_data_payload = merge_quotation_catalogue(structured_data_payload)
+        if json_repairs: # call_info is the dict just appended to generation_metadata
+            call_info["json_repairs"] = json_repairs
+            print(f"GraphNode: Repaired the quotation JSON locally ({stage}, {provider}): {', '.join(sorted(set(json_repairs)))}")
     except Exception as e:
-        user_message = f"Unexpected Error ({provider}) during JSON structuring: {type(e).__name__} - {e}"
-        print(user_message)
-        structured_data_payload = {"error": user_message, "details": str(e), "raw_output": raw_llm_output_for_error, "type": "GenericError", "status_code": None}
-    
-    return {"structured_quotation_data": structured_data_payload}
+        structured_data_payload = _structuring_error_payload(e, provider, raw_llm_output_for_error)
+
+    return {"structured_quotation_data": structured_data_payload, "generation_metadata": generation_metadata}
+
+
+async def _astructure_quotation(state: QuotationGenerationState, prompt_spec, inputs: dict, stage: str, trimmable_inputs: tuple,
+                                expected_output_tokens: int | None = None) -> dict:
+    """Async variant of _structure_quotation."""
+    provider = state["ai_provider"]
+    raw_llm_output_for_error = ""
+    generation_metadata = state.get("generation_metadata") or {}
+    if expected_output_tokens is None:
+        expected_output_tokens = _expected_structuring_output_tokens(state)
+
+    try:
+        response_data, call_info = await ainvoke_llm_prompt(
+            prompt_spec, inputs, provider, state["ai_conf"],
+            validate=_is_structurable_response, stage=stage, trimmable_inputs=trimmable_inputs,
+            expected_output_tokens=expected_output_tokens
+        )
+        generation_metadata = _with_llm_call(state, call_info)
+        raw_llm_output_for_error = _raw_output_for_error(response_data)
+        structured_data_payload, json_repairs = _parse_quotation_response(response_data)
+        _reject_truncated_quotation(call_info, json_repairs, raw_llm_output_for_error)
+        structured_data_payload = merge_quotation_catalogue(structured_data_payload)
+        if json_repairs: # call_info is the dict just appended to generation_metadata
+            call_info["json_repairs"] = json_repairs
+            print(f"GraphNode: Repaired the quotation JSON locally ({stage}, {provider}): {', '.join(sorted(set(json_repairs)))}")
+    except Exception as e:
+        structured_data_payload = _structuring_error_payload(e, provider, raw_llm_output_for_error)
+
+    return {"structured_quotation_data": structured_data_payload, "generation_metadata": generation_metadata}
+
+
+def structure_data_for_pdf_node(state: QuotationGenerationState):
+    skipped = _structuring_skip_result(state)
+    if skipped:
+        return skipped
+    return _structure_quotation(state, _structuring_prompt_spec, _structuring_inputs(state),
+                                "structure_quotation", STRUCTURING_TRIMMABLE_INPUTS)
+
+
+async def astructure_data_for_pdf_node(state: QuotationGenerationState):
+    """Async variant of structure_data_for_pdf_node, used by the async-compiled graph."""
+    skipped = _structuring_skip_result(state)
+    if skipped:
+        return skipped
+    return await _astructure_quotation(state, _structuring_prompt_spec, _structuring_inputs(state),
+                                       "structure_quotation", STRUCTURING_TRIMMABLE_INPUTS)
+
+
+def single_pass_quotation_node(state: QuotationGenerationState):
+    """Single-pass mode: one call from the raw vendor reply straight to the quotation JSON (no parsing stage)."""
+    return _structure_quotation(state, _single_pass_prompt_spec, _single_pass_inputs(state),
+                                "structure_quotation_single_pass", SINGLE_PASS_TRIMMABLE_INPUTS)
+
+
+async def asingle_pass_quotation_node(state: QuotationGenerationState):
+    """Async variant of single_pass_quotation_node."""
+    return await _astructure_quotation(state, _single_pass_prompt_spec, _single_pass_inputs(state),
+                                       "structure_quotation_single_pass", SINGLE_PASS_TRIMMABLE_INPUTS)
+
+
+# --- Segmented itinerary mode: skeleton -> parallel day segments (Send) -> merge ---
+
+def structure_skeleton_node(state: QuotationGenerationState):
+    """Segmented mode: the quotation JSON with a city, title and one-line outline per day, but no descriptions."""
+    skipped = _structuring_skip_result(state)
+    if skipped:
+        return skipped
+    result = _structure_quotation(state, _skeleton_prompt_spec, _structuring_inputs(state),
+                                  "structure_quotation_skeleton", STRUCTURING_TRIMMABLE_INPUTS,
+                                  _expected_structuring_output_tokens(state, SKELETON_OUTPUT_TOKENS_PER_DAY))
+    return {**result, "itinerary_segments": None}
+
+
+async def astructure_skeleton_node(state: QuotationGenerationState):
+    """Async variant of structure_skeleton_node."""
+    skipped = _structuring_skip_result(state)
+    if skipped:
+        return skipped
+    result = await _astructure_quotation(state, _skeleton_prompt_spec, _structuring_inputs(state),
+                                         "structure_quotation_skeleton", STRUCTURING_TRIMMABLE_INPUTS,
+                                         _expected_structuring_output_tokens(state, SKELETON_OUTPUT_TOKENS_PER_DAY))
+    return {**result, "itinerary_segments": None}
+
+
+def plan_itinerary_segments(days: list[dict], max_days: int = ITINERARY_SEGMENT_MAX_DAYS) -> list[list[int]]:
+    """
+    Positions of the outline's days grouped into segments for parallel writing: consecutive days in
+    the same city form a segment, split so that no segment has more than max_days days.
+    """
+    segments: list[list[int]] = []
+    previous_city = None
+    for position, day in enumerate(days):
+        city = str(day.get("city") or "").strip().casefold()
+        if not segments or city != previous_city or len(segments[-1]) >= max(1, max_days):
+            segments.append([])
+        segments[-1].append(position)
+        previous_city = city
+    return segments
+
+
+def _trip_outline(days: list[dict]) -> str:
+    return "\n".join(
+        " | ".join(str(day.get(key) or "-") for key in ("day_number", "city", "title", "outline")) for day in days
+    )
+
+
+def dispatch_itinerary_segments(state: QuotationGenerationState):
+    """Fans out one write_itinerary_segment task per segment; a failed skeleton goes straight to the (error) PDF."""
+    structured_data = state.get("structured_quotation_data") or {}
+    if structured_data.get("error"):
+        return "generate_pdf_document"
+    days = structured_data["detailed_itinerary"]
+    trip_outline = _trip_outline(days)
+    return [
+        Send("write_itinerary_segment", {**state, "segment_index": index, "segment_positions": positions,
+                                         "trip_outline": trip_outline})
+        for index, positions in enumerate(plan_itinerary_segments(days))
+    ]
+
+
+def _segment_days(state: dict) -> list[dict]:
+    days = state["structured_quotation_data"]["detailed_itinerary"]
+    return [days[position] for position in state["segment_positions"]]
+
+
+def _segment_inputs(state: dict) -> dict:
+    structuring_inputs = _structuring_inputs(state)
+    inputs = {key: structuring_inputs[key] for key in ("destination", "num_days", "traveler_count", "trip_type",
+                                                        "ai_suggested_itinerary_text", "vendor_parsed_text")}
+    inputs["trip_outline"] = state["trip_outline"]
+    inputs["segment_days"] = ", ".join(str(day.get("day_number")) for day in _segment_days(state))
+    return inputs
+
+
+def _expected_segment_output_tokens(state: dict) -> int:
+    return int((50 + len(state["segment_positions"]) * QUOTATION_OUTPUT_TOKENS_PER_DAY) * QUOTATION_OUTPUT_SAFETY_FACTOR)
+
+
+def _parse_itinerary_segment(response_data: Any) -> list[dict]:
+    """The days of a segment answer, repaired like the quotation JSON. Raises if none can be salvaged."""
+    payload = loads_json_with_repair(response_data)[0] if isinstance(response_data, str) else response_data
+    if isinstance(payload, list): # Some models answer with the bare list
+        payload = {"days": payload}
+    return QuotationItinerarySegment.model_validate(payload).model_dump(exclude_none=True)["days"]
+
+
+def _is_itinerary_segment_response(response_data: Any) -> bool:
+    try:
+        _parse_itinerary_segment(copy.deepcopy(response_data))
+        return True
+    except Exception:
+        return False
+
+
+def _segment_result(state: dict, response_data: Any = None, call_info: dict | None = None, error: str | None = None) -> dict:
+    result = {"index": state["segment_index"], "positions": state["segment_positions"], "call_info": call_info}
+    try:
+        result["days"] = _parse_itinerary_segment(response_data) if error is None else []
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        result["days"] = []
+    if error:
+        result["error"] = error
+        print(f"GraphNode: Itinerary segment {state['segment_index']} ({_segment_inputs(state)['segment_days']}) "
+              f"failed, its days keep their outline: {error}")
+    return {"itinerary_segments": [result]}
+
+
+def write_itinerary_segment_node(state: dict):
+    """Writes the descriptions of one segment's days. Runs in parallel with the other segments."""
+    try:
+        response_data, call_info = invoke_llm_prompt(
+            ITINERARY_SEGMENT_PROMPT_TEMPLATE_STRING, _segment_inputs(state), state["ai_provider"], state["ai_conf"],
+            validate=_is_itinerary_segment_response, stage="write_itinerary_segment",
+            trimmable_inputs=SEGMENT_TRIMMABLE_INPUTS, expected_output_tokens=_expected_segment_output_tokens(state)
+        )
+    except Exception as e:
+        return _segment_result(state, error=classify_llm_error(e, state["ai_provider"], "itinerary segment")["message"])
+    return _segment_result(state, response_data, call_info)
+
+
+async def awrite_itinerary_segment_node(state: dict):
+    """Async variant of write_itinerary_segment_node."""
+    try:
+        response_data, call_info = await ainvoke_llm_prompt(
+            ITINERARY_SEGMENT_PROMPT_TEMPLATE_STRING, _segment_inputs(state), state["ai_provider"], state["ai_conf"],
+            validate=_is_itinerary_segment_response, stage="write_itinerary_segment",
+            trimmable_inputs=SEGMENT_TRIMMABLE_INPUTS, expected_output_tokens=_expected_segment_output_tokens(state)
+        )
+    except Exception as e:
+        return _segment_result(state, error=classify_llm_error(e, state["ai_provider"], "itinerary segment")["message"])
+    return _segment_result(state, response_data, call_info)
+
+
+def _day_key(day_number: Any) -> str:
+    match = re.search(r"\d+", str(day_number or ""))
+    return match.group(0) if match else str(day_number or "").strip().casefold()
+
+
+def merge_itinerary_segments_node(state: QuotationGenerationState):
+    """
+    Puts the segment descriptions into the skeleton's days, in outline order. Days a segment did
+    not return (failed call, missing day) keep their outline as description and are listed in
+    generation_metadata["itinerary_segment_errors"].
+    """
+    structured_data = copy.deepcopy(state["structured_quotation_data"])
+    days = structured_data["detailed_itinerary"]
+    metadata = dict(state.get("generation_metadata") or {})
+    llm_calls = list(metadata.get("llm_calls", []))
+    segment_errors = []
+
+    for segment in sorted(state.get("itinerary_segments") or [], key=lambda s: s["index"]):
+        if segment.get("call_info"):
+            llm_calls.append(segment["call_info"])
+        written = {_day_key(day.get("day_number")): day.get("description") for day in segment["days"]}
+        if len(segment["days"]) == len(segment["positions"]) and not all(
+                _day_key(days[p].get("day_number")) in written for p in segment["positions"]):
+            # Renumbered days: match by position instead
+            written = {_day_key(days[p].get("day_number")): day.get("description")
+                       for p, day in zip(segment["positions"], segment["days"])}
+        missing = []
+        for position in segment["positions"]:
+            description = written.get(_day_key(days[position].get("day_number")))
+            if description:
+                days[position]["description"] = description
+            else:
+                missing.append(str(days[position].get("day_number")))
+        if missing:
+            segment_errors.append({"days": missing, "error": segment.get("error") or "Day missing from the segment answer."})
+
+    for day in days:
+        outline = day.pop("outline", None)
+        day.pop("city", None)
+        if not day.get("description"):
+            day["description"] = outline or ""
+    metadata["llm_calls"] = llm_calls
+    if segment_errors:
+        metadata["itinerary_segment_errors"] = segment_errors
+    if state.get("stream_preview"):
+        get_stream_writer()({"quotation_preview": structured_data})
+    return {"structured_quotation_data": structured_data, "generation_metadata": metadata}
 
 
 def generate_pdf_node(state: QuotationGenerationState):
@@ -388,7 +732,8 @@ def generate_pdf_node(state: QuotationGenerationState):
         pdf, dejavu_loaded = create_error_pdf_instance()
         title = "Quotation Generation Failed"
         if error_type == "UpstreamError": title = "Quotation Generation Failed: Data Parsing Error"
-        elif error_type in ["ConfigurationError", "HttpError", "LangChainException", "JsonParsingError", "ProviderAPIError"]: 
+        elif error_type in ["ConfigurationError", "HttpError", "LangChainException", "JsonParsingError", "ProviderAPIError",
+                            "NetworkError", "CircuitOpen", "ContextBudgetExceeded"]: 
             title = f"Quotation Generation Failed: AI ({state.get('ai_provider')}) Error"
 
         text_to_write = f"{title}\n\nIssue: {error_message}"
@@ -402,93 +747,364 @@ def generate_pdf_node(state: QuotationGenerationState):
     
     try:
         pdf_bytes = create_pdf_quotation_bytes(structured_data)
-        return {"pdf_output_bytes": pdf_bytes}
+        return {"pdf_output_bytes": pdf_bytes, "pdf_render_error": None}
     except Exception as e: 
         print(f"Critical error during PDF rendering process: {e}")
         pdf, dejavu_loaded = create_error_pdf_instance()
         text_to_write = f"Critical Error During PDF File Creation\n\nDetails: {str(e)}\n\nThis error occurred after the AI successfully structured the data. Please check the PDF library and data."
         if not dejavu_loaded: text_to_write = sanitize_for_standard_font(text_to_write)
         pdf.multi_cell(0, 7, text_to_write)
-        return {"pdf_output_bytes": bytes(pdf.output(dest='S'))}
+        return {"pdf_output_bytes": bytes(pdf.output(dest='S')), "pdf_render_error": str(e)}
 
 # Workflow definition
-workflow = StateGraph(QuotationGenerationState)
-workflow.add_node("fetch_enquiry_and_vendor_reply", fetch_data_node)
-workflow.add_node("parse_vendor_text", parse_vendor_reply_node)
-workflow.add_node("structure_data_for_pdf", structure_data_for_pdf_node)
-workflow.add_node("generate_pdf_document", generate_pdf_node)
+def _build_quotation_workflow(parse_node, structure_node) -> StateGraph:
+    workflow = StateGraph(QuotationGenerationState)
+    workflow.add_node("fetch_enquiry_and_vendor_reply", fetch_data_node)
+    workflow.add_node("parse_vendor_text", parse_node)
+    workflow.add_node("structure_data_for_pdf", structure_node)
+    workflow.add_node("generate_pdf_document", generate_pdf_node)
 
-workflow.set_entry_point("fetch_enquiry_and_vendor_reply")
-workflow.add_edge("fetch_enquiry_and_vendor_reply", "parse_vendor_text")
-workflow.add_edge("parse_vendor_text", "structure_data_for_pdf")
-workflow.add_edge("structure_data_for_pdf", "generate_pdf_document")
-workflow.add_edge("generate_pdf_document", END)
-quotation_generation_graph_compiled = workflow.compile()
+    workflow.set_entry_point("fetch_enquiry_and_vendor_reply")
+    workflow.add_edge("fetch_enquiry_and_vendor_reply", "parse_vendor_text")
+    workflow.add_edge("parse_vendor_text", "structure_data_for_pdf")
+    workflow.add_edge("structure_data_for_pdf", "generate_pdf_document")
+    workflow.add_edge("generate_pdf_document", END)
+    return workflow
 
+quotation_generation_graph_compiled = _build_quotation_workflow(parse_vendor_reply_node, structure_data_for_pdf_node).compile()
+# Same topology with coroutine LLM nodes; run it with `ainvoke` (see arun_quotation_generation_graph).
+# The PDF node stays synchronous and is executed off the event loop by LangGraph.
+quotation_generation_graph_async_compiled = _build_quotation_workflow(aparse_vendor_reply_node, astructure_data_for_pdf_node).compile()
 
-def run_quotation_generation_graph(
+
+def _build_single_pass_workflow(single_pass_node) -> StateGraph:
+    workflow = StateGraph(QuotationGenerationState)
+    workflow.add_node("fetch_enquiry_and_vendor_reply", fetch_data_node)
+    workflow.add_node("structure_vendor_reply_single_pass", single_pass_node)
+    workflow.add_node("generate_pdf_document", generate_pdf_node)
+
+    workflow.set_entry_point("fetch_enquiry_and_vendor_reply")
+    workflow.add_edge("fetch_enquiry_and_vendor_reply", "structure_vendor_reply_single_pass")
+    workflow.add_edge("structure_vendor_reply_single_pass", "generate_pdf_document")
+    workflow.add_edge("generate_pdf_document", END)
+    return workflow
+
+# Selected with ai_conf.single_pass_quotation: one LLM round-trip instead of parse + structure.
+quotation_single_pass_graph_compiled = _build_single_pass_workflow(single_pass_quotation_node).compile()
+quotation_single_pass_graph_async_compiled = _build_single_pass_workflow(asingle_pass_quotation_node).compile()
+
+
+def _build_segmented_workflow(parse_node, skeleton_node, segment_node) -> StateGraph:
+    workflow = StateGraph(QuotationGenerationState)
+    workflow.add_node("fetch_enquiry_and_vendor_reply", fetch_data_node)
+    workflow.add_node("parse_vendor_text", parse_node)
+    workflow.add_node("structure_itinerary_skeleton", skeleton_node)
+    workflow.add_node("write_itinerary_segment", segment_node)
+    workflow.add_node("merge_itinerary_segments", merge_itinerary_segments_node)
+    workflow.add_node("generate_pdf_document", generate_pdf_node)
+
+    workflow.set_entry_point("fetch_enquiry_and_vendor_reply")
+    workflow.add_edge("fetch_enquiry_and_vendor_reply", "parse_vendor_text")
+    workflow.add_edge("parse_vendor_text", "structure_itinerary_skeleton")
+    workflow.add_conditional_edges("structure_itinerary_skeleton", dispatch_itinerary_segments,
+                                   ["write_itinerary_segment", "generate_pdf_document"])
+    workflow.add_edge("write_itinerary_segment", "merge_itinerary_segments")
+    workflow.add_edge("merge_itinerary_segments", "generate_pdf_document")
+    workflow.add_edge("generate_pdf_document", END)
+    return workflow
+
+# Selected with ai_conf.segmented_itinerary: the itinerary days are written in parallel calls, so long
+# trips take about as long as short ones instead of one call writing every day.
+quotation_segmented_graph_compiled = _build_segmented_workflow(
+    parse_vendor_reply_node, structure_skeleton_node, write_itinerary_segment_node).compile()
+quotation_segmented_graph_async_compiled = _build_segmented_workflow(
+    aparse_vendor_reply_node, astructure_skeleton_node, awrite_itinerary_segment_node).compile()
+
+# The same graphs with every node's output checkpointed to SQLite (see src/core/quotation_checkpoints.py).
+# They need a {"configurable": {"thread_id": ...}} config, so the runners use them and callers that
+# invoke a graph directly (benchmarks) keep the plain ones.
+_checkpointer = get_quotation_checkpointer()
+_CHECKPOINTED_GRAPHS = {
+    ("two-stage", False): _build_quotation_workflow(parse_vendor_reply_node, structure_data_for_pdf_node).compile(checkpointer=_checkpointer),
+    ("two-stage", True): _build_quotation_workflow(aparse_vendor_reply_node, astructure_data_for_pdf_node).compile(checkpointer=_checkpointer),
+    ("single-pass", False): _build_single_pass_workflow(single_pass_quotation_node).compile(checkpointer=_checkpointer),
+    ("single-pass", True): _build_single_pass_workflow(asingle_pass_quotation_node).compile(checkpointer=_checkpointer),
+    ("segmented", False): _build_segmented_workflow(
+        parse_vendor_reply_node, structure_skeleton_node, write_itinerary_segment_node).compile(checkpointer=_checkpointer),
+    ("segmented", True): _build_segmented_workflow(
+        aparse_vendor_reply_node, astructure_skeleton_node, awrite_itinerary_segment_node).compile(checkpointer=_checkpointer),
+}
+
+
+def _quotation_mode(ai_conf: Any) -> str:
+    """single-pass takes precedence over segmented, which builds on the two-stage vendor parsing."""
+    if getattr(ai_conf, "single_pass_quotation", False):
+        return "single-pass"
+    return "segmented" if getattr(ai_conf, "segmented_itinerary", False) else "two-stage"
+
+
+_GRAPHS = {
+    ("two-stage", False): quotation_generation_graph_compiled,
+    ("two-stage", True): quotation_generation_graph_async_compiled,
+    ("single-pass", False): quotation_single_pass_graph_compiled,
+    ("single-pass", True): quotation_single_pass_graph_async_compiled,
+    ("segmented", False): quotation_segmented_graph_compiled,
+    ("segmented", True): quotation_segmented_graph_async_compiled,
+}
+
+
+def quotation_graph_for(ai_conf: Any, use_async: bool = False, checkpointed: bool = False):
+    """The compiled quotation graph matching ai_conf (two-stage, single-pass or segmented), optionally checkpointed."""
+    graphs = _CHECKPOINTED_GRAPHS if checkpointed else _GRAPHS
+    return graphs[(_quotation_mode(ai_conf), use_async)]
+
+
+def _node_outputs_ok(values: dict) -> bool:
+    return not values.get("parsed_vendor_info_error") and not (values.get("structured_quotation_data") or {}).get("error")
+
+
+def _resume_point(graph, thread_config: dict):
+    """
+    The checkpoint a retry should continue from, or None to start afresh: the newest checkpoint
+    of the thread's last run that still has nodes to run, has only error-free node outputs and
+    holds at least one LLM result worth keeping. A run that completed successfully is not resumed.
+    """
+    latest = graph.get_state(thread_config)
+    if not latest.values:
+        return None
+    if (not latest.next and _node_outputs_ok(latest.values) and latest.values.get("pdf_output_bytes")
+            and not latest.values.get("pdf_render_error")):
+        return None
+    for snapshot in graph.get_state_history(thread_config): # Newest first
+        # Fanned-out segment tasks are not restored by update_state: resume before the skeleton instead
+        if (snapshot.next and "write_itinerary_segment" not in snapshot.next and _node_outputs_ok(snapshot.values)
+                and (snapshot.values.get("generation_metadata") or {}).get("llm_calls")):
+            return snapshot
+        if (snapshot.metadata or {}).get("source") == "input":
+            return None # Reached the start of the last run
+    return None
+
+
+def _checkpointed_run_args(graph, initial_state: QuotationGenerationState) -> tuple[Any, dict]:
+    """(graph input, config) for a checkpointed run: the initial state, or None plus the checkpoint to resume."""
+    thread_id = quotation_thread_id(
+        initial_state["enquiry_details"], initial_state["vendor_reply_text"],
+        initial_state["ai_suggested_itinerary_text"], initial_state["ai_provider"], initial_state["ai_conf"]
+    )
+    thread_config = {
+        "configurable": {"thread_id": thread_id},
+        "metadata": {"quotation_mode": _quotation_mode(initial_state["ai_conf"])},
+    }
+    resume_from = _resume_point(graph, thread_config)
+    if resume_from is None:
+        return initial_state, thread_config
+
+    next_node = resume_from.next[0]
+    restored_calls = len(resume_from.values["generation_metadata"]["llm_calls"])
+    print(f"[Quotation Generation Graph] Resuming run {thread_id} at '{next_node}' "
+          f"with {restored_calls} earlier LLM result(s) restored.")
+    # Settings that do not change outputs (hedging, preview streaming) come from this attempt
+    resumed_config = graph.update_state(resume_from.config, {
+        "ai_conf": initial_state["ai_conf"],
+        "stream_preview": initial_state["stream_preview"],
+        "generation_metadata": {**resume_from.values["generation_metadata"], "resumed_at_node": next_node},
+    })
+    return None, {**resumed_config, "metadata": thread_config["metadata"]}
+
+
+def _summarize_state_values(values: dict) -> dict:
+    summary = {}
+    for key, value in values.items():
+        if isinstance(value, bytes):
+            summary[key] = f"<{len(value)} bytes>"
+        elif hasattr(value, "model_dump"):
+            summary[key] = value.model_dump()
+        else:
+            summary[key] = value
+    return summary
+
+
+def get_quotation_run_history(thread_id: str) -> list[dict]:
+    """
+    Every checkpoint of a run (see list_quotation_runs), oldest first: checkpoint_id, created_at,
+    step, source, the nodes due to run next and the graph state at that point (PDF bytes summarised).
+    """
+    checkpointer = get_quotation_checkpointer()
+    latest = checkpointer.get_tuple({"configurable": {"thread_id": thread_id}})
+    if latest is None:
+        return []
+    mode = latest.metadata.get("quotation_mode") or "two-stage"
+    graph = _CHECKPOINTED_GRAPHS[(mode, False)]
+    history = []
+    for snapshot in graph.get_state_history({"configurable": {"thread_id": thread_id}}):
+        history.append({
+            "checkpoint_id": snapshot.config["configurable"]["checkpoint_id"],
+            "created_at": snapshot.created_at,
+            "step": (snapshot.metadata or {}).get("step"),
+            "source": (snapshot.metadata or {}).get("source"),
+            "next": list(snapshot.next),
+            "values": _summarize_state_values(snapshot.values),
+        })
+    return list(reversed(history))
+
+
+def _initial_quotation_state(
     enquiry_details: dict,
     vendor_reply_text: str,
     ai_suggested_itinerary_text: str,
     provider: str,
-    ai_conf: Any # Added
-) -> tuple[bytes | None, Dict[str, Any] | None]:
-    initial_state = QuotationGenerationState(
+    ai_conf: Any,
+    stream_preview: bool = False,
+    vendor_reply_id: str | None = None
+) -> QuotationGenerationState:
+    return QuotationGenerationState(
         enquiry_details=enquiry_details,
         vendor_reply_text=vendor_reply_text,
+        vendor_reply_id=vendor_reply_id,
         ai_suggested_itinerary_text=ai_suggested_itinerary_text,
         parsed_vendor_info_text="",
+        parsed_vendor_info=None,
         parsed_vendor_info_error=None,
         structured_quotation_data={},
         pdf_output_bytes=b"",
         ai_provider=provider,
-        ai_conf=ai_conf # Added
+        ai_conf=ai_conf, # Added
+        generation_metadata={"llm_calls": []},
+        stream_preview=stream_preview,
+        pdf_render_error=None,
+        itinerary_segments=None
+    )
+
+
+def _graph_result_from_final_state(final_state: dict) -> tuple[bytes | None, Dict[str, Any] | None]:
+    pdf_bytes = final_state.get("pdf_output_bytes")
+    structured_data = final_state.get("structured_quotation_data", {})
+
+    if not pdf_bytes: 
+         print("[Quotation Generation Graph] CRITICAL: PDF generation node returned no bytes.")
+         err_pdf_fallback, dl = create_error_pdf_instance()
+         emsg = "System Error: PDF Generation process failed to produce output."
+         if not dl: emsg = sanitize_for_standard_font(emsg)
+         err_pdf_fallback.multi_cell(0, 10, emsg)
+         pdf_bytes = bytes(err_pdf_fallback.output(dest='S'))
+         if not structured_data.get("error"): 
+            structured_data = {"error": "System Error: PDF Generation process failed.", 
+                               "details": "No PDF bytes returned from graph's PDF node.", 
+                               "type": "SystemError", "raw_output": None, "status_code": None}
+    
+    generation_metadata = final_state.get("generation_metadata")
+    if generation_metadata and generation_metadata.get("llm_calls"):
+        structured_data = {**structured_data, "generation_metadata": generation_metadata}
+
+    print("[Quotation Generation Graph] Graph execution completed.")
+    return pdf_bytes, structured_data
+
+
+def _graph_exception_result(e: Exception, final_state: dict, provider: str) -> tuple[bytes, Dict[str, Any]]:
+    print(f"[Quotation Generation Graph] CRITICAL error running compiled graph for {provider}: {e}")
+    err_msg_graph = f"System error during quotation graph execution: {str(e)}"
+    raw_out_context = final_state.get("structured_quotation_data", {}).get("raw_output")
+    if not raw_out_context: raw_out_context = final_state.get("parsed_vendor_info_text", "N/A")
+
+    err_pdf, dl = create_error_pdf_instance()
+    title = "Quotation Generation Failed: System Error"
+    details_text = f"Error: {str(e)}\n\nContext (if available):\n{raw_out_context}"
+    if not dl: 
+        title = sanitize_for_standard_font(title)
+        details_text = sanitize_for_standard_font(details_text)
+    
+    err_pdf.multi_cell(0, 8, title, align='C'); err_pdf.ln(5)
+    if dl: err_pdf.set_font("DejaVu", "", 10)
+    else: err_pdf.set_font("Helvetica", "", 10)
+    err_pdf.multi_cell(0, 5, details_text)
+    
+    return bytes(err_pdf.output(dest='S')), {
+        "error": err_msg_graph, "details": str(e), "raw_output": raw_out_context, 
+        "type": "GraphExecutionError", "status_code": None
+    }
+
+
+def _deliver_preview(on_preview: Callable[[dict], None], preview: dict):
+    try:
+        on_preview(preview)
+    except Exception as e: # The preview is cosmetic: never fail the quotation because of it
+        print(f"[Quotation Generation Graph] Preview callback failed: {e}")
+
+
+def run_quotation_generation_graph(
+    enquiry_details: dict,
+    vendor_reply_text: str,
+    ai_suggested_itinerary_text: str,
+    provider: str,
+    ai_conf: Any, # Added
+    on_preview: Callable[[dict], None] | None = None,
+    vendor_reply_id: str | None = None,
+    cancel_event: threading.Event | None = None
+) -> tuple[bytes | None, Dict[str, Any] | None]:
+    """
+    Runs the quotation graph selected by ai_conf. With `on_preview`, the quotation JSON is streamed
+    and on_preview(partial_quotation_dict) is called from this thread as sections arrive; the
+    result is the same (pdf_bytes, structured_data) either way.
+    Node outputs are checkpointed: after a failed run, calling again with the same inputs resumes
+    from the failed node (generation_metadata["resumed_at_node"]).
+    `vendor_reply_id` links the memoized vendor reply parse to its vendor_replies row.
+    Setting `cancel_event` stops the run after the node in progress (an LLM call already sent is
+    not interrupted) and returns (None, {"type": "Cancelled", ...}).
+    """
+    initial_state = _initial_quotation_state(
+        enquiry_details, vendor_reply_text, ai_suggested_itinerary_text, provider, ai_conf,
+        stream_preview=on_preview is not None, vendor_reply_id=vendor_reply_id
     )
 
-    print(f"[Quotation Generation Graph] Starting quotation data generation with {provider}...")
+    print(f"[Quotation Generation Graph] Starting {_quotation_mode(ai_conf)} quotation data generation with {provider}...")
     final_state = {}
-    pdf_bytes = None
-    structured_data = None
 
     try:
-        final_state = quotation_generation_graph_compiled.invoke(initial_state)
-        pdf_bytes = final_state.get("pdf_output_bytes")
-        structured_data = final_state.get("structured_quotation_data", {})
-
-        if not pdf_bytes: 
-             print("[Quotation Generation Graph] CRITICAL: PDF generation node returned no bytes.")
-             err_pdf_fallback, dl = create_error_pdf_instance()
-             emsg = "System Error: PDF Generation process failed to produce output."
-             if not dl: emsg = sanitize_for_standard_font(emsg)
-             err_pdf_fallback.multi_cell(0, 10, emsg)
-             pdf_bytes = bytes(err_pdf_fallback.output(dest='S'))
-             if not structured_data.get("error"): 
-                structured_data = {"error": "System Error: PDF Generation process failed.", 
-                                   "details": "No PDF bytes returned from graph's PDF node.", 
-                                   "type": "SystemError", "raw_output": None, "status_code": None}
-        
-        print("[Quotation Generation Graph] Graph execution completed.")
-        return pdf_bytes, structured_data
+        checkpointed = quotation_checkpoints_enabled()
+        graph = quotation_graph_for(ai_conf, checkpointed=checkpointed)
+        graph_input, config = _checkpointed_run_args(graph, initial_state) if checkpointed else (initial_state, None)
+        if on_preview is None and cancel_event is None:
+            final_state = graph.invoke(graph_input, config)
+        else:
+            for stream_mode, payload in graph.stream(graph_input, config, stream_mode=["custom", "values"]):
+                if stream_mode == "values":
+                    final_state = payload
+                    if cancel_event is not None and cancel_event.is_set():
+                        print("[Quotation Generation Graph] Run cancelled between nodes.")
+                        return None, {"error": "Quotation generation was cancelled.", "details": None,
+                                      "type": "Cancelled", "raw_output": None, "status_code": None}
+                elif on_preview is not None and "quotation_preview" in payload:
+                    _deliver_preview(on_preview, payload["quotation_preview"])
+        return _graph_result_from_final_state(final_state)
+    except Exception as e: 
+        return _graph_exception_result(e, final_state, provider)
+
+
+async def arun_quotation_generation_graph(
+    enquiry_details: dict,
+    vendor_reply_text: str,
+    ai_suggested_itinerary_text: str,
+    provider: str,
+    ai_conf: Any,
+    vendor_reply_id: str | None = None
+) -> tuple[bytes | None, Dict[str, Any] | None]:
+    """
+    Async counterpart of run_quotation_generation_graph with the same (pdf_bytes, structured_data) contract.
+    LLM hops are awaited, so one event loop can drive many generations concurrently.
+    """
+    initial_state = _initial_quotation_state(
+        enquiry_details, vendor_reply_text, ai_suggested_itinerary_text, provider, ai_conf,
+        vendor_reply_id=vendor_reply_id
+    )
+
+    print(f"[Quotation Generation Graph] Starting async {_quotation_mode(ai_conf)} quotation data generation with {provider}...")
+    final_state = {}
 
+    try:
+        checkpointed = quotation_checkpoints_enabled()
+        graph = quotation_graph_for(ai_conf, use_async=True, checkpointed=checkpointed)
+        graph_input, config = _checkpointed_run_args(graph, initial_state) if checkpointed else (initial_state, None)
+        final_state = await graph.ainvoke(graph_input, config)
+        return _graph_result_from_final_state(final_state)
     except Exception as e: 
-        print(f"[Quotation Generation Graph] CRITICAL error running compiled graph for {provider}: {e}")
-        err_msg_graph = f"System error during quotation graph execution: {str(e)}"
-        raw_out_context = final_state.get("structured_quotation_data", {}).get("raw_output")
-        if not raw_out_context: raw_out_context = final_state.get("parsed_vendor_info_text", "N/A")
-
-        err_pdf, dl = create_error_pdf_instance()
-        title = "Quotation Generation Failed: System Error"
-        details_text = f"Error: {str(e)}\n\nContext (if available):\n{raw_out_context}"
-        if not dl: 
-            title = sanitize_for_standard_font(title)
-            details_text = sanitize_for_standard_font(details_text)
-        
-        err_pdf.multi_cell(0, 8, title, align='C'); err_pdf.ln(5)
-        if dl: err_pdf.set_font("DejaVu", "", 10)
-        else: err_pdf.set_font("Helvetica", "", 10)
-        err_pdf.multi_cell(0, 5, details_text)
-        
-        return bytes(err_pdf.output(dest='S')), {
-            "error": err_msg_graph, "details": str(e), "raw_output": raw_out_context, 
-            "type": "GraphExecutionError", "status_code": None
-        }
\ No newline at end of file
+        return _graph_exception_result(e, final_state, provider)
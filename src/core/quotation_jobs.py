@@ -0,0 +1,174 @@
+# src/core/quotation_jobs.py
+"""
+The background job kinds of the app, run by the process-wide JobQueue (src/core/job_queue.py):
+
+- "quotation": generate the quotation (or take the one pre-generated by speculative_quotations,
+  or patch the latest one after a small vendor-reply edit, see quotation_patch), then upload the PDF and insert its `quotations` row. The file is the PDF, or the error PDF when
+  generation failed.
+- "docx": convert the PDF of the quotation job it depends on, upload the DOCX and link it to that
+  quotation row. The file is the DOCX.
+- "suggestions": stream the places suggestions for Tab 2, with the text so far as the job preview
+  ({"text": ...}), and save them as the enquiry's itinerary.
+
+Payloads are JSON: the AI config is stored as a dict and rebuilt per job. With "save": false,
+nothing is written to Supabase (scripts and tests).
+"""
+import time
+
+from src.models import AIConfigState
+from src.core.job_queue import JobQueue, JobContext
+from src.core.quotation_patch import generate_quotation
+from src.core.quotation_persistence import is_storable_quotation, save_quotation_pdf, save_quotation_docx, save_llm_calls
+from src.core.speculative_quotations import get_speculative_quotation_runner
+from src.core.itinerary_generator import stream_places_suggestion_llm
+from src.llm.telemetry import capture_llm_calls
+from src.utils.constants import QUOTATION_PREVIEW_MIN_INTERVAL_SECONDS
+
+
+def run_quotation_job(payload: dict, context: JobContext) -> tuple[dict | None, bytes | None, str | None]:
+    ai_conf = AIConfigState(**payload["ai_conf"])
+    enquiry_details = payload["enquiry_details"]
+    save = payload.get("save", True)
+
+    context.progress(f"Generating quotation data with {payload['provider']}...")
+    speculative_output = get_speculative_quotation_runner().take(payload["cache_key"]) if payload.get("cache_key") else None
+    if speculative_output:
+        pdf_bytes, structured_data = speculative_output # Its LLM calls were saved by the speculative run
+        context.progress("Using the quotation pre-generated in the background.")
+    else:
+        on_preview = None
+        if ai_conf.live_quotation_preview:
+            on_preview = lambda preview: context.progress("Writing the quotation...", preview)
+        with capture_llm_calls() as llm_calls:
+            pdf_bytes, structured_data = generate_quotation(
+                enquiry_details, payload["vendor_reply_text"], payload["itinerary_text"], payload["provider"], ai_conf,
+                base_quotation=payload.get("base_quotation"), load_base=save, itinerary_id=payload.get("itinerary_id"),
+                vendor_reply_id=payload.get("vendor_reply_id"), on_preview=on_preview
+            )
+        if save:
+            save_llm_calls(enquiry_details.get("id"), llm_calls)
+
+    result = {"structured_data": structured_data}
+    if not is_storable_quotation(pdf_bytes, structured_data):
+        return result, pdf_bytes, str((structured_data or {}).get("error") or "No valid PDF was generated.")
+    if save:
+        context.progress("Uploading the PDF and saving the quotation...")
+        quotation_row, error_msg = save_quotation_pdf(
+            enquiry_details.get("id"), pdf_bytes, structured_data,
+            itinerary_used_id=payload.get("itinerary_id"), vendor_reply_used_id=payload.get("vendor_reply_id")
+        )
+        if error_msg:
+            return result, pdf_bytes, error_msg
+        result["quotation_id"] = quotation_row.get("id")
+        result["pdf_storage_path"] = quotation_row.get("pdf_storage_path")
+    return result, pdf_bytes, None
+
+
+def run_docx_job(payload: dict, context: JobContext) -> tuple[dict | None, bytes | None, str | None]:
+    from src.utils.docx_utils import convert_pdf_bytes_to_docx_bytes # pdf2docx is only needed by this job
+
+    quotation_job, pdf_bytes = context.dependency()
+    if not pdf_bytes:
+        return None, None, "The quotation PDF to convert is not available."
+    context.progress("Converting PDF to DOCX...")
+    docx_bytes = convert_pdf_bytes_to_docx_bytes(pdf_bytes)
+    if not docx_bytes:
+        return None, None, "Failed to convert PDF to DOCX."
+
+    result = {}
+    if payload.get("save", True):
+        context.progress("Uploading the DOCX...")
+        quotation_result = quotation_job.result or {}
+        storage_path, error_msg = save_quotation_docx(
+            payload["enquiry_id"], docx_bytes, quotation_result.get("quotation_id"), quotation_result.get("structured_data")
+        )
+        if error_msg:
+            return result, docx_bytes, error_msg
+        result["docx_storage_path"] = storage_path
+    return result, docx_bytes, None
+
+
+def run_suggestions_job(payload: dict, context: JobContext) -> tuple[dict | None, bytes | None, str | None]:
+    enquiry_details = payload["enquiry_details"]
+    context.progress(f"Generating places suggestions with {payload['provider']}...")
+    suggestion_stream = stream_places_suggestion_llm(enquiry_details, payload["provider"], AIConfigState(**payload["ai_conf"]))
+    last_preview_at = 0.0
+    with capture_llm_calls() as llm_calls:
+        for _ in suggestion_stream:
+            if time.monotonic() - last_preview_at >= QUOTATION_PREVIEW_MIN_INTERVAL_SECONDS:
+                context.progress("Writing the suggestions...", {"text": suggestion_stream.text})
+                last_preview_at = time.monotonic()
+    suggestions_text, error_info = suggestion_stream.text, suggestion_stream.error_info
+    if error_info or not suggestions_text:
+        error_info = error_info or {"message": "Could not generate place suggestions."}
+        return {"error_info": error_info}, None, error_info.get("message") or "Could not generate place suggestions."
+
+    result = {"itinerary_text": suggestions_text}
+    if payload.get("save", True):
+        from src.utils.supabase_utils import add_itinerary # Needs SUPABASE_URL/SUPABASE_KEY at import time
+
+        save_llm_calls(enquiry_details.get("id"), llm_calls)
+        itinerary_row, error_msg = add_itinerary(enquiry_details["id"], suggestions_text)
+        if not itinerary_row:
+            return result, None, f"Failed to save AI suggestions: {error_msg or 'Unknown error'}"
+        result["itinerary_id"] = itinerary_row["id"]
+    return result, None, None
+
+
+_job_queue = JobQueue()
+_job_queue.register("quotation", run_quotation_job)
+_job_queue.register("docx", run_docx_job)
+_job_queue.register("suggestions", run_suggestions_job)
+
+
+def get_job_queue() -> JobQueue:
+    return _job_queue
+
+
+def configure_job_queue(path: str | None = None) -> JobQueue:
+    """Points the queue at another SQLite file (e.g. a temp file in tests)."""
+    if path is not None:
+        _job_queue.reopen(path)
+    return _job_queue
+
+
+def submit_quotation_job(
+    enquiry_details: dict,
+    vendor_reply_text: str,
+    itinerary_text: str,
+    provider: str,
+    ai_conf: AIConfigState,
+    itinerary_id: str | None = None,
+    vendor_reply_id: str | None = None,
+    cache_key: str | None = None,
+    save: bool = True,
+    base_quotation: dict | None = None
+) -> str:
+    """
+    Queues (or finds) the quotation job for these inputs. `cache_key` lets it take a speculative result.
+    `base_quotation` is the quotation to patch after a small vendor-reply edit (see
+    quotation_persistence.load_quotation_base); with save, the latest one is loaded when the job runs.
+    """
+    return _job_queue.submit("quotation", {
+        "enquiry_details": enquiry_details,
+        "vendor_reply_text": vendor_reply_text,
+        "itinerary_text": itinerary_text,
+        "provider": provider,
+        "ai_conf": ai_conf.model_dump(),
+        "itinerary_id": itinerary_id,
+        "vendor_reply_id": vendor_reply_id,
+        "cache_key": cache_key,
+        "save": save,
+        "base_quotation": base_quotation,
+    }, scope=enquiry_details.get("id"))
+
+
+def submit_docx_job(enquiry_id: str, quotation_job_id: str, save: bool = True) -> str:
+    """Queues the DOCX conversion of a quotation job's PDF; it starts once that job is done."""
+    return _job_queue.submit("docx", {"enquiry_id": enquiry_id, "save": save}, scope=enquiry_id, depends_on=quotation_job_id)
+
+
+def submit_suggestions_job(enquiry_details: dict, provider: str, ai_conf: AIConfigState, save: bool = True) -> str:
+    return _job_queue.submit("suggestions", {
+        "enquiry_details": enquiry_details, "provider": provider, "ai_conf": ai_conf.model_dump(), "save": save,
+    }, scope=enquiry_details.get("id"))
@@ -0,0 +1,278 @@
+# src/core/quotation_patch.py
+"""
+Incremental quotation regeneration.
+
+Vendors often send a corrected reply that only changes the price, swaps a hotel or edits the
+inclusions. Regenerating the whole quotation for that rewrites the day-wise itinerary too, which is
+most of the output tokens. Instead, the new reply is diffed line by line against the reply the
+latest quotation was generated from (quotation_persistence.load_quotation_base):
+
+- every changed line is classified as pricing, hotels or inclusions/exclusions (by its section
+  header, e.g. the bullets under "Exclusions:", or by keywords);
+- if all of them are, one small LLM call (QUOTATION_PATCH_JSON_PROMPT_TEMPLATE_STRING) re-extracts
+  only the fields of those groups, which are patched into the stored structured data before the
+  PDF is re-rendered. The itinerary and every other field are reused as they are;
+- itinerary lines ("Day 3: ..."), anything unclassified, more than QUOTATION_PATCH_MAX_CHANGED_LINES
+  changed lines, a quotation made from another itinerary version or a failed patch call fall back
+  to the full quotation graph.
+
+generate_quotation() is the entry point for the background job and the speculative runner.
+"""
+import copy
+import difflib
+import json
+import re
+import threading
+from functools import partial
+from typing import Any, Callable
+
+from src.llm.llm_invocation import invoke_llm_prompt
+from src.llm.llm_providers import resolve_model_name, structured_output_format
+from src.llm.llm_prompts import QUOTATION_PATCH_JSON_PROMPT_TEMPLATE_STRING
+from src.core.quotation_graph_builder import (
+    QUOTATION_JSON_SCHEMA, VENDOR_PARSE_TRIMMABLE_INPUTS, _raw_output_for_error, _structuring_error_payload,
+    run_quotation_generation_graph
+)
+from src.core.quotation_persistence import is_storable_quotation, load_quotation_base
+from src.models import QuotationData
+from src.utils.json_repair import loads_json_with_repair
+from src.utils.pdf_utils import create_pdf_quotation_bytes
+from src.utils.quotation_catalogue import merge_quotation_catalogue
+from src.utils.constants import QUOTATION_PATCH_MAX_CHANGED_LINES
+
+# Field groups a vendor-reply change can be confined to, and the quotation fields each one rewrites
+PATCH_FIELD_GROUPS = {
+    "pricing": ("cost_per_head", "total_pax_for_cost", "total_package_cost", "currency"),
+    "hotels": ("hotel_details", "meal_plan_summary", "room_configuration_summary"),
+    "inclusions_exclusions": ("inclusions", "exclusions"),
+}
+
+PATCH_OUTPUT_TOKENS_PER_FIELD = 120 # A hotel list or an inclusions list; prices are much shorter
+
+_ITINERARY_LINE = re.compile(r"^(?:[-*•]\s*)?(?:day\s*\d+\b|itinerary\b)", re.IGNORECASE)
+_BULLET_LINE = re.compile(r"^(?:[-*•]|\d+[.)])\s+")
+_HEADER_LINE = re.compile(r"^([A-Za-z][A-Za-z /&-]{1,40}?)\s*:\s*(.*)$")
+_GROUP_KEYWORDS = {
+    "inclusions_exclusions": re.compile(
+        r"\b(?:inclusions?|exclusions?|includ(?:e|es|ed|ing)|exclud(?:e|es|ed|ing)|not included)\b", re.IGNORECASE),
+    "pricing": re.compile(
+        r"\b(?:price[sd]?|pricing|costs?|rates?|tariffs?|total|per person|per head|pp|amount|discount|gst|tax|"
+        r"inr|usd|eur|rs)\b|[₹$€£]", re.IGNORECASE),
+    "hotels": re.compile(
+        r"\b(?:(?i:hotels?|resorts?|stay|accommodation|villas?|inn|palace|retreat|houseboat|homestay|rooms?|"
+        r"nights?|meal plan)|\d+\s?N|MAP|CP|AP|EP)\b"), # Meal plan codes in capitals only
+}
+
+
+def _line_groups(line: str, section: str | None) -> set[str]:
+    """Groups a vendor-reply line belongs to: "itinerary" and "other" block a patch."""
+    if _ITINERARY_LINE.match(line):
+        return {"itinerary"}
+    if section and _BULLET_LINE.match(line):
+        return {section}
+    header = _HEADER_LINE.match(line)
+    text = header.group(1) if header else line # A labelled line is classified by its label
+    groups = {group for group, pattern in _GROUP_KEYWORDS.items() if pattern.search(text)}
+    if header and not groups:
+        groups = {group for group, pattern in _GROUP_KEYWORDS.items() if pattern.search(line)}
+    return groups or {"other"}
+
+
+def _classified_lines(vendor_reply_text: str) -> list[tuple[str, set[str]]]:
+    """(stripped line, groups) for each non-blank line. Bullets take the group of the header above them."""
+    lines = []
+    section = None
+    for raw_line in (vendor_reply_text or "").splitlines():
+        line = raw_line.strip()
+        if not line:
+            section = None
+            continue
+        groups = _line_groups(line, section)
+        header = _HEADER_LINE.match(line)
+        if header and not header.group(2).strip() and len(groups) == 1:
+            section = next(iter(groups)) # "Exclusions:" alone on its line: the bullets below are exclusions
+        elif not _BULLET_LINE.match(line):
+            section = None
+        lines.append((line, groups))
+    return lines
+
+
+def classify_vendor_reply_change(old_text: str, new_text: str) -> tuple[list[str] | None, list[str]]:
+    """
+    Compares two versions of a vendor reply. Returns (groups, diff_lines): the PATCH_FIELD_GROUPS
+    keys the change touches (empty when only whitespace changed), or None when it needs a full
+    regeneration; and the changed lines prefixed with "- " (old) or "+ " (new).
+    """
+    old_lines, new_lines = _classified_lines(old_text), _classified_lines(new_text)
+    matcher = difflib.SequenceMatcher(a=[line for line, _ in old_lines], b=[line for line, _ in new_lines], autojunk=False)
+    groups, diff_lines = set(), []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        for line, line_groups in old_lines[i1:i2]:
+            diff_lines.append(f"- {line}")
+            groups |= line_groups
+        for line, line_groups in new_lines[j1:j2]:
+            diff_lines.append(f"+ {line}")
+            groups |= line_groups
+
+    if len(diff_lines) > QUOTATION_PATCH_MAX_CHANGED_LINES or groups - PATCH_FIELD_GROUPS.keys():
+        return None, diff_lines
+    return [group for group in PATCH_FIELD_GROUPS if group in groups], diff_lines
+
+
+def _patch_prompt_spec(fields: list[str], provider: str, ai_conf: Any) -> tuple[str, dict]:
+    """Like quotation_graph_builder._json_prompt_spec, with a schema restricted to the patched fields."""
+    schema = copy.deepcopy(QUOTATION_JSON_SCHEMA)
+    schema["properties"] = {field: schema["properties"][field] for field in fields}
+    schema["required"] = list(fields)
+    chain_kwargs = {}
+    response_format = structured_output_format(provider, resolve_model_name(provider, ai_conf.selected_model_for_provider),
+                                               "quotation_patch", schema)
+    if response_format is not None:
+        chain_kwargs["response_format"] = response_format
+    return QUOTATION_PATCH_JSON_PROMPT_TEMPLATE_STRING, chain_kwargs
+
+
+def _patched_quotation(response_data: Any, base_data: dict, fields: list[str]) -> tuple[dict, list[str]]:
+    """
+    base_data with `fields` replaced by the answer's values (null removes a field), validated
+    against QuotationData. Keys outside `fields` are ignored. Returns (quotation, repairs applied).
+    """
+    repairs = []
+    if isinstance(response_data, str):
+        patch, repairs = loads_json_with_repair(response_data)
+    else:
+        patch = response_data
+    if not isinstance(patch, dict) or not any(field in patch for field in fields):
+        raise json.JSONDecodeError("Expected a JSON object with the fields to update.", _raw_output_for_error(response_data), 0)
+    patched = dict(base_data)
+    for field in fields:
+        if field in patch:
+            patched[field] = patch[field]
+            if patch[field] is None:
+                patched.pop(field)
+    return QuotationData.model_validate(patched).model_dump(exclude_none=True), repairs
+
+
+def _stored_structured_data(base_quotation: dict) -> dict:
+    structured_data = base_quotation.get("structured_data") or {}
+    if isinstance(structured_data, str):
+        structured_data = json.loads(structured_data)
+    return {key: value for key, value in structured_data.items() if key != "generation_metadata"}
+
+
+def patch_quotation(
+    base_quotation: dict,
+    enquiry_details: dict,
+    vendor_reply_text: str,
+    provider: str,
+    ai_conf: Any
+) -> tuple[bytes | None, dict | None]:
+    """
+    Re-renders base_quotation (see quotation_persistence.load_quotation_base) for the revised
+    vendor_reply_text, re-extracting only the fields the change touches. Returns (None, None)
+    when the change needs a full regeneration, else (pdf_bytes, structured_data) like
+    run_quotation_generation_graph; structured_data carries the error payload if the patch failed.
+    """
+    groups, diff_lines = classify_vendor_reply_change(base_quotation.get("vendor_reply_text") or "", vendor_reply_text)
+    if groups is None:
+        print(f"[Quotation Patch] {len(diff_lines)} changed vendor-reply line(s) go beyond prices, hotels and inclusions; regenerating in full.")
+        return None, None
+
+    base_data = _stored_structured_data(base_quotation)
+    fields = [field for group in groups for field in PATCH_FIELD_GROUPS[group]]
+    llm_calls = []
+    raw_llm_output_for_error = ""
+    try:
+        if fields:
+            inputs = {
+                "destination": enquiry_details.get("destination", "N/A"),
+                "num_days": str(enquiry_details.get("num_days", "N/A")),
+                "traveler_count": str(enquiry_details.get("traveler_count", "N/A")),
+                "fields_to_update": ", ".join(fields),
+                "current_values": json.dumps({field: base_data.get(field) for field in fields}, indent=2, ensure_ascii=False),
+                "vendor_reply_diff": "\n".join(diff_lines),
+                "vendor_reply": vendor_reply_text,
+            }
+            response_data, call_info = invoke_llm_prompt(
+                partial(_patch_prompt_spec, fields), inputs, provider, ai_conf,
+                validate=lambda response: _is_patch_response(response, base_data, fields),
+                stage="patch_quotation_fields", trimmable_inputs=VENDOR_PARSE_TRIMMABLE_INPUTS,
+                expected_output_tokens=PATCH_OUTPUT_TOKENS_PER_FIELD * len(fields)
+            )
+            llm_calls.append(call_info)
+            raw_llm_output_for_error = _raw_output_for_error(response_data)
+            structured_data, json_repairs = _patched_quotation(response_data, base_data, fields)
+            if json_repairs:
+                call_info["json_repairs"] = json_repairs
+        else: # Whitespace-only edit: nothing to re-extract
+            structured_data = QuotationData.model_validate(base_data).model_dump(exclude_none=True)
+        structured_data = merge_quotation_catalogue(structured_data)
+        pdf_bytes = create_pdf_quotation_bytes(structured_data)
+    except Exception as e:
+        error_payload = _structuring_error_payload(e, provider, raw_llm_output_for_error)
+        return None, {**error_payload, "generation_metadata": {"llm_calls": llm_calls}}
+
+    print(f"[Quotation Patch] Patched {', '.join(fields) or 'no fields'} of quotation {base_quotation.get('quotation_id')}.")
+    structured_data["generation_metadata"] = {
+        "llm_calls": llm_calls,
+        "incremental_patch": {"base_quotation_id": base_quotation.get("quotation_id"), "groups": groups, "fields": fields},
+    }
+    return pdf_bytes, structured_data
+
+
+def _is_patch_response(response_data: Any, base_data: dict, fields: list[str]) -> bool:
+    """Hedge-leg validation: the answer must patch the base quotation into a valid one."""
+    try:
+        _patched_quotation(copy.deepcopy(response_data), base_data, fields)
+        return True
+    except Exception:
+        return False
+
+
+def _load_base_quotation(enquiry_id: str | None) -> dict | None:
+    if not enquiry_id:
+        return None
+    try:
+        base_quotation, error_msg = load_quotation_base(enquiry_id)
+    except Exception as e: # e.g. Supabase not configured: regenerate in full
+        base_quotation, error_msg = None, f"{type(e).__name__}: {e}"
+    if error_msg:
+        print(f"[Quotation Patch] Could not load the latest quotation of enquiry {enquiry_id}: {error_msg}")
+    return base_quotation
+
+
+def generate_quotation(
+    enquiry_details: dict,
+    vendor_reply_text: str,
+    itinerary_text: str,
+    provider: str,
+    ai_conf: Any,
+    base_quotation: dict | None = None,
+    load_base: bool = False,
+    itinerary_id: str | None = None,
+    vendor_reply_id: str | None = None,
+    on_preview: Callable[[dict], None] | None = None,
+    cancel_event: threading.Event | None = None
+) -> tuple[bytes | None, dict | None]:
+    """
+    Patches the latest quotation (base_quotation, or loaded from Supabase with load_base) when
+    ai_conf.incremental_regeneration is on, it was made from the same itinerary and the vendor-reply
+    change allows it; otherwise, or if the patch fails, runs the full quotation graph.
+    Same (pdf_bytes, structured_data) contract as run_quotation_generation_graph.
+    """
+    if getattr(ai_conf, "incremental_regeneration", False):
+        if base_quotation is None and load_base:
+            base_quotation = _load_base_quotation(enquiry_details.get("id"))
+        if base_quotation and base_quotation.get("itinerary_id") == itinerary_id:
+            pdf_bytes, structured_data = patch_quotation(base_quotation, enquiry_details, vendor_reply_text, provider, ai_conf)
+            if is_storable_quotation(pdf_bytes, structured_data):
+                return pdf_bytes, structured_data
+            if structured_data is not None:
+                print(f"[Quotation Patch] Patch failed ({structured_data.get('type')}: {structured_data.get('error')}); regenerating in full.")
+
+    return run_quotation_generation_graph(
+        enquiry_details, vendor_reply_text, itinerary_text, provider, ai_conf,
+        on_preview=on_preview, vendor_reply_id=vendor_reply_id, cancel_event=cancel_event
+    )
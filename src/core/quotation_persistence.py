@@ -0,0 +1,125 @@
+# src/core/quotation_persistence.py
+"""
+Saving generated quotations outside the Streamlit UI: PDF/DOCX upload to the quotations bucket,
+the `quotations` row and the LLM call telemetry of the run, and loading the latest quotation back
+as the base of an incremental regeneration (src/core/quotation_patch.py). Used by the batch runner
+(src/core/batch_quotations.py) and the background job handlers (src/core/quotation_jobs.py).
+
+supabase_utils is imported inside the functions: it needs SUPABASE_URL/SUPABASE_KEY at import
+time, and the graph modules that import this one must stay importable without them.
+"""
+import uuid
+from datetime import datetime
+
+from src.utils.constants import BUCKET_QUOTATIONS
+
+MIN_VALID_PDF_BYTES = 1000 # Smaller outputs are treated as failed renders, as in Tab 3
+
+
+def quotation_storage_path(enquiry_id: str, file_kind: str = "PDF", extension: str = "pdf") -> str:
+    """Storage key of a new quotation file: <enquiry_id>/quotation_<KIND>_<timestamp>_<random>.<ext>."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{enquiry_id}/quotation_{file_kind}_{timestamp}_{uuid.uuid4().hex[:6]}.{extension}"
+
+
+def is_storable_quotation(pdf_bytes: bytes | None, structured_data: dict | None) -> bool:
+    """False for error documents: no PDF, a suspiciously small one, or structured data flagged with an error."""
+    return bool(pdf_bytes) and len(pdf_bytes) > MIN_VALID_PDF_BYTES and not (structured_data or {}).get("error")
+
+
+def save_quotation_pdf(
+    enquiry_id: str,
+    pdf_bytes: bytes,
+    structured_data: dict,
+    itinerary_used_id: str = None,
+    vendor_reply_used_id: str = None
+) -> tuple[dict | None, str | None]:
+    """
+    Uploads the PDF and inserts its `quotations` row. Returns (quotation_row, error_message).
+    Nothing is written to the table if the upload fails, so a retry does not leave a row without its PDF.
+    """
+    from src.utils.supabase_utils import upload_file_to_storage, add_quotation
+
+    storage_path, upload_err = upload_file_to_storage(
+        BUCKET_QUOTATIONS, quotation_storage_path(enquiry_id), pdf_bytes, "application/pdf"
+    )
+    if upload_err:
+        return None, f"PDF upload failed: {upload_err}"
+
+    quotation_row, db_err = add_quotation(
+        enquiry_id=enquiry_id,
+        structured_data_json=structured_data,
+        itinerary_used_id=itinerary_used_id,
+        vendor_reply_used_id=vendor_reply_used_id,
+        pdf_storage_path=storage_path,
+        docx_storage_path=None
+    )
+    if db_err:
+        return None, f"Saving quotation record failed: {db_err}"
+    return quotation_row, None
+
+
+def save_quotation_docx(
+    enquiry_id: str,
+    docx_bytes: bytes,
+    quotation_id: str | None = None,
+    structured_data: dict | None = None
+) -> tuple[str | None, str | None]:
+    """
+    Uploads the DOCX and links it to the quotation row `quotation_id`. Without one, a new row is
+    inserted for the DOCX alone. Returns (storage_path, error_message).
+    """
+    from src.utils.supabase_utils import upload_file_to_storage, add_quotation, update_quotation_storage_path
+
+    storage_path, upload_err = upload_file_to_storage(
+        BUCKET_QUOTATIONS, quotation_storage_path(enquiry_id, "DOCX", "docx"), docx_bytes,
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    )
+    if upload_err:
+        return None, f"DOCX upload failed: {upload_err}"
+
+    if quotation_id:
+        _, db_err = update_quotation_storage_path(quotation_id, 'docx_storage_path', storage_path)
+    else:
+        _, db_err = add_quotation(enquiry_id=enquiry_id, structured_data_json=structured_data or {},
+                                  docx_storage_path=storage_path)
+    if db_err:
+        return None, f"Saving DOCX path failed: {db_err}"
+    return storage_path, None
+
+
+def load_quotation_base(enquiry_id: str) -> tuple[dict | None, str | None]:
+    """
+    The enquiry's latest quotation with the vendor reply text it was generated from:
+    ({"quotation_id", "structured_data", "vendor_reply_text", "itinerary_id"}, error_message).
+    (None, None) when there is no such quotation, e.g. the latest row holds a DOCX only.
+    """
+    from src.utils.supabase_utils import get_quotation_by_enquiry_id, get_vendor_reply_by_id
+
+    quotation_row, db_err = get_quotation_by_enquiry_id(enquiry_id)
+    if db_err:
+        return None, db_err
+    if not quotation_row or not quotation_row.get("structured_data_json") or not quotation_row.get("vendor_reply_used_id"):
+        return None, None
+    vendor_reply_row, db_err = get_vendor_reply_by_id(quotation_row["vendor_reply_used_id"])
+    if db_err:
+        return None, db_err
+    if not vendor_reply_row or not vendor_reply_row.get("reply_text"):
+        return None, None
+    return {
+        "quotation_id": quotation_row.get("id"),
+        "structured_data": quotation_row["structured_data_json"],
+        "vendor_reply_text": vendor_reply_row["reply_text"],
+        "itinerary_id": quotation_row.get("itinerary_used_id"),
+    }, None
+
+
+def save_llm_calls(enquiry_id: str, calls: list[dict]):
+    """Saves captured LLM call telemetry for an enquiry. Failures are logged, never raised: telemetry must not block the workflow."""
+    if not enquiry_id or not calls:
+        return
+    from src.utils.supabase_utils import add_llm_calls
+
+    _, error_msg = add_llm_calls(enquiry_id, calls)
+    if error_msg:
+        print(f"QUOTATION_PERSISTENCE: Could not save {len(calls)} LLM call record(s) for enquiry {enquiry_id}: {error_msg}")
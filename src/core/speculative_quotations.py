@@ -0,0 +1,238 @@
+# src/core/speculative_quotations.py
+"""
+Speculative quotation pre-generation.
+
+Agents almost always click "Generate Quotation PDF" shortly after saving a vendor reply, so saving
+one (or saving a new itinerary in Tab 2) schedules a background run of the quotation graph with
+the session's AI config. The result is kept in a process-wide store under the same graph cache key
+Tab 3 computes for its button (ui_helpers.generate_graph_cache_key), so the click usually finds
+the quotation ready, or waits only for the rest of a run that is already under way.
+
+Speculative work is bounded:
+- one run per scope (the enquiry): scheduling new inputs cancels the previous run. A queued run is
+  dropped; a running one stops after its current node (see cancel_event in
+  run_quotation_generation_graph).
+- at most SPECULATIVE_QUOTATION_WORKERS runs at once and SPECULATIVE_QUOTATION_MAX_PENDING queued
+  or running.
+- at most SPECULATIVE_QUOTATION_TOKEN_BUDGET_PER_HOUR tokens per rolling hour, counted when runs
+  finish and checked when scheduling; beyond it nothing is scheduled and the button generates as
+  before.
+
+Runs patch the latest quotation instead when only prices, hotels or inclusions changed (see
+quotation_patch.generate_quotation). Failed runs are not stored. The button then generates in the foreground, and that run resumes
+from the speculative run's checkpoints.
+"""
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, CancelledError
+from typing import Any
+
+from src.core.quotation_patch import generate_quotation
+from src.core.quotation_persistence import is_storable_quotation, save_llm_calls
+from src.llm.telemetry import capture_llm_calls
+from src.utils.constants import (
+    SPECULATIVE_QUOTATION_WORKERS, SPECULATIVE_QUOTATION_MAX_PENDING,
+    SPECULATIVE_QUOTATION_TOKEN_BUDGET_PER_HOUR, SPECULATIVE_QUOTATION_RESULT_TTL_SECONDS
+)
+
+BUDGET_WINDOW_SECONDS = 3600
+
+
+class _SpeculativeJob:
+    def __init__(self, scope: str, cache_key: str):
+        self.scope = scope
+        self.cache_key = cache_key
+        self.cancel_event = threading.Event()
+        self.future: Future | None = None
+        self.finished_at: float | None = None
+
+
+class SpeculativeQuotationRunner:
+    """Background quotation runs keyed by graph cache key, shared by every session of the process."""
+
+    def __init__(
+        self,
+        max_workers: int = SPECULATIVE_QUOTATION_WORKERS,
+        max_pending: int = SPECULATIVE_QUOTATION_MAX_PENDING,
+        token_budget_per_hour: int = SPECULATIVE_QUOTATION_TOKEN_BUDGET_PER_HOUR,
+        result_ttl_seconds: float = SPECULATIVE_QUOTATION_RESULT_TTL_SECONDS,
+        save_calls: bool = True # False: no Supabase access at all (no telemetry, no base quotation to patch)
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max_pending
+        self.token_budget_per_hour = token_budget_per_hour
+        self.result_ttl_seconds = result_ttl_seconds
+        self.save_calls = save_calls
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._jobs: dict[str, _SpeculativeJob] = {} # cache_key -> job (queued, running or finished)
+        self._scopes: dict[str, str] = {} # scope -> cache_key of its latest job
+        self._spend: deque[tuple[float, int]] = deque() # (finished_at, tokens) of finished runs
+
+    def tokens_spent_last_hour(self) -> int:
+        with self._lock:
+            return self._tokens_spent_locked()
+
+    def _tokens_spent_locked(self) -> int:
+        cutoff = time.time() - BUDGET_WINDOW_SECONDS
+        while self._spend and self._spend[0][0] < cutoff:
+            self._spend.popleft()
+        return sum(tokens for _, tokens in self._spend)
+
+    def _is_expired(self, job: _SpeculativeJob) -> bool:
+        return job.finished_at is not None and job.finished_at < time.time() - self.result_ttl_seconds
+
+    def _drop_expired_locked(self):
+        for job in list(self._jobs.values()):
+            if self._is_expired(job):
+                self._forget_locked(job)
+
+    def _get_job_locked(self, cache_key: str) -> _SpeculativeJob | None:
+        """The job for cache_key, or None when there is none or its result is past result_ttl_seconds (then forgotten)."""
+        job = self._jobs.get(cache_key)
+        if job is not None and self._is_expired(job):
+            self._forget_locked(job)
+            return None
+        return job
+
+    def _forget_locked(self, job: _SpeculativeJob):
+        if self._jobs.get(job.cache_key) is job:
+            del self._jobs[job.cache_key]
+        if self._scopes.get(job.scope) == job.cache_key:
+            del self._scopes[job.scope]
+
+    def _cancel_locked(self, job: _SpeculativeJob):
+        job.cancel_event.set()
+        if job.future is not None and not job.future.cancel() and not job.future.done():
+            print(f"[Speculative Quotations] Stopping stale run for {job.scope} after its current node.")
+        self._forget_locked(job)
+
+    def schedule(
+        self,
+        scope: str,
+        cache_key: str,
+        enquiry_details: dict,
+        vendor_reply_text: str,
+        itinerary_text: str,
+        provider: str,
+        ai_conf: Any,
+        vendor_reply_id: str | None = None,
+        itinerary_id: str | None = None
+    ) -> bool:
+        """
+        Starts a background run for cache_key unless one exists already. Cancels the scope's run for
+        other inputs. Returns False when nothing was scheduled (duplicate, queue full or budget spent).
+        """
+        with self._lock:
+            self._drop_expired_locked()
+            previous_key = self._scopes.get(scope)
+            if previous_key and previous_key != cache_key and previous_key in self._jobs:
+                self._cancel_locked(self._jobs[previous_key])
+            if cache_key in self._jobs:
+                return False
+            active = sum(1 for job in self._jobs.values() if job.finished_at is None)
+            if active >= self.max_pending:
+                print(f"[Speculative Quotations] {active} run(s) pending, not scheduling {scope}.")
+                return False
+            spent = self._tokens_spent_locked()
+            if spent >= self.token_budget_per_hour:
+                print(f"[Speculative Quotations] Hourly token budget spent ({spent}/{self.token_budget_per_hour}), not scheduling {scope}.")
+                return False
+
+            job = _SpeculativeJob(scope, cache_key)
+            self._jobs[cache_key] = job
+            self._scopes[scope] = cache_key
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="speculative-quote")
+            # Copies: the session's AI config and enquiry dict may change while the run is queued
+            job.future = self._executor.submit(
+                self._run, job, dict(enquiry_details), vendor_reply_text, itinerary_text,
+                provider, ai_conf.model_copy(), vendor_reply_id, itinerary_id
+            )
+        print(f"[Speculative Quotations] Scheduled quotation for {scope} with {provider}.")
+        return True
+
+    def _run(self, job: _SpeculativeJob, enquiry_details: dict, vendor_reply_text: str, itinerary_text: str,
+             provider: str, ai_conf: Any, vendor_reply_id: str | None, itinerary_id: str | None) -> tuple[bytes, dict] | None:
+        result = None
+        try:
+            if job.cancel_event.is_set():
+                return None
+            with capture_llm_calls() as llm_calls:
+                pdf_bytes, structured_data = generate_quotation(
+                    enquiry_details, vendor_reply_text, itinerary_text, provider, ai_conf, load_base=self.save_calls,
+                    itinerary_id=itinerary_id, vendor_reply_id=vendor_reply_id, cancel_event=job.cancel_event
+                )
+            tokens = sum((c.get("prompt_tokens") or 0) + (c.get("completion_tokens") or 0)
+                         for c in llm_calls if not c.get("cache_hit"))
+            with self._lock:
+                self._spend.append((time.time(), tokens))
+            if self.save_calls:
+                save_llm_calls(enquiry_details.get("id"), llm_calls)
+
+            if is_storable_quotation(pdf_bytes, structured_data):
+                result = (pdf_bytes, structured_data)
+                print(f"[Speculative Quotations] Quotation for {job.scope} ready ({tokens} tokens).")
+            else:
+                print(f"[Speculative Quotations] Run for {job.scope} not kept: {(structured_data or {}).get('error')}")
+        except Exception as e: # Speculation must never surface errors: the button generates instead
+            print(f"[Speculative Quotations] Run for {job.scope} failed: {type(e).__name__}: {e}")
+        finally:
+            with self._lock:
+                job.finished_at = time.time()
+                if result is None:
+                    self._forget_locked(job)
+        return result
+
+    def cancel(self, scope: str, keep_key: str | None = None):
+        """Cancels the scope's run unless it is for keep_key (the inputs currently shown)."""
+        with self._lock:
+            cache_key = self._scopes.get(scope)
+            if cache_key and cache_key != keep_key and cache_key in self._jobs:
+                self._cancel_locked(self._jobs[cache_key])
+
+    def status(self, cache_key: str) -> str | None:
+        """"queued", "running", "ready" or None (no run for these inputs, or its result expired)."""
+        with self._lock:
+            job = self._get_job_locked(cache_key)
+        if job is None or job.future is None:
+            return None
+        if job.future.done():
+            return "ready"
+        return "running" if job.future.running() else "queued"
+
+    def take(self, cache_key: str) -> tuple[bytes, dict] | None:
+        """
+        The speculative (pdf_bytes, structured_data) for cache_key, waiting for a run in progress.
+        A run still queued is dropped instead, and the caller generates in the foreground.
+        Returns None when there is no usable result, or it is older than result_ttl_seconds.
+        """
+        with self._lock:
+            job = self._get_job_locked(cache_key)
+            if job is None or job.future is None:
+                return None
+            if job.future.cancel():
+                self._forget_locked(job)
+                return None
+        try:
+            result = job.future.result()
+        except CancelledError: # Cancelled by another session for newer inputs meanwhile
+            result = None
+        with self._lock:
+            self._forget_locked(job)
+        return result
+
+    def clear(self):
+        """Cancels every run and forgets every result (tests)."""
+        with self._lock:
+            for job in list(self._jobs.values()):
+                self._cancel_locked(job)
+            self._spend.clear()
+
+
+_runner = SpeculativeQuotationRunner()
+
+
+def get_speculative_quotation_runner() -> SpeculativeQuotationRunner:
+    return _runner
@@ -0,0 +1,146 @@
+# src/core/vendor_parse_memo.py
+"""
+Memo of the vendor reply parsing step (parse_vendor_reply_node).
+
+The parsed vendor reply depends only on the reply, the enquiry's destination and duration and the
+model that parsed it, so it is keyed by exactly those (and the parse format, VENDOR_PARSE_FORMAT): changing temperature, the structuring
+model, single/two-stage settings or regenerating the quotation reuses the stored parse and skips
+the first LLM hop. Parses are stored in the `vendor_reply_parses` table, next to the
+`vendor_replies` row they came from, so the memo survives restarts and is shared by every session
+and the batch runner. Each row keeps the compact text given to the structuring prompt and the
+ParsedVendorReply record itself (parsed_data), so prices, hotels and inclusions can be queried.
+
+Memo failures are logged and treated as a miss: the node then parses with the LLM as before.
+"""
+import os
+import json
+import hashlib
+import threading
+from typing import Any
+
+from src.llm.llm_providers import resolve_model_name
+from src.llm.model_router import routing_requested
+
+VENDOR_PARSE_STAGE = "parse_vendor_reply"
+VENDOR_PARSE_FORMAT = "record-v1" # ParsedVendorReply JSON; earlier prose parses are not reused
+
+
+class SupabaseVendorParseStore:
+    """Stores parses in the vendor_reply_parses table. Disables itself if Supabase is not configured."""
+
+    def __init__(self):
+        self._available = True
+
+    def _utils(self):
+        if not self._available:
+            return None
+        try:
+            # Imported lazily: supabase_utils raises at import time without SUPABASE_URL/SUPABASE_KEY.
+            from src.utils import supabase_utils
+            return supabase_utils
+        except Exception as e:
+            self._available = False
+            print(f"VENDOR_PARSE_MEMO: Supabase unavailable, memo disabled for this process: {e}")
+            return None
+
+    def get(self, memo_key: str) -> dict | None:
+        utils = self._utils()
+        if utils is None:
+            return None
+        row, error_msg = utils.get_vendor_reply_parse(memo_key)
+        if error_msg:
+            print(f"VENDOR_PARSE_MEMO: Lookup failed, treating as miss: {error_msg}")
+            return None
+        return {"parsed_text": row["parsed_text"], "parsed_data": row.get("parsed_data")} if row and row.get("parsed_text") else None
+
+    def put(self, memo_key: str, parse_model: str, parsed_text: str, vendor_reply_id: str | None = None,
+            parsed_data: dict | None = None):
+        utils = self._utils()
+        if utils is None:
+            return
+        _, error_msg = utils.add_vendor_reply_parse(memo_key, parse_model, parsed_text, vendor_reply_id=vendor_reply_id,
+                                                    parsed_data=parsed_data)
+        if error_msg:
+            print(f"VENDOR_PARSE_MEMO: Write failed, parse not memoized: {error_msg}")
+
+
+class InMemoryVendorParseStore:
+    """Process-local store with the same interface (tests, or running without Supabase)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows: dict[str, dict] = {}
+
+    def get(self, memo_key: str) -> dict | None:
+        with self._lock:
+            row = self.rows.get(memo_key)
+        return {"parsed_text": row["parsed_text"], "parsed_data": row["parsed_data"]} if row else None
+
+    def put(self, memo_key: str, parse_model: str, parsed_text: str, vendor_reply_id: str | None = None,
+            parsed_data: dict | None = None):
+        with self._lock:
+            self.rows[memo_key] = {"parse_model": parse_model, "parsed_text": parsed_text, "vendor_reply_id": vendor_reply_id,
+                                   "parsed_data": parsed_data}
+
+
+_memo_enabled = os.getenv("VENDOR_PARSE_MEMO_ENABLED", "true").lower() == "true"
+_memo_store: Any = SupabaseVendorParseStore()
+
+
+def configure_vendor_parse_memo(store: Any = None, enabled: bool | None = None) -> Any:
+    """Swaps the process-wide store or toggles the memo (e.g. disabled or in-memory in tests)."""
+    global _memo_store, _memo_enabled
+    if store is not None:
+        _memo_store = store
+    if enabled is not None:
+        _memo_enabled = enabled
+    return _memo_store
+
+
+def vendor_parse_memo_enabled() -> bool:
+    return _memo_enabled
+
+
+def parse_model_id(provider: str, ai_conf: Any) -> str:
+    """
+    The model that parses the reply: 'provider/model', or 'routed/<provider>' when the model router
+    picks it per call (any routed parse is reused). Temperature is deliberately not part of it.
+    """
+    if routing_requested(VENDOR_PARSE_STAGE, ai_conf):
+        return f"routed/{provider}"
+    return f"{provider}/{resolve_model_name(provider, ai_conf.selected_model_for_provider)}"
+
+
+def vendor_parse_memo_key(vendor_reply_text: str, destination: Any, num_days: Any, parse_model: str) -> str:
+    key_material = json.dumps({
+        "vendor_reply_sha256": hashlib.sha256((vendor_reply_text or "").encode("utf-8")).hexdigest(),
+        "destination": destination,
+        "num_days": num_days,
+        "parse_model": parse_model,
+        "parse_format": VENDOR_PARSE_FORMAT,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+
+def lookup_parsed_vendor_reply(memo_key: str, ai_conf: Any) -> dict | None:
+    """
+    The memoized parse ({"parsed_text", "parsed_data"}), or None on a miss.
+    "Bypass response cache" also skips the memo.
+    """
+    if not _memo_enabled or getattr(ai_conf, "bypass_response_cache", False):
+        return None
+    try:
+        return _memo_store.get(memo_key)
+    except Exception as e:
+        print(f"VENDOR_PARSE_MEMO: Lookup failed, treating as miss: {e}")
+        return None
+
+
+def remember_parsed_vendor_reply(memo_key: str, parse_model: str, parsed_text: str, vendor_reply_id: str | None = None,
+                                 parsed_data: dict | None = None):
+    if not _memo_enabled:
+        return
+    try:
+        _memo_store.put(memo_key, parse_model, parsed_text, vendor_reply_id=vendor_reply_id, parsed_data=parsed_data)
+    except Exception as e:
+        print(f"VENDOR_PARSE_MEMO: Write failed, parse not memoized: {e}")
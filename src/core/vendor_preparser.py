@@ -0,0 +1,282 @@
+# src/core/vendor_preparser.py
+"""
+Rule-based vendor reply pre-parser, run in front of the parsing LLM call (parse_vendor_reply_node).
+
+Most vendors send templated emails: "Package cost INR 45,000 per person", "Hotels: A (2N), B (2N)",
+"Inclusions:" / "Exclusions:" lists, "Day 1: ..." lines. preparse_vendor_reply reads those with
+compiled regular expressions into the same ParsedVendorReply record the LLM produces, and scores
+how much of the reply it understood:
+
+- price: one unambiguous amount with its currency (and per-person/total basis) scores highest;
+  several different amounts (room categories, child prices) or no price at all score low, so the
+  LLM reads those replies.
+- hotels: from a labelled line ("Hotels:", "Stay:", "Accommodation:") or "N nights at ..." bullets;
+  hotel-like names found elsewhere in a sentence count less.
+- coverage: the share of the reply's content lines (after greetings, signatures, quoted threads and
+  disclaimers are removed) that some rule explained.
+
+At or above VENDOR_PREPARSE_CONFIDENCE_THRESHOLD the record replaces the LLM call. Below it the
+node parses with the LLM as before. benchmarks/bench_vendor_preparser.py reports the hit rate and
+the agreement with the LLM parser on a corpus of recorded replies.
+"""
+import os
+import re
+from typing import Any
+
+from src.llm.token_budget import strip_boilerplate
+from src.models import ParsedVendorReply
+
+PREPARSER_VERSION = "rules/v1" # Recorded in generation_metadata["vendor_preparse"]; bump when the rules change
+
+_preparser_enabled = os.getenv("VENDOR_PREPARSE_ENABLED", "true").lower() == "true"
+_confidence_threshold = float(os.getenv("VENDOR_PREPARSE_CONFIDENCE_THRESHOLD", "0.8"))
+
+PRICE_WEIGHT, HOTELS_WEIGHT, COVERAGE_WEIGHT = 0.4, 0.3, 0.3
+
+_CURRENCY_CODES = {"INR": "INR", "RS": "INR", "RS.": "INR", "₹": "INR", "USD": "USD", "$": "USD", "EUR": "EUR",
+                   "€": "EUR", "GBP": "GBP", "£": "GBP", "AED": "AED", "SGD": "SGD", "THB": "THB"}
+_CURRENCY = r"(?:INR|USD|EUR|GBP|AED|SGD|THB|Rs\.?|₹|\$|€|£)"
+_NUMBER = r"\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+_AMOUNT = re.compile(rf"(?P<currency>{_CURRENCY})\s?(?P<amount>{_NUMBER})\b|\b(?P<amount_first>{_NUMBER})\s?(?P<currency_after>INR|USD|EUR|GBP|AED|SGD|THB)\b",
+                     re.IGNORECASE)
+_PER_PERSON = re.compile(r"\b(?:per person|per head|per pax|per adult|pp|p\.p\.)\b", re.IGNORECASE)
+_TOTAL = re.compile(r"\b(?:total|for the (?:couple|family|group)|for (?:all|both)|for \d+ (?:pax|adults|people|persons|travell?ers))\b", re.IGNORECASE)
+_PAX = re.compile(r"\b(?:family of \d+(?:\s*\([^)]*\))?|\d+\s*(?:adults?|pax|people|persons|travell?ers|guests)(?:,?\s*(?:and\s*)?\d+\s*(?:kids?|child(?:ren)?))?|couple)\b",
+                  re.IGNORECASE)
+
+_HOTEL_LABEL = re.compile(r"^(?:hotels?|hotel details|stay|accommodation|accommodations)\s*:\s*(?P<rest>.+)$", re.IGNORECASE)
+_HOTEL_KEYWORD = r"(?:Hotel|Resort|Inn|Villa|Palace|Retreat|Haveli|Bhawan|Lodge|Suites?|Homestay|Residency|Camp|Houseboat|Spa)"
+# "Samode Haveli Hotel Jaipur": one capitalised word after a name ending in the keyword is the city.
+# "Hotel Royal Saigon" and "Vivanta Dal View Srinagar" are kept whole: the city cannot be told apart.
+_HOTEL_NAME = re.compile(rf"^(?P<name>.*?\S\s+{_HOTEL_KEYWORD})(?:\s+(?P<city>[A-Z][a-z]+))?$")
+_HOTEL_IN_TEXT = re.compile(rf"\b((?:[A-Z][\w&'-]*\s+)+{_HOTEL_KEYWORD}\b|{_HOTEL_KEYWORD}(?:\s+[A-Z][\w'-]*)+)")
+_ROOM_TYPE = re.compile(r"^(?:[A-Z][\w-]*\s+)*(?:Villa|Suite|Room|Cottage|Chalet|Tent)s?$")
+_NIGHTS_AT = re.compile(r"^(?P<nights>\d+)\s*(?:nights?|N)\s+(?:at|in)\s+(?P<rest>.+)$", re.IGNORECASE)
+_NIGHTS = re.compile(r"^\(?(?P<nights>\d+)\s*(?:nights?|N)\)?$", re.IGNORECASE)
+_NIGHTS_SUFFIX = re.compile(r"\s*\((?P<nights>\d+)\s*(?:nights?|N)\)", re.IGNORECASE)
+_PARENTHETICAL = re.compile(r"\s*\((?P<text>[^)]*)\)")
+_MEAL_PLAN = re.compile(r"\b(?:(?P<code>CP|MAP|AP|EP)\b(?:\s*\((?P<detail>[^)]*)\))?|with (?P<meals>breakfast(?: and dinner)?|half board|full board|all meals))")
+_ROOMS = re.compile(r"\b(?:twin|double|triple|single) sharing\b|\b\d+\s+(?:double|twin|triple|single|family)\s+rooms?\b", re.IGNORECASE)
+
+_INCLUSIONS_HEADER = re.compile(r"^(?:inclusions?|included|includes|including|package includes|the package includes)\b\s*:?\s*(?P<rest>.*)$", re.IGNORECASE)
+_EXCLUSIONS_HEADER = re.compile(r"^(?:exclusions?|excluded|excludes|excluding|not included|does not include|doesn't include|package excludes)\b\s*:?\s*(?P<rest>.*)$", re.IGNORECASE)
+_INLINE_INCLUDING = re.compile(r",?\s*\b(?:including|inclusive of)\s+(?P<items>.+?)\.?$", re.IGNORECASE)
+_INLINE_ITEM_MAX_WORDS = 6 # Longer "items" are a sentence running on, not a list
+_INLINE_INCLUDED = re.compile(r",\s*(?P<items>[^,]+?)\s+included\b", re.IGNORECASE)
+_TABLE_ROW = re.compile(r"^\|(?P<cells>.+)\|?$")
+_BULLET = re.compile(r"^(?:[-*•]|\d+[.)])\s+(?P<item>.+)$")
+_DAY = re.compile(r"^(?:[-*•]\s*)?day\s*(?P<day>\d+)\s*[:.\-–]\s*(?P<summary>.+)$", re.IGNORECASE)
+_ROUTE = re.compile(r"^(?:itinerary|route|tour flow)\s*:", re.IGNORECASE)
+_GREETING = re.compile(r"^(?:dear|hi|hello|hey|greetings|good (?:morning|afternoon|evening)|thanks|thank you|many thanks)\b", re.IGNORECASE)
+_INTRO = re.compile(r":\s*$") # "Please find our best offer for 2 adults:"
+
+
+def configure_vendor_preparser(enabled: bool | None = None, confidence_threshold: float | None = None):
+    """Toggles the pre-parser or changes its threshold (e.g. disabled in tests that count LLM calls)."""
+    global _preparser_enabled, _confidence_threshold
+    if enabled is not None:
+        _preparser_enabled = enabled
+    if confidence_threshold is not None:
+        _confidence_threshold = confidence_threshold
+
+
+def vendor_preparser_enabled() -> bool:
+    return _preparser_enabled
+
+
+def vendor_preparse_threshold() -> float:
+    return _confidence_threshold
+
+
+def _split_items(text: str) -> list[str]:
+    items = [item.strip(" .;") for item in re.split(r"[;,]", text)]
+    return [item for item in items if item]
+
+
+def _amounts(line: str) -> list[tuple[str, str]]:
+    """(currency code, amount) pairs in a line."""
+    found = []
+    for match in _AMOUNT.finditer(line):
+        currency = match.group("currency") or match.group("currency_after")
+        amount = match.group("amount") or match.group("amount_first")
+        found.append((_CURRENCY_CODES.get(currency.upper(), currency.upper()), amount))
+    return found
+
+
+def _hotel_entry(text: str, nights: str | None = None) -> dict | None:
+    """{"name", "city", "nights", "category"} of a hotel mention such as "Spice Village Resort (2N)"."""
+    nights_match = _NIGHTS_SUFFIX.search(text)
+    if nights_match:
+        nights = nights_match.group("nights")
+        text = text[:nights_match.start()] + text[nights_match.end():]
+    category = None
+    parenthetical = _PARENTHETICAL.search(text)
+    if parenthetical:
+        category = parenthetical.group("text").strip() or None
+        text = text[:parenthetical.start()] + text[parenthetical.end():]
+    text = re.sub(r"\s+with\s+.+$", "", text).strip(" .")
+    if not text or not text[0].isupper():
+        return None
+    match = _HOTEL_NAME.match(text)
+    name, city = (match.group("name"), match.group("city")) if match else (text, None)
+    return {"name": name.strip(), "city": city, "nights": nights, "category": category}
+
+
+def _labelled_hotels(rest: str) -> tuple[list[dict], str | None, str | None]:
+    """Hotels, meal plan and room configuration of a "Hotels:" / "Stay:" line."""
+    hotels, meal_plan = [], None
+    meal_match = _MEAL_PLAN.search(rest)
+    if meal_match:
+        meal_plan = _meal_plan_text(meal_match)
+    rooms = _ROOMS.search(rest)
+    for item in re.split(r",|;|\s+and\s+(?=[A-Z])", rest):
+        item = item.strip(" .")
+        if not item:
+            continue
+        nights = _NIGHTS.match(item)
+        if nights:
+            if hotels and not hotels[-1]["nights"]:
+                hotels[-1]["nights"] = nights.group("nights")
+            continue
+        if _MEAL_PLAN.fullmatch(item) or (meal_match and item.startswith(meal_match.group(0))):
+            continue
+        if hotels and _ROOM_TYPE.match(item): # "Kurumba Resort (3N), Beach Villa, AP"
+            hotels[-1]["category"] = hotels[-1]["category"] or item
+            continue
+        hotel = _hotel_entry(item)
+        if hotel:
+            hotels.append(hotel)
+    return hotels, meal_plan, rooms.group(0) if rooms else None
+
+
+def _table_row_hotels(cells: list[str]) -> tuple[list[dict], bool]:
+    """(hotels, whether the row was understood) of a "| Hotel | Nights | Price |" table row."""
+    nights = next((cell for cell in cells if cell.isdigit()), None)
+    hotels = [hotel for cell in cells if _HOTEL_NAME.match(cell) and (hotel := _hotel_entry(cell, nights))]
+    is_header = all(not any(char.isdigit() for char in cell) and len(cell.split()) <= 2 for cell in cells)
+    return hotels, bool(hotels) or is_header
+
+
+def _inline_items(text: str) -> list[str]:
+    items = _split_items(re.sub(r"\s+and\s+", ", ", text))
+    return [item for item in items if len(item.split()) <= _INLINE_ITEM_MAX_WORDS]
+
+
+def _meal_plan_text(match: re.Match) -> str:
+    if match.group("code"):
+        return f"{match.group('code')} ({match.group('detail')})" if match.group("detail") else match.group("code")
+    return match.group("meals")
+
+
+def preparse_vendor_reply(vendor_reply_text: str) -> tuple[ParsedVendorReply, float]:
+    """
+    (record, confidence between 0 and 1) read from the reply with the rules above. The record holds
+    only what the rules found; use it instead of the LLM parse when confidence is high enough.
+    """
+    values: dict[str, Any] = {"hotels": [], "inclusions": [], "exclusions": [], "itinerary_days": []}
+    amounts, bases, fallback_hotels = [], set(), []
+    labelled_hotels = False
+    content_lines = explained_lines = 0
+    section = None
+
+    for raw_line in strip_boilerplate(vendor_reply_text or "").splitlines():
+        line = raw_line.strip()
+        if not line:
+            section = None
+            continue
+        if _GREETING.match(line) and not _AMOUNT.search(line):
+            pax = _PAX.search(line)
+            if pax and not values.get("pax_basis"):
+                values["pax_basis"] = pax.group(0)
+            continue
+        content_lines += 1
+        explained = False
+        bullet = _BULLET.match(line)
+        day = _DAY.match(line)
+
+        if day:
+            values["itinerary_days"].append({"day": day.group("day"), "summary": day.group("summary").strip()})
+            explained, section = True, None
+        elif bullet and section in ("inclusions", "exclusions"):
+            values[section].append(bullet.group("item").strip(" ."))
+            explained = True
+        elif (header := _EXCLUSIONS_HEADER.match(line)) or (header := _INCLUSIONS_HEADER.match(line)):
+            section = "exclusions" if header.re is _EXCLUSIONS_HEADER else "inclusions"
+            values[section] += _split_items(header.group("rest"))
+            explained = True
+        elif (nights_at := _NIGHTS_AT.match(bullet.group("item") if bullet else line)):
+            hotel = _hotel_entry(nights_at.group("rest"), nights_at.group("nights"))
+            if hotel:
+                values["hotels"].append(hotel)
+                labelled_hotels = explained = True
+        elif (label := _HOTEL_LABEL.match(line)):
+            hotels, meal_plan, rooms = _labelled_hotels(label.group("rest"))
+            values["hotels"] += hotels
+            values["meal_plan"] = values.get("meal_plan") or meal_plan
+            values["room_configuration"] = values.get("room_configuration") or rooms
+            labelled_hotels = labelled_hotels or bool(hotels)
+            explained = bool(hotels)
+        elif (row := _TABLE_ROW.match(line)):
+            hotels, explained = _table_row_hotels([cell.strip() for cell in row.group("cells").split("|") if cell.strip()])
+            values["hotels"] += hotels
+            labelled_hotels = labelled_hotels or bool(hotels)
+        elif _ROUTE.match(line):
+            explained = True # "Itinerary: Jaipur (2N) - Jodhpur (2N)": the day lines follow
+        if not bullet:
+            section = section if explained and section and not _AMOUNT.search(line) else None
+
+        line_amounts = _amounts(line)
+        if line_amounts:
+            amounts += line_amounts
+            if _PER_PERSON.search(line):
+                bases.add("per person")
+            elif _TOTAL.search(line):
+                bases.add("total")
+            if (including := _INLINE_INCLUDING.search(line)):
+                values["inclusions"] += _inline_items(including.group("items"))
+            elif (included := _INLINE_INCLUDED.search(line)):
+                values["inclusions"].append(included.group("items").strip())
+            explained = True
+        for pattern, key in ((_PAX, "pax_basis"), (_ROOMS, "room_configuration")):
+            match = pattern.search(line)
+            if match and not values.get(key):
+                values[key] = match.group(0)
+                explained = explained or bool(_INTRO.search(line))
+        if (meal := _MEAL_PLAN.search(line)) and not values.get("meal_plan"):
+            values["meal_plan"] = _meal_plan_text(meal)
+        if not explained:
+            fallback_hotels += [name.strip() for name in _HOTEL_IN_TEXT.findall(line)]
+            explained = bool(_INTRO.search(line)) # An introduction to the list or details below it
+        explained_lines += explained
+
+    distinct_amounts = list(dict.fromkeys(amounts))
+    if len(distinct_amounts) == 1:
+        values["currency"], values["price"] = distinct_amounts[0]
+        price_score = 1.0 if len(bases) == 1 else 0.7
+        if len(bases) == 1:
+            values["price_basis"] = bases.pop()
+    else:
+        price_score = 0.3 if distinct_amounts else 0.0 # Several prices are ambiguous; none may be hidden in prose
+    if not values["hotels"] and fallback_hotels:
+        values["hotels"] = [hotel for name in dict.fromkeys(fallback_hotels) if (hotel := _hotel_entry(name))]
+    hotels_score = 1.0 if labelled_hotels else (0.6 if values["hotels"] else 0.0)
+    coverage = explained_lines / content_lines if content_lines else 0.0
+
+    confidence = PRICE_WEIGHT * price_score + HOTELS_WEIGHT * hotels_score + COVERAGE_WEIGHT * coverage
+    record = ParsedVendorReply.model_validate({key: value or None for key, value in values.items()})
+    return record, round(confidence, 3)
+
+
+def confident_vendor_preparse(vendor_reply_text: str) -> tuple[ParsedVendorReply | None, float | None]:
+    """
+    (record, confidence) when the pre-parser is enabled and confident enough to skip the LLM,
+    (None, confidence) when it is not, and (None, None) when it is disabled.
+    """
+    if not _preparser_enabled:
+        return None, None
+    try:
+        record, confidence = preparse_vendor_reply(vendor_reply_text)
+    except Exception as e: # A rule bug must never fail the graph: the LLM parses instead
+        print(f"VENDOR_PREPARSER: Pre-parse failed, using the LLM: {type(e).__name__}: {e}")
+        return None, 0.0
+    return (record if confidence >= _confidence_threshold else None), confidence
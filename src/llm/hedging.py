@@ -0,0 +1,186 @@
+# src/llm/hedging.py
+"""
+Hedged ("first response wins") racing of two LLM providers.
+
+The primary provider is started immediately. If it has not produced a valid answer
+within the hedge delay (by default the primary's observed p95 latency), the backup
+provider is started as well. The first valid response wins and the other request is
+cancelled. Winners and estimated latency savings are recorded in module-level stats.
+"""
+import os
+import time
+import asyncio
+import threading
+import concurrent.futures
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable
+
+from src.utils.constants import LLM_REQUEST_TIMEOUT_SECONDS
+
+HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", "4.0"))
+HEDGE_BRIDGE_TIMEOUT_MARGIN_SECONDS = 30.0 # On top of the request timeout: hedge delay, rate-limit waits, continuations
+HEDGE_MIN_SAMPLES_FOR_P95 = 5
+LATENCY_WINDOW_SIZE = 200
+
+
+class InvalidLLMResponse(Exception):
+    """Raised by a hedge leg whose response failed validation, so the other leg can still win."""
+
+
+class ProviderLatencyTracker:
+    """Keeps a sliding window of observed call latencies per (provider, model)."""
+
+    def __init__(self, window_size: int = LATENCY_WINDOW_SIZE):
+        self._lock = threading.Lock()
+        self._samples: dict[tuple[str, str], deque] = defaultdict(lambda: deque(maxlen=window_size))
+
+    def record(self, provider: str, model: str | None, latency_seconds: float):
+        with self._lock:
+            self._samples[(provider, model or "")].append(latency_seconds)
+
+    def percentile(self, provider: str, model: str | None, pct: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples.get((provider, model or ""), ()))
+        if len(samples) < HEDGE_MIN_SAMPLES_FOR_P95:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def expected_remaining(self, provider: str, model: str | None, elapsed_seconds: float) -> float:
+        """Mean remaining latency of historical calls that took longer than `elapsed_seconds`."""
+        with self._lock:
+            slower = [s for s in self._samples.get((provider, model or ""), ()) if s > elapsed_seconds]
+        if not slower:
+            return 0.0
+        return sum(slower) / len(slower) - elapsed_seconds
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+latency_tracker = ProviderLatencyTracker()
+
+_stats_lock = threading.Lock()
+_hedge_stats = {"hedged_calls": 0, "backup_started": 0, "wins": defaultdict(int), "latency_saved_seconds": 0.0}
+
+
+def get_hedge_stats() -> dict:
+    with _stats_lock:
+        return {
+            "hedged_calls": _hedge_stats["hedged_calls"],
+            "backup_started": _hedge_stats["backup_started"],
+            "wins": dict(_hedge_stats["wins"]),
+            "latency_saved_seconds": round(_hedge_stats["latency_saved_seconds"], 3),
+        }
+
+
+def hedge_delay_for(provider: str, model: str | None, configured_delay: float | None) -> float:
+    """Configured delay if set, otherwise the primary's p95 latency, otherwise the default."""
+    if configured_delay is not None:
+        return configured_delay
+    p95 = latency_tracker.percentile(provider, model, 95)
+    return p95 if p95 is not None else HEDGE_DEFAULT_DELAY_SECONDS
+
+
+async def ahedged_race(
+    leg_factory: Callable[[str, Any], Awaitable[Any]],
+    primary: tuple[str, Any],
+    backup: tuple[str, Any],
+    delay_seconds: float,
+    primary_model: str | None = None,
+) -> tuple[Any, dict]:
+    """
+    Races leg_factory(provider, ai_conf) for the primary and (after delay_seconds) the backup.
+    Returns (response, hedge_info). Raises the primary's exception if both legs fail.
+    """
+    primary_provider, primary_conf = primary
+    backup_provider, backup_conf = backup
+    start = time.perf_counter()
+
+    primary_task = asyncio.create_task(leg_factory(primary_provider, primary_conf))
+    task_roles = {primary_task: "primary"}
+    errors: dict[str, BaseException] = {}
+    backup_started = False
+
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=delay_seconds)
+        pending = {primary_task} - done
+
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    winner_role = task_roles[task]
+                    winner = primary_provider if winner_role == "primary" else backup_provider
+                    elapsed = time.perf_counter() - start
+                    saved = 0.0
+                    if winner_role == "backup":
+                        # The primary was cancelled; estimate how long it would still have taken.
+                        saved = latency_tracker.expected_remaining(primary_provider, primary_model, elapsed)
+                    info = {
+                        "primary": primary_provider,
+                        "backup": backup_provider,
+                        "delay_seconds": round(delay_seconds, 3),
+                        "backup_started": backup_started,
+                        "winner": winner,
+                        "winner_role": winner_role,
+                        "latency_saved_seconds": round(saved, 3),
+                        "elapsed_seconds": round(elapsed, 3),
+                    }
+                    with _stats_lock:
+                        _hedge_stats["hedged_calls"] += 1
+                        _hedge_stats["backup_started"] += int(backup_started)
+                        _hedge_stats["wins"][winner] += 1
+                        _hedge_stats["latency_saved_seconds"] += saved
+                    print(f"HEDGING: {winner_role} ({winner}) won after {elapsed:.2f}s (backup started: {backup_started}, est. saved: {saved:.2f}s)")
+                    return task.result(), info
+                errors[task_roles[task]] = task.exception()
+                print(f"HEDGING: {task_roles[task]} leg failed: {type(task.exception()).__name__} - {task.exception()}")
+
+            if not backup_started:
+                # Primary is slow (delay elapsed) or already failed: start the backup now.
+                backup_started = True
+                backup_task = asyncio.create_task(leg_factory(backup_provider, backup_conf))
+                task_roles[backup_task] = "backup"
+                pending.add(backup_task)
+
+            if not pending:
+                with _stats_lock:
+                    _hedge_stats["hedged_calls"] += 1
+                    _hedge_stats["backup_started"] += int(backup_started)
+                raise errors.get("primary") or errors["backup"]
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Cancels the losing leg (and both legs if the caller itself is cancelled).
+        for task in task_roles:
+            if not task.done():
+                task.cancel()
+
+
+# --- Sync bridge ---
+# Sync callers (Streamlit script threads, sync graph nodes) run hedged races on one long-lived
+# background loop, so pooled clients' async HTTP connections always live on the same loop.
+_bridge_loop: asyncio.AbstractEventLoop | None = None
+_bridge_lock = threading.Lock()
+
+
+def run_coroutine_sync(coro: Awaitable[Any], timeout: float | None = None) -> Any:
+    """
+    Runs coro on the bridge loop and returns its result. After timeout seconds (default: the request
+    timeout plus HEDGE_BRIDGE_TIMEOUT_MARGIN_SECONDS) the coroutine is cancelled and TimeoutError raised,
+    so a hung provider cannot block the calling thread forever.
+    """
+    global _bridge_loop
+    with _bridge_lock:
+        if _bridge_loop is None:
+            _bridge_loop = asyncio.new_event_loop()
+            threading.Thread(target=_bridge_loop.run_forever, name="llm-hedge-loop", daemon=True).start()
+    if timeout is None:
+        timeout = LLM_REQUEST_TIMEOUT_SECONDS + HEDGE_BRIDGE_TIMEOUT_MARGIN_SECONDS
+    future = asyncio.run_coroutine_threadsafe(coro, _bridge_loop)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel() # Cancels the race task; its finally block cancels both legs
+        raise TimeoutError(f"Hedged LLM call did not finish within {timeout:g}s.")
@@ -0,0 +1,628 @@
+# src/llm/llm_invocation.py
+"""
+Single entry point for the LLM calls made by the core generators.
+
+Call sites hand over the prompt (or a per-provider prompt spec), the prompt inputs,
+the provider and the AI config. This module builds the pooled chain, times the call,
+and applies cross-cutting behaviour: stage-aware model routing, context-window budgeting,
+the persistent response cache, retries with per-provider circuit breakers, per-provider
+adaptive rate limiting, hedged multi-provider requests, max_tokens sizing with continuation of
+truncated answers, and per-call telemetry.
+Every call returns (response, call_info) where call_info describes what actually ran
+(queue time, time to first token, latency, tokens and estimated cost); it is also recorded
+with telemetry.record_llm_call so the UI can persist it against the enquiry.
+"""
+import os
+import re
+import time
+from typing import Any, Callable, Iterator, Union
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from src.llm.llm_providers import get_llm_chain, aget_llm_chain, resolve_model_name, ensure_provider_configured
+from src.llm.response_cache import (
+    get_cached_response, put_cached_response, response_cache_enabled, response_cache_key
+)
+from src.llm.rate_limiter import call_with_rate_limit, acall_with_rate_limit, stream_with_rate_limit
+from src.llm.hedging import (
+    InvalidLLMResponse, ahedged_race, hedge_delay_for, latency_tracker, run_coroutine_sync
+)
+from src.llm.telemetry import LLMCallTelemetry, record_llm_call, with_cost
+from src.llm.token_budget import (
+    ContextBudgetExceeded, count_tokens, fit_inputs_to_context, output_reservation_for, sized_max_tokens
+)
+from src.llm.model_router import model_health, route, routed_ai_conf, routing_requested
+from src.llm.llm_resilience import call_with_retry, acall_with_retry, stream_with_retry
+from src.llm.llm_prompts import CONTINUATION_PROMPT_TEMPLATE_STRING
+
+# A prompt is either a template string or a callable (provider, ai_conf) -> (template_str, get_llm_chain kwargs),
+# for call sites whose prompt or output parser depends on the provider.
+PromptSpec = Union[str, Callable[[str, Any], tuple[str, dict]]]
+# Ordered (input name, "truncate" | "boilerplate") pairs, lowest priority first; see token_budget.
+TrimmableInputs = tuple[tuple[str, str], ...]
+
+# Follow-up requests allowed per call to resume a text answer that stopped at the output limit (0 disables)
+LLM_MAX_CONTINUATIONS = int(os.getenv("LLM_MAX_CONTINUATIONS", "2"))
+# A continuation starting with at least this many characters of the partial answer's end is de-duplicated
+CONTINUATION_MIN_OVERLAP_CHARS = 8
+CONTINUATION_MAX_OVERLAP_CHARS = 500
+
+
+def is_non_empty_text(response: Any) -> bool:
+    return isinstance(response, str) and bool(response.strip())
+
+
+def _prompt_spec_for(prompt: PromptSpec, provider: str, ai_conf: Any) -> tuple[str, dict]:
+    if callable(prompt):
+        return prompt(provider, ai_conf)
+    return prompt, {}
+
+
+def _prepare_call(prompt: PromptSpec, inputs: dict, provider: str, ai_conf: Any,
+                  trimmable_inputs: TrimmableInputs) -> tuple[str, dict, dict, dict]:
+    """(prompt_str, chain_kwargs, inputs fitted to the model's context window, token budget report)."""
+    prompt_str, chain_kwargs = _prompt_spec_for(prompt, provider, ai_conf)
+    model = resolve_model_name(provider, ai_conf.selected_model_for_provider)
+    fitted_inputs, budget_report = fit_inputs_to_context(
+        prompt_str, inputs, model, output_reservation_for(ai_conf), trimmable_inputs
+    )
+    return prompt_str, chain_kwargs, fitted_inputs, budget_report
+
+
+def _sized_ai_conf(ai_conf: Any, provider: str, expected_output_tokens: int | None) -> Any:
+    """ai_conf with max_tokens sized for an answer of about `expected_output_tokens`, unless the user set max_tokens."""
+    if not expected_output_tokens or getattr(ai_conf, "max_tokens", None) is not None:
+        return ai_conf
+    model = resolve_model_name(provider, ai_conf.selected_model_for_provider)
+    return ai_conf.model_copy(update={"max_tokens": sized_max_tokens(expected_output_tokens, model)})
+
+
+def hedging_requested(provider: str, ai_conf: Any) -> bool:
+    backup_provider = getattr(ai_conf, "hedge_backup_provider", None)
+    backup_model = getattr(ai_conf, "hedge_backup_model", None)
+    if not getattr(ai_conf, "hedging_enabled", False) or not backup_provider:
+        return False
+    # Hedging against the exact same provider/model would only double the spend.
+    return (backup_provider, backup_model) != (provider, ai_conf.selected_model_for_provider)
+
+
+def _backup_ai_conf(ai_conf: Any) -> Any:
+    return ai_conf.model_copy(update={
+        "selected_ai_provider": ai_conf.hedge_backup_provider,
+        "selected_model_for_provider": ai_conf.hedge_backup_model,
+    })
+
+
+def _call_info(stage: str, provider: str, ai_conf: Any, metrics: dict) -> dict:
+    return {
+        "stage": stage,
+        "provider": provider,
+        "model": resolve_model_name(provider, ai_conf.selected_model_for_provider),
+        **metrics,
+    }
+
+
+def _call_metrics(telemetry: LLMCallTelemetry, queue_seconds: float, latency_seconds: float) -> dict:
+    return {
+        "queue_seconds": round(max(0.0, queue_seconds), 3),
+        "latency_seconds": round(latency_seconds, 3),
+        **telemetry.summary(latency_seconds),
+    }
+
+
+def _recorded(call_info: dict) -> dict:
+    if not call_info.get("cache_hit"):
+        model_health.record_success(call_info["provider"], call_info["model"], call_info["latency_seconds"], call_info["stage"])
+    record_llm_call(with_cost(call_info))
+    return call_info
+
+
+def _record_failure(stage: str, provider: str, ai_conf: Any, started_at: float, error: BaseException):
+    if not isinstance(error, ContextBudgetExceeded): # An oversized prompt says nothing about the model's health
+        model_health.record_failure(provider, resolve_model_name(provider, ai_conf.selected_model_for_provider))
+    record_llm_call({
+        **_call_info(stage, provider, ai_conf, {"latency_seconds": round(time.perf_counter() - started_at, 3)}),
+        "cache_hit": False,
+        "error_type": type(error).__name__,
+    })
+
+
+def _cache_candidates(prompt: PromptSpec, inputs: dict, provider: str, ai_conf: Any,
+                      trimmable_inputs: TrimmableInputs) -> list[tuple[str, Any, str]]:
+    """
+    (provider, ai_conf, cache_key) for the primary and, when hedging, the backup.
+    A hedged call is answered from the cache if either provider's answer is cached.
+    """
+    # Configuration errors surface as before, even when an answer is cached.
+    ensure_provider_configured(provider)
+    candidates = [(provider, ai_conf)]
+    if hedging_requested(provider, ai_conf):
+        backup_conf = _backup_ai_conf(ai_conf)
+        candidates.append((backup_conf.selected_ai_provider, backup_conf))
+    keyed = []
+    for candidate_provider, candidate_conf in candidates:
+        # Keyed on the inputs actually sent, i.e. after trimming to the candidate's context window
+        prompt_str, chain_kwargs, fitted_inputs, _ = _prepare_call(prompt, inputs, candidate_provider, candidate_conf, trimmable_inputs)
+        rendered_prompt = ChatPromptTemplate.from_template(prompt_str).invoke(fitted_inputs).to_string()
+        model = resolve_model_name(candidate_provider, candidate_conf.selected_model_for_provider)
+        keyed.append((candidate_provider, candidate_conf,
+                      response_cache_key(rendered_prompt, candidate_provider, model, candidate_conf, chain_kwargs)))
+    return keyed
+
+
+def _cached_call(candidates: list[tuple[str, Any, str]], stage: str) -> tuple[Any, dict] | None:
+    for candidate_provider, candidate_conf, cache_key in candidates:
+        hit, response = get_cached_response(cache_key)
+        if hit:
+            print(f"LLM_INVOCATION: Cache hit for '{stage or 'llm_call'}' ({candidate_provider})")
+            call_info = _call_info(stage, candidate_provider, candidate_conf, {"latency_seconds": 0.0})
+            call_info["cache_hit"] = True
+            return response, _recorded(call_info)
+    return None
+
+
+def _store_in_cache(candidates: list[tuple[str, Any, str]], response: Any, call_info: dict,
+                    validate: Callable[[Any], bool] | None):
+    if validate is not None and not validate(response):
+        return # Never cache an answer the caller would reject
+    if call_info.get("finish_reason") == "length":
+        return # Still cut off after the continuations: a retry may get the whole answer
+    winner_index = 1 if call_info.get("hedge", {}).get("winner_role") == "backup" else 0
+    winner_provider, _, cache_key = candidates[winner_index]
+    put_cached_response(cache_key, response, winner_provider, call_info["model"])
+
+
+def _run_chain(chain: Any, inputs: dict, provider: str, model: str | None) -> tuple[Any, dict]:
+    """
+    Invokes the chain inside the provider's rate-limiter slot. Returns (response, metrics) where
+    metrics holds the queue wait, the provider latency (queue wait excluded) and token usage.
+    """
+    requested_at = time.perf_counter()
+
+    def call(callbacks):
+        telemetry = LLMCallTelemetry()
+        start = time.perf_counter()
+        response = chain.invoke(inputs, config={"callbacks": callbacks + [telemetry]})
+        return response, _call_metrics(telemetry, start - requested_at, time.perf_counter() - start)
+
+    response, metrics = call_with_rate_limit(provider, model, call)
+    latency_tracker.record(provider, model, metrics["latency_seconds"])
+    return response, metrics
+
+
+async def _arun_chain(chain: Any, inputs: dict, provider: str, model: str | None) -> tuple[Any, dict]:
+    requested_at = time.perf_counter()
+
+    async def call(callbacks):
+        telemetry = LLMCallTelemetry()
+        start = time.perf_counter()
+        response = await chain.ainvoke(inputs, config={"callbacks": callbacks + [telemetry]})
+        return response, _call_metrics(telemetry, start - requested_at, time.perf_counter() - start)
+
+    response, metrics = await acall_with_rate_limit(provider, model, call)
+    latency_tracker.record(provider, model, metrics["latency_seconds"])
+    return response, metrics
+
+
+_LEADING_JSON_FENCE = re.compile(r"^\s*```json\s*\n")
+
+
+def merge_continuation(partial: str, continuation: str) -> str:
+    """Appends a continuation, dropping a restated opening code fence and any text repeating the end of `partial`."""
+    if partial.lstrip().startswith("```"):
+        continuation = _LEADING_JSON_FENCE.sub("", continuation, count=1)
+    for overlap in range(min(len(partial), len(continuation), CONTINUATION_MAX_OVERLAP_CHARS), CONTINUATION_MIN_OVERLAP_CHARS - 1, -1):
+        if partial.endswith(continuation[:overlap]):
+            return partial + continuation[overlap:]
+    return partial + continuation
+
+
+def _needs_continuation(response: Any, metrics: dict) -> bool:
+    return isinstance(response, str) and metrics.get("finish_reason") == "length" \
+        and metrics.get("continuations", 0) < LLM_MAX_CONTINUATIONS
+
+
+def _continuation_ai_conf(ai_conf: Any, provider: str, partial: str) -> Any:
+    """The continuation only needs what is left of the output budget, so the longer prompt still fits the model."""
+    remaining = output_reservation_for(ai_conf) - count_tokens(partial)
+    model = resolve_model_name(provider, ai_conf.selected_model_for_provider)
+    return ai_conf.model_copy(update={"max_tokens": sized_max_tokens(max(remaining, 1), model)})
+
+
+def _continuation_inputs(prompt_str: str, fitted_inputs: dict, partial: str, provider: str, continuation_conf: Any) -> dict:
+    """Inputs for CONTINUATION_PROMPT_TEMPLATE_STRING. Raises ContextBudgetExceeded if they do not fit the model."""
+    original_prompt = ChatPromptTemplate.from_template(prompt_str).invoke(fitted_inputs).to_messages()[-1].content
+    inputs, _ = fit_inputs_to_context(
+        CONTINUATION_PROMPT_TEMPLATE_STRING, {"original_prompt": original_prompt, "partial_output": partial},
+        resolve_model_name(provider, continuation_conf.selected_model_for_provider), output_reservation_for(continuation_conf)
+    )
+    return inputs
+
+
+def _with_continuation(metrics: dict, response: str, continuation_metrics: dict) -> dict:
+    """Metrics of the whole answer: latency and tokens add up, the stop reason is the continuation's."""
+    merged = {**metrics, "finish_reason": continuation_metrics["finish_reason"]}
+    for key in ("queue_seconds", "latency_seconds"):
+        merged[key] = round(metrics[key] + continuation_metrics[key], 3)
+    for key in ("prompt_tokens", "completion_tokens"):
+        merged[key] = metrics[key] + continuation_metrics[key]
+    merged["tokens_estimated"] = metrics["tokens_estimated"] or continuation_metrics["tokens_estimated"]
+    merged["continuations"] = metrics.get("continuations", 0) + 1
+    print(f"LLM_INVOCATION: Resumed a truncated answer ({merged['continuations']} continuation(s), {len(response)} chars so far)")
+    return merged
+
+
+def _continue_truncated(response: Any, metrics: dict, provider: str, ai_conf: Any,
+                        prompt_str: str, fitted_inputs: dict) -> tuple[Any, dict]:
+    """Resumes a text answer that stopped at max_tokens instead of discarding it."""
+    while _needs_continuation(response, metrics):
+        continuation_conf = _continuation_ai_conf(ai_conf, provider, response)
+        try:
+            inputs = _continuation_inputs(prompt_str, fitted_inputs, response, provider, continuation_conf)
+        except ContextBudgetExceeded as e:
+            print(f"LLM_INVOCATION: Cannot resume truncated answer from {provider}: {e}")
+            break
+        chain = get_llm_chain(provider, continuation_conf, CONTINUATION_PROMPT_TEMPLATE_STRING)
+        model = resolve_model_name(provider, ai_conf.selected_model_for_provider)
+        continuation, continuation_metrics = _run_chain(chain, inputs, provider, model)
+        response = merge_continuation(response, continuation)
+        metrics = _with_continuation(metrics, response, continuation_metrics)
+    return response, metrics
+
+
+async def _acontinue_truncated(response: Any, metrics: dict, provider: str, ai_conf: Any,
+                               prompt_str: str, fitted_inputs: dict) -> tuple[Any, dict]:
+    while _needs_continuation(response, metrics):
+        continuation_conf = _continuation_ai_conf(ai_conf, provider, response)
+        try:
+            inputs = _continuation_inputs(prompt_str, fitted_inputs, response, provider, continuation_conf)
+        except ContextBudgetExceeded as e:
+            print(f"LLM_INVOCATION: Cannot resume truncated answer from {provider}: {e}")
+            break
+        chain = await aget_llm_chain(provider, continuation_conf, CONTINUATION_PROMPT_TEMPLATE_STRING)
+        model = resolve_model_name(provider, ai_conf.selected_model_for_provider)
+        continuation, continuation_metrics = await _arun_chain(chain, inputs, provider, model)
+        response = merge_continuation(response, continuation)
+        metrics = _with_continuation(metrics, response, continuation_metrics)
+    return response, metrics
+
+
+async def _ahedge_leg(prompt: PromptSpec, inputs: dict, provider: str, ai_conf: Any,
+                      validate: Callable[[Any], bool] | None, trimmable_inputs: TrimmableInputs) -> tuple[Any, dict]:
+    prompt_str, chain_kwargs, fitted_inputs, budget_report = _prepare_call(prompt, inputs, provider, ai_conf, trimmable_inputs)
+    chain = await aget_llm_chain(provider, ai_conf, prompt_str, **chain_kwargs)
+    response, metrics = await _arun_chain(chain, fitted_inputs, provider, resolve_model_name(provider, ai_conf.selected_model_for_provider))
+    response, metrics = await _acontinue_truncated(response, metrics, provider, ai_conf, prompt_str, fitted_inputs)
+    if validate is not None and not validate(response):
+        raise InvalidLLMResponse(f"{provider} returned a response that failed validation.")
+    return response, {**metrics, "token_budget": budget_report}
+
+
+async def _ahedged_invoke(prompt: PromptSpec, inputs: dict, provider: str, ai_conf: Any,
+                          validate: Callable[[Any], bool] | None, stage: str,
+                          trimmable_inputs: TrimmableInputs) -> tuple[Any, dict]:
+    primary_model = resolve_model_name(provider, ai_conf.selected_model_for_provider)
+    backup_conf = _backup_ai_conf(ai_conf)
+    delay = hedge_delay_for(provider, primary_model, getattr(ai_conf, "hedge_delay_seconds", None))
+    (response, metrics), hedge_info = await ahedged_race(
+        lambda leg_provider, leg_conf: _ahedge_leg(prompt, inputs, leg_provider, leg_conf, validate, trimmable_inputs),
+        (provider, ai_conf),
+        (backup_conf.selected_ai_provider, backup_conf),
+        delay,
+        primary_model=primary_model,
+    )
+    winner_conf = ai_conf if hedge_info["winner_role"] == "primary" else backup_conf
+    # Latency of a hedged call is the caller-visible time for the race, not the winning leg's own latency.
+    call_info = _call_info(stage, hedge_info["winner"], winner_conf, {**metrics, "latency_seconds": hedge_info["elapsed_seconds"]})
+    call_info["hedge"] = hedge_info
+    return response, call_info
+
+
+def _invoke_uncached(prompt: PromptSpec, inputs: dict, provider: str, ai_conf: Any,
+                     validate: Callable[[Any], bool] | None, stage: str,
+                     trimmable_inputs: TrimmableInputs) -> tuple[Any, dict]:
+    """One attempt at the provider (or the hedged race); retried as a whole by llm_resilience."""
+    if hedging_requested(provider, ai_conf):
+        return run_coroutine_sync(_ahedged_invoke(prompt, inputs, provider, ai_conf, validate, stage, trimmable_inputs))
+    prompt_str, chain_kwargs, fitted_inputs, budget_report = _prepare_call(prompt, inputs, provider, ai_conf, trimmable_inputs)
+    chain = get_llm_chain(provider, ai_conf, prompt_str, **chain_kwargs)
+    model = resolve_model_name(provider, ai_conf.selected_model_for_provider)
+    response, metrics = _run_chain(chain, fitted_inputs, provider, model)
+    response, metrics = _continue_truncated(response, metrics, provider, ai_conf, prompt_str, fitted_inputs)
+    return response, _call_info(stage, provider, ai_conf, {**metrics, "token_budget": budget_report})
+
+
+async def _ainvoke_uncached(prompt: PromptSpec, inputs: dict, provider: str, ai_conf: Any,
+                            validate: Callable[[Any], bool] | None, stage: str,
+                            trimmable_inputs: TrimmableInputs) -> tuple[Any, dict]:
+    if hedging_requested(provider, ai_conf):
+        return await _ahedged_invoke(prompt, inputs, provider, ai_conf, validate, stage, trimmable_inputs)
+    prompt_str, chain_kwargs, fitted_inputs, budget_report = _prepare_call(prompt, inputs, provider, ai_conf, trimmable_inputs)
+    chain = await aget_llm_chain(provider, ai_conf, prompt_str, **chain_kwargs)
+    model = resolve_model_name(provider, ai_conf.selected_model_for_provider)
+    response, metrics = await _arun_chain(chain, fitted_inputs, provider, model)
+    response, metrics = await _acontinue_truncated(response, metrics, provider, ai_conf, prompt_str, fitted_inputs)
+    return response, _call_info(stage, provider, ai_conf, {**metrics, "token_budget": budget_report})
+
+
+def _prompt_tokens(prompt: PromptSpec, inputs: dict, provider: str, ai_conf: Any) -> int:
+    prompt_str, _ = _prompt_spec_for(prompt, provider, ai_conf)
+    return count_tokens(ChatPromptTemplate.from_template(prompt_str).invoke(inputs).to_string())
+
+
+def _routing_metadata(decision: dict, provider: str, model: str | None, fallbacks: list[dict]) -> dict:
+    return {**decision, "chosen": {"provider": provider, "model": model}, "fallbacks": fallbacks}
+
+
+def _fallback_entry(provider: str, model: str | None, error: str) -> dict:
+    print(f"MODEL_ROUTER: {provider}/{model} failed ({error}); falling back to the next candidate")
+    return {"provider": provider, "model": model, "error": error}
+
+
+def invoke_llm_prompt(
+    prompt: PromptSpec,
+    inputs: dict,
+    provider: str,
+    ai_conf: Any,
+    validate: Callable[[Any], bool] | None = None,
+    stage: str = "",
+    trimmable_inputs: TrimmableInputs = (),
+    expected_output_tokens: int | None = None,
+) -> tuple[Any, dict]:
+    """
+    Runs one prompt through the pooled chain for `provider` and returns (response, call_info).
+    Identical prompts are answered from the persistent response cache unless
+    ai_conf.bypass_response_cache is set. With hedging enabled in ai_conf, a backup provider
+    may race the primary; `validate` decides whether a hedge leg's response counts as a win
+    and whether a response is cached. The prompt must fit the model's context window: the inputs
+    named in `trimmable_inputs` are shrunk if needed (see token_budget) and what was trimmed is
+    reported in call_info["token_budget"]. With model routing enabled, the stage's ranked
+    candidates replace `provider` and are tried in order until one returns a valid response;
+    the decision is reported in call_info["routing"]. Transient provider failures are retried
+    (see llm_resilience; call_info["retries"] counts them) and an open circuit breaker fails fast
+    with CircuitOpenError. When ai_conf.max_tokens is unset, `expected_output_tokens` sizes max_tokens
+    for the answer; a text answer that still stops at the limit is resumed by up to
+    LLM_MAX_CONTINUATIONS follow-up requests (call_info["continuations"]) instead of being discarded.
+    Exceptions (including ContextBudgetExceeded) from the last candidate propagate.
+    """
+    if not routing_requested(stage, ai_conf):
+        return _invoke_selected(prompt, inputs, provider, ai_conf, validate, stage, trimmable_inputs, expected_output_tokens)
+
+    decision = route(stage, provider, ai_conf, _prompt_tokens(prompt, inputs, provider, ai_conf))
+    fallbacks = []
+    for attempt, candidate in enumerate(decision["ranked"]):
+        is_last = attempt == len(decision["ranked"]) - 1
+        candidate_conf = routed_ai_conf(ai_conf, candidate["provider"], candidate["model"])
+        try:
+            response, call_info = _invoke_selected(prompt, inputs, candidate["provider"], candidate_conf,
+                                                   validate, stage, trimmable_inputs, expected_output_tokens)
+        except Exception as e:
+            if is_last:
+                raise
+            fallbacks.append(_fallback_entry(candidate["provider"], candidate["model"], type(e).__name__))
+            continue
+        if validate is not None and not validate(response) and not is_last:
+            model_health.record_failure(candidate["provider"], candidate["model"])
+            fallbacks.append(_fallback_entry(candidate["provider"], candidate["model"], "InvalidLLMResponse"))
+            continue
+        call_info["routing"] = _routing_metadata(decision, candidate["provider"], candidate["model"], fallbacks)
+        return response, call_info
+
+
+def _invoke_selected(
+    prompt: PromptSpec,
+    inputs: dict,
+    provider: str,
+    ai_conf: Any,
+    validate: Callable[[Any], bool] | None,
+    stage: str,
+    trimmable_inputs: TrimmableInputs,
+    expected_output_tokens: int | None,
+) -> tuple[Any, dict]:
+    ai_conf = _sized_ai_conf(ai_conf, provider, expected_output_tokens)
+    candidates = _cache_candidates(prompt, inputs, provider, ai_conf, trimmable_inputs) if response_cache_enabled(ai_conf) else []
+    cached = _cached_call(candidates, stage)
+    if cached:
+        return cached
+
+    started_at = time.perf_counter()
+    try:
+        (response, call_info), retries = call_with_retry(
+            provider, lambda: _invoke_uncached(prompt, inputs, provider, ai_conf, validate, stage, trimmable_inputs)
+        )
+    except Exception as e:
+        _record_failure(stage, provider, ai_conf, started_at, e)
+        raise
+
+    call_info["cache_hit"] = False
+    if retries:
+        call_info["retries"] = retries
+    if candidates:
+        _store_in_cache(candidates, response, call_info, validate)
+    return response, _recorded(call_info)
+
+
+async def ainvoke_llm_prompt(
+    prompt: PromptSpec,
+    inputs: dict,
+    provider: str,
+    ai_conf: Any,
+    validate: Callable[[Any], bool] | None = None,
+    stage: str = "",
+    trimmable_inputs: TrimmableInputs = (),
+    expected_output_tokens: int | None = None,
+) -> tuple[Any, dict]:
+    """Async counterpart of invoke_llm_prompt."""
+    if not routing_requested(stage, ai_conf):
+        return await _ainvoke_selected(prompt, inputs, provider, ai_conf, validate, stage, trimmable_inputs, expected_output_tokens)
+
+    decision = route(stage, provider, ai_conf, _prompt_tokens(prompt, inputs, provider, ai_conf))
+    fallbacks = []
+    for attempt, candidate in enumerate(decision["ranked"]):
+        is_last = attempt == len(decision["ranked"]) - 1
+        candidate_conf = routed_ai_conf(ai_conf, candidate["provider"], candidate["model"])
+        try:
+            response, call_info = await _ainvoke_selected(prompt, inputs, candidate["provider"], candidate_conf,
+                                                          validate, stage, trimmable_inputs, expected_output_tokens)
+        except Exception as e:
+            if is_last:
+                raise
+            fallbacks.append(_fallback_entry(candidate["provider"], candidate["model"], type(e).__name__))
+            continue
+        if validate is not None and not validate(response) and not is_last:
+            model_health.record_failure(candidate["provider"], candidate["model"])
+            fallbacks.append(_fallback_entry(candidate["provider"], candidate["model"], "InvalidLLMResponse"))
+            continue
+        call_info["routing"] = _routing_metadata(decision, candidate["provider"], candidate["model"], fallbacks)
+        return response, call_info
+
+
+async def _ainvoke_selected(
+    prompt: PromptSpec,
+    inputs: dict,
+    provider: str,
+    ai_conf: Any,
+    validate: Callable[[Any], bool] | None,
+    stage: str,
+    trimmable_inputs: TrimmableInputs,
+    expected_output_tokens: int | None,
+) -> tuple[Any, dict]:
+    ai_conf = _sized_ai_conf(ai_conf, provider, expected_output_tokens)
+    candidates = _cache_candidates(prompt, inputs, provider, ai_conf, trimmable_inputs) if response_cache_enabled(ai_conf) else []
+    cached = _cached_call(candidates, stage)
+    if cached:
+        return cached
+
+    started_at = time.perf_counter()
+    try:
+        (response, call_info), retries = await acall_with_retry(
+            provider, lambda: _ainvoke_uncached(prompt, inputs, provider, ai_conf, validate, stage, trimmable_inputs)
+        )
+    except Exception as e:
+        _record_failure(stage, provider, ai_conf, started_at, e)
+        raise
+
+    call_info["cache_hit"] = False
+    if retries:
+        call_info["retries"] = retries
+    if candidates:
+        _store_in_cache(candidates, response, call_info, validate)
+    return response, _recorded(call_info)
+
+
+def stream_llm_prompt(
+    prompt: PromptSpec,
+    inputs: dict,
+    provider: str,
+    ai_conf: Any,
+    validate: Callable[[Any], bool] | None = None,
+    stage: str = "",
+    call_info: dict | None = None,
+    trimmable_inputs: TrimmableInputs = (),
+    expected_output_tokens: int | None = None,
+) -> Iterator[str]:
+    """
+    Streaming counterpart of invoke_llm_prompt for text prompts: yields chunks as the provider
+    produces them. A cached answer is yielded as a single chunk. Streams are never hedged,
+    since the first token arrives long before a hedge delay would elapse.
+    If given, `call_info` is filled in once the stream completes (including time to first token).
+    With model routing enabled, a candidate that fails before producing any chunk falls back
+    to the next one; a stream that already started is never restarted on another model.
+    A text stream that stops at max_tokens is resumed like invoke_llm_prompt's answers: the
+    continuation is yielded as one more chunk once it arrives (call_info["continuations"]).
+    """
+    if not routing_requested(stage, ai_conf):
+        yield from _stream_selected(prompt, inputs, provider, ai_conf, validate, stage, call_info, trimmable_inputs, expected_output_tokens)
+        return
+
+    decision = route(stage, provider, ai_conf, _prompt_tokens(prompt, inputs, provider, ai_conf))
+    fallbacks = []
+    for attempt, candidate in enumerate(decision["ranked"]):
+        is_last = attempt == len(decision["ranked"]) - 1
+        candidate_conf = routed_ai_conf(ai_conf, candidate["provider"], candidate["model"])
+        candidate_info = {}
+        produced_chunks = False
+        try:
+            for chunk in _stream_selected(prompt, inputs, candidate["provider"], candidate_conf, validate, stage,
+                                          candidate_info, trimmable_inputs, expected_output_tokens):
+                produced_chunks = True
+                yield chunk
+        except Exception as e:
+            if produced_chunks or is_last:
+                raise
+            fallbacks.append(_fallback_entry(candidate["provider"], candidate["model"], type(e).__name__))
+            continue
+        candidate_info["routing"] = _routing_metadata(decision, candidate["provider"], candidate["model"], fallbacks)
+        if call_info is not None:
+            call_info.update(candidate_info)
+        return
+
+
+def _stream_selected(
+    prompt: PromptSpec,
+    inputs: dict,
+    provider: str,
+    ai_conf: Any,
+    validate: Callable[[Any], bool] | None,
+    stage: str,
+    call_info: dict | None,
+    trimmable_inputs: TrimmableInputs,
+    expected_output_tokens: int | None,
+) -> Iterator[str]:
+    ai_conf = _sized_ai_conf(ai_conf, provider, expected_output_tokens)
+    candidates = _cache_candidates(prompt, inputs, provider, ai_conf, trimmable_inputs) if response_cache_enabled(ai_conf) else []
+    cached = _cached_call(candidates, stage)
+    if cached:
+        response, cached_info = cached
+        if call_info is not None:
+            call_info.update(cached_info)
+        yield response
+        return
+
+    prompt_str, chain_kwargs, fitted_inputs, budget_report = _prepare_call(prompt, inputs, provider, ai_conf, trimmable_inputs)
+    chain = get_llm_chain(provider, ai_conf, prompt_str, **chain_kwargs)
+    model = resolve_model_name(provider, ai_conf.selected_model_for_provider)
+    requested_at = time.perf_counter()
+    timing = {}
+
+    def make_stream(callbacks):
+        timing["telemetry"] = LLMCallTelemetry()
+        timing["start"] = time.perf_counter() # Queue wait is excluded, as in _run_chain
+        yield from chain.stream(fitted_inputs, config={"callbacks": callbacks + [timing["telemetry"]]})
+
+    chunks = []
+    retry_info = {}
+    try:
+        for chunk in stream_with_retry(provider, lambda: stream_with_rate_limit(provider, model, make_stream), retry_info):
+            if not chunks:
+                timing["first_chunk"] = time.perf_counter()
+            chunks.append(chunk)
+            yield chunk
+    except Exception as e:
+        _record_failure(stage, provider, ai_conf, requested_at, e)
+        raise
+
+    latency = time.perf_counter() - timing["start"]
+    latency_tracker.record(provider, model, latency)
+    response = "".join(chunks)
+    metrics = _call_metrics(timing["telemetry"], timing["start"] - requested_at, latency)
+    if _needs_continuation(response, metrics):
+        try:
+            continued, metrics = _continue_truncated(response, metrics, provider, ai_conf, prompt_str, fitted_inputs)
+        except Exception as e:
+            _record_failure(stage, provider, ai_conf, requested_at, e)
+            raise
+        if len(continued) > len(response): # merge_continuation only ever appends to the partial answer
+            yield continued[len(response):]
+        response = continued
+    info = _call_info(stage, provider, ai_conf, {**metrics, "token_budget": budget_report})
+    info["cache_hit"] = False
+    if retry_info.get("retries"):
+        info["retries"] = retry_info["retries"]
+    # The first chunk the caller saw is what matters for a stream, whether or not the model emitted token events.
+    info["time_to_first_token_seconds"] = round(timing["first_chunk"] - timing["start"], 3) if chunks else None
+    _recorded(info)
+    if call_info is not None:
+        call_info.update(info)
+    if candidates:
+        _store_in_cache(candidates, response, info, validate)
@@ -13,16 +13,19 @@ Enquiry:
 Provide the output as a comma-separated list or a bulleted list of suggestions."""
 
 
-# Prompt for parsing vendor replies
+# Prompt for parsing vendor replies into a ParsedVendorReply record (src/models.py). The structuring
+# prompts receive it in the compact text form of src/utils/parsed_vendor_reply.py, not as JSON.
 VENDOR_REPLY_PARSING_PROMPT_TEMPLATE_STRING = """You are an expert at parsing vendor replies for travel quotations.
-From the vendor reply provided below, extract the following information clearly:
-1.  **Proposed Itinerary:** (Day-by-day plan or tour flow. If none, state 'Itinerary not specified by vendor.')
-2.  **Hotel Details:** (List any mentioned hotels, their category, and for which city/duration if specified. If none, state 'Hotel details not specified by vendor'.)
-3.  **Total Price or Per Person Price:** (e.g., USD 1200 per person, INR 50000 total for 2 pax. If not found, state 'Price not specified'.)
-4.  **Currency:** (e.g., USD, INR. If not found, state 'Currency not specified'.)
-5.  **Number of Pax cost is based on:** (e.g., "for 2 adults", "per person". If not clear, state 'Not specified'.)
-6.  **Inclusions:** (List them. If not found, state 'Inclusions not specified'.)
-7.  **Exclusions:** (List them. If not found, state 'Exclusions not specified'.)
+Extract the vendor's offer from the reply below into one compact JSON object with these keys:
+- "price": the amount as written, without currency (e.g. "45,000"), or null
+- "currency": e.g. "INR", "USD", or null
+- "price_basis": "per person" or "total", or null
+- "pax_basis": the travellers the price is for (e.g. "2 adults", "family of 4"), or null
+- "hotels": list of {{"name", "city", "nights", "category"}}; use null for parts not given
+- "meal_plan": e.g. "MAP (breakfast and dinner)", or null
+- "room_configuration": e.g. "1 double room", or null
+- "inclusions", "exclusions": lists of short items as the vendor lists them
+- "itinerary_days": list of {{"day", "summary"}}, one per day the vendor describes, with a one-line summary
 
 Vendor Reply:
 ---
@@ -33,11 +36,11 @@ Enquiry Context (for your reference):
 - Destination: {destination}
 - Duration: {num_days} days
 
-Output the extracted information clearly under respective headings."""
+Only include what the vendor actually wrote: use null or [] for anything missing and do not invent details. Omit greetings, signatures and disclaimers. Output only the JSON object, without explanations or code fences."""
 
 
 # Prompt for structuring data for PDF (JSON Output)
-QUOTATION_STRUCTURE_JSON_PROMPT_TEMPLATE_STRING = """
+_QUOTATION_STRUCTURE_JSON_HEADER = """
 You are a travel agent assistant preparing data for a PDF quotation document.
 Your goal is to transform the Client Enquiry Details, AI-Suggested Itinerary, and Parsed Vendor Information into a single, structured JSON object.
 Strictly adhere to the JSON format and all specified keys. Ensure all string values are properly escaped for JSON.
@@ -45,23 +48,25 @@ Strictly adhere to the JSON format and all specified keys. Ensure all string val
 **Information Sources:**
 1.  **Client Enquiry Details:** Basic trip requirements.
 2.  **AI-Suggested Itinerary (from preliminary planning):** A list of suggested places or activities, or a more general textual suggestion. This is sourced from an earlier AI generation step (Tab 2).
-3.  **Parsed Vendor Information:** This is output from a previous step where a vendor's textual reply was processed. It *should* contain specific details like proposed itinerary, hotel details, pricing, meals included, room configuration, inclusions, and exclusions provided by the vendor.
+3.  **Parsed Vendor Information:** The vendor's offer, extracted from their reply in a previous step, one labelled line or list per detail: "Price", "Pax basis", "Hotels", "Meal plan", "Room configuration", "Inclusions", "Exclusions" and "Vendor itinerary". Details the vendor did not give are left out.
 
-**Crucial Task: Detailed Itinerary Generation**
+"""
+
+_QUOTATION_ITINERARY_TASK = """**Crucial Task: Detailed Itinerary Generation**
 - You MUST generate a comprehensive, engaging, day-wise itinerary for the full duration of `{num_days}` days.
-- **Primary Source:** Use the "Proposed Itinerary" from the "Parsed Vendor Information" if available and detailed.
+- **Primary Source:** Use the "Vendor itinerary" from the "Parsed Vendor Information" if available and detailed.
 - **Secondary Source (if vendor itinerary is missing, brief, or needs enhancement):** Refer to the "AI-Suggested Itinerary (from preliminary planning)". Incorporate these suggestions to create or enrich the day-wise plan. This might be a list of places, attractions, or a textual description.
 - **Structure each day** within the "detailed_itinerary" list as an object containing:
     - "day_number": (String, e.g., "Day 1", "Day 2")
     - "title": (String, a concise and appealing headline for the day's activities, e.g., "Arrival in Paris & Eiffel Tower Magic", "Exploring Ancient Rome: Colosseum & Forum")
     - "description": (String, a well-written paragraph or two detailing the day's activities, sightseeing, meals if specified, and flow. Use descriptive language to make it sound attractive to the client.)
 - **Completeness:**
-    - If the vendor's itinerary ("Proposed Itinerary" in Parsed Vendor Information) is detailed and covers all `{num_days}` days, adapt it to the structure above. You can enhance descriptions using relevant ideas from the "AI-Suggested Itinerary" if they complement the vendor's plan.
+    - If the vendor's itinerary ("Vendor itinerary" in Parsed Vendor Information) is detailed and covers all `{num_days}` days, adapt it to the structure above. You can enhance descriptions using relevant ideas from the "AI-Suggested Itinerary" if they complement the vendor's plan.
     - If the vendor's itinerary is brief, missing days, or not strictly day-wise:
         - You MUST expand upon it logically to cover all `{num_days}` days. Use the "AI-Suggested Itinerary" as a strong guide for filling gaps or fleshing out days.
         - For any missing days not covered by vendor or AI suggestions, creatively and plausibly generate activities based on the destination (`{destination}`), trip type (`{trip_type}`), and common tourist interests for such a trip.
         - Ensure a smooth flow between days.
-- **If the vendor reply provides NO itinerary details at all (check "Proposed Itinerary" in Parsed Vendor Information):**
+- **If the vendor reply provides NO itinerary details at all (no "Vendor itinerary" in Parsed Vendor Information):**
     - **First Priority:** Use the "AI-Suggested Itinerary (from preliminary planning)" to construct a day-wise itinerary. If it's just a list of places, weave them into a logical daily plan covering `{num_days}`.
     - **If AI-Suggested Itinerary is also minimal, unhelpful, or states "No AI-generated itinerary/suggestions available...":** Create a compelling, generic, day-wise itinerary for `{num_days}` days in `{destination}` suitable for a `{trip_type}` trip.
     - When generating an itinerary primarily from AI suggestions or generically (i.e., not from a detailed vendor plan), include a note in the description of "Day 1" like: "(Please note: This is a suggested itinerary based on popular activities and initial suggestions. We can customize it further to your preferences.)"
@@ -70,12 +75,14 @@ Strictly adhere to the JSON format and all specified keys. Ensure all string val
     - Avoid jargon. Highlight key experiences.
     - Ensure correct grammar and spelling.
 
-**Populating JSON Fields from Parsed Vendor Information:**
-- **`meal_plan_summary`**: Extract this from the "Meals Included" section of the `Parsed Vendor Information`. If not specified there, use a sensible default like "Daily breakfast at hotel; other meals as per detailed itinerary".
-- **`room_configuration_summary`**: Extract this from the "Rooms Required/Configuration" section of the `Parsed Vendor Information`. If not specified there, use "Standard double occupancy rooms (or as per final booking confirmation)".
-- **`cost_per_head`, `total_package_cost`, `currency`**: Extract these from the "Total Price or Per Person Price" and "Currency" sections of `Parsed Vendor Information`. If not found, use defaults like "To be advised" or "INR".
+"""
+
+_QUOTATION_STRUCTURE_FIELDS_AND_INPUTS = """**Populating JSON Fields from Parsed Vendor Information:**
+- **`meal_plan_summary`**: Extract this from the "Meal plan" line of the `Parsed Vendor Information`. If not specified there, use a sensible default like "Daily breakfast at hotel; other meals as per detailed itinerary".
+- **`room_configuration_summary`**: Extract this from the "Room configuration" line of the `Parsed Vendor Information`. If not specified there, use "Standard double occupancy rooms (or as per final booking confirmation)".
+- **`cost_per_head`, `total_package_cost`, `currency`, `total_pax_for_cost`**: Extract these from the "Price" and "Pax basis" lines of `Parsed Vendor Information`. If not found, use defaults like "To be advised" or "INR".
 - **`inclusions`, `exclusions`**: Primarily use the "Inclusions" and "Exclusions" lists from `Parsed Vendor Information`. If these are minimal or missing, you can augment them with the standard items provided in the JSON template below, but vendor-provided specifics take precedence.
-- **`hotel_details`**: Use information from "Hotel Details" in `Parsed Vendor Information`. If none, use the template's default.
+- **`hotel_details`**: Use the "Hotels" list of `Parsed Vendor Information` (name, then city, nights and category where given). If none, use the template's default.
 
 Client Enquiry Details:
 - Destination: {destination}
@@ -89,12 +96,17 @@ AI-Suggested Itinerary (from preliminary planning - may be a list of places or d
 {ai_suggested_itinerary_text}
 ---
 
-Parsed Vendor Information (This contains what the vendor provided, including their proposed itinerary, meals, room configuration, pricing, etc.):
+Parsed Vendor Information (what the vendor provided):
 ---
 {vendor_parsed_text}
 ---
 
-**Output JSON Structure (fill all keys, using information as per instructions above. Use "Not specified", default values, or empty lists [] if info is unavailable and cannot be plausibly generated/derived for non-itinerary fields):**
+"""
+
+# JSON schema block shared by the quotation prompts; the itinerary day example is swapped in the skeleton prompt.
+# Fixed text (tax notes, company contact, standard exclusions and notes) is not requested: it is merged
+# locally from src/utils/quotation_catalogue.py, so the model only writes enquiry-specific fields.
+_QUOTATION_JSON_BEFORE_ITINERARY = """**Output JSON Structure (fill all keys, using information as per instructions above. Use "Not specified", default values, or empty lists [] if info is unavailable and cannot be plausibly generated/derived for non-itinerary fields):**
 ```json
 {{
   "client_name": "{client_name_placeholder}",
@@ -109,12 +121,16 @@ Parsed Vendor Information (This contains what the vendor provided, including the
 
   "itinerary_title": "Your Personalized {num_days}-Day Journey in {destination}",
   "detailed_itinerary": [
-    {{
+"""
+
+_QUOTATION_JSON_ITINERARY_DAY_EXAMPLE = """    {{
       "day_number": "Day 1",
       "title": "Arrival in {destination} & Evening at Leisure",
       "description": "Welcome to the vibrant city of {destination}! Upon your arrival at the international airport/railway station, our friendly representative will greet you and assist with a smooth transfer to your pre-booked hotel. Complete your check-in formalities and take some time to relax and settle in. The rest of the evening is yours to explore the nearby surroundings at your own pace, perhaps indulging in some local snacks or simply soaking in the new atmosphere. Enjoy a comfortable overnight stay at your hotel in {destination}."
     }}
-  ],
+"""
+
+_QUOTATION_JSON_AFTER_ITINERARY = """  ],
   "hotel_details": [
     {{ "destination_location": "{destination}", "hotel_name": "Selected 3-Star/4-Star Hotel (or similar, based on package)", "nights": "{num_nights}" }}
   ],
@@ -138,28 +154,184 @@ Parsed Vendor Information (This contains what the vendor provided, including the
       "Entrance fees to monuments, museums, parks, and attractions.",
       "Personal expenses such as laundry, telephone calls, tips, porterage, etc.",
       "Any services not explicitly mentioned in the 'Inclusions' section."
-    ],
+    ]
+}}
+"""
 
-  "gst_note": "GST (Goods and Services Tax) will be applicable as per government norms, currently 5% on tour packages.",
-  "tcs_note_short": "TCS may be applicable for overseas packages as per prevailing government regulations.",
+_QUOTATION_JSON_OUTPUT_STRUCTURE = _QUOTATION_JSON_BEFORE_ITINERARY + _QUOTATION_JSON_ITINERARY_DAY_EXAMPLE + _QUOTATION_JSON_AFTER_ITINERARY
 
-  "company_contact_person": "V.R.Viswanathan",
-  "company_phone": "+91-8884016046",
-  "company_email": "vrtravelpackages@gmail.com",
-  "company_website": "www.tripexplore.in",
+QUOTATION_STRUCTURE_JSON_PROMPT_TEMPLATE_STRING = (
+    _QUOTATION_STRUCTURE_JSON_HEADER + _QUOTATION_ITINERARY_TASK + _QUOTATION_STRUCTURE_FIELDS_AND_INPUTS
+    + _QUOTATION_JSON_OUTPUT_STRUCTURE
+)
 
-  "standard_exclusions_list": [
-        "Expenses of personal nature like tips, laundry, phone calls, alcoholic beverages etc.",
-        "Any increase in airfare, visa fees, or taxes levied by the government.",
-        "Cost of any optional tours, activities, or services.",
-        "Early check-in & late check-out charges at hotels (standard check-in/out times apply)."
-  ],
-  "important_notes": [
-      "This is a proposed itinerary and is subject to change/customization based on your preferences and availability.",
-      "All hotel accommodations are subject to availability at the time of booking. In case of unavailability, similar category hotels will be provided.",
-      "Rates are valid for the period mentioned and for Indian nationals only, unless specified otherwise.",
-      "Standard check-in time at hotels is 14:00 hrs and check-out is 12:00 hrs."
-  ],
-  "tcs_rules_full": "Note: Effective 01 October 2023, 'Tax Collected at Source' (TCS), will be at 5% till Rs. 7 lakh, and 20% thereafter, for all Cumulative Payments made against a PAN in the Current Financial Year. The Buyer will have to Furnish an Undertaking on their spends for Overseas Tour Packages/ Cruises in the year. The Government of India, Ministry of Finance, via Circular No. 10 of 2023, F. No. 37 014212312023-TPL, dated 30th June, 2023, has clarified that the information is to be furnished by the buyer in an undertaking and any false information will merit appropriate action against the buyer under the Finance Act, 2023 amended sub-section (1G) of section 206C of the income-tax Act, 1961."
+
+# Segmented mode (ai_config.segmented_itinerary), step 1: the quotation JSON with a one-line outline
+# per day instead of full descriptions. The descriptions are then written in parallel, a segment of
+# days per call, with ITINERARY_SEGMENT_PROMPT_TEMPLATE_STRING.
+_QUOTATION_SKELETON_ITINERARY_TASK = """**Crucial Task: Itinerary Outline**
+- List every one of the `{num_days}` days in "detailed_itinerary". Do NOT write full day descriptions: they are written separately from your outline.
+- **Structure each day** as an object containing:
+    - "day_number": (String, e.g., "Day 1", "Day 2")
+    - "city": (String, the city or area where the travellers spend that day and night, e.g., "Munnar")
+    - "title": (String, a concise and appealing headline for the day's activities, e.g., "Arrival in Paris & Eiffel Tower Magic")
+    - "outline": (String, one short sentence naming the day's key activities, transfers and sights)
+- **Sources, in order of priority:** the "Vendor itinerary" from the "Parsed Vendor Information"; then the "AI-Suggested Itinerary (from preliminary planning)" to fill gaps; then plausible activities for a `{trip_type}` trip to `{destination}`. Ensure a smooth, realistic flow between days and cities, and do not repeat sights.
+- If the itinerary is not based on a detailed vendor plan, end the outline of "Day 1" with "(suggested itinerary)".
+
+"""
+
+_QUOTATION_SKELETON_ITINERARY_DAY_EXAMPLE = """    {{
+      "day_number": "Day 1",
+      "city": "{destination}",
+      "title": "Arrival in {destination} & Evening at Leisure",
+      "outline": "Arrival, transfer to the hotel and an evening at leisure."
+    }}
+"""
+
+QUOTATION_SKELETON_JSON_PROMPT_TEMPLATE_STRING = (
+    _QUOTATION_STRUCTURE_JSON_HEADER + _QUOTATION_SKELETON_ITINERARY_TASK + _QUOTATION_STRUCTURE_FIELDS_AND_INPUTS
+    + _QUOTATION_JSON_BEFORE_ITINERARY + _QUOTATION_SKELETON_ITINERARY_DAY_EXAMPLE + _QUOTATION_JSON_AFTER_ITINERARY
+)
+
+# Segmented mode, step 2: full descriptions for a few consecutive days (usually one city) of the outline
+ITINERARY_SEGMENT_PROMPT_TEMPLATE_STRING = """You are a travel agent assistant writing part of the day-wise itinerary of a quotation document.
+The full trip outline is given for context; write ONLY the days listed under "Days To Write".
+
+Client Enquiry Details:
+- Destination: {destination}
+- Number of Days: {num_days}
+- Traveler Count: {traveler_count}
+- Trip Type: {trip_type}
+
+Parsed Vendor Information (hotels, meals and sightseeing the vendor included):
+---
+{vendor_parsed_text}
+---
+
+AI-Suggested Itinerary (from preliminary planning):
+---
+{ai_suggested_itinerary_text}
+---
+
+Trip Outline (day | city | title | outline):
+---
+{trip_outline}
+---
+
+Days To Write: {segment_days}
+
+For each day to write, write a "description": a well-written paragraph or two detailing the day's activities, sightseeing, transfers, meals if specified, and the overnight stay. Follow the outline's city and title for that day, stay consistent with the neighbouring days (no repeated sights, realistic travel times between cities), and use the vendor's hotels, meals and inclusions where they apply. Use clear, professional and engaging language with correct grammar and spelling.
+If "Day 1" is one of your days and its outline ends with "(suggested itinerary)", add to its description: "(Please note: This is a suggested itinerary based on popular activities and initial suggestions. We can customize it further to your preferences.)"
+
+Respond with only this JSON, one entry per day to write, in order:
+```json
+{{
+  "days": [
+    {{ "day_number": "Day N", "description": "..." }}
+  ]
 }}
-"""
\ No newline at end of file
+```
+"""
+
+
+# Single-pass quotation prompt: goes straight from the raw vendor reply to the quotation JSON,
+# replacing VENDOR_REPLY_PARSING + QUOTATION_STRUCTURE_JSON when single_pass_quotation is enabled.
+_QUOTATION_SINGLE_PASS_JSON_INSTRUCTIONS = """
+You are a travel agent assistant preparing data for a PDF quotation document.
+Your goal is to read the vendor's raw reply, extract its commercial details, and combine them with the Client Enquiry Details and the AI-Suggested Itinerary into a single, structured JSON object.
+Strictly adhere to the JSON format and all specified keys. Ensure all string values are properly escaped for JSON.
+
+**Information Sources:**
+1.  **Client Enquiry Details:** Basic trip requirements.
+2.  **AI-Suggested Itinerary (from preliminary planning):** A list of suggested places or activities, or a more general textual suggestion.
+3.  **Raw Vendor Reply:** The vendor's email or message, unedited. It may contain greetings, signatures, quoted earlier messages and disclaimers; ignore those.
+
+**Step 1 - Read the Raw Vendor Reply carefully and identify:**
+- The proposed itinerary or tour flow, if any.
+- Hotels, their category, and the city/number of nights for each.
+- The price (per person or total), its currency, and the number of travellers it is based on.
+- The meal plan and the room configuration.
+- Inclusions and exclusions.
+Copy figures, currencies and hotel names exactly as the vendor wrote them. Never invent a price: if none is given, use "To be advised".
+
+**Step 2 - Detailed Itinerary Generation**
+- You MUST generate a comprehensive, engaging, day-wise itinerary for the full duration of `{num_days}` days.
+- Use the vendor's itinerary as the primary source. Where it is brief, missing days or absent, use the "AI-Suggested Itinerary" to fill the gaps, and for any remaining days create plausible activities for a `{trip_type}` trip to `{destination}`.
+- Structure each day within the "detailed_itinerary" list as an object with "day_number" (e.g. "Day 1"), "title" (a concise, appealing headline) and "description" (a well-written paragraph describing the day's activities).
+- When the itinerary comes mainly from AI suggestions or is generic (not from a detailed vendor plan), add to the "Day 1" description: "(Please note: This is a suggested itinerary based on popular activities and initial suggestions. We can customize it further to your preferences.)"
+- Use clear, professional and engaging language with correct grammar and spelling.
+
+**Step 3 - Populate the remaining JSON fields from what you extracted in Step 1:**
+- **`meal_plan_summary`**, **`room_configuration_summary`**: from the vendor's meal plan and room configuration, else the template's defaults.
+- **`cost_per_head`, `total_package_cost`, `currency`, `total_pax_for_cost`**: from the vendor's pricing. If not found, use defaults like "To be advised" or "INR".
+- **`inclusions`, `exclusions`**: the vendor's lists take precedence; augment them with the template's standard items only if they are minimal or missing.
+- **`hotel_details`**: one entry per vendor hotel. If none, use the template's default.
+
+Client Enquiry Details:
+- Destination: {destination}
+- Number of Days: {num_days}
+- Traveler Count: {traveler_count}
+- Trip Type: {trip_type}
+- Client Name (if available, use "Mr./Ms. [Client Name]", else "Mr./Ms. Valued Client"): {client_name_placeholder}
+
+AI-Suggested Itinerary (from preliminary planning - may be a list of places or descriptive text, or a note if none available):
+---
+{ai_suggested_itinerary_text}
+---
+
+Raw Vendor Reply (unedited, as received from the vendor):
+---
+{vendor_reply}
+---
+
+"""
+
+QUOTATION_SINGLE_PASS_JSON_PROMPT_TEMPLATE_STRING = _QUOTATION_SINGLE_PASS_JSON_INSTRUCTIONS + _QUOTATION_JSON_OUTPUT_STRUCTURE
+
+
+# Prompt for resuming an answer that stopped at the output token limit (see llm_invocation)
+CONTINUATION_PROMPT_TEMPLATE_STRING = """Your previous answer to the request below was cut off because it reached the output length limit.
+
+=== ORIGINAL REQUEST START ===
+{original_prompt}
+=== ORIGINAL REQUEST END ===
+
+=== PARTIAL ANSWER START ===
+{partial_output}
+=== PARTIAL ANSWER END ===
+
+Continue the answer exactly where it stopped. Output only the remaining text, starting with the next character after the partial answer.
+Do not repeat any of the partial answer, do not start over, and do not add commentary or code fences."""
+
+
+# Incremental regeneration (src/core/quotation_patch.py): the vendor corrected only prices, hotels or
+# inclusions/exclusions, so only those fields of the stored quotation JSON are extracted again.
+QUOTATION_PATCH_JSON_PROMPT_TEMPLATE_STRING = """You are a travel agent assistant updating an existing quotation after the vendor revised their reply.
+Only the fields listed under "Fields To Update" may change; everything else in the quotation stays as it is.
+
+Client Enquiry Details:
+- Destination: {destination}
+- Number of Days: {num_days}
+- Number of Travelers: {traveler_count}
+
+Fields To Update: {fields_to_update}
+
+Current Values (JSON, from the quotation generated from the previous vendor reply):
+{current_values}
+
+Changed Lines Of The Vendor Reply (diff, "-" removed, "+" added):
+---
+{vendor_reply_diff}
+---
+
+Updated Vendor Reply (full text):
+---
+{vendor_reply}
+---
+
+Instructions:
+- Return one JSON object containing exactly the keys listed under "Fields To Update", with their values as they must read after the vendor's changes.
+- Keep the value types of "Current Values": "hotel_details" is a list of objects with "destination_location", "hotel_name" and "nights"; "inclusions" and "exclusions" are lists of short strings; prices, pax and currency are strings (e.g. "45,000", "2 Adults", "INR").
+- Keep current wording for anything the vendor did not change. Use null for a field the updated reply no longer provides.
+- Output only the JSON object, without explanations or code fences."""
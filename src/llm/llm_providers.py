@@ -1,18 +1,112 @@
 # src/llm/llm_providers.py:
 import os
+import json
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any
+
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_openai import ChatOpenAI
 from langchain_groq import ChatGroq
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
+
+from src.utils.constants import AI_PROVIDER_OPTIONS, LLM_REQUEST_TIMEOUT_SECONDS
+
+SUPPORTED_PROVIDERS = AI_PROVIDER_OPTIONS
+
+# --- Process-wide client pool ---
+# Every Streamlit session runs in its own script thread but shares this module, so pooled
+# clients (and their keep-alive HTTP connections) are reused across sessions and LLM hops.
+LLM_POOL_MAX_SIZE = int(os.getenv("LLM_POOL_MAX_SIZE", "16"))
+# When set, every real provider call is appended to this JSONL cassette for the Local provider's replay mode.
+LLM_CASSETTE_RECORD_PATH = os.getenv("LLM_CASSETTE_RECORD_PATH")
+
+_pool_lock = threading.RLock()
+_llm_instance_pool: "OrderedDict[tuple, Any]" = OrderedDict()
+_llm_chain_pool: "OrderedDict[tuple, Any]" = OrderedDict()
+_pool_stats = {"instance_hits": 0, "instance_misses": 0, "chain_hits": 0, "chain_misses": 0, "evictions": 0}
+
+
+def _freeze(value: Any) -> Any:
+    """Turns dict/list config values (e.g. response_format) into a hashable pool key part."""
+    if value is None:
+        return None
+    return json.dumps(value, sort_keys=True)
+
 
-def get_llm_instance(provider: str, ai_conf): # Added ai_conf parameter
+def _key_fingerprint(api_key: str) -> str:
+    # Only a short digest of the key is kept in the pool key, never the key itself.
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+# provider -> (API key env var or None if no key is needed, default model env var, built-in default model)
+PROVIDER_ENV_SETTINGS = {
+    "Gemini": ("GOOGLE_API_KEY", "GOOGLE_DEFAULT_MODEL", "gemini-1.5-flash-latest"),
+    "OpenRouter": ("OPENROUTER_API_KEY", "OPENROUTER_DEFAULT_MODEL", "openai/gpt-3.5-turbo"),
+    "Groq": ("GROQ_API_KEY", "GROQ_DEFAULT_MODEL", "llama3-8b-8192"),
+    "TogetherAI": ("TOGETHERAI_API_KEY", "TOGETHERAI_DEFAULT_MODEL", "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"),
+    "Local": (None, "LOCAL_LLM_DEFAULT_MODEL", "synthetic"),
+}
+
+
+def resolve_model_name(provider: str, selected_model: str | None) -> str | None:
+    """Model that get_llm_instance would use for this provider (selected model or env/built-in default)."""
+    if selected_model:
+        return selected_model
+    if provider not in PROVIDER_ENV_SETTINGS:
+        return None
+    _, default_model_env, builtin_default = PROVIDER_ENV_SETTINGS[provider]
+    return os.getenv(default_model_env, builtin_default)
+
+
+def _resolve_provider_settings(provider: str, selected_model: str | None) -> tuple[str, str]:
     """
-    Returns an LLM instance based on the specified provider, selected model,
-    and advanced settings from session state.
+    Resolves the model name (falling back to the provider's env default) and API key.
+    Raises ValueError for a missing key or an unsupported provider.
     """
-    selected_model = ai_conf.selected_model_for_provider
-    temperature = ai_conf.temperature
-    max_tokens_from_state = ai_conf.max_tokens
+    if provider not in PROVIDER_ENV_SETTINGS:
+        raise ValueError(f"Unsupported AI provider: {provider}. Supported: 'Gemini', 'OpenRouter', 'Groq', 'TogetherAI', 'Local'.")
+    api_key_env, _, _ = PROVIDER_ENV_SETTINGS[provider]
+    if api_key_env is None:
+        return resolve_model_name(provider, selected_model), ""
+    api_key = os.getenv(api_key_env)
+    if not api_key:
+        raise ValueError(f"{api_key_env} not found for {provider}. Check .env file.")
+    return resolve_model_name(provider, selected_model), api_key
 
+
+def structured_output_format(provider: str, model_name: str | None, schema_name: str, json_schema: dict) -> dict | None:
+    """
+    response_format asking the provider for native JSON output, or None where it is not supported
+    (Local, other OpenRouter models); those rely on the prompt and local JSON repair.
+    """
+    model = (model_name or "").lower()
+    if provider == "OpenRouter" and ("gpt" in model or "claude-3" in model):
+        return {"type": "json_schema", "json_schema": {"name": schema_name, "schema": json_schema}}
+    if provider == "TogetherAI" and "llama" in model:
+        return {"type": "json_object", "schema": json_schema}
+    if provider in ("Groq", "Gemini"): # JSON mode (Gemini: response_mime_type, see _create_llm_instance)
+        return {"type": "json_object"}
+    return None
+
+
+def ensure_provider_configured(provider: str):
+    """Raises the same ValueError get_llm_instance would for an unsupported provider or a missing API key."""
+    _resolve_provider_settings(provider, None)
+
+
+def _create_llm_instance(
+    provider: str,
+    model_name: str,
+    api_key: str,
+    temperature: float | None,
+    max_tokens_from_state: int | None,
+    response_format: dict | None
+):
+    """Builds a new provider client. Only called on a pool miss."""
     # Prepare common LLM parameters
     llm_params = {}
     if temperature is not None:
@@ -20,70 +114,45 @@ def get_llm_instance(provider: str, ai_conf): # Added ai_conf parameter
     # Note: max_tokens parameter name can vary, but LangChain often standardizes it.
 
     if provider == "Gemini":
-        api_key = os.getenv("GOOGLE_API_KEY")
-        model_for_api_call = selected_model
-        if not model_for_api_call: 
-            model_for_api_call = os.getenv("GOOGLE_DEFAULT_MODEL", "gemini-1.5-flash-latest")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found for Gemini. Check .env file.")
-        
         # Gemini specific parameter name for max tokens is 'max_output_tokens'
         if max_tokens_from_state is not None:
             llm_params['max_output_tokens'] = max_tokens_from_state
-        
-        gemini_model_kwargs = {"request_options": {"timeout": 120}}
+        if response_format is not None:
+            # Gemini's JSON mode; the schema itself stays in the prompt (response_schema rejects $ref/$defs)
+            llm_params['response_mime_type'] = "application/json"
+
+        gemini_model_kwargs = {"request_options": {"timeout": LLM_REQUEST_TIMEOUT_SECONDS}}
 
-        print(f"LLM_PROVIDERS.PY: Initializing Gemini with model: {model_for_api_call}, Params: {llm_params}, ModelKwargs: {gemini_model_kwargs}")
+        print(f"LLM_PROVIDERS.PY: Initializing Gemini with model: {model_name}, Params: {llm_params}, ModelKwargs: {gemini_model_kwargs}")
         return ChatGoogleGenerativeAI(
-            model=model_for_api_call,
+            model=model_name,
             google_api_key=api_key,
             model_kwargs=gemini_model_kwargs, # For non-generation params like timeout
             **llm_params # Spread temperature, max_output_tokens
         )
-    
-    elif provider == "OpenRouter":
-        api_key = os.getenv("OPENROUTER_API_KEY")
-        model_name = selected_model
-        if not model_name:
-            model_name = os.getenv("OPENROUTER_DEFAULT_MODEL", "openai/gpt-3.5-turbo")
-        if not api_key:
-            raise ValueError("OPENROUTER_API_KEY not found for OpenRouter. Check .env file.")
-        
+
+    # OpenRouter, Groq and TogetherAI all use 'max_tokens'
+    if max_tokens_from_state is not None:
+        llm_params['max_tokens'] = max_tokens_from_state
+    if response_format is not None:
+        llm_params['model_kwargs'] = {"response_format": response_format}
+
+    if provider == "OpenRouter":
         http_referer = os.getenv("OPENROUTER_HTTP_REFERER", "http://localhost:3000")
         app_title = os.getenv("OPENROUTER_APP_TITLE", "AI Travel Quotation")
         headers = {"HTTP-Referer": http_referer, "X-Title": app_title}
-        
-        # ChatOpenAI (used by OpenRouter) typically uses 'max_tokens'
-        if max_tokens_from_state is not None:
-            llm_params['max_tokens'] = max_tokens_from_state
-        
+
         print(f"LLM_PROVIDERS.PY: Initializing OpenRouter with model: {model_name}, Params: {llm_params}")
         return ChatOpenAI(
             model=model_name,
             openai_api_key=api_key,
             base_url="https://openrouter.ai/api/v1",
             default_headers=headers,
+            include_response_headers=True, # x-ratelimit-* headers feed the adaptive rate limiter
             **llm_params # Spread temperature, max_tokens
         )
-        
-    elif provider == "Groq":
-        api_key = os.getenv("GROQ_API_KEY")
-        model_name = selected_model
-        if not model_name:
-            model_name = os.getenv("GROQ_DEFAULT_MODEL", "llama3-8b-8192")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY not found for Groq. Check .env file.")
-        
-        # ChatGroq standard parameter for max tokens is 'max_tokens'
-        # The warning previously indicated that 'max_output_tokens' was moved to model_kwargs.
-        # We should use the direct parameter if available.
-        if max_tokens_from_state is not None:
-            llm_params['max_tokens'] = max_tokens_from_state
-            # Remove 'max_output_tokens' if it was incorrectly added to llm_params before
-            if 'max_output_tokens' in llm_params:
-                del llm_params['max_output_tokens']
-
 
+    elif provider == "Groq":
         print(f"LLM_PROVIDERS.PY: Initializing Groq with model: {model_name}, Params: {llm_params}")
         return ChatGroq(
             groq_api_key=api_key,
@@ -92,23 +161,149 @@ def get_llm_instance(provider: str, ai_conf): # Added ai_conf parameter
         )
 
     elif provider == "TogetherAI":
-        api_key = os.getenv("TOGETHERAI_API_KEY")
-        model_name = selected_model
-        if not model_name:
-            model_name = os.getenv("TOGETHERAI_DEFAULT_MODEL", "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free")
-        if not api_key:
-            raise ValueError("TOGETHERAI_API_KEY not found for TogetherAI. Check .env file.")
-
-        # ChatOpenAI (used by TogetherAI) typically uses 'max_tokens'
-        if max_tokens_from_state is not None:
-            llm_params['max_tokens'] = max_tokens_from_state
-        
         print(f"LLM_PROVIDERS.PY: Initializing TogetherAI with model: {model_name}, Params: {llm_params}")
         return ChatOpenAI(
             model=model_name,
             openai_api_key=api_key,
             base_url="https://api.together.xyz/v1",
+            include_response_headers=True,
             **llm_params # Spread temperature, max_tokens
         )
-    else:
-        raise ValueError(f"Unsupported AI provider: {provider}. Supported: 'Gemini', 'OpenRouter', 'Groq', 'TogetherAI'.")
\ No newline at end of file
+    elif provider == "Local":
+        from src.llm.local_provider import create_local_chat_model # Offline provider; no SDK or network needed
+        print(f"LLM_PROVIDERS.PY: Initializing Local provider in '{model_name}' mode")
+        return create_local_chat_model(model_name, max_tokens_from_state)
+    raise ValueError(f"Unsupported AI provider: {provider}. Supported: 'Gemini', 'OpenRouter', 'Groq', 'TogetherAI', 'Local'.")
+
+
+def _llm_pool_key(provider: str, ai_conf, response_format: dict | None = None) -> tuple[tuple, str, str]:
+    model_name, api_key = _resolve_provider_settings(provider, ai_conf.selected_model_for_provider)
+    key = (
+        provider,
+        model_name,
+        ai_conf.temperature,
+        ai_conf.max_tokens,
+        _freeze(response_format),
+        _key_fingerprint(api_key),
+    )
+    return key, model_name, api_key
+
+
+def _evict_lru(pool: "OrderedDict[tuple, Any]"):
+    while len(pool) > LLM_POOL_MAX_SIZE:
+        evicted_key, _ = pool.popitem(last=False)
+        _pool_stats["evictions"] += 1
+        if pool is _llm_instance_pool:
+            # Chains hold a reference to the evicted client; drop them too.
+            for chain_key in [k for k in _llm_chain_pool if k[0] == evicted_key]:
+                del _llm_chain_pool[chain_key]
+        print(f"LLM_PROVIDERS.PY: Evicted pooled entry for {evicted_key[0] if pool is _llm_instance_pool else evicted_key[0][0]}")
+
+
+def get_llm_instance(provider: str, ai_conf, response_format: dict | None = None): # Added ai_conf parameter
+    """
+    Returns an LLM instance based on the specified provider, selected model,
+    and advanced settings from session state.
+
+    Instances are pooled process-wide and keyed by
+    (provider, model, temperature, max_tokens, response_format), so repeated calls
+    reuse the same client and its warm HTTP connection pool.
+    """
+    key, model_name, api_key = _llm_pool_key(provider, ai_conf, response_format)
+    with _pool_lock:
+        if key in _llm_instance_pool:
+            _llm_instance_pool.move_to_end(key)
+            _pool_stats["instance_hits"] += 1
+            return _llm_instance_pool[key]
+
+        _pool_stats["instance_misses"] += 1
+        llm = _create_llm_instance(
+            provider, model_name, api_key,
+            ai_conf.temperature, ai_conf.max_tokens, response_format
+        )
+        if LLM_CASSETTE_RECORD_PATH and provider != "Local":
+            from src.llm.local_provider import CassetteRecorder
+            llm.callbacks = [CassetteRecorder(LLM_CASSETTE_RECORD_PATH, provider, model_name)]
+        _llm_instance_pool[key] = llm
+        _evict_lru(_llm_instance_pool)
+        return llm
+
+
+def get_llm_chain(
+    provider: str,
+    ai_conf,
+    prompt_template_str: str,
+    output_parser: str | None = "str",
+    response_format: dict | None = None
+):
+    """
+    Returns a cached `prompt | llm | parser` chain built on a pooled LLM instance.
+    output_parser: "str" for StrOutputParser, "json" for JsonOutputParser, None for the raw message.
+    """
+    llm_key, _, _ = _llm_pool_key(provider, ai_conf, response_format)
+    chain_key = (llm_key, prompt_template_str, output_parser)
+    with _pool_lock:
+        if chain_key in _llm_chain_pool:
+            _llm_chain_pool.move_to_end(chain_key)
+            _pool_stats["chain_hits"] += 1
+            return _llm_chain_pool[chain_key]
+
+        _pool_stats["chain_misses"] += 1
+        llm = get_llm_instance(provider, ai_conf, response_format)
+        chain = ChatPromptTemplate.from_template(prompt_template_str) | llm
+        if output_parser == "str":
+            chain = chain | StrOutputParser()
+        elif output_parser == "json":
+            chain = chain | JsonOutputParser()
+        elif output_parser is not None:
+            raise ValueError(f"Unsupported output parser: {output_parser}. Supported: 'str', 'json', None.")
+        _llm_chain_pool[chain_key] = chain
+        _evict_lru(_llm_chain_pool)
+        return chain
+
+
+async def aget_llm_chain(
+    provider: str,
+    ai_conf,
+    prompt_template_str: str,
+    output_parser: str | None = "str",
+    response_format: dict | None = None
+):
+    """
+    Async counterpart of get_llm_chain for coroutine callers.
+    Pool hits return immediately; a cold miss builds the client in a worker thread so the
+    event loop is never blocked by client construction.
+    """
+    llm_key, _, _ = _llm_pool_key(provider, ai_conf, response_format)
+    with _pool_lock:
+        chain = _llm_chain_pool.get((llm_key, prompt_template_str, output_parser))
+    if chain is not None:
+        return get_llm_chain(provider, ai_conf, prompt_template_str, output_parser, response_format) # Records the hit, refreshes LRU
+    return await asyncio.to_thread(get_llm_chain, provider, ai_conf, prompt_template_str, output_parser, response_format)
+
+
+def invalidate_llm_instances(provider: str | None = None) -> int:
+    """
+    Drops pooled instances (and their chains) for one provider, or all of them.
+    Call this after rotating an API key or changing provider env settings.
+    Returns the number of LLM instances removed.
+    """
+    with _pool_lock:
+        instance_keys = [k for k in _llm_instance_pool if provider is None or k[0] == provider]
+        for key in instance_keys:
+            del _llm_instance_pool[key]
+        for chain_key in [k for k in _llm_chain_pool if provider is None or k[0][0] == provider]:
+            del _llm_chain_pool[chain_key]
+    print(f"LLM_PROVIDERS.PY: Invalidated {len(instance_keys)} pooled LLM instance(s) for {provider or 'all providers'}")
+    return len(instance_keys)
+
+
+def get_llm_pool_stats() -> dict:
+    """Returns hit/miss/eviction counters and the current pool sizes."""
+    with _pool_lock:
+        return {
+            **_pool_stats,
+            "instances": len(_llm_instance_pool),
+            "chains": len(_llm_chain_pool),
+            "max_size": LLM_POOL_MAX_SIZE,
+        }
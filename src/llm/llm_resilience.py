@@ -0,0 +1,409 @@
+# src/llm/llm_resilience.py
+"""
+Error classification, retries and circuit breaking for LLM calls.
+
+classify_llm_error turns any exception raised by a provider chain into one error_info dict
+(message, details, type, status_code, raw_response, retryable); the core generators map it to
+their own payload shapes instead of each scanning exception strings.
+
+llm_invocation runs every uncached call through call_with_retry / acall_with_retry /
+stream_with_retry. Retryable failures (timeouts, connection errors, 408/429/5xx) are retried
+with full-jitter exponential backoff (honouring Retry-After) within a per-call budget of
+attempts and seconds. Each provider has a circuit breaker: after LLM_BREAKER_FAILURE_THRESHOLD
+consecutive retryable failures it opens and calls fail fast with CircuitOpenError until
+LLM_BREAKER_RESET_SECONDS have passed; then one probe call decides whether it closes again.
+Fatal errors (configuration, context budget, unparseable output) are never retried and do not
+count against the breaker. Counters are exposed through get_resilience_stats.
+"""
+import os
+import re
+import ast
+import json
+import time
+import random
+import asyncio
+import threading
+from typing import Any, Callable, Iterator
+
+import httpx
+from langchain_core.exceptions import OutputParserException, LangChainException
+from pydantic import ValidationError
+
+from src.llm.rate_limiter import status_and_headers, parse_retry_after, response_header
+from src.llm.token_budget import ContextBudgetExceeded
+
+LLM_RETRY_MAX_ATTEMPTS = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "3")) # Attempts per call, including the first
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+LLM_RETRY_MAX_DELAY_SECONDS = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", "8"))
+LLM_RETRY_BUDGET_SECONDS = float(os.getenv("LLM_RETRY_BUDGET_SECONDS", "30")) # No retry starts after this much time
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+# Transport-level SDK errors that carry no status code (openai/groq, google api_core)
+RETRYABLE_EXCEPTION_NAMES = {"APIConnectionError", "APITimeoutError", "ServiceUnavailable", "DeadlineExceeded"}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+    def __init__(self, provider: str, retry_in_seconds: float):
+        super().__init__(
+            f"The AI service ({provider}) is temporarily unavailable after repeated failures; "
+            f"calls resume in about {max(1, round(retry_in_seconds))}s."
+        )
+        self.provider = provider
+        self.retry_in_seconds = retry_in_seconds
+
+
+# --- Error classification ---
+
+def extract_provider_message(payload: Any) -> str | None:
+    """Extracts a user-friendly error message from common provider error structures."""
+    if isinstance(payload, dict):
+        if "error" in payload:
+            error_content = payload["error"]
+            if isinstance(error_content, dict) and "message" in error_content:
+                return error_content["message"]
+            elif isinstance(error_content, str):
+                return error_content
+        elif "message" in payload:
+            return payload["message"]
+    elif isinstance(payload, str):
+        return payload
+    return None
+
+
+def _balanced_object(text: str, start: int) -> str | None:
+    """The {...} object starting at text[start], or None if it is not closed."""
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == "{":
+            depth += 1
+        elif text[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+def _embedded_error_payload(text: str) -> dict | None:
+    """
+    Error body embedded in an exception string: LangChain's wrapped httpx errors
+    (status_code=..., response=b'{...}' / response='{...}') or SDK errors such as
+    Groq's "Error code: 400 - {'error': {...}}" (a Python dict literal).
+    """
+    for marker in ("b'{", "response='{", "- {"):
+        index = text.find(marker)
+        if index == -1:
+            continue
+        candidate = _balanced_object(text, text.index("{", index))
+        if candidate is None:
+            continue
+        for parse in (lambda s: json.loads(s.replace("\\'", "'")), ast.literal_eval):
+            try:
+                parsed = parse(candidate)
+            except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+                continue
+            if isinstance(parsed, dict):
+                return parsed
+    return None
+
+
+def _status_from_text(text: str) -> int | None:
+    match = re.search(r"status_code=(\d{3})|Error code:\s*(\d{3})", text, re.IGNORECASE)
+    if match:
+        return int(match.group(1) or match.group(2))
+    return None
+
+
+def _is_transport_error(e: BaseException) -> bool:
+    return isinstance(e, (httpx.TransportError, TimeoutError, ConnectionError)) or \
+        type(e).__name__ in RETRYABLE_EXCEPTION_NAMES
+
+
+def classify_llm_error(e: BaseException, provider: str, activity: str = "the AI request") -> dict:
+    """
+    Maps an exception from an LLM call to error_info:
+    {"message", "details", "type", "status_code", "raw_response", "retryable"}
+    (plus "token_budget" for ContextBudgetExceeded). `activity` names the step in user messages.
+    """
+    info = {"message": "", "details": str(e), "type": "GenericError", "status_code": None,
+            "raw_response": None, "retryable": False}
+
+    if isinstance(e, CircuitOpenError):
+        info.update(message=str(e), type="CircuitOpen")
+    elif isinstance(e, ContextBudgetExceeded):
+        info.update(message=f"The input for {activity} is too long for the selected {provider} model, even after trimming. {e}",
+                    type="ContextBudgetExceeded", token_budget=e.report)
+    # Parse errors first: json.JSONDecodeError and pydantic's ValidationError are ValueErrors but say nothing about configuration
+    elif isinstance(e, (json.JSONDecodeError, OutputParserException, ValidationError)):
+        info.update(message=f"The AI's response ({provider}) could not be parsed during {activity}: {e}",
+                    type="OutputParsingError")
+    elif isinstance(e, ValueError):
+        info.update(message=f"LLM configuration error ({provider}) during {activity}: {e}", type="ConfigurationError")
+    elif _is_transport_error(e):
+        info.update(message=f"Could not reach the AI service ({provider}) during {activity}: {type(e).__name__}.",
+                    type="NetworkError", retryable=True)
+    else:
+        status, _ = status_and_headers(e)
+        response = getattr(e, "response", None)
+        payload = None
+        if status is not None and response is not None:
+            info["type"] = "HttpError"
+            raw_text = getattr(response, "text", None)
+            info["raw_response"] = raw_text if isinstance(raw_text, str) else None
+            try:
+                payload = response.json()
+            except Exception: # Not JSON, or a response stub without a body
+                payload = None
+            if info["raw_response"]:
+                info["details"] = f"Full details: {info['raw_response']}"
+        else:
+            text = str(e.args[0]) if e.args and isinstance(e.args[0], str) else str(e)
+            payload = e.args[0] if e.args and isinstance(e.args[0], dict) else _embedded_error_payload(text)
+            status = status if status is not None else _status_from_text(text)
+            if payload is not None:
+                info["type"] = "ProviderAPIError"
+                info["raw_response"] = json.dumps(payload, default=str)
+                info["details"] = info["raw_response"]
+            elif status is not None:
+                info["type"] = "HttpError"
+            elif isinstance(e, LangChainException):
+                info["type"] = "LangChainException"
+
+        info["status_code"] = status
+        info["retryable"] = status in RETRYABLE_STATUS_CODES
+        provider_message = extract_provider_message(payload) if payload is not None else None
+        if provider_message and status is not None:
+            info["message"] = f"The AI service ({provider}) reported (Status {status}) during {activity}: {provider_message}"
+        elif provider_message:
+            info["message"] = f"The AI service ({provider}) reported during {activity}: {provider_message}"
+        elif status is not None:
+            info["message"] = f"The AI service ({provider}) returned an HTTP error (Status: {status}) during {activity}."
+        else:
+            info["message"] = f"Unexpected error ({provider}) during {activity}: {type(e).__name__} - {e}"
+
+    attempts = getattr(e, "llm_attempts", None)
+    if attempts and attempts > 1:
+        info["message"] += f" (gave up after {attempts} attempts)"
+    return info
+
+
+# --- Circuit breakers ---
+
+class CircuitBreaker:
+    """Per-provider breaker (closed -> open -> half-open) plus the provider's retry counters."""
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.counters = {"attempts": 0, "retries": 0, "retries_exhausted": 0, "fatal_errors": 0,
+                         "times_opened": 0, "short_circuited": 0}
+
+    def _remaining_open_seconds(self) -> float:
+        return self.opened_at + LLM_BREAKER_RESET_SECONDS - time.monotonic()
+
+    def before_call(self):
+        """Raises CircuitOpenError while open; lets a single probe through once the reset period passed."""
+        with self._lock:
+            if self.state == "open":
+                remaining = self._remaining_open_seconds()
+                if remaining > 0:
+                    self.counters["short_circuited"] += 1
+                    raise CircuitOpenError(self.provider, remaining)
+                self.state = "half_open"
+                self.probe_in_flight = False
+            if self.state == "half_open":
+                if self.probe_in_flight:
+                    self.counters["short_circuited"] += 1
+                    raise CircuitOpenError(self.provider, 0.0)
+                self.probe_in_flight = True
+            self.counters["attempts"] += 1
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == "open" and self._remaining_open_seconds() > 0
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print(f"LLM_RESILIENCE: Circuit for {self.provider} closed again")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self, retryable: bool):
+        with self._lock:
+            self.probe_in_flight = False
+            if not retryable: # The provider answered; the request itself was at fault
+                self.counters["fatal_errors"] += 1
+                return
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= LLM_BREAKER_FAILURE_THRESHOLD:
+                if self.state != "open":
+                    self.counters["times_opened"] += 1
+                    print(f"LLM_RESILIENCE: Circuit for {self.provider} opened for {LLM_BREAKER_RESET_SECONDS:.0f}s "
+                          f"after {self.consecutive_failures} consecutive failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Frees the half-open probe slot of a call that was cancelled or abandoned."""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.consecutive_failures, **self.counters}
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    with _registry_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = _breakers[provider] = CircuitBreaker(provider)
+        return breaker
+
+
+def circuit_open(provider: str) -> bool:
+    with _registry_lock:
+        breaker = _breakers.get(provider)
+    return breaker is not None and breaker.is_open()
+
+
+def get_resilience_stats() -> dict:
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {breaker.provider: breaker.stats() for breaker in breakers}
+
+
+def reset_resilience_state():
+    with _registry_lock:
+        _breakers.clear()
+
+
+# --- Retries ---
+
+def _retry_delay(e: BaseException, attempt: int, started_at: float) -> float | None:
+    """Seconds to wait before the next attempt, or None if the call's retry budget is spent."""
+    if attempt + 1 >= LLM_RETRY_MAX_ATTEMPTS:
+        return None
+    delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY_SECONDS, LLM_RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+    _, headers = status_and_headers(e)
+    retry_after = parse_retry_after(response_header(headers, "Retry-After"))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    if time.monotonic() - started_at + delay > LLM_RETRY_BUDGET_SECONDS:
+        return None
+    return delay
+
+
+def _after_failure(breaker: CircuitBreaker, e: BaseException, attempt: int, started_at: float) -> float | None:
+    """Records the failure; returns the backoff before retrying, or None if `e` should propagate."""
+    retryable = classify_llm_error(e, breaker.provider)["retryable"]
+    breaker.record_failure(retryable)
+    delay = _retry_delay(e, attempt, started_at) if retryable else None
+    if delay is None:
+        if retryable:
+            breaker.count("retries_exhausted")
+        try:
+            e.llm_attempts = attempt + 1
+        except AttributeError:
+            pass
+        return None
+    breaker.count("retries")
+    print(f"LLM_RESILIENCE: {breaker.provider} call failed ({type(e).__name__}); retry {attempt + 1} in {delay:.2f}s")
+    return delay
+
+
+def call_with_retry(provider: str, call: Callable[[], Any]) -> tuple[Any, int]:
+    """Runs call() through the provider's breaker, retrying retryable failures. Returns (result, retries)."""
+    breaker = get_circuit_breaker(provider)
+    started_at = time.monotonic()
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = call()
+        except Exception as e:
+            delay = _after_failure(breaker, e, attempt, started_at)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+            continue
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+        return result, attempt
+
+
+async def acall_with_retry(provider: str, call: Callable[[], Any]) -> tuple[Any, int]:
+    """Async counterpart of call_with_retry; call() returns an awaitable."""
+    breaker = get_circuit_breaker(provider)
+    started_at = time.monotonic()
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await call()
+        except Exception as e:
+            delay = _after_failure(breaker, e, attempt, started_at)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        except BaseException: # e.g. the hedged race or the caller's task was cancelled
+            breaker.release()
+            raise
+        breaker.record_success()
+        return result, attempt
+
+
+def stream_with_retry(provider: str, make_stream: Callable[[], Iterator], retry_info: dict | None = None) -> Iterator:
+    """
+    Yields from make_stream() through the provider's breaker. A stream is retried only if it
+    failed before producing any chunk. If given, retry_info["retries"] is set once it completes.
+    """
+    breaker = get_circuit_breaker(provider)
+    started_at = time.monotonic()
+    attempt = 0
+    while True:
+        breaker.before_call()
+        produced_chunks = False
+        try:
+            for chunk in make_stream():
+                produced_chunks = True
+                yield chunk
+        except Exception as e:
+            if produced_chunks:
+                breaker.record_failure(classify_llm_error(e, provider)["retryable"])
+                raise
+            delay = _after_failure(breaker, e, attempt, started_at)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+            continue
+        except BaseException: # The consumer stopped iterating early
+            breaker.release()
+            raise
+        breaker.record_success()
+        if retry_info is not None:
+            retry_info["retries"] = attempt
+        return
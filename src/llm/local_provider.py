@@ -0,0 +1,416 @@
+# src/llm/local_provider.py
+"""
+"Local" LLM provider for offline benchmarking, profiling and load tests.
+
+Two modes, selected by the model name:
+- "synthetic": builds schema-valid answers for the app's prompts (places suggestions, vendor-reply
+  parsing, quotation JSON or its skeleton, itinerary segments) with a configurable
+  time-to-first-token and token rate.
+  Answers longer than max_tokens are cut off with a "length" stop reason, and continuation
+  prompts are answered with the rest of the original answer. Replayed answers are served as recorded.
+- "replay": serves responses recorded from real providers (a JSONL cassette), sleeping for the
+  recorded latency so the original latency profile is reproduced.
+
+Cassettes are recorded by setting LLM_CASSETTE_RECORD_PATH while using any real provider;
+every completed call is then appended to that file.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.utils.constants import PROJECT_ROOT
+
+LOCAL_MODES = ["synthetic", "replay"]
+DEFAULT_CASSETTE_PATH = os.path.join(PROJECT_ROOT, "benchmarks", "cassettes", "llm_cassette.jsonl")
+CHARS_PER_TOKEN = 4 # Rough estimate, good enough for latency simulation
+STREAM_CHUNK_TOKENS = 4
+
+
+def prompt_text_from_messages(messages: List[BaseMessage]) -> str:
+    return "\n".join(str(m.content) for m in messages)
+
+
+def prompt_fingerprint(prompt_text: str) -> str:
+    return hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def classify_prompt(prompt_text: str) -> str:
+    """
+    Which of the app's prompts this is: continuation, itinerary_segment, quotation_json, quotation_patch,
+    vendor_parse, places_suggestion or other.
+    """
+    if "=== PARTIAL ANSWER START ===" in prompt_text: # Also contains the original prompt, so checked first
+        return "continuation"
+    if "Fields To Update:" in prompt_text:
+        return "quotation_patch"
+    if "Days To Write:" in prompt_text:
+        return "itinerary_segment"
+    if "Output JSON Structure" in prompt_text:
+        return "quotation_json"
+    if "Vendor Reply:" in prompt_text:
+        return "vendor_parse"
+    if "suggest a list of key places" in prompt_text:
+        return "places_suggestion"
+    return "other"
+
+
+def _field(prompt_text: str, label: str, default: str = "") -> str:
+    match = re.search(rf"{re.escape(label)}:\s*(.+)", prompt_text)
+    return match.group(1).strip() if match else default
+
+
+# --- Synthetic responses ---
+
+def _synthetic_places(prompt_text: str) -> str:
+    destination = _field(prompt_text, "- Destination", "the destination")
+    trip_type = _field(prompt_text, "- Trip Type", "leisure")
+    themes = ["Old Town walking tour", "Local food market", "Sunset viewpoint", "Heritage museum",
+              "Scenic day excursion", "Cultural evening show", f"{trip_type} experience"]
+    return "\n".join(f"- {destination}: {theme}" for theme in themes)
+
+
+def _vendor_facts(vendor_text: str) -> tuple[str | None, str | None, list[str]]:
+    """(price, currency, hotel names) found in vendor text, raw or already parsed."""
+    price = re.search(r"((?:INR|USD|EUR|Rs\.?)\s?[\d,]+(?:\.\d+)?)", vendor_text)
+    currency = re.search(r"\b(INR|USD|EUR)\b", vendor_text)
+    hotels = re.findall(r"([A-Z][\w&' ]+?(?:Hotel|Resort|Inn|Villa|Palace|Retreat)[\w' ]*)", vendor_text)
+    return (price.group(1) if price else None, currency.group(1) if currency else None,
+            [hotel.strip() for hotel in hotels])
+
+
+def _vendor_list(vendor_text: str, header_pattern: str) -> list[str]:
+    """The "- item" bullets under the first header matching header_pattern (e.g. "Inclusions:")."""
+    match = re.search(rf"^(?:{header_pattern})\s*:?\s*\n((?:[-*\u2022] .+\n?)+)", vendor_text, re.IGNORECASE | re.MULTILINE)
+    return [line[2:].strip() for line in match.group(1).splitlines()] if match else []
+
+
+def _synthetic_vendor_parse(prompt_text: str) -> str:
+    """A ParsedVendorReply record of the reply, as the parsing prompt asks for."""
+    vendor_reply = prompt_text.split("Vendor Reply:", 1)[1].split("---")[1].strip() if "---" in prompt_text else ""
+    price, currency, hotels = _vendor_facts(vendor_reply)
+    basis = re.search(r"\b(per person|total)\b", vendor_reply, re.IGNORECASE)
+    days = re.findall(r"^\s*Day\s*(\d+)\s*[:\-]\s*(.+)$", vendor_reply, re.IGNORECASE | re.MULTILINE)
+    record = {
+        "price": price.split(" ", 1)[-1] if price else None,
+        "currency": currency,
+        "price_basis": basis.group(1).lower() if basis else None,
+        "pax_basis": None,
+        "hotels": [{"name": hotel, "city": None, "nights": None, "category": None} for hotel in hotels],
+        "meal_plan": None,
+        "room_configuration": None,
+        "inclusions": _vendor_list(vendor_reply, "inclusions|includes|included"),
+        "exclusions": _vendor_list(vendor_reply, "exclusions|excludes|not included|does not include"),
+        "itinerary_days": [{"day": day, "summary": summary.strip()} for day, summary in days],
+    }
+    return json.dumps(record)
+
+
+def _synthetic_quotation_patch(prompt_text: str) -> str:
+    """The fields to update, read from the updated vendor reply; unknown values keep their current value."""
+    fields = [field.strip() for field in _field(prompt_text, "Fields To Update").split(",") if field.strip()]
+    current = json.loads(_between(prompt_text, "Current Values (JSON, from the quotation generated from the previous vendor reply):\n",
+                                  "\n\nChanged Lines"))
+    vendor_reply = _between(prompt_text, "Updated Vendor Reply (full text):\n---\n", "\n---")
+    price, currency, hotels = _vendor_facts(vendor_reply)
+    destination = _field(prompt_text, "- Destination", "")
+    values = {
+        "cost_per_head": price,
+        "currency": currency,
+        "hotel_details": [{"destination_location": destination, "hotel_name": hotel, "nights": "As per itinerary"}
+                          for hotel in hotels] or None,
+        "inclusions": _vendor_list(vendor_reply, "inclusions|includes|included") or None,
+        "exclusions": _vendor_list(vendor_reply, "exclusions|excludes|not included|does not include") or None,
+    }
+    return json.dumps({field: values.get(field) or current.get(field) for field in fields}, indent=2)
+
+
+_SYNTHETIC_DAY_DETAIL_SENTENCES = [
+    "After breakfast at the hotel, set out with your driver for the morning's sightseeing, with time at each stop for photographs and short walks.",
+    "Break for lunch at a recommended local restaurant, then continue to the afternoon's attractions.",
+    "Later, browse through the markets for handicrafts, spices and souvenirs.",
+    "Return to the hotel in the evening with time to relax before dinner and an overnight stay.",
+]
+
+
+def _synthetic_day_description(destination: str) -> str:
+    """
+    One sentence by default. LOCAL_LLM_DAY_DETAIL_SENTENCES (0-4) adds more, so synthetic output
+    and latency grow per itinerary day like a real model's (see benchmarks/bench_segmented_itinerary.py).
+    """
+    detail = int(os.getenv("LOCAL_LLM_DAY_DETAIL_SENTENCES", "0"))
+    return " ".join([f"A full day discovering the highlights of {destination} at a relaxed pace, with time for local cuisine and shopping."]
+                    + _SYNTHETIC_DAY_DETAIL_SENTENCES[:max(0, detail)])
+
+
+def _synthetic_itinerary_segment(prompt_text: str) -> str:
+    destination = _field(prompt_text, "- Destination", "the destination")
+    day_numbers = [int(number) for number in re.findall(r"\d+", _field(prompt_text, "Days To Write"))]
+    days = [{"day_number": f"Day {day}", "description": _synthetic_day_description(destination)} for day in day_numbers]
+    return "```json\n" + json.dumps({"days": days}, indent=2) + "\n```"
+
+
+def _synthetic_quotation_json(prompt_text: str) -> str:
+    """Fills the rendered JSON template from the prompt itself, so the output always matches its schema."""
+    template = prompt_text.split("```json", 1)[1]
+    quotation = json.loads(template[:template.rfind("}") + 1])
+    destination = _field(prompt_text, "- Destination", quotation.get("destination_summary", ""))
+    try:
+        num_days = max(1, int(_field(prompt_text, "- Number of Days", "1")))
+    except ValueError:
+        num_days = 1
+    first_day = (quotation.get("detailed_itinerary") or [{}])[0]
+    # Vendor facts come from the parsed vendor text (two-stage graph) or the raw reply (single-pass graph)
+    vendor_section = re.search(r"(?:Parsed Vendor Information|Raw Vendor Reply) \([^\n]*\):\n---\n(.*?)\n---", prompt_text, re.DOTALL)
+    price, currency, hotels = _vendor_facts(vendor_section.group(1) if vendor_section else "")
+    if price:
+        quotation["cost_per_head"] = price
+    if currency:
+        quotation["currency"] = currency
+    if hotels:
+        quotation["hotel_details"] = [{"destination_location": destination, "hotel_name": hotel, "nights": "As per itinerary"}
+                                      for hotel in hotels]
+    if "outline" in first_day: # Skeleton prompt of the segmented graph: no descriptions
+        quotation["detailed_itinerary"] = [first_day] + [
+            {"day_number": f"Day {day}", "city": destination, "title": f"Exploring {destination} - Day {day}",
+             "outline": f"Sightseeing, local cuisine and shopping in {destination}."}
+            for day in range(2, num_days + 1)
+        ]
+    else:
+        quotation["detailed_itinerary"] = [first_day] + [
+            {"day_number": f"Day {day}", "title": f"Exploring {destination} - Day {day}",
+             "description": _synthetic_day_description(destination)}
+            for day in range(2, num_days + 1)
+        ]
+    return "```json\n" + json.dumps(quotation, indent=2) + "\n```"
+
+
+def _between(text: str, start_marker: str, end_marker: str) -> str:
+    return text.split(start_marker, 1)[1].split(end_marker, 1)[0].strip("\n")
+
+
+def _synthetic_continuation(prompt_text: str) -> str:
+    """The part of the original prompt's synthetic answer that follows the partial answer."""
+    original_prompt = _between(prompt_text, "=== ORIGINAL REQUEST START ===", "=== ORIGINAL REQUEST END ===")
+    partial = _between(prompt_text, "=== PARTIAL ANSWER START ===", "=== PARTIAL ANSWER END ===")
+    full = synthetic_response(original_prompt)
+    return full[len(partial):] if full.startswith(partial) else full
+
+
+def synthetic_response(prompt_text: str) -> str:
+    kind = classify_prompt(prompt_text)
+    if kind == "continuation":
+        return _synthetic_continuation(prompt_text)
+    if kind == "itinerary_segment":
+        return _synthetic_itinerary_segment(prompt_text)
+    if kind == "quotation_json":
+        return _synthetic_quotation_json(prompt_text)
+    if kind == "quotation_patch":
+        return _synthetic_quotation_patch(prompt_text)
+    if kind == "vendor_parse":
+        return _synthetic_vendor_parse(prompt_text)
+    if kind == "places_suggestion":
+        return _synthetic_places(prompt_text)
+    return f"Synthetic response ({estimate_tokens(prompt_text)} prompt tokens received)."
+
+
+# --- Cassettes ---
+
+class Cassette:
+    """Recorded calls, looked up by exact prompt hash, else round-robin among calls of the same prompt kind."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._by_fingerprint: dict[str, dict] = {}
+        self._by_kind: dict[str, list[dict]] = defaultdict(list)
+        self._next_index: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._by_fingerprint[entry["prompt_sha256"]] = entry
+                        self._by_kind[entry.get("prompt_kind", "other")].append(entry)
+
+    def lookup(self, prompt_text: str) -> dict:
+        entry = self._by_fingerprint.get(prompt_fingerprint(prompt_text))
+        if entry is not None:
+            return entry
+        kind = classify_prompt(prompt_text)
+        with self._lock:
+            entries = self._by_kind.get(kind)
+            if not entries:
+                raise ValueError(f"No recorded '{kind}' responses in cassette {self.path}. Record one with LLM_CASSETTE_RECORD_PATH.")
+            entry = entries[self._next_index[kind] % len(entries)]
+            self._next_index[kind] += 1
+        return entry
+
+
+_cassettes: dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def load_cassette(path: str) -> Cassette:
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+
+class CassetteRecorder(BaseCallbackHandler):
+    """Appends every completed chat-model call (prompt hash, response, latency profile) to a JSONL cassette."""
+
+    def __init__(self, path: str, provider: str, model: str):
+        self.path = path
+        self.provider = provider
+        self.model = model
+        self._runs: dict[Any, dict] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._runs[run_id] = {"prompt": prompt_text_from_messages(messages[0]), "start": time.perf_counter(), "first_token": None}
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None and run["first_token"] is None:
+            run["first_token"] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None or not response.generations or not response.generations[0]:
+            return
+        latency = time.perf_counter() - run["start"]
+        text = response.generations[0][0].text
+        entry = {
+            "prompt_sha256": prompt_fingerprint(run["prompt"]),
+            "prompt_kind": classify_prompt(run["prompt"]),
+            "provider": self.provider,
+            "model": self.model,
+            "response": text,
+            "ttft_seconds": round((run["first_token"] or time.perf_counter()) - run["start"], 3),
+            "latency_seconds": round(latency, 3),
+            "prompt_tokens": estimate_tokens(run["prompt"]),
+            "completion_tokens": estimate_tokens(text),
+        }
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._runs.pop(run_id, None)
+
+
+# --- Chat model ---
+
+class LocalChatModel(BaseChatModel):
+    """Offline chat model; see module docstring for the two modes."""
+    mode: str = "synthetic"
+    ttft_seconds: float = 0.3
+    tokens_per_second: float = 50.0
+    latency_scale: float = 1.0
+    cassette_path: str = DEFAULT_CASSETTE_PATH
+    max_tokens: Optional[int] = None # Output limit; longer answers stop with finish_reason "length"
+
+    @property
+    def _llm_type(self) -> str:
+        return f"local-{self.mode}"
+
+    def _plan(self, messages: List[BaseMessage]) -> tuple[str, float, float, int, str]:
+        """Returns (text, ttft_seconds, total_seconds, prompt_tokens, finish_reason) for this call."""
+        prompt_text = prompt_text_from_messages(messages)
+        finish_reason = "stop"
+        if self.mode == "replay":
+            entry = load_cassette(self.cassette_path).lookup(prompt_text)
+            text = entry["response"]
+            ttft, total = entry.get("ttft_seconds", 0.0), entry.get("latency_seconds", 0.0)
+        elif self.mode == "synthetic":
+            text = synthetic_response(prompt_text)
+            if self.max_tokens and estimate_tokens(text) > self.max_tokens:
+                text, finish_reason = text[:self.max_tokens * CHARS_PER_TOKEN], "length"
+            ttft = self.ttft_seconds
+            total = ttft + estimate_tokens(text) / self.tokens_per_second
+        else:
+            raise ValueError(f"Unsupported Local provider mode: {self.mode}. Supported: {', '.join(LOCAL_MODES)}.")
+        return text, ttft * self.latency_scale, max(ttft, total) * self.latency_scale, estimate_tokens(prompt_text), finish_reason
+
+    def _message(self, text: str, prompt_tokens: int, finish_reason: str) -> AIMessage:
+        completion_tokens = estimate_tokens(text)
+        return AIMessage(content=text, response_metadata={"finish_reason": finish_reason}, usage_metadata={
+            "input_tokens": prompt_tokens, "output_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens
+        })
+
+    def _chunks(self, text: str) -> list[str]:
+        size = STREAM_CHUNK_TOKENS * CHARS_PER_TOKEN
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    def _chunk_message(self, piece: str, is_last: bool, finish_reason: str) -> AIMessageChunk:
+        return AIMessageChunk(content=piece, response_metadata={"finish_reason": finish_reason} if is_last else {})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        text, _, total, prompt_tokens, finish_reason = self._plan(messages)
+        time.sleep(total)
+        return ChatResult(generations=[ChatGeneration(message=self._message(text, prompt_tokens, finish_reason))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        text, _, total, prompt_tokens, finish_reason = self._plan(messages)
+        await asyncio.sleep(total)
+        return ChatResult(generations=[ChatGeneration(message=self._message(text, prompt_tokens, finish_reason))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        text, ttft, total, _, finish_reason = self._plan(messages)
+        chunks = self._chunks(text)
+        per_chunk = (total - ttft) / len(chunks)
+        time.sleep(ttft)
+        for i, piece in enumerate(chunks):
+            if i:
+                time.sleep(per_chunk)
+            chunk = ChatGenerationChunk(message=self._chunk_message(piece, i == len(chunks) - 1, finish_reason))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        text, ttft, total, _, finish_reason = self._plan(messages)
+        chunks = self._chunks(text)
+        per_chunk = (total - ttft) / len(chunks)
+        await asyncio.sleep(ttft)
+        for i, piece in enumerate(chunks):
+            if i:
+                await asyncio.sleep(per_chunk)
+            chunk = ChatGenerationChunk(message=self._chunk_message(piece, i == len(chunks) - 1, finish_reason))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+
+def create_local_chat_model(mode: str, max_tokens: int | None = None) -> LocalChatModel:
+    """
+    Builds the Local client from LOCAL_LLM_* env settings (read at creation, so benchmarks can change them).
+    Without max_tokens, LOCAL_LLM_DEFAULT_MAX_OUTPUT_TOKENS (0 = unlimited) stands in for a provider's default output cap.
+    """
+    return LocalChatModel(
+        mode=mode,
+        ttft_seconds=float(os.getenv("LOCAL_LLM_TTFT_SECONDS", "0.3")),
+        tokens_per_second=float(os.getenv("LOCAL_LLM_TOKENS_PER_SECOND", "50")),
+        latency_scale=float(os.getenv("LOCAL_LLM_LATENCY_SCALE", "1.0")),
+        cassette_path=os.getenv("LOCAL_LLM_CASSETTE_PATH", DEFAULT_CASSETTE_PATH),
+        max_tokens=max_tokens or int(os.getenv("LOCAL_LLM_DEFAULT_MAX_OUTPUT_TOKENS", "0")) or None,
+    )
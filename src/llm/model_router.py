@@ -0,0 +1,161 @@
+# src/llm/model_router.py
+"""
+Latency-aware, stage-aware model routing.
+
+With ai_config.model_routing_enabled, each LLM stage (places_suggestion, parse_vendor_reply,
+structure_quotation) is served by a (provider, model) picked from STAGE_MODEL_CANDIDATES rather
+than the single sidebar selection. Candidates are ranked by expected latency:
+  - live EWMA latency of the (provider, model) for this stage, or a prior that follows the
+    configured order until the model has been observed on the stage,
+  - penalised by the model's EWMA error rate (across stages: outages are not stage-specific),
+  - excluding providers without an API key or with an open circuit breaker, models cooling down
+    after repeated failures and models whose context window cannot hold the input.
+llm_invocation tries the ranked candidates in order, so a failing model falls back to the next.
+The decision is attached to call_info["routing"] and ends up in the quotation's generation_metadata.
+"""
+import os
+import time
+import threading
+from typing import Any
+
+from src.llm.llm_providers import ensure_provider_configured, resolve_model_name
+from src.llm.token_budget import context_window_for, output_reservation_for
+from src.llm.llm_resilience import circuit_open
+from src.utils.constants import STAGE_MODEL_CANDIDATES
+
+ROUTER_EWMA_ALPHA = float(os.getenv("ROUTER_EWMA_ALPHA", "0.3"))
+ROUTER_PRIOR_LATENCY_SECONDS = float(os.getenv("ROUTER_PRIOR_LATENCY_SECONDS", "5.0"))
+# Each later position in the configured order adds this fraction to the prior latency
+ROUTER_PRIOR_ORDER_PENALTY = 0.25
+# Expected latency is multiplied by (1 + penalty * error rate)
+ROUTER_ERROR_RATE_PENALTY = 4.0
+ROUTER_FAILURE_THRESHOLD = int(os.getenv("ROUTER_FAILURE_THRESHOLD", "3"))
+ROUTER_COOLDOWN_SECONDS = float(os.getenv("ROUTER_COOLDOWN_SECONDS", "60"))
+
+
+class ModelHealthTracker:
+    """Per (provider, model): EWMA latency per stage, EWMA error rate and a failure cooldown."""
+
+    def __init__(self, alpha: float = ROUTER_EWMA_ALPHA):
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._health: dict[tuple[str, str], dict] = {}
+
+    def _entry(self, provider: str, model: str | None) -> dict:
+        return self._health.setdefault((provider, model or ""), {
+            "ewma_latency_seconds": {}, "ewma_error_rate": 0.0, "calls": 0,
+            "consecutive_failures": 0, "cooldown_until": 0.0,
+        })
+
+    def record_success(self, provider: str, model: str | None, latency_seconds: float, stage: str = ""):
+        with self._lock:
+            entry = self._entry(provider, model)
+            previous = entry["ewma_latency_seconds"].get(stage)
+            entry["ewma_latency_seconds"][stage] = latency_seconds if previous is None else \
+                self.alpha * latency_seconds + (1 - self.alpha) * previous
+            entry["ewma_error_rate"] *= (1 - self.alpha)
+            entry["calls"] += 1
+            entry["consecutive_failures"] = 0
+
+    def record_failure(self, provider: str, model: str | None):
+        with self._lock:
+            entry = self._entry(provider, model)
+            entry["ewma_error_rate"] = self.alpha + (1 - self.alpha) * entry["ewma_error_rate"]
+            entry["calls"] += 1
+            entry["consecutive_failures"] += 1
+            if entry["consecutive_failures"] >= ROUTER_FAILURE_THRESHOLD:
+                entry["cooldown_until"] = time.monotonic() + ROUTER_COOLDOWN_SECONDS
+                print(f"MODEL_ROUTER: {provider}/{model} cooling down for {ROUTER_COOLDOWN_SECONDS:.0f}s after "
+                      f"{entry['consecutive_failures']} consecutive failures")
+
+    def snapshot(self, provider: str, model: str | None) -> dict:
+        with self._lock:
+            entry = dict(self._entry(provider, model))
+            entry["ewma_latency_seconds"] = dict(entry["ewma_latency_seconds"])
+        entry["cooling_down"] = entry.pop("cooldown_until") > time.monotonic()
+        return entry
+
+    def all_stats(self) -> dict:
+        with self._lock:
+            keys = list(self._health)
+        return {f"{provider}/{model}": self.snapshot(provider, model) for provider, model in keys}
+
+    def reset(self):
+        with self._lock:
+            self._health.clear()
+
+
+model_health = ModelHealthTracker()
+
+
+def get_model_health_stats() -> dict:
+    return model_health.all_stats()
+
+
+def routing_requested(stage: str, ai_conf: Any) -> bool:
+    return bool(getattr(ai_conf, "model_routing_enabled", False)) and stage in STAGE_MODEL_CANDIDATES
+
+
+def routed_ai_conf(ai_conf: Any, provider: str, model: str | None) -> Any:
+    """Copy of ai_conf targeting (provider, model); routing is switched off so the call is not re-routed."""
+    return ai_conf.model_copy(update={
+        "selected_ai_provider": provider,
+        "selected_model_for_provider": model,
+        "model_routing_enabled": False,
+    })
+
+
+def _candidate_list(stage: str, provider: str, ai_conf: Any) -> list[tuple[str, str | None]]:
+    selected = (provider, resolve_model_name(provider, ai_conf.selected_model_for_provider))
+    candidates = [(p, m) for p, m in STAGE_MODEL_CANDIDATES.get(stage, [])]
+    if selected not in candidates:
+        candidates.append(selected)
+    return candidates
+
+
+def route(stage: str, provider: str, ai_conf: Any, input_tokens: int) -> dict:
+    """
+    Ranks the stage's candidates for a prompt of `input_tokens` tokens. Returns the routing decision:
+    {"stage", "input_tokens", "ranked": [{"provider", "model", "expected_latency_seconds", ...}],
+     "excluded": [{"provider", "model", "reason"}]}. "ranked" is never empty: if every candidate is
+    excluded, the sidebar-selected provider/model is used as before.
+    """
+    reservation = output_reservation_for(ai_conf)
+    ranked, excluded = [], []
+    for index, (candidate_provider, candidate_model) in enumerate(_candidate_list(stage, provider, ai_conf)):
+        try:
+            ensure_provider_configured(candidate_provider)
+        except ValueError:
+            excluded.append({"provider": candidate_provider, "model": candidate_model, "reason": "not_configured"})
+            continue
+        if circuit_open(candidate_provider):
+            excluded.append({"provider": candidate_provider, "model": candidate_model, "reason": "circuit_open"})
+            continue
+        window = context_window_for(candidate_model)
+        if input_tokens + min(reservation, window // 2) > window:
+            excluded.append({"provider": candidate_provider, "model": candidate_model, "reason": "context_window"})
+            continue
+        health = model_health.snapshot(candidate_provider, candidate_model)
+        if health["cooling_down"]:
+            excluded.append({"provider": candidate_provider, "model": candidate_model, "reason": "cooling_down"})
+            continue
+        observed = health["ewma_latency_seconds"].get(stage)
+        expected = observed if observed is not None else ROUTER_PRIOR_LATENCY_SECONDS * (1 + ROUTER_PRIOR_ORDER_PENALTY * index)
+        ranked.append({
+            "provider": candidate_provider,
+            "model": candidate_model,
+            "expected_latency_seconds": round(expected, 3),
+            "error_rate": round(health["ewma_error_rate"], 3),
+            "observed": observed is not None,
+            "score": round(expected * (1 + ROUTER_ERROR_RATE_PENALTY * health["ewma_error_rate"]), 3),
+        })
+
+    ranked.sort(key=lambda c: c["score"])
+    if not ranked:
+        selected_model = resolve_model_name(provider, ai_conf.selected_model_for_provider)
+        ranked = [{"provider": provider, "model": selected_model, "expected_latency_seconds": None,
+                   "error_rate": None, "observed": False, "score": None}]
+    decision = {"stage": stage, "input_tokens": input_tokens, "ranked": ranked, "excluded": excluded}
+    print(f"MODEL_ROUTER: '{stage}' ({input_tokens} tokens) -> " +
+          ", ".join(f"{c['provider']}/{c['model']} ({c['score']})" for c in ranked))
+    return decision
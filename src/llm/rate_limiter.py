@@ -0,0 +1,385 @@
+# src/llm/rate_limiter.py
+"""
+Adaptive per-(provider, model) rate limiting for LLM calls.
+
+Each limiter combines a token bucket (requests per second, with a burst allowance) and an
+AIMD concurrency window. The window grows by about one slot per window of successful calls
+and halves on a 429/503. `Retry-After` and `x-ratelimit-remaining`/`x-ratelimit-reset` headers
+pause the limiter until the provider says capacity is back. Callers that cannot get a slot wait
+in FIFO order instead of failing. Both sync (thread) and async callers are supported.
+"""
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from email.utils import parsedate_to_datetime
+from itertools import count
+from typing import Any
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+RATE_LIMIT_RPS = float(os.getenv("LLM_RATE_LIMIT_RPS", "5.0"))
+RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_INITIAL_CONCURRENCY = float(os.getenv("LLM_RATE_LIMIT_INITIAL_CONCURRENCY", "4"))
+RATE_LIMIT_MAX_CONCURRENCY = float(os.getenv("LLM_RATE_LIMIT_MAX_CONCURRENCY", "16"))
+RATE_LIMIT_MIN_CONCURRENCY = 1.0
+RATE_LIMIT_DECREASE_FACTOR = 0.5
+RATE_LIMIT_DEFAULT_BACKOFF_SECONDS = 1.0 # Pause after a 429/503 that carries no Retry-After
+RATE_LIMIT_MAX_REQUEUES = int(os.getenv("LLM_RATE_LIMIT_MAX_REQUEUES", "2")) # Throttled calls re-queued before failing
+RATE_LIMIT_LOW_REMAINING = 1 # x-ratelimit-remaining at or below this pauses until x-ratelimit-reset
+ASYNC_POLL_INTERVAL_SECONDS = 0.02
+THROTTLE_STATUS_CODES = {429, 503}
+
+_rate_limiting_enabled = os.getenv("LLM_RATE_LIMIT_ENABLED", "true").lower() == "true"
+
+
+def set_rate_limiting_enabled(enabled: bool):
+    """Turns limiting on/off process-wide (e.g. for benchmarks against stub providers)."""
+    global _rate_limiting_enabled
+    _rate_limiting_enabled = enabled
+
+
+def rate_limiting_enabled() -> bool:
+    return _rate_limiting_enabled
+
+
+def response_header(headers: Any, name: str) -> str | None:
+    """Header value from a provider error's response headers (any mapping, exact or lower-case name), else None."""
+    if not headers:
+        return None
+    try:
+        value = headers.get(name)
+        if value is None:
+            value = headers.get(name.lower())
+        return value
+    except AttributeError:
+        return None
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Retry-After is either delay-seconds or an HTTP date."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_reset_seconds(value: str | None) -> float | None:
+    """
+    x-ratelimit-reset comes as epoch milliseconds (OpenRouter), epoch seconds,
+    plain seconds, or a duration such as "1m30s" / "250ms" (OpenAI-compatible APIs).
+    """
+    if value is None:
+        return None
+    try:
+        number = float(value)
+        if number > 1e12:
+            return max(0.0, number / 1000.0 - time.time())
+        if number > 1e9:
+            return max(0.0, number - time.time())
+        return max(0.0, number)
+    except ValueError:
+        pass
+    total, digits = 0.0, ""
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if ch.isdigit() or ch == ".":
+            digits += ch
+            i += 1
+            continue
+        unit = "ms" if value[i:i + 2] == "ms" else ch
+        if unit not in units or not digits:
+            return None
+        total += float(digits) * units[unit]
+        digits = ""
+        i += len(unit)
+    return total if not digits else None
+
+
+def status_and_headers(e: BaseException) -> tuple[int | None, Any]:
+    """Best-effort HTTP status code and response headers from provider SDK / httpx exceptions."""
+    response = getattr(e, "response", None)
+    status = getattr(e, "status_code", None) or getattr(response, "status_code", None)
+    if status is None:
+        code = getattr(e, "code", None) # google.api_core exceptions (e.g. ResourceExhausted -> 429)
+        status = int(code) if isinstance(code, int) else None
+    headers = getattr(response, "headers", None)
+    return (status if isinstance(status, int) else None), headers
+
+
+def is_rate_limited_error(e: BaseException) -> bool:
+    status, _ = status_and_headers(e)
+    return status in THROTTLE_STATUS_CODES
+
+
+class _HeaderObserver(BaseCallbackHandler):
+    """Feeds x-ratelimit-* headers from successful responses (response_metadata["headers"]) to a limiter."""
+
+    def __init__(self, limiter: "AdaptiveRateLimiter"):
+        self._limiter = limiter
+
+    def on_llm_end(self, response, **kwargs):
+        for generation_list in getattr(response, "generations", []) or []:
+            for generation in generation_list:
+                message = getattr(generation, "message", None)
+                headers = (getattr(message, "response_metadata", None) or {}).get("headers")
+                if headers:
+                    self._limiter.observe_headers(headers)
+
+
+class AdaptiveRateLimiter:
+    """Token bucket + AIMD concurrency window for one (provider, model)."""
+
+    def __init__(self, provider: str, model: str | None):
+        self.provider = provider
+        self.model = model
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._limit = RATE_LIMIT_INITIAL_CONCURRENCY
+        self._in_flight = 0
+        self._tokens = float(RATE_LIMIT_BURST)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._queue: deque[int] = deque()
+        self._tickets = count()
+        self._stats = {"calls": 0, "throttled": 0, "queued": 0, "total_wait_seconds": 0.0, "max_wait_seconds": 0.0}
+        self.header_observer = _HeaderObserver(self)
+
+    # --- internal, called with the lock held ---
+    def _refill(self, now: float):
+        self._tokens = min(float(RATE_LIMIT_BURST), self._tokens + (now - self._last_refill) * RATE_LIMIT_RPS)
+        self._last_refill = now
+
+    def _try_take(self, ticket: int) -> float:
+        """Takes a slot and a token if `ticket` is at the head of the queue. Returns 0.0 or a wait hint."""
+        now = time.monotonic()
+        self._refill(now)
+        if self._queue[0] != ticket:
+            return ASYNC_POLL_INTERVAL_SECONDS
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._in_flight >= math.floor(self._limit):
+            return ASYNC_POLL_INTERVAL_SECONDS
+        if self._tokens < 1.0:
+            return (1.0 - self._tokens) / RATE_LIMIT_RPS
+        self._tokens -= 1.0
+        self._in_flight += 1
+        self._queue.popleft()
+        self._cond.notify_all() # Next ticket is now at the head
+        return 0.0
+
+    def _enqueue(self) -> int:
+        ticket = next(self._tickets)
+        self._queue.append(ticket)
+        if len(self._queue) > 1 or self._in_flight >= math.floor(self._limit):
+            self._stats["queued"] += 1
+        return ticket
+
+    def _dequeue(self, ticket: int):
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            self._cond.notify_all()
+
+    def _record_wait(self, waited: float):
+        self._stats["calls"] += 1
+        self._stats["total_wait_seconds"] += waited
+        self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+
+    # --- acquire / release ---
+    def acquire(self) -> float:
+        """Blocks until a slot is available. Returns the seconds spent waiting."""
+        start = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue()
+            try:
+                while (hint := self._try_take(ticket)) > 0:
+                    self._cond.wait(timeout=hint)
+            except BaseException:
+                self._dequeue(ticket)
+                raise
+            waited = time.monotonic() - start
+            self._record_wait(waited)
+            return waited
+
+    async def aacquire(self) -> float:
+        """Async acquire: waits without blocking the event loop; cancellation leaves the queue."""
+        start = time.monotonic()
+        with self._lock:
+            ticket = self._enqueue()
+        try:
+            while True:
+                with self._lock:
+                    hint = self._try_take(ticket)
+                    if hint == 0:
+                        waited = time.monotonic() - start
+                        self._record_wait(waited)
+                        return waited
+                await asyncio.sleep(min(hint, 0.25))
+        except BaseException:
+            with self._lock:
+                self._dequeue(ticket)
+            raise
+
+    def release(self, error: BaseException | None = None):
+        """Frees the slot and adapts the window: additive increase on success, multiplicative decrease on 429/503."""
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            if error is None:
+                self._limit = min(RATE_LIMIT_MAX_CONCURRENCY, self._limit + 1.0 / self._limit)
+            else:
+                status, headers = status_and_headers(error)
+                if status in THROTTLE_STATUS_CODES:
+                    self._stats["throttled"] += 1
+                    self._limit = max(RATE_LIMIT_MIN_CONCURRENCY, self._limit * RATE_LIMIT_DECREASE_FACTOR)
+                    retry_after = parse_retry_after(response_header(headers, "Retry-After"))
+                    self._pause_for(retry_after if retry_after is not None else RATE_LIMIT_DEFAULT_BACKOFF_SECONDS)
+                    print(f"RATE_LIMITER: {self.provider}/{self.model} throttled (HTTP {status}); "
+                          f"concurrency limit now {math.floor(self._limit)}, pausing {max(0.0, self._paused_until - time.monotonic()):.1f}s")
+                if headers:
+                    self._observe_headers_locked(headers)
+            self._cond.notify_all()
+
+    def _pause_for(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = min(self._tokens, 0.0)
+
+    def _observe_headers_locked(self, headers: Any):
+        remaining = response_header(headers, "x-ratelimit-remaining") or response_header(headers, "x-ratelimit-remaining-requests")
+        try:
+            remaining_count = int(float(remaining)) if remaining is not None else None
+        except ValueError:
+            remaining_count = None
+        if remaining_count is not None and remaining_count <= RATE_LIMIT_LOW_REMAINING:
+            reset = parse_reset_seconds(response_header(headers, "x-ratelimit-reset") or response_header(headers, "x-ratelimit-reset-requests"))
+            self._pause_for(reset if reset is not None else RATE_LIMIT_DEFAULT_BACKOFF_SECONDS)
+
+    def observe_headers(self, headers: Any):
+        with self._cond:
+            self._observe_headers_locked(headers)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        except BaseException as e:
+            self.release(e)
+            raise
+        self.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.aacquire()
+        try:
+            yield
+        except BaseException as e:
+            self.release(e)
+            raise
+        self.release()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            calls = self._stats["calls"]
+            return {
+                "concurrency_limit": math.floor(self._limit),
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._queue),
+                "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3),
+                "calls": calls,
+                "queued": self._stats["queued"],
+                "throttled": self._stats["throttled"],
+                "avg_wait_seconds": round(self._stats["total_wait_seconds"] / calls, 3) if calls else 0.0,
+                "max_wait_seconds": round(self._stats["max_wait_seconds"], 3),
+            }
+
+
+_registry_lock = threading.Lock()
+_limiters: dict[tuple[str, str], AdaptiveRateLimiter] = {}
+
+
+def get_rate_limiter(provider: str, model: str | None) -> AdaptiveRateLimiter:
+    key = (provider, model or "")
+    with _registry_lock:
+        if key not in _limiters:
+            _limiters[key] = AdaptiveRateLimiter(provider, model)
+        return _limiters[key]
+
+
+def get_rate_limiter_metrics() -> dict:
+    """Current limit, queue depth and wait times per "provider/model"."""
+    with _registry_lock:
+        limiters = list(_limiters.items())
+    return {f"{provider}/{model}" if model else provider: limiter.metrics() for (provider, model), limiter in limiters}
+
+
+def reset_rate_limiters():
+    with _registry_lock:
+        _limiters.clear()
+
+
+def call_with_rate_limit(provider: str, model: str | None, call):
+    """
+    Runs call(callbacks) inside a limiter slot. Throttled (429/503) calls are re-queued behind
+    the limiter's pause up to RATE_LIMIT_MAX_REQUEUES times before the error propagates.
+    """
+    if not _rate_limiting_enabled:
+        return call([])
+    limiter = get_rate_limiter(provider, model)
+    for attempt in range(RATE_LIMIT_MAX_REQUEUES + 1):
+        try:
+            with limiter.slot():
+                return call([limiter.header_observer])
+        except Exception as e:
+            if attempt >= RATE_LIMIT_MAX_REQUEUES or not is_rate_limited_error(e):
+                raise
+            print(f"RATE_LIMITER: Re-queueing throttled call to {provider}/{model} (attempt {attempt + 1})")
+
+
+async def acall_with_rate_limit(provider: str, model: str | None, call):
+    """Async counterpart of call_with_rate_limit; `call(callbacks)` returns an awaitable."""
+    if not _rate_limiting_enabled:
+        return await call([])
+    limiter = get_rate_limiter(provider, model)
+    for attempt in range(RATE_LIMIT_MAX_REQUEUES + 1):
+        try:
+            async with limiter.aslot():
+                return await call([limiter.header_observer])
+        except Exception as e:
+            if attempt >= RATE_LIMIT_MAX_REQUEUES or not is_rate_limited_error(e):
+                raise
+            print(f"RATE_LIMITER: Re-queueing throttled call to {provider}/{model} (attempt {attempt + 1})")
+
+
+def stream_with_rate_limit(provider: str, model: str | None, make_stream):
+    """
+    Yields from make_stream(callbacks) while holding a limiter slot for the whole stream.
+    A throttled stream is re-queued only if it failed before producing any chunk.
+    """
+    if not _rate_limiting_enabled:
+        yield from make_stream([])
+        return
+    limiter = get_rate_limiter(provider, model)
+    for attempt in range(RATE_LIMIT_MAX_REQUEUES + 1):
+        produced_chunks = False
+        try:
+            with limiter.slot():
+                for chunk in make_stream([limiter.header_observer]):
+                    produced_chunks = True
+                    yield chunk
+            return
+        except Exception as e:
+            if produced_chunks or attempt >= RATE_LIMIT_MAX_REQUEUES or not is_rate_limited_error(e):
+                raise
+            print(f"RATE_LIMITER: Re-queueing throttled stream to {provider}/{model} (attempt {attempt + 1})")
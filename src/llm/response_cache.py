@@ -0,0 +1,179 @@
+# src/llm/response_cache.py
+"""
+Persistent LLM response cache backed by SQLite.
+
+Entries are keyed by a hash of (rendered prompt, provider, model, temperature, max_tokens,
+output parser/response format), expire after a TTL and are evicted least-recently-used once
+the cache holds more than LLM_CACHE_MAX_ENTRIES responses. The cache file is shared by every
+session and survives restarts, so regenerating with identical inputs costs no tokens.
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Any
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_responses.sqlite3"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+
+_MISSING = object()
+
+
+class ResponseCache:
+    """SQLite-backed TTL + LRU cache of JSON-serialisable LLM responses."""
+
+    def __init__(self, path: str, ttl_seconds: float = LLM_CACHE_TTL_SECONDS, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "expired": 0, "evictions": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily so importing the module never touches the disk.
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                " cache_key TEXT PRIMARY KEY, provider TEXT, model TEXT, response_json TEXT NOT NULL,"
+                " created_at REAL NOT NULL, last_accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_accessed ON llm_responses (last_accessed_at)")
+        return self._conn
+
+    def get(self, cache_key: str) -> Any:
+        """Returns the cached response or the module's _MISSING sentinel."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT response_json, created_at FROM llm_responses WHERE cache_key = ?", (cache_key,)).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return _MISSING
+            response_json, created_at = row
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM llm_responses WHERE cache_key = ?", (cache_key,))
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return _MISSING
+            conn.execute("UPDATE llm_responses SET last_accessed_at = ? WHERE cache_key = ?", (now, cache_key))
+            self._stats["hits"] += 1
+        return json.loads(response_json)
+
+    def put(self, cache_key: str, response: Any, provider: str, model: str | None):
+        try:
+            response_json = json.dumps(response)
+        except (TypeError, ValueError):
+            print(f"RESPONSE_CACHE: Skipping non-JSON-serialisable response of type {type(response).__name__}")
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (cache_key, provider, model, response_json, created_at, last_accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key, provider, model, response_json, now, now)
+            )
+            self._stats["writes"] += 1
+            (entries,) = conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+            excess = entries - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM llm_responses WHERE cache_key IN"
+                    " (SELECT cache_key FROM llm_responses ORDER BY last_accessed_at ASC LIMIT ?)",
+                    (excess,)
+                )
+                self._stats["evictions"] += excess
+
+    def clear(self) -> int:
+        with self._lock:
+            conn = self._connection()
+            (entries,) = conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+            conn.execute("DELETE FROM llm_responses")
+        return entries
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = 0
+            if self._conn is not None:
+                (entries,) = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+            return {**self._stats, "entries": entries, "max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache_enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+_response_cache = ResponseCache(LLM_CACHE_PATH)
+
+
+def configure_response_cache(path: str | None = None, enabled: bool | None = None,
+                             ttl_seconds: float | None = None, max_entries: int | None = None) -> ResponseCache:
+    """Re-points or toggles the process-wide cache (e.g. a temp file in tests)."""
+    global _response_cache, _cache_enabled
+    if enabled is not None:
+        _cache_enabled = enabled
+    if path is not None or ttl_seconds is not None or max_entries is not None:
+        _response_cache.close()
+        _response_cache = ResponseCache(
+            path or _response_cache.path,
+            ttl_seconds if ttl_seconds is not None else _response_cache.ttl_seconds,
+            max_entries if max_entries is not None else _response_cache.max_entries,
+        )
+    return _response_cache
+
+
+def response_cache_enabled(ai_conf: Any) -> bool:
+    return _cache_enabled and not getattr(ai_conf, "bypass_response_cache", False)
+
+
+def response_cache_key(rendered_prompt: str, provider: str, model: str | None, ai_conf: Any, chain_kwargs: dict) -> str:
+    key_material = json.dumps({
+        "prompt": rendered_prompt,
+        "provider": provider,
+        "model": model,
+        "temperature": ai_conf.temperature,
+        "max_tokens": ai_conf.max_tokens,
+        "chain": chain_kwargs, # output parser / response_format change the cached value's shape
+    }, sort_keys=True)
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+
+def get_cached_response(cache_key: str) -> tuple[bool, Any]:
+    """Returns (hit, response). Cache failures are logged and treated as a miss."""
+    try:
+        response = _response_cache.get(cache_key)
+    except sqlite3.Error as e:
+        print(f"RESPONSE_CACHE: Lookup failed, treating as miss: {e}")
+        return False, None
+    if response is _MISSING:
+        return False, None
+    return True, response
+
+
+def put_cached_response(cache_key: str, response: Any, provider: str, model: str | None):
+    try:
+        _response_cache.put(cache_key, response, provider, model)
+    except sqlite3.Error as e:
+        print(f"RESPONSE_CACHE: Write failed, response not cached: {e}")
+
+
+def get_response_cache_stats() -> dict:
+    return {**_response_cache.stats(), "enabled": _cache_enabled}
+
+
+def clear_response_cache() -> int:
+    removed = _response_cache.clear()
+    print(f"RESPONSE_CACHE: Cleared {removed} cached response(s)")
+    return removed
@@ -0,0 +1,169 @@
+# src/llm/telemetry.py
+"""
+Per-call LLM telemetry: queue time, time to first token, latency, token usage and estimated cost.
+
+LLMCallTelemetry is a LangChain callback attached to every chain invocation made through
+llm_invocation. The resulting call_info dicts are recorded with record_llm_call(); the UI wraps a
+generation in capture_llm_calls() to collect them and persists them to the llm_calls table
+against the enquiry (see supabase_utils.add_llm_calls).
+"""
+import time
+import statistics
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.utils.constants import MODEL_PRICING_USD_PER_MILLION_TOKENS
+
+CHARS_PER_TOKEN = 4 # Fallback when a provider does not report usage
+
+_captured_calls: ContextVar[list | None] = ContextVar("llm_captured_calls", default=None)
+
+
+# Provider stop reasons meaning "the output limit was hit" (OpenAI-compatible, Gemini, Anthropic)
+LENGTH_FINISH_REASONS = {"length", "max_tokens"}
+
+
+def _finish_reason_from_result(response: Any) -> str | None:
+    """Normalised stop reason of the last generation in an LLMResult: "length" when the output was cut off."""
+    reason = None
+    for generation_list in getattr(response, "generations", []) or []:
+        for generation in generation_list:
+            metadata = getattr(getattr(generation, "message", None), "response_metadata", None) or {}
+            info = getattr(generation, "generation_info", None) or {}
+            reason = info.get("finish_reason") or metadata.get("finish_reason") or metadata.get("stop_reason") or reason
+    if reason is None:
+        return None
+    reason = str(getattr(reason, "name", reason)).lower() # Gemini reports an enum (FinishReason.MAX_TOKENS)
+    return "length" if reason in LENGTH_FINISH_REASONS else reason
+
+
+def _usage_from_result(response: Any) -> tuple[int | None, int | None, str]:
+    """(prompt_tokens, completion_tokens, output_text) from an LLMResult."""
+    prompt_tokens = completion_tokens = None
+    output_text = ""
+    for generation_list in getattr(response, "generations", []) or []:
+        for generation in generation_list:
+            output_text += getattr(generation, "text", "") or ""
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens = (prompt_tokens or 0) + usage.get("input_tokens", 0)
+                completion_tokens = (completion_tokens or 0) + usage.get("output_tokens", 0)
+    if prompt_tokens is None:
+        # Older integrations report usage in llm_output instead of on the message
+        token_usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        if token_usage:
+            prompt_tokens = token_usage.get("prompt_tokens")
+            completion_tokens = token_usage.get("completion_tokens")
+    return prompt_tokens, completion_tokens, output_text
+
+
+class LLMCallTelemetry(BaseCallbackHandler):
+    """Collects timing and token usage for one chain invocation."""
+
+    run_inline = True # Timestamps must be taken on the calling thread / event loop
+
+    def __init__(self):
+        self.started_at: float | None = None
+        self.first_token_at: float | None = None
+        self.prompt_chars = 0
+        self.prompt_tokens: int | None = None
+        self.completion_tokens: int | None = None
+        self.output_chars = 0
+        self.finish_reason: str | None = None
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.started_at = time.perf_counter()
+        self.prompt_chars = sum(len(str(m.content)) for batch in messages for m in batch)
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.started_at = time.perf_counter()
+        self.prompt_chars = sum(len(p) for p in prompts)
+
+    def on_llm_new_token(self, token, **kwargs):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def on_llm_end(self, response, **kwargs):
+        self.prompt_tokens, self.completion_tokens, output_text = _usage_from_result(response)
+        self.output_chars = len(output_text)
+        self.finish_reason = _finish_reason_from_result(response)
+
+    def summary(self, latency_seconds: float) -> dict:
+        """Telemetry fields for call_info. Non-streamed calls get their whole latency as time to first token."""
+        ttft = self.first_token_at - self.started_at if self.first_token_at and self.started_at else latency_seconds
+        tokens_estimated = self.prompt_tokens is None or self.completion_tokens is None
+        return {
+            "time_to_first_token_seconds": round(ttft, 3),
+            "prompt_tokens": self.prompt_tokens if self.prompt_tokens is not None else max(1, self.prompt_chars // CHARS_PER_TOKEN),
+            "completion_tokens": self.completion_tokens if self.completion_tokens is not None else max(0, self.output_chars // CHARS_PER_TOKEN),
+            "tokens_estimated": tokens_estimated,
+            "finish_reason": self.finish_reason,
+        }
+
+
+def estimate_cost_usd(provider: str, model: str | None, prompt_tokens: int | None, completion_tokens: int | None) -> float | None:
+    """Estimated USD cost from the pricing table; None when the model's price is unknown."""
+    if provider == "Local" or (model and model.lower().endswith((":free", "-free"))):
+        return 0.0
+    pricing = MODEL_PRICING_USD_PER_MILLION_TOKENS.get(model or "")
+    if pricing is None:
+        return None
+    input_price, output_price = pricing
+    return round(((prompt_tokens or 0) * input_price + (completion_tokens or 0) * output_price) / 1_000_000, 6)
+
+
+def with_cost(call_info: dict) -> dict:
+    call_info["estimated_cost_usd"] = 0.0 if call_info.get("cache_hit") else estimate_cost_usd(
+        call_info.get("provider"), call_info.get("model"), call_info.get("prompt_tokens"), call_info.get("completion_tokens")
+    )
+    return call_info
+
+
+@contextmanager
+def capture_llm_calls() -> Iterator[list[dict]]:
+    """Collects the call_info of every LLM call recorded while the block runs (including graph worker threads)."""
+    calls: list[dict] = []
+    token = _captured_calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _captured_calls.reset(token)
+
+
+def record_llm_call(call_info: dict):
+    captured = _captured_calls.get()
+    if captured is not None:
+        captured.append(dict(call_info))
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def summarize_llm_calls(calls: list[dict]) -> dict:
+    """
+    Aggregates call records (call_info dicts or llm_calls rows) per provider:
+    call count, cache hits, p50/p95 latency, total tokens and estimated cost.
+    """
+    by_provider: dict[str, list[dict]] = {}
+    for call in calls:
+        by_provider.setdefault(call.get("provider") or "Unknown", []).append(call)
+
+    summary = {}
+    for provider, provider_calls in sorted(by_provider.items()):
+        latencies = sorted(float(c["latency_seconds"]) for c in provider_calls
+                           if c.get("latency_seconds") is not None and not c.get("cache_hit") and not c.get("error_type"))
+        summary[provider] = {
+            "calls": len(provider_calls),
+            "cache_hits": sum(1 for c in provider_calls if c.get("cache_hit")),
+            "errors": sum(1 for c in provider_calls if c.get("error_type")),
+            "p50_latency_seconds": round(statistics.median(latencies), 3) if latencies else None,
+            "p95_latency_seconds": round(_percentile(latencies, 0.95), 3) if latencies else None,
+            "prompt_tokens": sum(c.get("prompt_tokens") or 0 for c in provider_calls),
+            "completion_tokens": sum(c.get("completion_tokens") or 0 for c in provider_calls),
+            "estimated_cost_usd": round(sum(float(c.get("estimated_cost_usd") or 0) for c in provider_calls), 6),
+        }
+    return summary
@@ -0,0 +1,207 @@
+# src/llm/token_budget.py
+"""
+Context-window budgeting for LLM calls.
+
+Before every call, llm_invocation renders the prompt and counts its tokens against the model's
+context window (MODEL_CONTEXT_WINDOWS) minus the tokens reserved for the completion. When the
+prompt does not fit, the caller's trimmable inputs are shrunk in priority order:
+"truncate" cuts an input from the end (dropping it if almost nothing would remain) and
+"boilerplate" removes quoted email threads, signatures and disclaimers. The returned report
+lists what was trimmed and is attached to call_info (or to ContextBudgetExceeded).
+
+Tokens are counted with tiktoken's cl100k_base encoding when it is available locally and with a
+conservative character heuristic otherwise (set LLM_TOKENIZER=heuristic to skip tiktoken).
+"""
+import os
+import re
+import math
+import threading
+from typing import Any
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from src.utils.constants import (
+    MODEL_CONTEXT_WINDOWS, DEFAULT_CONTEXT_WINDOW_TOKENS, DEFAULT_OUTPUT_TOKEN_RESERVATION, OUTPUT_TOKEN_SIZING_STEP
+)
+
+LLM_TOKENIZER = os.getenv("LLM_TOKENIZER", "tiktoken").lower()
+# Fewer characters per token than typical English prose, so estimates err on the side of fitting
+HEURISTIC_CHARS_PER_TOKEN = 3.5
+# Inputs truncated below this many tokens are dropped instead
+MIN_TRUNCATED_INPUT_TOKENS = 64
+# Tokens at the cut point rarely add up exactly; keep this much slack when truncating
+TRUNCATION_SLACK_TOKENS = 16
+
+# A sign-off followed by at most this many lines (name, company, phone) is treated as a signature
+MAX_SIGNATURE_LINES = 6
+
+TRUNCATION_MARKER = "\n[... trimmed to fit the model's context window ...]"
+DROPPED_MARKER = "[Omitted to fit the model's context window.]"
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_encoding_unavailable = False
+
+
+class ContextBudgetExceeded(Exception):
+    """The prompt does not fit the model's context window even after trimming. `report` describes the attempt."""
+
+    def __init__(self, message: str, report: dict):
+        super().__init__(message)
+        self.report = report
+
+
+def configure_tokenizer(name: str):
+    """Selects "tiktoken" or "heuristic" token counting (tests and offline benchmarks use the heuristic)."""
+    global LLM_TOKENIZER
+    LLM_TOKENIZER = name.lower()
+
+
+def _tiktoken_encoding():
+    global _encoding, _encoding_unavailable
+    if LLM_TOKENIZER != "tiktoken" or _encoding_unavailable:
+        return None
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None and not _encoding_unavailable:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e: # Not installed, or the encoding file cannot be downloaded
+                    _encoding_unavailable = True
+                    print(f"TOKEN_BUDGET: tiktoken unavailable ({type(e).__name__}); using the character heuristic")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / HEURISTIC_CHARS_PER_TOKEN)
+
+
+def context_window_for(model: str | None) -> int:
+    return MODEL_CONTEXT_WINDOWS.get(model or "", DEFAULT_CONTEXT_WINDOW_TOKENS)
+
+
+def output_reservation_for(ai_conf: Any) -> int:
+    return getattr(ai_conf, "max_tokens", None) or DEFAULT_OUTPUT_TOKEN_RESERVATION
+
+
+def sized_max_tokens(expected_output_tokens: int, model: str | None) -> int:
+    """
+    max_tokens for an answer of about `expected_output_tokens`: rounded up to OUTPUT_TOKEN_SIZING_STEP
+    and capped at half the context window (the most fit_inputs_to_context will reserve).
+    """
+    rounded = -(-expected_output_tokens // OUTPUT_TOKEN_SIZING_STEP) * OUTPUT_TOKEN_SIZING_STEP
+    return max(OUTPUT_TOKEN_SIZING_STEP, min(rounded, context_window_for(model) // 2))
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        truncated = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        truncated = text[:int(max_tokens * HEURISTIC_CHARS_PER_TOKEN)]
+    # Prefer ending on a line boundary when one is close to the cut
+    last_newline = truncated.rfind("\n")
+    if last_newline > len(truncated) * 0.8:
+        truncated = truncated[:last_newline]
+    return truncated.rstrip()
+
+
+_QUOTED_THREAD_START = re.compile(
+    r"^(On .{4,200} wrote:\s*$|-{2,}\s*Original Message\s*-{2,}|-{2,}\s*Forwarded message\s*-{2,}|From: .+$)",
+    re.IGNORECASE | re.MULTILINE
+)
+_SIGNATURE_START = re.compile(
+    r"^(--\s*$|(best|kind|warm|warmest)?\s*regards,?\s*$|thanks\s*(&|and)\s*regards,?\s*$|sincerely,?\s*$)",
+    re.IGNORECASE | re.MULTILINE
+)
+_DISCLAIMER_HINTS = re.compile(
+    r"confidential|disclaimer|intended recipient|unsubscribe|sent from my|please consider the environment",
+    re.IGNORECASE
+)
+
+
+def strip_boilerplate(text: str) -> str:
+    """Removes quoted reply threads, sign-offs/signatures and disclaimer paragraphs from an email-like text."""
+    thread = _QUOTED_THREAD_START.search(text)
+    if thread and thread.start() > 0:
+        text = text[:thread.start()]
+    text = "\n".join(line for line in text.splitlines() if not line.lstrip().startswith(">"))
+    paragraphs = [p for p in re.split(r"\n\s*\n", text) if not _DISCLAIMER_HINTS.search(p)]
+    text = "\n\n".join(p.rstrip() for p in paragraphs)
+    signature = _SIGNATURE_START.search(text)
+    if signature and len([l for l in text[signature.end():].splitlines() if l.strip()]) <= MAX_SIGNATURE_LINES:
+        text = text[:signature.start()]
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def _render(prompt_str: str, inputs: dict) -> str:
+    return ChatPromptTemplate.from_template(prompt_str).invoke(inputs).to_string()
+
+
+def fit_inputs_to_context(
+    prompt_str: str,
+    inputs: dict,
+    model: str | None,
+    output_reservation: int,
+    trimmable_inputs: tuple[tuple[str, str], ...] = (),
+) -> tuple[dict, dict]:
+    """
+    Returns (inputs, report) where inputs fit the model's context window with `output_reservation`
+    tokens left for the completion. `trimmable_inputs` is an ordered sequence of (input name, action),
+    lowest priority first. Raises ContextBudgetExceeded if trimming is not enough.
+    """
+    window = context_window_for(model)
+    reservation = min(output_reservation, window // 2)
+    available = window - reservation
+    prompt_tokens = count_tokens(_render(prompt_str, inputs))
+    report = {
+        "model": model,
+        "context_window": window,
+        "output_reservation": reservation,
+        "prompt_tokens": prompt_tokens,
+        "trimmed": [],
+    }
+    if prompt_tokens <= available:
+        return inputs, report
+
+    report["original_prompt_tokens"] = prompt_tokens
+    fitted = dict(inputs)
+    for input_name, action in trimmable_inputs:
+        value = fitted.get(input_name)
+        over = prompt_tokens - available
+        if over <= 0:
+            break
+        if not isinstance(value, str) or not value.strip() or value == DROPPED_MARKER:
+            continue
+        before = count_tokens(value)
+        if action == "boilerplate":
+            trimmed_value, outcome = strip_boilerplate(value), "boilerplate_removed"
+        else:
+            keep = before - over - count_tokens(TRUNCATION_MARKER) - TRUNCATION_SLACK_TOKENS
+            if keep < MIN_TRUNCATED_INPUT_TOKENS:
+                trimmed_value, outcome = DROPPED_MARKER, "dropped"
+            else:
+                trimmed_value, outcome = _truncate_to_tokens(value, keep) + TRUNCATION_MARKER, "truncated"
+        after = count_tokens(trimmed_value)
+        if after >= before:
+            continue
+        fitted[input_name] = trimmed_value
+        prompt_tokens -= before - after
+        report["trimmed"].append({"input": input_name, "action": outcome, "tokens_removed": before - after})
+
+    report["prompt_tokens"] = count_tokens(_render(prompt_str, fitted))
+    if report["prompt_tokens"] > available:
+        raise ContextBudgetExceeded(
+            f"Prompt needs {report['prompt_tokens']} tokens but {model or 'the model'} allows {available} "
+            f"({window} context window, {reservation} reserved for the answer).",
+            report,
+        )
+    print(f"TOKEN_BUDGET: Trimmed prompt for {model} from {report['original_prompt_tokens']} to {report['prompt_tokens']} tokens: "
+          + ", ".join(f"{t['input']} {t['action']}" for t in report["trimmed"]))
+    return fitted, report
@@ -1,18 +1,31 @@
 # src/models.py
-from typing import Optional, Any
-from pydantic import BaseModel, Field
+from typing import Optional, Any, Annotated
+from pydantic import BaseModel, Field, ConfigDict, BeforeValidator, model_validator
 
 class AIConfigState(BaseModel):
     selected_ai_provider: str = "OpenRouter"
     selected_model_for_provider: Optional[str] = None
     temperature: Optional[float] = Field(default=0.7, ge=0.0, le=2.0)
     max_tokens: Optional[int] = Field(default=None, ge=1) # None means use provider's default
+    bypass_response_cache: bool = False # Always call the provider, ignoring the persistent response cache
+    hedging_enabled: bool = False # Race a backup provider when the primary is slow
+    hedge_backup_provider: Optional[str] = None
+    hedge_backup_model: Optional[str] = None # None means the backup provider's default model
+    hedge_delay_seconds: Optional[float] = Field(default=None, ge=0.0) # None means primary's observed p95 latency
+    model_routing_enabled: bool = False # Pick provider/model per stage from STAGE_MODEL_CANDIDATES
+    single_pass_quotation: bool = False # One LLM call from the raw vendor reply to the quotation JSON
+    segmented_itinerary: bool = False # Outline first, then write the itinerary days in parallel calls (two-stage only)
+    live_quotation_preview: bool = True # Stream the quotation JSON into a live preview (skipped when hedging is enabled)
+    speculative_quotations: bool = True # Pre-generate the quotation in the background when its inputs are saved
+    incremental_regeneration: bool = True # Patch prices/hotels/inclusions of the latest quotation after small vendor-reply edits
 
 class Tab2State(BaseModel):
     selected_enquiry_id: Optional[Any] = None
     current_ai_suggestions: Optional[Any] = None
     current_ai_suggestions_id: Optional[Any] = None
     itinerary_loaded_for_tab2: Optional[Any] = None
+    active_job_id: Optional[str] = None # Suggestions job Tab 2 is polling
+    suggestions_job_error: Optional[Any] = None # error_info of the last failed suggestions job, for display
 
 class Tab3State(BaseModel):
     selected_enquiry_id: Optional[Any] = None
@@ -28,6 +41,9 @@ class Tab3State(BaseModel):
     show_quotation_success: bool = False
     cached_graph_output: Optional[Any] = None
     cache_key: Optional[str] = None
+    quotation_job_id: Optional[str] = None # Job that produced cached_graph_output: DOCX converts its PDF
+    active_job_ids: list[str] = Field(default_factory=list) # Background jobs Tab 3 is polling
+    quotation_job_error: Optional[Any] = None # structured_data of the last failed quotation job, for display
 
 class AppSessionState(BaseModel):
     ai_config: AIConfigState = Field(default_factory=AIConfigState)
@@ -36,4 +52,148 @@ class AppSessionState(BaseModel):
     operation_success_message: Optional[str] = None
 
     class Config:
-        arbitrary_types_allowed = True
\ No newline at end of file
+        arbitrary_types_allowed = True
+
+# --- Quotation JSON (output of the structuring LLM call, input of the PDF/DOCX renderers) ---
+
+def _as_text(value: Any) -> Any:
+    """LLMs often emit numbers where the template has strings (prices, nights); the renderers expect text."""
+    return str(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+
+
+def _as_text_list(value: Any) -> Any:
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value] if isinstance(value, list) else value
+
+
+QuotationText = Annotated[Optional[str], BeforeValidator(_as_text)]
+QuotationTextList = Annotated[Optional[list[str]], BeforeValidator(_as_text_list)]
+
+
+class _QuotationEntry(BaseModel):
+    """Itinerary day / hotel entry: every value is rendered as text, extra keys are kept."""
+    model_config = ConfigDict(extra="allow")
+
+    @model_validator(mode="before")
+    @classmethod
+    def _values_as_text(cls, data: Any) -> Any:
+        if isinstance(data, dict):
+            return {key: None if value is None else str(value) for key, value in data.items()}
+        return data
+
+
+class QuotationItineraryDay(_QuotationEntry):
+    day_number: Optional[str] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+
+
+class QuotationHotel(_QuotationEntry):
+    destination_location: Optional[str] = None
+    hotel_name: Optional[str] = None
+    nights: Optional[str] = None
+
+
+class QuotationData(BaseModel):
+    """
+    Schema of QUOTATION_STRUCTURE_JSON_PROMPT_TEMPLATE_STRING's JSON. Only the itinerary is required;
+    missing fields are left out (model_dump(exclude_none=True)) so the renderers apply their defaults.
+    """
+    model_config = ConfigDict(extra="allow")
+
+    client_name: QuotationText = None
+    quotation_title: QuotationText = None
+    destination_summary: QuotationText = None
+    duration_summary: QuotationText = None
+    dates_summary: QuotationText = None
+    meal_plan_summary: QuotationText = None
+    room_configuration_summary: QuotationText = None
+    vehicle_summary: QuotationText = None
+    main_image_placeholder_text: QuotationText = None
+    itinerary_title: QuotationText = None
+    detailed_itinerary: list[QuotationItineraryDay] = Field(min_length=1)
+    hotel_details: Optional[list[QuotationHotel]] = None
+    cost_per_head: QuotationText = None
+    total_pax_for_cost: QuotationText = None
+    total_package_cost: QuotationText = None
+    currency: QuotationText = None
+    inclusions: QuotationTextList = None
+    exclusions: QuotationTextList = None
+    # Tax notes, company contact, standard exclusions and important notes are not generated:
+    # they are merged from src/utils/quotation_catalogue.py
+
+
+class QuotationItinerarySegment(BaseModel):
+    """Answer of ITINERARY_SEGMENT_PROMPT_TEMPLATE_STRING: descriptions for some days of the outline."""
+    days: list[QuotationItineraryDay] = Field(min_length=1)
+
+# --- Parsed vendor reply (output of the vendor reply parsing LLM call, see src/utils/parsed_vendor_reply.py) ---
+
+class ParsedVendorHotel(_QuotationEntry):
+    name: Optional[str] = None
+    city: Optional[str] = None
+    nights: Optional[str] = None
+    category: Optional[str] = None
+
+
+class ParsedVendorDay(_QuotationEntry):
+    day: Optional[str] = None
+    summary: Optional[str] = None
+
+
+class ParsedVendorReply(BaseModel):
+    """
+    Schema of VENDOR_REPLY_PARSING_PROMPT_TEMPLATE_STRING's JSON: only what the vendor wrote, missing
+    values are None. Stored as vendor_reply_parses.parsed_data; the structuring prompts get it as text.
+    """
+    model_config = ConfigDict(extra="ignore")
+
+    price: QuotationText = None # Amount as written, without currency
+    currency: QuotationText = None
+    price_basis: QuotationText = None # "per person" or "total"
+    pax_basis: QuotationText = None # Travellers the price is for
+    hotels: Optional[list[ParsedVendorHotel]] = None
+    meal_plan: QuotationText = None
+    room_configuration: QuotationText = None
+    inclusions: QuotationTextList = None
+    exclusions: QuotationTextList = None
+    itinerary_days: Optional[list[ParsedVendorDay]] = None
+
+# --- Batch quotation runs (src/core/batch_quotations.py) ---
+
+class BatchQuotationItem(BaseModel):
+    """One enquiry to quote: its details and the itinerary / vendor reply versions to quote from."""
+    enquiry_id: str
+    enquiry_details: dict # Enquiry row plus "client_name_actual", as Tab 3 passes it to the graph
+    itinerary_text: str
+    vendor_reply_text: str
+    itinerary_id: Optional[str] = None
+    vendor_reply_id: Optional[str] = None
+
+class BatchItemResult(BaseModel):
+    item_key: str # Enquiry + vendor reply version: a newer reply is quoted again on resume
+    enquiry_id: str
+    status: str # "done", "generated" (--no-save: nothing uploaded), "failed" or "skipped" (already done in an earlier run)
+    seconds: float = 0.0
+    quotation_id: Optional[str] = None
+    pdf_storage_path: Optional[str] = None
+    llm_calls: int = 0
+    error: Optional[str] = None
+
+# --- Background jobs (src/core/job_queue.py) ---
+
+class JobRecord(BaseModel):
+    job_id: str # Kind + hash of the inputs + a random suffix: same inputs share a job only while it is unfinished
+    kind: str # "quotation", "docx" or "suggestions"
+    scope: Optional[str] = None # Enquiry the job belongs to
+    status: str # "waiting" (for depends_on), "queued", "running", "done" or "failed"
+    payload: dict = Field(default_factory=dict)
+    depends_on: Optional[str] = None
+    progress: Optional[str] = None # Latest progress message from the handler
+    preview: Optional[dict] = None # e.g. the partial quotation while it is being written
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    attempts: int = 0 # Runs started, including the resumes after a restart
+    created_at: float = 0.0
+    updated_at: float = 0.0
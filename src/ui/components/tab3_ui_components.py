@@ -1,6 +1,7 @@
 import streamlit as st
 from src.utils.supabase_utils import get_public_url, create_signed_url
-from src.utils.constants import BUCKET_QUOTATIONS
+from src.utils.constants import BUCKET_QUOTATIONS, JOB_POLL_INTERVAL_SECONDS
+from src.core.quotation_jobs import get_job_queue
 
 def display_enquiry_and_itinerary_details_tab3(active_enquiry_id_tab3):
     """Displays selected enquiry details and AI-generated itinerary."""
@@ -68,6 +69,47 @@ def render_quotation_generation_section(active_enquiry_id_tab3, handle_pdf_gener
             handle_docx_generation_func(active_enquiry_id_tab3, current_graph_cache_key)
 
 
+JOB_KIND_LABELS = {"quotation": "Quotation", "docx": "DOCX conversion", "suggestions": "Places suggestions"}
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL_SECONDS)
+def render_quotation_jobs_status(handle_finished_job_func):
+    """
+    Polls Tab 3's background jobs without rerunning the page: shows their progress and the live
+    quotation preview, hands finished jobs to the handler and then reruns the page once.
+    Only rendered while jobs are active, so an idle tab does not poll.
+    """
+    any_finished = False
+    for job_id in list(st.session_state.app_state.tab3_state.active_job_ids):
+        job = get_job_queue().get(job_id)
+        if job is None or job.status in ("done", "failed"):
+            handle_finished_job_func(job_id, job)
+            any_finished = True
+            continue
+        label = JOB_KIND_LABELS.get(job.kind, job.kind)
+        status_text = job.progress or ("Waiting for the quotation" if job.status == "waiting" else "Queued")
+        st.info(f"⏳ {label}: {status_text} (runs in the background; you can switch tabs or reload the page)")
+        if job.preview:
+            render_quotation_preview(st.empty(), job.preview)
+    if any_finished:
+        st.rerun() # Refresh the messages and the files section with the job's output
+
+
+def render_quotation_job_error(error_data: dict):
+    """Shows why the last quotation/DOCX job failed, with the technical details in an expander."""
+    error_message_display = error_data.get("error") or "Quotation data generation failed."
+    error_details_display = str(error_data.get("details") or "")
+    error_raw_output_display = str(error_data.get("raw_output") or "")
+    st.error(f"AI Quotation Error ({error_data.get('type', 'UnknownError')}): {error_message_display}")
+
+    if error_details_display or error_raw_output_display:
+        with st.expander("Error Details & Technical Information"):
+            if error_details_display:
+                st.markdown(f"**Details:**\n```\n{error_details_display}\n```")
+            if error_raw_output_display:
+                st.markdown(f"**Raw Output/Context (truncated):**\n```\n{error_raw_output_display[:1000]}\n```")
+
+
 def display_quotation_files_section(active_enquiry_id_tab3):
     """Displays download/view links for generated quotation files."""
     st.markdown("---")
@@ -127,4 +169,36 @@ def display_quotation_files_section(active_enquiry_id_tab3):
             )
 
     if not has_any_file_info and not st.session_state.app_state.tab3_state.quotation_pdf_bytes and not st.session_state.app_state.tab3_state.quotation_docx_bytes:
-        st.info("No quotation files available. Use 'Generate' buttons to create them.")
\ No newline at end of file
+        st.info("No quotation files available. Use 'Generate' buttons to create them.")
+
+def render_quotation_preview(placeholder, preview: dict):
+    """
+    Redraws the live quotation preview in `placeholder` from a partial quotation dict (see
+    run_quotation_generation_graph(on_preview=...)): header first, then the days, then costs.
+    """
+    with placeholder.container(border=True):
+        st.markdown(f"**{preview.get('quotation_title') or 'Preparing your quotation...'}**")
+        summary_lines = [
+            f"- **{label}:** {preview[key]}" for key, label in (
+                ("client_name", "Client"), ("destination_summary", "Destination"),
+                ("duration_summary", "Duration"), ("dates_summary", "Dates"),
+                ("meal_plan_summary", "Meals"), ("vehicle_summary", "Vehicle"),
+            ) if preview.get(key)
+        ]
+        if summary_lines:
+            st.markdown("\n".join(summary_lines))
+
+        days = [day for day in preview.get("detailed_itinerary") or [] if isinstance(day, dict)]
+        if days:
+            st.markdown(f"**{preview.get('itinerary_title') or 'Itinerary'}**")
+            for day in days:
+                st.markdown(f"- **{day.get('day_number', '')}: {day.get('title', '')}** {day.get('description', '')}")
+
+        if preview.get("cost_per_head") or preview.get("total_package_cost"):
+            st.markdown(f"**Cost per head:** {preview.get('currency', '')} {preview.get('cost_per_head', 'N/A')} · "
+                        f"**Total:** {preview.get('total_package_cost', 'N/A')}")
+        cols_incl_excl = st.columns(2)
+        for col, key, label in ((cols_incl_excl[0], "inclusions", "Inclusions"), (cols_incl_excl[1], "exclusions", "Exclusions")):
+            items = [str(item) for item in preview.get(key) or []]
+            if items:
+                col.markdown(f"**{label}**\n" + "\n".join(f"- {item}" for item in items))
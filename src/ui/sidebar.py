@@ -1,34 +1,14 @@
 # src/ui/sidebar.py
 import streamlit as st
 import os
-
-# Define model options for providers that support multiple models via this UI
-PROVIDER_MODEL_OPTIONS = {
-    "OpenRouter": [
-        "google/gemma-3-27b-it:free",
-        "openai/gpt-3.5-turbo",
-        "meta-llama/llama-3.3-8b-instruct:free",
-        "microsoft/phi-4-reasoning-plus:free",
-        "deepseek/deepseek-prover-v2:free"
-    ],
-    "Groq": [
-        "llama3-8b-8192",
-        "llama3-70b-8192",
-        "meta-llama/llama-4-scout-17b-16e-instruct",
-        "deepseek-r1-distill-llama-70b",
-        "qwen-qwq-32b"
-    ],
-    "Gemini": [
-        "gemini-1.5-flash-latest",
-        "gemini-1.5-pro-latest",
-        "gemini-1.0-pro"
-    ],
-    "TogetherAI": [
-        "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free",
-        "deepseek-ai/DeepSeek-R1-Distill-Llama-70B-free"
-        # Add other TogetherAI models here if needed
-    ]
-}
+from src.utils.constants import PROVIDER_MODEL_OPTIONS, AI_PROVIDER_OPTIONS
+from src.llm.hedging import get_hedge_stats
+from src.llm.rate_limiter import get_rate_limiter_metrics
+from src.llm.model_router import get_model_health_stats
+from src.llm.llm_resilience import get_resilience_stats
+from src.llm.response_cache import get_response_cache_stats, clear_response_cache
+from src.llm.telemetry import summarize_llm_calls
+from src.utils.supabase_utils import get_llm_calls
 
 def render_sidebar():
     """
@@ -36,7 +16,7 @@ def render_sidebar():
     Manages AI provider, model, and advanced settings in st.session_state.app_state.ai_config.
     """
     st.sidebar.subheader("⚙️ AI Configuration")
-    ai_provider_options = ["Gemini", "OpenRouter", "Groq", "TogetherAI"] # Added TogetherAI
+    ai_provider_options = AI_PROVIDER_OPTIONS # Includes the offline "Local" provider
     ai_conf = st.session_state.app_state.ai_config # Shorthand for session state config
 
     # --- Provider Selection ---
@@ -81,6 +61,7 @@ def render_sidebar():
         elif active_provider == "Groq": default_model_env_var = os.getenv("GROQ_DEFAULT_MODEL")
         elif active_provider == "Gemini": default_model_env_var = os.getenv("GOOGLE_DEFAULT_MODEL")
         elif active_provider == "TogetherAI": default_model_env_var = os.getenv("TOGETHERAI_DEFAULT_MODEL")
+        elif active_provider == "Local": default_model_env_var = os.getenv("LOCAL_LLM_DEFAULT_MODEL")
 
         current_model_index = 0
         if ai_conf.selected_model_for_provider and ai_conf.selected_model_for_provider in available_models:
@@ -152,6 +133,186 @@ def render_sidebar():
         ai_conf.max_tokens = new_max_tokens_val
         # Similar to temperature, no immediate rerun unless explicitly needed for cache invalidation.
 
+    # --- Response Cache ---
+    new_bypass_cache = st.sidebar.checkbox(
+        "Bypass response cache",
+        value=ai_conf.bypass_response_cache,
+        key="bypass_response_cache_checkbox",
+        help="Identical prompts with the same provider, model, temperature and max tokens are normally answered from the on-disk cache. Tick to always call the provider."
+    )
+    if new_bypass_cache != ai_conf.bypass_response_cache:
+        ai_conf.bypass_response_cache = new_bypass_cache
+
+    cache_stats = get_response_cache_stats()
+    st.sidebar.caption(
+        f"Response cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, {cache_stats['entries']} entries"
+        + ("" if cache_stats["enabled"] else " (disabled)")
+    )
+    if st.sidebar.button("Clear Response Cache", key="clear_response_cache_button"):
+        removed = clear_response_cache()
+        st.sidebar.success(f"Removed {removed} cached response(s).")
+
+    # --- Stage-aware Model Routing (optional) ---
+    new_routing_enabled = st.sidebar.checkbox(
+        "Route each stage to the best available model",
+        value=ai_conf.model_routing_enabled,
+        key="model_routing_enabled_checkbox",
+        help="Vendor-reply parsing and suggestions go to fast small models, quotation structuring to larger ones, ranked by live latency and error rate with automatic fallback. The provider selected above is the last resort. Candidates are configured in STAGE_MODEL_CANDIDATES."
+    )
+    if new_routing_enabled != ai_conf.model_routing_enabled:
+        ai_conf.model_routing_enabled = new_routing_enabled
+
+    # --- Single-pass Quotation (optional) ---
+    new_single_pass = st.sidebar.checkbox(
+        "Single-pass quotation (one LLM call)",
+        value=ai_conf.single_pass_quotation,
+        key="single_pass_quotation_checkbox",
+        help="Build the quotation JSON straight from the raw vendor reply in one call, instead of parsing the reply first and structuring it in a second call. Roughly halves quotation latency and token spend; compare accuracy with benchmarks/bench_single_pass.py."
+    )
+    if new_single_pass != ai_conf.single_pass_quotation:
+        ai_conf.single_pass_quotation = new_single_pass
+
+    # --- Segmented Itinerary (optional) ---
+    new_segmented = st.sidebar.checkbox(
+        "Write itinerary days in parallel",
+        value=ai_conf.segmented_itinerary,
+        key="segmented_itinerary_checkbox",
+        help="For long or multi-city trips: outline the itinerary first (city and title per day), then write the days of each city in parallel calls and merge them. Generation time grows much more slowly with the trip length, at the cost of more calls. Ignored when single-pass quotation is ticked; compare with benchmarks/bench_segmented_itinerary.py."
+    )
+    if new_segmented != ai_conf.segmented_itinerary:
+        ai_conf.segmented_itinerary = new_segmented
+
+    # --- Live Quotation Preview ---
+    new_live_preview = st.sidebar.checkbox(
+        "Live quotation preview",
+        value=ai_conf.live_quotation_preview,
+        key="live_quotation_preview_checkbox",
+        help="Stream the quotation JSON and show the header, days and costs in Tab 3 as they arrive, before the PDF is ready. Cut-off answers are continued as usual; with hedging enabled the quotation is not streamed, so the backup can race."
+    )
+    if new_live_preview != ai_conf.live_quotation_preview:
+        ai_conf.live_quotation_preview = new_live_preview
+
+    # --- Speculative Quotations ---
+    new_speculative = st.sidebar.checkbox(
+        "Pre-generate quotations in the background",
+        value=ai_conf.speculative_quotations,
+        key="speculative_quotations_checkbox",
+        help="Saving a vendor reply (or a new itinerary for an enquiry that has one) starts generating the quotation with these settings, so 'Generate Quotation PDF' is usually instant. Runs for outdated inputs are cancelled, and background runs stop once SPECULATIVE_QUOTATION_TOKEN_BUDGET_PER_HOUR tokens were spent in the last hour."
+    )
+    if new_speculative != ai_conf.speculative_quotations:
+        ai_conf.speculative_quotations = new_speculative
+
+    # --- Incremental Regeneration ---
+    new_incremental = st.sidebar.checkbox(
+        "Patch quotations after small vendor-reply edits",
+        value=ai_conf.incremental_regeneration,
+        key="incremental_regeneration_checkbox",
+        help="When a revised vendor reply only changes prices, hotels or inclusions/exclusions, those fields of the latest quotation are re-extracted with one small LLM call and the PDF is re-rendered, keeping its day-wise itinerary. Other changes regenerate the whole quotation."
+    )
+    if new_incremental != ai_conf.incremental_regeneration:
+        ai_conf.incremental_regeneration = new_incremental
+
+    # --- Hedged Requests (optional) ---
+    new_hedging_enabled = st.sidebar.checkbox(
+        "Hedge slow requests with a backup provider",
+        value=ai_conf.hedging_enabled,
+        key="hedging_enabled_checkbox",
+        help="If the selected provider is slower than usual, the same request is also sent to a backup provider and the first valid answer wins. This can double token spend for hedged calls."
+    )
+    if new_hedging_enabled != ai_conf.hedging_enabled:
+        ai_conf.hedging_enabled = new_hedging_enabled
+
+    if ai_conf.hedging_enabled:
+        backup_options = [p for p in ai_provider_options if p != active_provider]
+        if ai_conf.hedge_backup_provider not in backup_options:
+            ai_conf.hedge_backup_provider = backup_options[0]
+            ai_conf.hedge_backup_model = None
+        selected_backup = st.sidebar.selectbox(
+            "Backup Provider:",
+            options=backup_options,
+            index=backup_options.index(ai_conf.hedge_backup_provider),
+            key="hedge_backup_provider_selector"
+        )
+        if selected_backup != ai_conf.hedge_backup_provider:
+            ai_conf.hedge_backup_provider = selected_backup
+            ai_conf.hedge_backup_model = None
+
+        backup_models = PROVIDER_MODEL_OPTIONS.get(ai_conf.hedge_backup_provider, [])
+        if backup_models:
+            backup_model_index = backup_models.index(ai_conf.hedge_backup_model) if ai_conf.hedge_backup_model in backup_models else 0
+            ai_conf.hedge_backup_model = st.sidebar.selectbox(
+                f"Backup Model for {ai_conf.hedge_backup_provider}:",
+                options=backup_models,
+                index=backup_model_index,
+                key=f"hedge_backup_model_selector_{ai_conf.hedge_backup_provider}"
+            )
+
+        new_hedge_delay = st.sidebar.number_input(
+            "Hedge Delay (seconds):",
+            min_value=0.0,
+            value=ai_conf.hedge_delay_seconds,
+            step=0.5,
+            key="hedge_delay_input",
+            help="How long to wait for the primary before starting the backup. Leave blank to use the primary's observed p95 latency.",
+            placeholder="Auto (p95 latency)"
+        )
+        ai_conf.hedge_delay_seconds = float(new_hedge_delay) if new_hedge_delay is not None else None
+
+        hedge_stats = get_hedge_stats()
+        if hedge_stats["hedged_calls"]:
+            wins = ", ".join(f"{p}: {n}" for p, n in hedge_stats["wins"].items())
+            st.sidebar.caption(
+                f"Hedged calls: {hedge_stats['hedged_calls']} (backup started {hedge_stats['backup_started']}), "
+                f"wins: {wins}, est. saved: {hedge_stats['latency_saved_seconds']}s"
+            )
+
+    # --- Rate Limiter Metrics ---
+    limiter_metrics = get_rate_limiter_metrics()
+    if limiter_metrics:
+        with st.sidebar.expander("Rate Limits"):
+            for limiter_key, m in limiter_metrics.items():
+                st.caption(
+                    f"{limiter_key}: limit {m['concurrency_limit']}, in flight {m['in_flight']}, queued {m['queue_depth']}, "
+                    f"avg wait {m['avg_wait_seconds']}s, throttled {m['throttled']}"
+                )
+
+    # --- Retries & Circuit Breakers ---
+    resilience_stats = get_resilience_stats()
+    if resilience_stats:
+        with st.sidebar.expander("Retries & Circuit Breakers"):
+            for provider_name, r in resilience_stats.items():
+                st.caption(
+                    f"{provider_name}: circuit {r['state']} (opened {r['times_opened']}x, fast-failed {r['short_circuited']}), "
+                    f"attempts {r['attempts']}, retries {r['retries']}, exhausted {r['retries_exhausted']}, fatal {r['fatal_errors']}"
+                )
+
+    # --- Model Health (router inputs) ---
+    model_health_stats = get_model_health_stats()
+    if model_health_stats:
+        with st.sidebar.expander("Model Health"):
+            for model_key, h in model_health_stats.items():
+                latency_text = ", ".join(f"{stage or 'other'} {seconds:.2f}s" for stage, seconds in h["ewma_latency_seconds"].items()) or "n/a"
+                st.caption(
+                    f"{model_key}: EWMA latency {latency_text}; error rate {h['ewma_error_rate']:.0%}, calls {h['calls']}"
+                    + (" (cooling down)" if h["cooling_down"] else "")
+                )
+
+    # --- LLM Usage & Cost (persisted telemetry) ---
+    with st.sidebar.expander("LLM Usage & Cost"):
+        if st.checkbox("Load recent LLM calls", key="show_llm_usage_checkbox", help="Aggregates the last 1000 LLM calls saved for all enquiries."):
+            llm_calls, llm_calls_error = get_llm_calls(limit=1000)
+            if llm_calls_error:
+                st.error(f"Could not load LLM call telemetry: {llm_calls_error}")
+            elif not llm_calls:
+                st.caption("No LLM calls recorded yet.")
+            else:
+                usage_rows = [
+                    {"provider": provider, **stats}
+                    for provider, stats in summarize_llm_calls(llm_calls).items()
+                ]
+                st.dataframe(usage_rows, hide_index=True, use_container_width=True)
+                st.caption("Latency percentiles cover successful provider calls (cache hits excluded). Cost is estimated from list prices; models without known pricing count as $0.")
+
     # --- Display Current Configuration ---
     st.sidebar.markdown("---")
     st.sidebar.caption(f"Provider: {ai_conf.selected_ai_provider}")
@@ -159,6 +320,10 @@ def render_sidebar():
         st.sidebar.caption(f"Model: {ai_conf.selected_model_for_provider}")
     st.sidebar.caption(f"Temperature: {ai_conf.temperature if ai_conf.temperature is not None else 'Default (0.7)'}")
     st.sidebar.caption(f"Max Tokens: {ai_conf.max_tokens if ai_conf.max_tokens is not None else 'Provider Default'}")
+    if ai_conf.model_routing_enabled:
+        st.sidebar.caption("Model routing: per stage (selected provider is the fallback)")
+    if ai_conf.hedging_enabled:
+        st.sidebar.caption(f"Hedging: {ai_conf.hedge_backup_provider} ({ai_conf.hedge_backup_model or 'default model'})")
     
     if provider_changed: # This rerun handles provider/model changes primarily.
         st.rerun()
\ No newline at end of file
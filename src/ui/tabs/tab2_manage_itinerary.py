@@ -1,10 +1,13 @@
 # src/ui/tabs/tab2_manage_itinerary.py
 import streamlit as st
 from src.utils.supabase_utils import (
-    get_enquiry_by_id, add_itinerary, get_itinerary_by_enquiry_id
+    get_enquiry_by_id, get_itinerary_by_enquiry_id,
+    get_client_by_enquiry_id, get_vendor_reply_by_enquiry_id
 )
-from src.core.itinerary_generator import generate_places_suggestion_llm
-from src.ui.ui_helpers import handle_enquiry_selection
+from src.utils.constants import JOB_POLL_INTERVAL_SECONDS
+from src.core.quotation_jobs import get_job_queue, submit_suggestions_job
+from src.models import JobRecord
+from src.ui.ui_helpers import handle_enquiry_selection, schedule_speculative_quotation
 # Constants for session keys are removed as per refactoring plan,
 # direct attribute access on st.session_state.app_state will be used.
 
@@ -12,6 +15,84 @@ def _reset_tab2_states():
     st.session_state.app_state.tab2_state.current_ai_suggestions = None
     st.session_state.app_state.tab2_state.current_ai_suggestions_id = None
     st.session_state.app_state.tab2_state.itinerary_loaded_for_tab2 = None
+    # A suggestions job of the previous enquiry keeps running; this tab just stops polling it
+    st.session_state.app_state.tab2_state.active_job_id = None
+    st.session_state.app_state.tab2_state.suggestions_job_error = None
+
+def _render_suggestion_error(error_info: dict | None):
+    err_msg_display = "Could not generate place suggestions."
+    if error_info:
+        err_msg_display = error_info.get("message", err_msg_display)
+        st.error(f"AI Error: {err_msg_display}")
+        
+        details_to_show = error_info.get("details")
+        raw_response_to_show = error_info.get("raw_response")
+
+        if details_to_show or raw_response_to_show :
+            with st.expander("Error Details from AI Provider"):
+                if error_info.get("type"): st.caption(f"Error Type: {error_info.get('type')}")
+                if error_info.get("status_code"): st.caption(f"Status Code: {error_info.get('status_code')}")
+                if details_to_show: st.markdown(f"**Details:**\n```\n{str(details_to_show)}\n```")
+                if raw_response_to_show: st.markdown(f"**Raw Response:**\n```\n{str(raw_response_to_show)[:1000]}\n```") # Truncate long raw responses
+    else: 
+        st.error(err_msg_display) # Fallback if error_info is somehow None
+
+def _schedule_quotation_for_new_itinerary(enquiry_details: dict, itinerary_text: str, itinerary_id: str):
+    """A new itinerary changes the quotation inputs: pre-generate it if a vendor reply is already saved."""
+    if not st.session_state.app_state.ai_config.speculative_quotations:
+        return
+    vendor_reply_data, _ = get_vendor_reply_by_enquiry_id(enquiry_details['id'])
+    if not vendor_reply_data:
+        return
+    client_data, _ = get_client_by_enquiry_id(enquiry_details['id'])
+    schedule_speculative_quotation(
+        enquiry_details,
+        client_data["name"] if client_data and client_data.get("name") else "Valued Client", # As Tab 3 shows it
+        {'text': vendor_reply_data['reply_text'], 'id': vendor_reply_data['id']},
+        itinerary_text,
+        st.session_state.app_state.ai_config,
+        itinerary_id=itinerary_id
+    )
+
+def _running_suggestions_job_id(enquiry_id: str) -> str | None:
+    """The suggestions job still running for the enquiry (e.g. started before a page reload), if any."""
+    for job_id in get_job_queue().list_job_ids(enquiry_id):
+        job = get_job_queue().get(job_id)
+        if job and job.kind == "suggestions":
+            return job_id
+    return None
+
+def _handle_finished_suggestions_job(job: JobRecord | None, enquiry_details: dict):
+    """Applies a finished suggestions job's output to Tab 2's state (called by the job fragment)."""
+    tab2_state = st.session_state.app_state.tab2_state
+    tab2_state.active_job_id = None
+    if job is None:
+        return # Record expired or removed
+    result = job.result or {}
+    if job.status == "done":
+        tab2_state.current_ai_suggestions = result.get("itinerary_text")
+        tab2_state.current_ai_suggestions_id = result.get("itinerary_id")
+        tab2_state.itinerary_loaded_for_tab2 = enquiry_details['id']
+        tab2_state.suggestions_job_error = None
+        st.session_state.app_state.operation_success_message = "AI Place suggestions generated and saved!"
+        _schedule_quotation_for_new_itinerary(enquiry_details, result.get("itinerary_text"), result.get("itinerary_id"))
+    else:
+        tab2_state.suggestions_job_error = result.get("error_info") or {"message": job.error}
+
+@st.fragment(run_every=JOB_POLL_INTERVAL_SECONDS)
+def _render_suggestions_job_status(enquiry_details: dict):
+    """
+    Polls the suggestions job without rerunning the page and shows the text written so far.
+    Only rendered while a job is active, so an idle tab does not poll.
+    """
+    job = get_job_queue().get(st.session_state.app_state.tab2_state.active_job_id)
+    if job is None or job.status in ("done", "failed"):
+        _handle_finished_suggestions_job(job, enquiry_details)
+        st.rerun() # Show the saved suggestions (or the error) in the page
+    with st.container(border=True):
+        st.caption(f"⏳ {job.progress or 'Queued'} (runs in the background; you can switch tabs or reload the page)")
+        if job.preview and job.preview.get("text"):
+            st.markdown(job.preview["text"])
 
 def render_tab2():
     st.header("2. Manage Enquiries & Generate Itinerary")
@@ -43,6 +124,7 @@ def render_tab2():
                     st.session_state.app_state.tab2_state.current_ai_suggestions = None
                     st.session_state.app_state.tab2_state.current_ai_suggestions_id = None
                 st.session_state.app_state.tab2_state.itinerary_loaded_for_tab2 = active_enquiry_id_tab2
+                st.session_state.app_state.tab2_state.active_job_id = _running_suggestions_job_id(active_enquiry_id_tab2)
 
             st.subheader(f"Details for Enquiry: {enquiry_details_tab2['destination']} (ID: {active_enquiry_id_tab2[:8]}...)")
             st.markdown(f"""
@@ -63,41 +145,21 @@ def render_tab2():
             else:
                 st.caption("No AI suggestions generated yet for this enquiry.")
 
-            if st.button(f"Generate Places Suggestions with {st.session_state.app_state.ai_config.selected_ai_provider}", key="gen_ai_suggestions_btn_tab2"):
-                with st.spinner(f"Generating AI suggestions with {st.session_state.app_state.ai_config.selected_ai_provider}..."):
-                    ai_conf_for_generation = st.session_state.app_state.ai_config # Added
-                    suggestions_text, error_info = generate_places_suggestion_llm(
-                        enquiry_details_tab2,
-                        provider=st.session_state.app_state.ai_config.selected_ai_provider,
-                        ai_conf=ai_conf_for_generation # Added
-                    )
-                    if suggestions_text and not error_info:
-                        new_suggestion_record, error_msg_sugg_add = add_itinerary(active_enquiry_id_tab2, suggestions_text)
-                        if new_suggestion_record:
-                            st.session_state.app_state.tab2_state.current_ai_suggestions = suggestions_text
-                            st.session_state.app_state.tab2_state.current_ai_suggestions_id = new_suggestion_record['id']
-                            st.session_state.app_state.tab2_state.itinerary_loaded_for_tab2 = active_enquiry_id_tab2 
-                            st.session_state.app_state.operation_success_message = "AI Place suggestions generated and saved!"
-                            st.rerun()
-                        else:
-                            st.error(f"Failed to save AI suggestions to database: {error_msg_sugg_add or 'Unknown error'}")
-                    else: 
-                        err_msg_display = "Could not generate place suggestions."
-                        if error_info:
-                            err_msg_display = error_info.get("message", err_msg_display)
-                            st.error(f"AI Error: {err_msg_display}")
-                            
-                            details_to_show = error_info.get("details")
-                            raw_response_to_show = error_info.get("raw_response")
-
-                            if details_to_show or raw_response_to_show :
-                                with st.expander("Error Details from AI Provider"):
-                                    if error_info.get("type"): st.caption(f"Error Type: {error_info.get('type')}")
-                                    if error_info.get("status_code"): st.caption(f"Status Code: {error_info.get('status_code')}")
-                                    if details_to_show: st.markdown(f"**Details:**\n```\n{str(details_to_show)}\n```")
-                                    if raw_response_to_show: st.markdown(f"**Raw Response:**\n```\n{str(raw_response_to_show)[:1000]}\n```") # Truncate long raw responses
-                        else: 
-                            st.error(err_msg_display) # Fallback if error_info is somehow None
+            generation_running = st.session_state.app_state.tab2_state.active_job_id is not None
+            if st.button(f"Generate Places Suggestions with {st.session_state.app_state.ai_config.selected_ai_provider}",
+                         disabled=generation_running, key="gen_ai_suggestions_btn_tab2"):
+                # Generation and saving run in the job queue (src/core/quotation_jobs.py); the fragment below polls it
+                st.session_state.app_state.tab2_state.suggestions_job_error = None
+                st.session_state.app_state.tab2_state.active_job_id = submit_suggestions_job(
+                    enquiry_details_tab2,
+                    st.session_state.app_state.ai_config.selected_ai_provider,
+                    st.session_state.app_state.ai_config
+                )
+
+            if st.session_state.app_state.tab2_state.active_job_id:
+                _render_suggestions_job_status(enquiry_details_tab2)
+            if st.session_state.app_state.tab2_state.suggestions_job_error:
+                _render_suggestion_error(st.session_state.app_state.tab2_state.suggestions_job_error)
         elif error_msg_details_tab2:
             st.error(f"Could not load selected enquiry details: {error_msg_details_tab2}")
         else:
@@ -1,5 +1,4 @@
 import streamlit as st
-import hashlib
 
 from src.utils.supabase_utils import (
     get_enquiry_by_id, get_client_by_enquiry_id,
@@ -7,39 +6,25 @@ from src.utils.supabase_utils import (
     get_itinerary_by_enquiry_id,
     get_quotation_by_enquiry_id
 )
-import hashlib
-from src.ui.ui_helpers import handle_enquiry_selection
+from src.ui.ui_helpers import handle_enquiry_selection, graph_cache_key_for
+from src.core.speculative_quotations import get_speculative_quotation_runner
 # SESSION_KEY constants removed as per refactoring plan
 
 from src.ui.components.tab3_ui_components import (
     display_enquiry_and_itinerary_details_tab3,
     render_vendor_reply_section,
     render_quotation_generation_section,
+    render_quotation_jobs_status,
+    render_quotation_job_error,
     display_quotation_files_section
 )
 from src.ui.components.tab3_actions import (
     handle_vendor_reply_submit,
     handle_pdf_generation,
-    handle_docx_generation
+    handle_docx_generation,
+    handle_finished_job
 )
-
-def _generate_graph_cache_key(
-    enquiry_id: str, 
-    client_name: str, 
-    vendor_reply_text: str, 
-    ai_itinerary_text: str, 
-    llm_provider: str, 
-    llm_model: str | None,
-    temperature: float | None, # New
-    max_tokens: int | None # New
-) -> str:
-    key_string = (
-        f"{enquiry_id}-{client_name}-{vendor_reply_text}-{ai_itinerary_text}-"
-        f"{llm_provider}-{llm_model or 'N/A'}-"
-        f"temp:{temperature if temperature is not None else AIConfigState().temperature}-" # Use default from model if None for consistent key
-        f"maxtok:{max_tokens if max_tokens is not None else 'provider_default'}" 
-    )
-    return hashlib.md5(key_string.encode('utf-8')).hexdigest()
+from src.core.quotation_jobs import get_job_queue
 
 def _reset_tab3_specific_data_on_selection_change():
     """Callback to reset tab3 specific states when enquiry selection changes."""
@@ -61,6 +46,10 @@ def _reset_tab3_specific_data_on_selection_change():
     
     st.session_state.app_state.tab3_state.show_quotation_success = False
 
+    # Background jobs of the previous enquiry keep running; this tab just stops polling them
+    st.session_state.app_state.tab3_state.active_job_ids = []
+    st.session_state.app_state.tab3_state.quotation_job_error = None
+
 
 def render_tab3(): 
     """Render the UI for the 'Add Vendor Reply & Generate Quotation' tab."""
@@ -110,6 +99,9 @@ def render_tab3():
                 st.session_state.app_state.tab3_state.current_docx_storage_path = None
             # Cache is already reset by the callback
 
+            # Jobs still running for this enquiry (e.g. started before a page reload) are polled again
+            st.session_state.app_state.tab3_state.active_job_ids = get_job_queue().list_job_ids(active_enquiry_id_tab3)
+
         # Always refresh itinerary text from DB and check if it changed, invalidating cache if so
         # This part needs to be inside the `if active_enquiry_id_tab3:` block
         itinerary_data_tab3, _ = get_itinerary_by_enquiry_id(active_enquiry_id_tab3)
@@ -135,24 +127,34 @@ def render_tab3():
         render_vendor_reply_section(active_enquiry_id_tab3, handle_vendor_reply_submit)
         
         if st.session_state.app_state.tab3_state.enquiry_details and st.session_state.app_state.tab3_state.vendor_reply_info:
-            ai_conf_for_key = st.session_state.app_state.ai_config # Get current AI config
-            current_graph_cache_key = _generate_graph_cache_key(
+            current_graph_cache_key = graph_cache_key_for(
                 active_enquiry_id_tab3,
                 st.session_state.app_state.tab3_state.client_name,
                 st.session_state.app_state.tab3_state.vendor_reply_info.get('text', ""),
                 st.session_state.app_state.tab3_state.itinerary_info.get('text', "Itinerary suggestions not available."),
-                ai_conf_for_key.selected_ai_provider,
-                ai_conf_for_key.selected_model_for_provider,
-                ai_conf_for_key.temperature,   # Pass current temperature
-                ai_conf_for_key.max_tokens     # Pass current max_tokens
+                st.session_state.app_state.ai_config # Current AI config
             )
 
+            # A background run for other inputs (e.g. the AI settings changed since the reply was saved) is wasted work
+            speculative_runner = get_speculative_quotation_runner()
+            speculative_runner.cancel(active_enquiry_id_tab3, keep_key=current_graph_cache_key)
+            speculative_status = speculative_runner.status(current_graph_cache_key)
+            if speculative_status == "ready":
+                st.caption("⚡ Quotation pre-generated in the background and ready.")
+            elif speculative_status:
+                st.caption("⏳ Quotation is being pre-generated in the background.")
+
             render_quotation_generation_section(
                 active_enquiry_id_tab3,
                 lambda aid, ckey: handle_pdf_generation(aid, ckey), 
                 lambda aid, ckey: handle_docx_generation(aid, ckey),
                 current_graph_cache_key
             )
+
+            if st.session_state.app_state.tab3_state.active_job_ids:
+                render_quotation_jobs_status(handle_finished_job)
+            if st.session_state.app_state.tab3_state.quotation_job_error:
+                render_quotation_job_error(st.session_state.app_state.tab3_state.quotation_job_error)
             
         display_quotation_files_section(active_enquiry_id_tab3) 
 
@@ -1,6 +1,9 @@
 # ui_helpers.py
+import hashlib
 import streamlit as st
 from src.utils.supabase_utils import get_enquiries
+from src.models import AIConfigState
+from src.core.speculative_quotations import get_speculative_quotation_runner
 
 from typing import Any # Add Any for type hinting
 
@@ -97,4 +100,61 @@ def handle_enquiry_selection(
         on_selection_change_callback()
         st.rerun()  # Re-run to reflect changes and trigger data loading for the new selection
 
-    return getattr(state_model_instance, field_name_for_selected_id, None), enquiries_list
\ No newline at end of file
+    return getattr(state_model_instance, field_name_for_selected_id, None), enquiries_list
+
+
+def generate_graph_cache_key(
+    enquiry_id: str, 
+    client_name: str, 
+    vendor_reply_text: str, 
+    ai_itinerary_text: str, 
+    llm_provider: str, 
+    llm_model: str | None,
+    temperature: float | None, # New
+    max_tokens: int | None, # New
+    single_pass: bool = False,
+    segmented: bool = False
+) -> str:
+    key_string = (
+        f"{enquiry_id}-{client_name}-{vendor_reply_text}-{ai_itinerary_text}-"
+        f"{llm_provider}-{llm_model or 'N/A'}-"
+        f"temp:{temperature if temperature is not None else AIConfigState().temperature}-" # Use default from model if None for consistent key
+        f"maxtok:{max_tokens if max_tokens is not None else 'provider_default'}-"
+        f"mode:{'single_pass' if single_pass else 'segmented' if segmented else 'two_stage'}"
+    )
+    return hashlib.md5(key_string.encode('utf-8')).hexdigest()
+
+
+def graph_cache_key_for(enquiry_id: str, client_name: str, vendor_reply_text: str, itinerary_text: str, ai_conf: AIConfigState) -> str:
+    """generate_graph_cache_key for the inputs and AI config a quotation is generated with."""
+    return generate_graph_cache_key(
+        enquiry_id, client_name, vendor_reply_text, itinerary_text,
+        ai_conf.selected_ai_provider, ai_conf.selected_model_for_provider,
+        ai_conf.temperature, ai_conf.max_tokens,
+        ai_conf.single_pass_quotation, ai_conf.segmented_itinerary
+    )
+
+
+def schedule_speculative_quotation(
+    enquiry_details: dict,
+    client_name: str,
+    vendor_reply_info: dict | None,
+    itinerary_text: str,
+    ai_conf: AIConfigState,
+    itinerary_id: str | None = None
+):
+    """
+    Pre-generates the quotation in the background after its inputs were saved, so Tab 3's generate
+    buttons usually find it ready (see src/core/speculative_quotations.py). No-op without a vendor
+    reply or when the agent turned speculation off.
+    """
+    if not ai_conf.speculative_quotations or not enquiry_details or not (vendor_reply_info or {}).get('text'):
+        return
+    enquiry_id = enquiry_details['id']
+    cache_key = graph_cache_key_for(enquiry_id, client_name, vendor_reply_info['text'], itinerary_text, ai_conf)
+    details_for_graph = dict(enquiry_details)
+    details_for_graph["client_name_actual"] = client_name
+    get_speculative_quotation_runner().schedule(
+        enquiry_id, cache_key, details_for_graph, vendor_reply_info['text'], itinerary_text,
+        ai_conf.selected_ai_provider, ai_conf, vendor_reply_id=vendor_reply_info.get('id'), itinerary_id=itinerary_id
+    )
@@ -22,6 +22,148 @@ IMAGE_TOP_BANNER = os.path.join(ASSETS_DIR, "top_banner.png")
 IMAGE_TRIPEXPLORE_LOGO_RATING = os.path.join(ASSETS_DIR, "tripexplore-logo-with-rating.png")
 
 
+# --- LLM Providers ---
+AI_PROVIDER_OPTIONS = ["Gemini", "OpenRouter", "Groq", "TogetherAI", "Local"]
+
+# Define model options for providers that support multiple models via this UI
+PROVIDER_MODEL_OPTIONS = {
+    "OpenRouter": [
+        "google/gemma-3-27b-it:free",
+        "openai/gpt-3.5-turbo",
+        "meta-llama/llama-3.3-8b-instruct:free",
+        "microsoft/phi-4-reasoning-plus:free",
+        "deepseek/deepseek-prover-v2:free"
+    ],
+    "Groq": [
+        "llama3-8b-8192",
+        "llama3-70b-8192",
+        "meta-llama/llama-4-scout-17b-16e-instruct",
+        "deepseek-r1-distill-llama-70b",
+        "qwen-qwq-32b"
+    ],
+    "Gemini": [
+        "gemini-1.5-flash-latest",
+        "gemini-1.5-pro-latest",
+        "gemini-1.0-pro"
+    ],
+    "TogetherAI": [
+        "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free",
+        "deepseek-ai/DeepSeek-R1-Distill-Llama-70B-free"
+        # Add other TogetherAI models here if needed
+    ],
+    "Local": [
+        "synthetic", # Schema-valid generated answers with configurable latency (no network)
+        "replay" # Recorded responses from a cassette, with their original latency
+    ]
+}
+
+# Candidate (provider, model) pairs per LLM stage for the model router, in order of preference.
+# Cheap, fast models extract; larger models generate the quotation JSON. The sidebar-selected
+# provider/model is always appended as the last resort.
+STAGE_MODEL_CANDIDATES = {
+    "places_suggestion": [
+        ("Groq", "llama3-8b-8192"),
+        ("Gemini", "gemini-1.5-flash-latest"),
+        ("TogetherAI", "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"),
+    ],
+    "parse_vendor_reply": [
+        ("Groq", "llama3-8b-8192"),
+        ("Gemini", "gemini-1.5-flash-latest"),
+        ("OpenRouter", "openai/gpt-3.5-turbo"),
+    ],
+    "structure_quotation": [
+        ("Groq", "llama3-70b-8192"),
+        ("Gemini", "gemini-1.5-pro-latest"),
+        ("OpenRouter", "openai/gpt-3.5-turbo"),
+        ("TogetherAI", "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"),
+    ],
+    # Single-pass mode also reads the raw vendor reply; long replies drop the 8k models via the context-window check
+    "structure_quotation_single_pass": [
+        ("Groq", "llama3-70b-8192"),
+        ("Gemini", "gemini-1.5-pro-latest"),
+        ("OpenRouter", "openai/gpt-3.5-turbo"),
+        ("TogetherAI", "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"),
+    ],
+    # Segmented mode: the skeleton is short and the day descriptions are written in parallel small calls
+    "structure_quotation_skeleton": [
+        ("Groq", "llama3-70b-8192"),
+        ("Gemini", "gemini-1.5-flash-latest"),
+        ("OpenRouter", "openai/gpt-3.5-turbo"),
+    ],
+    "write_itinerary_segment": [
+        ("Groq", "llama3-8b-8192"),
+        ("Gemini", "gemini-1.5-flash-latest"),
+        ("TogetherAI", "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"),
+    ],
+    # Incremental regeneration: a few quotation fields re-extracted from a corrected vendor reply
+    "patch_quotation_fields": [
+        ("Groq", "llama3-8b-8192"),
+        ("Gemini", "gemini-1.5-flash-latest"),
+        ("OpenRouter", "openai/gpt-3.5-turbo"),
+    ],
+}
+
+# Context window (prompt + completion tokens) of each model in PROVIDER_MODEL_OPTIONS and the
+# provider defaults. Unknown models get DEFAULT_CONTEXT_WINDOW_TOKENS, the smallest window offered.
+MODEL_CONTEXT_WINDOWS = {
+    "google/gemma-3-27b-it:free": 96000,
+    "openai/gpt-3.5-turbo": 16385,
+    "meta-llama/llama-3.3-8b-instruct:free": 128000,
+    "microsoft/phi-4-reasoning-plus:free": 32768,
+    "deepseek/deepseek-prover-v2:free": 163840,
+    "llama3-8b-8192": 8192,
+    "llama3-70b-8192": 8192,
+    "meta-llama/llama-4-scout-17b-16e-instruct": 131072,
+    "deepseek-r1-distill-llama-70b": 131072,
+    "qwen-qwq-32b": 131072,
+    "gemini-1.5-flash-latest": 1048576,
+    "gemini-1.5-pro-latest": 2097152,
+    "gemini-1.0-pro": 32760,
+    "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free": 131072,
+    "deepseek-ai/DeepSeek-R1-Distill-Llama-70B-free": 8192,
+    "synthetic": 8192, # Local provider: behaves like the smallest hosted models
+    "replay": 8192,
+}
+DEFAULT_CONTEXT_WINDOW_TOKENS = 8192
+# Tokens kept free for the completion when ai_config.max_tokens is not set
+DEFAULT_OUTPUT_TOKEN_RESERVATION = 2048
+
+# Expected size of the quotation JSON, used to size max_tokens when ai_config.max_tokens is not set:
+# summary fields and default lists (catalogue text is merged locally, see quotation_catalogue), one itinerary
+# day (title + one or two paragraphs), one vendor list item.
+QUOTATION_OUTPUT_BASE_TOKENS = 450
+QUOTATION_OUTPUT_TOKENS_PER_DAY = 220
+QUOTATION_OUTPUT_TOKENS_PER_LIST_ITEM = 30
+QUOTATION_OUTPUT_SAFETY_FACTOR = 1.3
+# Sized max_tokens are rounded up to a multiple of this, so similar quotations share pooled clients and cache keys
+OUTPUT_TOKEN_SIZING_STEP = 512
+
+# Minimum time between two live quotation previews while the quotation JSON streams in
+QUOTATION_PREVIEW_MIN_INTERVAL_SECONDS = 0.3
+
+# Segmented itinerary mode (ai_config.segmented_itinerary): the skeleton has a one-line outline per day,
+# then each city's days are written in parallel calls of at most ITINERARY_SEGMENT_MAX_DAYS days
+SKELETON_OUTPUT_TOKENS_PER_DAY = 60
+ITINERARY_SEGMENT_MAX_DAYS = int(os.getenv("ITINERARY_SEGMENT_MAX_DAYS", "3"))
+
+# Timeout of one provider request (Gemini request_options), also the limit for a hedged race run from sync code
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "120"))
+
+# Published list prices in USD per million tokens: (input, output). Used for cost estimates only;
+# free-tier models (":free" / "-Free" suffix) and the Local provider cost nothing.
+MODEL_PRICING_USD_PER_MILLION_TOKENS = {
+    "openai/gpt-3.5-turbo": (0.50, 1.50),
+    "llama3-8b-8192": (0.05, 0.08),
+    "llama3-70b-8192": (0.59, 0.79),
+    "meta-llama/llama-4-scout-17b-16e-instruct": (0.11, 0.34),
+    "deepseek-r1-distill-llama-70b": (0.75, 0.99),
+    "qwen-qwq-32b": (0.29, 0.39),
+    "gemini-1.5-flash-latest": (0.075, 0.30),
+    "gemini-1.5-pro-latest": (1.25, 5.00),
+    "gemini-1.0-pro": (0.50, 1.50),
+}
+
+
 # --- Supabase ---
 # Table Names
 TABLE_ENQUIRIES = "enquiries"
@@ -29,6 +171,28 @@ TABLE_CLIENTS = "clients"
 TABLE_ITINERARIES = "itineraries"
 TABLE_VENDOR_REPLIES = "vendor_replies"
 TABLE_QUOTATIONS = "quotations"
+TABLE_LLM_CALLS = "llm_calls"
+TABLE_VENDOR_REPLY_PARSES = "vendor_reply_parses"
 
 # Storage Bucket Names
 BUCKET_QUOTATIONS = "quotations"
+
+# --- Batch Quotations ---
+BATCH_QUOTATION_WORKERS = int(os.getenv("BATCH_QUOTATION_WORKERS", "4")) # Enquiries quoted concurrently
+BATCH_QUOTATION_STATE_FILE = "quotation_batch_state.jsonl" # Per-item results, read back to resume a run
+
+# --- Speculative Quotations ---
+# Saving a vendor reply (Tab 3) or an itinerary (Tab 2) pre-generates the quotation in the background
+SPECULATIVE_QUOTATION_WORKERS = int(os.getenv("SPECULATIVE_QUOTATION_WORKERS", "2")) # Background graph runs at once
+SPECULATIVE_QUOTATION_MAX_PENDING = int(os.getenv("SPECULATIVE_QUOTATION_MAX_PENDING", "8")) # Queued + running; more are not scheduled
+# Tokens (prompt + completion) speculative runs may spend per rolling hour, across all sessions
+SPECULATIVE_QUOTATION_TOKEN_BUDGET_PER_HOUR = int(os.getenv("SPECULATIVE_QUOTATION_TOKEN_BUDGET_PER_HOUR", "200000"))
+SPECULATIVE_QUOTATION_RESULT_TTL_SECONDS = float(os.getenv("SPECULATIVE_QUOTATION_RESULT_TTL_SECONDS", "1800")) # Unclaimed results expire
+
+# --- Incremental Quotation Regeneration ---
+# A revised vendor reply whose changed lines only touch prices, hotels or inclusions/exclusions
+# patches those fields of the latest quotation instead of regenerating it (src/core/quotation_patch.py)
+QUOTATION_PATCH_MAX_CHANGED_LINES = int(os.getenv("QUOTATION_PATCH_MAX_CHANGED_LINES", "12")) # More: regenerate in full
+
+# --- Background Jobs ---
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1.5")) # How often Tab 3 refreshes running jobs
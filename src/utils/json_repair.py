@@ -0,0 +1,263 @@
+# src/utils/json_repair.py
+"""
+Local repair of almost-JSON LLM output, so a malformed answer can be salvaged without another
+paid LLM call.
+
+extract_json_text() finds the JSON object in a chatty answer (code fences, preamble, trailing
+remarks) with a string-aware scan, so braces inside string values do not confuse it.
+repair_json() rewrites the common defects in a single pass:
+  - trailing commas and doubled commas,
+  - unescaped double quotes and raw control characters inside strings,
+  - Python literals (True/False/None),
+  - answers cut off mid-way: the open string is closed, an incomplete member is dropped and the
+    open brackets are closed. This also makes any prefix of a streamed answer parseable.
+loads_json_with_repair() tries a strict json.loads first and only repairs when that fails;
+loads_partial_json() is the lenient variant used for live previews of a streaming answer.
+"""
+import re
+import json
+from typing import Any
+
+_FENCE_START = re.compile(r"```(?:json|JSON)?\s*")
+_LITERAL = re.compile(r"[^\s,:\[\]{}\"]+")
+_VALID_LITERAL = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null")
+_KEY_AHEAD = re.compile(r'"(?:[^"\\\n]|\\.)*"\s*:')
+_NON_SPACE = re.compile(r"\S")
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+
+
+def extract_json_text(text: str) -> str:
+    """
+    The JSON value in `text`: from the first '{' (or '[' if no object) to its matching bracket,
+    or to the end of the text if the answer was cut off. Raises json.JSONDecodeError if there is none.
+    """
+    fence = _FENCE_START.search(text)
+    if fence and "{" in text[fence.end():]:
+        text = text[fence.end():]
+    start = text.find("{")
+    if start == -1:
+        start = text.find("[")
+    if start == -1:
+        raise json.JSONDecodeError("No JSON object found.", text, 0)
+
+    depth, in_string, escaped = 0, False, False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def _next_significant(text: str, index: int) -> str:
+    """The first non-whitespace character at or after index ('' at the end of the text)."""
+    match = _NON_SPACE.search(text, index)
+    return match.group(0) if match else ""
+
+
+def _closes_string(text: str, index: int, is_key: bool) -> bool:
+    """Whether the quote at text[index] ends the current string or is an unescaped quote inside it."""
+    following = _next_significant(text, index + 1)
+    if is_key:
+        return following in (":", "")
+    if following in ("}", "]", ""):
+        return True
+    if following == '"':
+        # `"a": "x"\n  "b": ...` - a missing comma, if a key follows
+        return bool(_KEY_AHEAD.match(text, text.index('"', index + 1)))
+    if following == ",":
+        # `"a", "b"` or `"a",\n  "key":` - a comma inside prose is followed by a word instead
+        after_comma = _next_significant(text, text.index(",", index + 1) + 1)
+        return after_comma in ('"', "{", "[", "}", "]", "") or after_comma.isdigit() or after_comma == "-"
+    return False
+
+
+class _Frame:
+    """An open object or array: what it expects next, and the output length at its last clean point."""
+    __slots__ = ("closer", "expect", "safe_length")
+
+    def __init__(self, closer: str, expect: str, safe_length: int):
+        self.closer = closer
+        self.expect = expect # object: key/colon/value/comma, array: value/comma
+        self.safe_length = safe_length
+
+
+class _Output:
+    """Append-only text buffer that can be rolled back to an earlier length."""
+
+    def __init__(self):
+        self.parts: list[str] = []
+        self.length = 0
+
+    def append(self, part: str):
+        self.parts.append(part)
+        self.length += len(part)
+
+    def rollback(self, length: int) -> str:
+        """Truncates the buffer to `length` and returns the removed text."""
+        text = "".join(self.parts)
+        self.parts, self.length = [text[:length]], length
+        return text[length:]
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+def _close_frame(out: _Output, frame: _Frame, repairs: list[str]):
+    """Closes frame, first rolling back a dangling comma or an incomplete member (`"key":` with no value)."""
+    if frame.expect != "comma":
+        removed = out.rollback(frame.safe_length).strip()
+        if removed == ",":
+            repairs.append("removed trailing comma")
+        elif removed:
+            repairs.append("dropped incomplete member")
+    out.append(frame.closer)
+
+
+def repair_json(text: str) -> tuple[str, list[str]]:
+    """
+    Returns (repaired JSON text, list of repairs applied). The result parses with json.loads for
+    the defects listed in the module docstring; anything else is passed through unchanged.
+    """
+    text = extract_json_text(text)
+    out = _Output()
+    repairs: list[str] = []
+    stack: list[_Frame] = []
+    in_string = is_key = False
+    i = 0
+
+    def value_done():
+        if stack:
+            stack[-1].expect = "comma"
+            stack[-1].safe_length = out.length
+
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            if char == "\\" and i + 1 < len(text):
+                out.append(text[i:i + 2])
+                i += 2
+                continue
+            if char == '"':
+                if _closes_string(text, i, is_key):
+                    out.append(char)
+                    in_string = False
+                    if is_key:
+                        stack[-1].expect = "colon"
+                    else:
+                        value_done()
+                else:
+                    out.append('\\"')
+                    repairs.append("escaped quote inside string")
+            elif ord(char) < 0x20:
+                out.append(_CONTROL_ESCAPES.get(char, f"\\u{ord(char):04x}"))
+                repairs.append("escaped control character")
+            else:
+                out.append(char)
+            i += 1
+            continue
+
+        if char.isspace():
+            out.append(char)
+        elif char in "{[":
+            if stack and stack[-1].expect == "comma": # `} {` - missing comma between values
+                out.append(",")
+                repairs.append("inserted missing comma")
+            out.append(char)
+            stack.append(_Frame("}" if char == "{" else "]", "key" if char == "{" else "value", out.length))
+        elif char in "}]":
+            if not stack:
+                repairs.append("dropped unmatched closing bracket")
+            else:
+                while len(stack) > 1 and stack[-1].closer != char: # `[{"a": 1]` - close the inner container first
+                    _close_frame(out, stack.pop(), repairs)
+                    repairs.append("closed mismatched bracket")
+                    value_done()
+                _close_frame(out, stack.pop(), repairs)
+                value_done()
+                if not stack:
+                    break # Root closed: ignore whatever follows
+        elif char == '"':
+            frame = stack[-1] if stack else None
+            if frame and frame.expect == "comma": # `"a": "x" "b": "y"`
+                out.append(",")
+                repairs.append("inserted missing comma")
+                frame.expect = "key" if frame.closer == "}" else "value"
+            is_key = bool(frame and frame.closer == "}" and frame.expect == "key")
+            in_string = True
+            out.append(char)
+        elif char == ":":
+            if stack and stack[-1].expect == "colon":
+                stack[-1].expect = "value"
+            out.append(char)
+        elif char == ",":
+            if stack and stack[-1].expect == "comma":
+                stack[-1].expect = "key" if stack[-1].closer == "}" else "value"
+                out.append(char)
+            else:
+                repairs.append("removed stray comma")
+        else:
+            literal = _LITERAL.match(text, i).group(0)
+            i += len(literal)
+            if i >= len(text) and not _VALID_LITERAL.fullmatch(literal):
+                break # Cut off inside a literal: its member is dropped below
+            if literal in _PYTHON_LITERALS:
+                literal = _PYTHON_LITERALS[literal]
+                repairs.append("converted Python literal")
+            elif not _VALID_LITERAL.fullmatch(literal):
+                literal = json.dumps(literal)
+                repairs.append("quoted bare word")
+            out.append(literal)
+            value_done()
+            continue
+        i += 1
+
+    if in_string:
+        if is_key:
+            out.rollback(stack[-1].safe_length)
+            repairs.append("dropped incomplete member")
+        else:
+            out.append('"')
+            value_done()
+            repairs.append("closed unterminated string")
+    if stack:
+        repairs.append(f"closed {len(stack)} unclosed bracket(s)")
+    while stack:
+        _close_frame(out, stack.pop(), repairs)
+        value_done()
+    return out.text(), repairs
+
+
+def loads_partial_json(text: str) -> Any | None:
+    """Best-effort value of an incomplete (e.g. still streaming) JSON answer; None until its JSON has started."""
+    try:
+        return json.loads(repair_json(text)[0])
+    except json.JSONDecodeError:
+        return None
+
+
+def loads_json_with_repair(text: str) -> tuple[Any, list[str]]:
+    """
+    Parses the JSON value in an LLM answer. Returns (value, repairs); repairs is empty when the
+    answer was valid JSON. Raises json.JSONDecodeError if it cannot be repaired.
+    """
+    candidate = extract_json_text(text)
+    try:
+        return json.loads(candidate), []
+    except json.JSONDecodeError:
+        pass
+    repaired, repairs = repair_json(candidate)
+    return json.loads(repaired), repairs
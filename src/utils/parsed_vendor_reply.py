@@ -0,0 +1,77 @@
+# src/utils/parsed_vendor_reply.py
+"""
+The parsed vendor reply (ParsedVendorReply in src/models.py) passed between the two LLM stages of
+the quotation graph.
+
+The parsing call answers with the record as JSON. The structuring, skeleton and segment prompts get
+it in the compact text form of format_parsed_vendor_reply: one labelled line per value and "- "
+lists, with missing values left out. That is shorter than both the JSON and the prose under
+headings the parse used to produce, and list items still count towards the quotation's expected
+output size (quotation_graph_builder._expected_structuring_output_tokens).
+"""
+import json
+from typing import Any
+
+from src.models import ParsedVendorReply
+from src.utils.json_repair import loads_json_with_repair
+
+# Sent as the provider's JSON schema where structured output is supported (see structured_output_format)
+PARSED_VENDOR_REPLY_SCHEMA = ParsedVendorReply.model_json_schema()
+
+NOTHING_PARSED_TEXT = "The vendor reply gives no prices, hotels, inclusions or itinerary."
+
+
+def parse_vendor_reply_record(response_data: Any) -> tuple[ParsedVendorReply, list[str]]:
+    """
+    The record in the parsing call's answer, repairing malformed JSON locally. Returns (record, repairs applied).
+    Raises json.JSONDecodeError / pydantic.ValidationError when the answer is not a record (e.g. prose).
+    """
+    repairs = []
+    if isinstance(response_data, str):
+        payload, repairs = loads_json_with_repair(response_data)
+    else:
+        payload = response_data
+    if not isinstance(payload, dict):
+        raise json.JSONDecodeError("Expected a JSON object.", str(response_data), 0)
+    return ParsedVendorReply.model_validate(payload), repairs
+
+
+def _hotel_line(hotel: Any) -> str:
+    nights = hotel.nights
+    if nights and nights.strip().isdigit():
+        nights = f"{nights.strip()} night{'' if nights.strip() == '1' else 's'}"
+    details = ", ".join(part for part in (hotel.city, nights, hotel.category) if part)
+    name = hotel.name or "Hotel"
+    return f"- {name} ({details})" if details else f"- {name}"
+
+
+def _day_line(day: Any) -> str:
+    label = (day.day or "").strip()
+    if label.isdigit():
+        label = f"Day {label}"
+    return f"- {label}: {day.summary}" if label else f"- {day.summary}"
+
+
+def format_parsed_vendor_reply(record: ParsedVendorReply) -> str:
+    """Compact text of the record for the structuring prompts."""
+    lines = []
+    price = " ".join(part for part in (record.currency, record.price, record.price_basis) if part)
+    if price:
+        lines.append(f"Price: {price}")
+    if record.pax_basis:
+        lines.append(f"Pax basis: {record.pax_basis}")
+    hotels = [hotel for hotel in record.hotels or [] if hotel.name or hotel.city]
+    if hotels:
+        lines += ["Hotels:"] + [_hotel_line(hotel) for hotel in hotels]
+    if record.meal_plan:
+        lines.append(f"Meal plan: {record.meal_plan}")
+    if record.room_configuration:
+        lines.append(f"Room configuration: {record.room_configuration}")
+    for label, items in (("Inclusions", record.inclusions), ("Exclusions", record.exclusions)):
+        items = [item for item in items or [] if item.strip()]
+        if items:
+            lines += [f"{label}:"] + [f"- {item}" for item in items]
+    days = [day for day in record.itinerary_days or [] if day.summary]
+    if days:
+        lines += ["Vendor itinerary:"] + [_day_line(day) for day in days]
+    return "\n".join(lines) or NOTHING_PARSED_TEXT
@@ -0,0 +1,53 @@
+# src/utils/quotation_catalogue.py
+"""
+Fixed quotation content: tax notes, company contact details, standard exclusions and the default
+important notes. This text is the same on every quotation, so the LLM is not asked to copy it (that
+cost several hundred of the slowest, output tokens per quotation). merge_quotation_catalogue() adds
+it to the structured quotation data before the PDF/DOCX renderers run.
+
+Bump QUOTATION_CATALOGUE_VERSION whenever the content changes: it is saved with every quotation
+(structured_data["catalogue_version"]), so it is clear which wording a sent quotation used.
+"""
+import copy
+
+QUOTATION_CATALOGUE_VERSION = "2023-10-01"
+
+QUOTATION_CATALOGUE = {
+    "gst_note": "GST (Goods and Services Tax) will be applicable as per government norms, currently 5% on tour packages.",
+    "tcs_note_short": "TCS may be applicable for overseas packages as per prevailing government regulations.",
+
+    "company_contact_person": "V.R.Viswanathan",
+    "company_phone": "+91-8884016046",
+    "company_email": "vrtravelpackages@gmail.com",
+    "company_website": "www.tripexplore.in",
+
+    "standard_exclusions_list": [
+        "Expenses of personal nature like tips, laundry, phone calls, alcoholic beverages etc.",
+        "Any increase in airfare, visa fees, or taxes levied by the government.",
+        "Cost of any optional tours, activities, or services.",
+        "Early check-in & late check-out charges at hotels (standard check-in/out times apply).",
+    ],
+    "important_notes": [
+        "This is a proposed itinerary and is subject to change/customization based on your preferences and availability.",
+        "All hotel accommodations are subject to availability at the time of booking. In case of unavailability, similar category hotels will be provided.",
+        "Rates are valid for the period mentioned and for Indian nationals only, unless specified otherwise.",
+        "Standard check-in time at hotels is 14:00 hrs and check-out is 12:00 hrs.",
+    ],
+    "tcs_rules_full": "Note: Effective 01 October 2023, 'Tax Collected at Source' (TCS), will be at 5% till Rs. 7 lakh, and 20% thereafter, for all Cumulative Payments made against a PAN in the Current Financial Year. The Buyer will have to Furnish an Undertaking on their spends for Overseas Tour Packages/ Cruises in the year. The Government of India, Ministry of Finance, via Circular No. 10 of 2023, F. No. 37 014212312023-TPL, dated 30th June, 2023, has clarified that the information is to be furnished by the buyer in an undertaking and any false information will merit appropriate action against the buyer under the Finance Act, 2023 amended sub-section (1G) of section 206C of the income-tax Act, 1961.",
+}
+
+# Notes the model adds for this enquiry are kept after the standard ones; every other catalogue field
+# replaces whatever the model wrote, so legal and contact text cannot drift.
+_APPENDABLE_FIELDS = ("important_notes",)
+
+
+def merge_quotation_catalogue(structured_data: dict) -> dict:
+    """A copy of the quotation data with the catalogue content and its version added."""
+    merged = dict(structured_data)
+    for field, value in QUOTATION_CATALOGUE.items():
+        value = copy.deepcopy(value)
+        if field in _APPENDABLE_FIELDS and isinstance(merged.get(field), list):
+            value += [item for item in merged[field] if item not in value]
+        merged[field] = value
+    merged["catalogue_version"] = QUOTATION_CATALOGUE_VERSION
+    return merged
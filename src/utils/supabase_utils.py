@@ -5,7 +5,7 @@ from postgrest import APIError
 from httpx import HTTPStatusError
 from src.utils.constants import (
     TABLE_CLIENTS, TABLE_ENQUIRIES, TABLE_ITINERARIES,
-    TABLE_VENDOR_REPLIES, TABLE_QUOTATIONS
+    TABLE_VENDOR_REPLIES, TABLE_QUOTATIONS, TABLE_LLM_CALLS, TABLE_VENDOR_REPLY_PARSES
 )
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -132,6 +132,15 @@ def get_vendor_reply_by_enquiry_id(enquiry_id: str):
     except Exception as e:
         return None, _format_error_message(e, f"Unexpected error fetching vendor reply for enquiry {enquiry_id}")
 
+def get_vendor_reply_by_id(vendor_reply_id: str):
+    try:
+        response = supabase.table(TABLE_VENDOR_REPLIES).select("*").eq("id", vendor_reply_id).maybe_single().execute()
+        return response.data if response else None, None
+    except (APIError, HTTPStatusError) as e:
+        return None, _format_error_message(e, f"Error fetching vendor reply {vendor_reply_id}")
+    except Exception as e:
+        return None, _format_error_message(e, f"Unexpected error fetching vendor reply {vendor_reply_id}")
+
 def upload_file_to_storage(bucket_name: str, file_path_in_storage: str, file_bytes: bytes, content_type: str) -> tuple[str | None, str | None]:
     try:
         response = supabase.storage.from_(bucket_name).upload( # bucket_name is already a parameter
@@ -193,6 +202,64 @@ def get_quotation_by_enquiry_id(enquiry_id: str):
     except Exception as e:
         return None, _format_error_message(e, f"Unexpected error fetching quotation for enquiry {enquiry_id}")
 
+LLM_CALL_COLUMNS = (
+    "stage", "provider", "model", "cache_hit", "queue_seconds", "time_to_first_token_seconds",
+    "latency_seconds", "prompt_tokens", "completion_tokens", "tokens_estimated", "estimated_cost_usd",
+    "finish_reason", "continuations", "error_type"
+)
+
+def add_llm_calls(enquiry_id: str, calls: list[dict]):
+    """Bulk-inserts call_info dicts (see src/llm/telemetry.py) for an enquiry."""
+    if not calls:
+        return [], None
+    rows = []
+    for call in calls:
+        row = {column: call.get(column) for column in LLM_CALL_COLUMNS if call.get(column) is not None}
+        row["enquiry_id"] = enquiry_id
+        row["hedged"] = "hedge" in call
+        rows.append(row)
+    try:
+        response = supabase.table(TABLE_LLM_CALLS).insert(rows).execute()
+        return response.data if response else [], None
+    except (APIError, HTTPStatusError) as e:
+        return [], _format_error_message(e, "Error adding LLM call telemetry")
+    except Exception as e:
+        return [], _format_error_message(e, "Unexpected error adding LLM call telemetry")
+
+def get_llm_calls(enquiry_id: str = None, limit: int = 1000):
+    try:
+        query = supabase.table(TABLE_LLM_CALLS).select("*")
+        if enquiry_id:
+            query = query.eq("enquiry_id", enquiry_id)
+        response = query.order("created_at", desc=True).limit(limit).execute()
+        return response.data if response else [], None
+    except (APIError, HTTPStatusError) as e:
+        return [], _format_error_message(e, "Error fetching LLM call telemetry")
+    except Exception as e:
+        return [], _format_error_message(e, "Unexpected error fetching LLM call telemetry")
+
+def get_vendor_reply_parse(memo_key: str):
+    try:
+        response = supabase.table(TABLE_VENDOR_REPLY_PARSES).select("*").eq("memo_key", memo_key).limit(1).maybe_single().execute()
+        return response.data if response else None, None
+    except (APIError, HTTPStatusError) as e:
+        return None, _format_error_message(e, "Error fetching parsed vendor reply")
+    except Exception as e:
+        return None, _format_error_message(e, "Unexpected error fetching parsed vendor reply")
+
+def add_vendor_reply_parse(memo_key: str, parse_model: str, parsed_text: str, vendor_reply_id: str = None,
+                           parsed_data: dict = None):
+    upsert_data = {"memo_key": memo_key, "parse_model": parse_model, "parsed_text": parsed_text}
+    if vendor_reply_id: upsert_data["vendor_reply_id"] = vendor_reply_id
+    if parsed_data is not None: upsert_data["parsed_data"] = parsed_data
+    try:
+        response = supabase.table(TABLE_VENDOR_REPLY_PARSES).upsert(upsert_data, on_conflict="memo_key").execute()
+        return response.data[0] if response and response.data else None, None
+    except (APIError, HTTPStatusError) as e:
+        return None, _format_error_message(e, "Error saving parsed vendor reply")
+    except Exception as e:
+        return None, _format_error_message(e, "Unexpected error saving parsed vendor reply")
+
 def get_public_url(bucket_name: str, file_path: str) -> str | None:
     if not file_path: return None
     try:
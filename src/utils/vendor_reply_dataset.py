@@ -0,0 +1,58 @@
+# src/utils/vendor_reply_dataset.py
+"""
+Recorded vendor replies (benchmarks/data/*.jsonl, one JSON record per line with the enquiry, the
+reply and the values expected from it) and the checks that score a result against those values.
+Used by the benchmarks and the tests.
+"""
+import os
+import re
+import json
+
+VENDOR_REPLY_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                     "benchmarks", "data")
+VENDOR_REPLIES_PATH = os.path.join(VENDOR_REPLY_DATA_DIR, "vendor_replies.jsonl")
+VENDOR_REPLY_CORPUS_PATH = os.path.join(VENDOR_REPLY_DATA_DIR, "vendor_reply_corpus.jsonl")
+
+
+def load_vendor_replies(path: str = VENDOR_REPLIES_PATH) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def digits(text) -> str:
+    return re.sub(r"\D", "", str(text or ""))
+
+
+def same_hotel(a: str, b: str) -> bool:
+    """Names agree when one extends the other: "Hotel Royal" vs "Hotel Royal Saigon" (city kept in the name)."""
+    a, b = a.casefold().strip(), b.casefold().strip()
+    return bool(a and b) and (a.startswith(b) or b.startswith(a))
+
+
+def quotation_field_checks(structured_data: dict, record: dict) -> list[bool]:
+    """One pass/fail per expected field of the recorded reply, for a quotation's structured data."""
+    expected = record["expected"]
+    cost = str(structured_data.get("cost_per_head", "")) + " " + str(structured_data.get("total_package_cost", ""))
+    if expected["price"]:
+        checks = [digits(expected["price"]) in digits(cost)]
+    else:
+        checks = [not re.search(r"\d", cost)] # No price in the reply: none may be invented
+    if expected["currency"]:
+        checks.append(str(structured_data.get("currency", "")).upper() == expected["currency"])
+    hotel_names = " | ".join(str(h.get("hotel_name", "")) for h in structured_data.get("hotel_details") or []
+                             if isinstance(h, dict)).casefold()
+    checks += [hotel.casefold() in hotel_names for hotel in expected["hotels"]]
+    checks.append(len(structured_data.get("detailed_itinerary") or []) == int(record["enquiry"]["num_days"]))
+    return checks
+
+
+def parsed_reply_checks(parsed: dict, record: dict) -> list[bool]:
+    """One pass/fail per value recorded with the reply (price, currency, price basis when recorded, hotel names)."""
+    expected = record["expected"]
+    checks = [digits(parsed.get("price")) == digits(expected["price"])]
+    checks.append((parsed.get("currency") or None) == expected["currency"])
+    if "price_basis" in expected:
+        checks.append((parsed.get("price_basis") or None) == expected["price_basis"])
+    names = [h.get("name") or "" for h in parsed.get("hotels") or []]
+    checks += [any(same_hotel(expected_name, name) for name in names) for expected_name in expected["hotels"]]
+    return checks
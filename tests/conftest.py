@@ -0,0 +1,72 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from src.llm.llm_providers import invalidate_llm_instances
+from src.llm.response_cache import configure_response_cache, clear_response_cache
+from src.llm.token_budget import configure_tokenizer
+from src.llm.local_provider import LocalChatModel
+from src.core.quotation_checkpoints import configure_quotation_checkpoints, clear_quotation_checkpoints
+from src.core.vendor_parse_memo import configure_vendor_parse_memo
+from src.core.vendor_preparser import configure_vendor_preparser
+from src.core.quotation_jobs import configure_job_queue
+from src.models import AIConfigState
+from src.utils.vendor_reply_dataset import load_vendor_replies
+
+# Places suggestions passed with the first recorded vendor reply (a Kerala enquiry)
+AI_SUGGESTIONS = "- Alleppey houseboat\n- Munnar tea gardens"
+
+# Keep the persistent LLM response cache out of the working tree and isolated per test run.
+_cache_dir = tempfile.mkdtemp(prefix="llm-cache-tests-")
+configure_response_cache(path=os.path.join(_cache_dir, "llm_responses.sqlite3"))
+configure_quotation_checkpoints(path=os.path.join(_cache_dir, "quotation_checkpoints.sqlite3"))
+configure_job_queue(path=os.path.join(_cache_dir, "jobs.sqlite3"))
+# Tests count LLM calls per run: memoized vendor parses are opted into per test (test_vendor_parse_memo).
+configure_vendor_parse_memo(enabled=False)
+# Likewise the rule-based pre-parser, which skips the parsing call (test_vendor_preparser).
+configure_vendor_preparser(enabled=False)
+# Token counts must not depend on whether tiktoken can download its encoding.
+configure_tokenizer("heuristic")
+
+
+@pytest.fixture(autouse=True)
+def isolated_llm_state():
+    """Every test starts without pooled LLM clients (patched models must not leak), cached responses or checkpoints."""
+    invalidate_llm_instances()
+    clear_response_cache()
+    clear_quotation_checkpoints()
+
+
+# The fixtures below are used by unittest classes with @pytest.mark.usefixtures(...), so they also
+# set what they provide on the test instance (request.instance).
+
+@pytest.fixture
+def fast_local_llm(request):
+    """Every provider answers with an instant synthetic Local model, as self.fast_local."""
+    model = LocalChatModel(mode="synthetic", ttft_seconds=0.0, tokens_per_second=1e9)
+    if request.instance is not None:
+        request.instance.fast_local = model
+    with patch('src.llm.llm_providers._create_llm_instance', return_value=model):
+        yield model
+
+
+@pytest.fixture
+def recorded_quotation(request):
+    """
+    Inputs of a quotation for the first recorded vendor reply: self.record, self.enquiry,
+    self.vendor_reply, self.ai_suggestions and self.ai_conf (Local, synthetic).
+    """
+    record = load_vendor_replies()[0]
+    inputs = {
+        "record": record,
+        "enquiry": dict(record["enquiry"]),
+        "vendor_reply": record["vendor_reply"],
+        "ai_suggestions": AI_SUGGESTIONS,
+        "ai_conf": AIConfigState(selected_ai_provider="Local", selected_model_for_provider="synthetic"),
+    }
+    if request.instance is not None:
+        for name, value in inputs.items():
+            setattr(request.instance, name, value)
+    return inputs
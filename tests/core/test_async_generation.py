@@ -0,0 +1,56 @@
+import os
+import json
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.core.itinerary_generator import agenerate_places_suggestion_llm, generate_places_suggestion_llm
+from src.core.quotation_graph_builder import arun_quotation_generation_graph
+from src.models import AIConfigState
+
+ENQUIRY = {"destination": "Goa", "num_days": 3, "traveler_count": 2, "trip_type": "Leisure", "client_name_actual": "Asha"}
+QUOTATION_JSON = json.dumps({
+    "client_name": "Mr./Ms. Asha",
+    "destination_summary": "Goa",
+    "detailed_itinerary": [{"day_number": "Day 1", "title": "Arrival", "description": "Check in."}],
+    "hotel_details": [{"destination_location": "Goa", "hotel_name": "Sea View", "nights": 2}],
+    "inclusions": ["Breakfast"],
+    "exclusions": ["Flights"],
+})
+
+
+@patch.dict(os.environ, {"GROQ_API_KEY": "test_groq_key"})
+class TestAsyncGeneration(unittest.TestCase):
+
+    def setUp(self):
+        self.ai_conf = AIConfigState(selected_ai_provider="Groq", selected_model_for_provider="llama3-8b-8192")
+
+    def test_async_places_suggestion_matches_sync_contract(self):
+        fake = FakeListChatModel(responses=["Baga Beach, Fort Aguada"])
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=fake):
+            sync_result = generate_places_suggestion_llm(ENQUIRY, "Groq", self.ai_conf)
+            async_result = asyncio.run(agenerate_places_suggestion_llm(ENQUIRY, "Groq", self.ai_conf))
+        self.assertEqual(sync_result, ("Baga Beach, Fort Aguada", None))
+        self.assertEqual(async_result, sync_result)
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_async_places_suggestion_reports_configuration_error(self):
+        text, error_info = asyncio.run(agenerate_places_suggestion_llm(ENQUIRY, "Groq", self.ai_conf))
+        self.assertIsNone(text)
+        self.assertEqual(error_info["type"], "ConfigurationError")
+
+    def test_async_quotation_graph_returns_pdf_and_structured_data(self):
+        fake = FakeListChatModel(responses=["Price: INR 40000 per person", QUOTATION_JSON])
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=fake):
+            pdf_bytes, structured_data = asyncio.run(arun_quotation_generation_graph(
+                ENQUIRY, "INR 40000 pp, breakfast included", "Baga Beach", "Groq", self.ai_conf
+            ))
+        self.assertNotIn("error", structured_data)
+        self.assertEqual(structured_data["hotel_details"][0]["nights"], "2") # Normalised to strings
+        self.assertTrue(pdf_bytes.startswith(b"%PDF"))
+
+
+if __name__ == '__main__':
+    unittest.main()
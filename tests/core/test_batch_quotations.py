@@ -0,0 +1,87 @@
+import os
+import csv
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from src.core.batch_quotations import load_batch_items_from_csv, run_quotation_batch
+from src.models import AIConfigState
+
+CSV_ROWS = [
+    {"enquiry_id": "enq-1", "destination": "Kerala", "num_days": "4", "traveler_count": "2", "client_name": "Asha",
+     "vendor_reply_text": "Package cost INR 45,000 per person. Hotel: Taj Kumarakom Resort (3N)."},
+    {"enquiry_id": "enq-2", "destination": "Goa", "num_days": "3", "traveler_count": "4", "client_name": "Ravi",
+     "vendor_reply_text": "INR 20,000 per person including Taj Fort Aguada (2N)."},
+    {"enquiry_id": "enq-3", "destination": "Manali", "num_days": "five", "traveler_count": "2", "client_name": "Neha",
+     "vendor_reply_text": "INR 30,000 per person."},
+]
+
+
+@pytest.mark.usefixtures("fast_local_llm")
+class TestBatchQuotations(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.csv_path = os.path.join(self.tmp_dir.name, "enquiries.csv")
+        self.state_path = os.path.join(self.tmp_dir.name, "state.jsonl")
+        with open(self.csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(CSV_ROWS[0]))
+            writer.writeheader()
+            writer.writerows(CSV_ROWS)
+        self.ai_conf = AIConfigState(selected_ai_provider="Local", selected_model_for_provider="synthetic")
+
+    def test_csv_rows_become_items_and_bad_rows_are_reported(self):
+        items, errors = load_batch_items_from_csv(self.csv_path)
+        self.assertEqual([item.enquiry_id for item in items], ["enq-1", "enq-2"])
+        self.assertEqual(items[0].enquiry_details["client_name_actual"], "Asha")
+        self.assertEqual(len(errors), 1)
+        self.assertIn(":4:", errors[0])
+
+    def test_resumed_run_skips_items_already_done(self):
+        items, _ = load_batch_items_from_csv(self.csv_path)
+        first = run_quotation_batch(items, "Local", self.ai_conf, max_workers=2, save=False, state_path=self.state_path)
+        self.assertEqual((first["generated"], first["failed"], first["skipped"]), (2, 0, 0))
+        self.assertGreater(first["throughput_per_minute"], 0)
+
+        second = run_quotation_batch(items, "Local", self.ai_conf, max_workers=2, save=False, state_path=self.state_path)
+        self.assertEqual((second["generated"], second["skipped"]), (0, 2))
+
+    @patch('src.core.batch_quotations.save_llm_calls')
+    def test_saving_run_after_a_dry_run_still_saves_every_item(self, _save_llm_calls):
+        items, _ = load_batch_items_from_csv(self.csv_path)
+        dry_run = run_quotation_batch(items, "Local", self.ai_conf, max_workers=2, save=False, state_path=self.state_path)
+        self.assertEqual((dry_run["done"], dry_run["generated"]), (0, 2))
+
+        saved = {"id": "quote-1", "pdf_storage_path": "enq/quotation.pdf"}
+        with patch('src.core.batch_quotations.save_quotation_pdf', return_value=(saved, None)) as save_pdf:
+            report = run_quotation_batch(items, "Local", self.ai_conf, max_workers=2, state_path=self.state_path)
+        self.assertEqual(sorted(call.args[0] for call in save_pdf.call_args_list), ["enq-1", "enq-2"])
+        self.assertEqual((report["done"], report["skipped"]), (2, 0))
+
+    @patch('src.core.batch_quotations.save_llm_calls')
+    def test_failed_saves_are_reported_and_retried_on_resume(self, _save_llm_calls):
+        items, _ = load_batch_items_from_csv(self.csv_path)
+
+        def save_failing_for_goa(enquiry_id, pdf_bytes, structured_data, **kwargs):
+            self.assertGreater(len(pdf_bytes), 1000)
+            if enquiry_id == "enq-2":
+                return None, "PDF upload failed: bucket unavailable"
+            return {"id": f"quote-{enquiry_id}", "pdf_storage_path": f"{enquiry_id}/quotation.pdf"}, None
+
+        with patch('src.core.batch_quotations.save_quotation_pdf', side_effect=save_failing_for_goa) as save_pdf:
+            report = run_quotation_batch(items, "Local", self.ai_conf, max_workers=2, state_path=self.state_path)
+            self.assertEqual((report["done"], report["failed"]), (1, 1))
+            self.assertEqual(report["failures"][0]["enquiry_id"], "enq-2")
+            self.assertIn("bucket unavailable", report["failures"][0]["error"])
+
+            save_pdf.reset_mock()
+            resumed = run_quotation_batch(items, "Local", self.ai_conf, max_workers=2, state_path=self.state_path)
+            self.assertEqual([call.args[0] for call in save_pdf.call_args_list], ["enq-2"])
+            self.assertEqual((resumed["skipped"], resumed["failed"]), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
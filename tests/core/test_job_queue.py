@@ -0,0 +1,131 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from src.core.job_queue import JobQueue
+from src.core.quotation_jobs import get_job_queue, submit_quotation_job, submit_docx_job, submit_suggestions_job
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(prefix="job-queue-tests-"), "jobs.sqlite3")
+        self.queue = JobQueue(path=self.path, max_workers=2)
+        self.calls = []
+
+    def tearDown(self):
+        self.queue.close()
+
+    def _flaky(self, payload, context):
+        self.calls.append(payload["value"])
+        context.progress("Working")
+        if len(self.calls) == 1:
+            return None, None, "Provider timed out"
+        return {"doubled": payload["value"] * 2}, b"file", None
+
+    def test_unfinished_job_is_shared_and_finished_job_runs_again(self):
+        release = threading.Event()
+        def held_flaky(payload, context):
+            release.wait(10)
+            return self._flaky(payload, context)
+        self.queue.register("double", held_flaky)
+        job_id = self.queue.submit("double", {"value": 21}, scope="enquiry-1")
+        self.assertEqual(self.queue.submit("double", {"value": 21}, scope="enquiry-1"), job_id) # Still running
+        self.assertEqual(self.queue.list_job_ids("enquiry-1"), [job_id])
+        release.set()
+        self.assertEqual(self.queue.wait(job_id, timeout=10).status, "failed")
+
+        retry_id = self.queue.submit("double", {"value": 21}, scope="enquiry-1")
+        self.assertNotEqual(retry_id, job_id)
+        job = self.queue.wait(retry_id, timeout=10)
+        self.assertEqual((job.status, job.result, job.attempts, job.progress), ("done", {"doubled": 42}, 1, "Working"))
+        self.assertEqual(self.queue.get_file(retry_id), b"file")
+
+        again_id = self.queue.submit("double", {"value": 21}, scope="enquiry-1") # Done: a new click runs again
+        self.assertNotIn(again_id, (job_id, retry_id))
+        self.assertEqual(self.queue.wait(again_id, timeout=10).status, "done")
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(self.queue.list_job_ids("enquiry-1"), [])
+
+    def test_dependent_job_waits_for_and_fails_with_its_dependency(self):
+        self.queue.register("double", self._flaky)
+        self.queue.register("read", lambda payload, context: ({"parent": context.dependency()[0].result}, None, None))
+        parent_id = self.queue.submit("double", {"value": 1})
+        child_id = self.queue.submit("read", {}, depends_on=parent_id)
+        self.assertEqual(self.queue.wait(child_id, timeout=10).status, "failed")
+
+        parent_id = self.queue.submit("double", {"value": 1})
+        child_id = self.queue.submit("read", {}, depends_on=parent_id)
+        self.assertEqual(self.queue.wait(child_id, timeout=10).result, {"parent": {"doubled": 2}})
+
+    def test_unfinished_jobs_resume_after_a_restart(self):
+        self.queue.register("double", self._flaky)
+        self.calls.append("earlier attempt") # Next run succeeds
+        job_id = self.queue.submit("double", {"value": 5})
+        self.queue.wait(job_id, timeout=10)
+        # Simulate a server that died mid-run
+        self.queue._connection().execute("UPDATE jobs SET status = 'running', result = NULL WHERE job_id = ?", (job_id,))
+        self.queue.close()
+
+        restarted = JobQueue(path=self.path)
+        restarted.register("double", self._flaky)
+        restarted.start()
+        job = restarted.wait(job_id, timeout=10)
+        restarted.close()
+        self.assertEqual((job.status, job.result), ("done", {"doubled": 10}))
+
+
+@pytest.mark.usefixtures("fast_local_llm", "recorded_quotation")
+class TestQuotationJobs(unittest.TestCase):
+
+    def setUp(self):
+        get_job_queue().clear()
+        self.enquiry["id"] = "enquiry-jobs"
+
+    def test_quotation_and_docx_jobs(self):
+        quotation_job_id = submit_quotation_job(self.enquiry, self.vendor_reply, self.ai_suggestions, "Local",
+                                                self.ai_conf, save=False)
+        docx_job_id = submit_docx_job("enquiry-jobs", quotation_job_id, save=False)
+        quotation_job = get_job_queue().wait(quotation_job_id, timeout=60)
+        docx_job = get_job_queue().wait(docx_job_id, timeout=120)
+
+        self.assertEqual(quotation_job.status, "done")
+        self.assertEqual(quotation_job.attempts, 1)
+        self.assertNotIn("error", quotation_job.result["structured_data"])
+        self.assertTrue(quotation_job.preview) # Live preview stored while the JSON was written
+        self.assertTrue(get_job_queue().get_file(quotation_job_id).startswith(b"%PDF"))
+        self.assertEqual(docx_job.status, "done", docx_job.error)
+        self.assertTrue(get_job_queue().get_file(docx_job_id).startswith(b"PK")) # DOCX is a zip
+
+    def test_each_click_after_a_finished_quotation_saves_a_new_row(self):
+        saved_rows = []
+        def save_quotation_pdf(enquiry_id, pdf_bytes, structured_data, **kwargs):
+            saved_rows.append({"id": f"quotation-{len(saved_rows) + 1}", "pdf_storage_path": f"{enquiry_id}/{len(saved_rows)}.pdf"})
+            return saved_rows[-1], None
+
+        with patch('src.core.quotation_jobs.save_quotation_pdf', side_effect=save_quotation_pdf), \
+             patch('src.core.quotation_jobs.save_llm_calls'):
+            jobs = []
+            for _ in range(2): # Two clicks of "Generate Quotation PDF" with the same inputs
+                job_id = submit_quotation_job(self.enquiry, self.vendor_reply, self.ai_suggestions, "Local", self.ai_conf)
+                jobs.append(get_job_queue().wait(job_id, timeout=60))
+
+        self.assertEqual([job.status for job in jobs], ["done", "done"])
+        self.assertNotEqual(jobs[0].job_id, jobs[1].job_id)
+        self.assertEqual([job.result["quotation_id"] for job in jobs], ["quotation-1", "quotation-2"])
+
+    def test_suggestions_job_streams_its_text_into_the_preview(self):
+        job = get_job_queue().wait(submit_suggestions_job(self.enquiry, "Local", self.ai_conf, save=False), timeout=60)
+
+        self.assertEqual(job.status, "done", job.error)
+        self.assertTrue(job.result["itinerary_text"])
+        self.assertTrue(job.result["itinerary_text"].startswith(job.preview["text"]))
+        self.assertNotIn("itinerary_id", job.result) # Nothing saved
+
+
+if __name__ == '__main__':
+    unittest.main()
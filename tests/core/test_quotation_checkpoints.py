@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.llm.llm_providers import invalidate_llm_instances
+from src.llm.telemetry import capture_llm_calls
+from src.core.quotation_checkpoints import list_quotation_runs
+from src.core.quotation_graph_builder import run_quotation_generation_graph, get_quotation_run_history
+from src.models import AIConfigState
+
+ENQUIRY = {"id": "enq-42", "destination": "Kerala", "num_days": 3, "traveler_count": 2, "trip_type": "Leisure", "client_name_actual": "Asha"}
+VENDOR_REPLY = "Package cost INR 45,000 per person. Hotel: Taj Kumarakom Resort (2N)."
+
+
+@pytest.mark.usefixtures("fast_local_llm")
+class TestQuotationCheckpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.ai_conf = AIConfigState(selected_ai_provider="Local", selected_model_for_provider="synthetic")
+
+    def _run(self, model):
+        invalidate_llm_instances() # Each attempt gets the model it patches in, not the pooled one
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=model), capture_llm_calls() as calls:
+            pdf_bytes, structured_data = run_quotation_generation_graph(ENQUIRY, VENDOR_REPLY, "Backwaters", "Local", self.ai_conf)
+        return pdf_bytes, structured_data, calls
+
+    def _fail_structuring(self):
+        failing = FakeListChatModel(responses=["Cost: INR 45,000 per person. Hotel: Taj Kumarakom Resort.", "Sorry, no JSON today."])
+        _, structured_data, calls = self._run(failing)
+        self.assertEqual(structured_data["type"], "JsonParsingError")
+        self.assertEqual(len(calls), 2)
+
+    def test_retry_resumes_at_the_failed_node_with_earlier_outputs_restored(self):
+        self._fail_structuring()
+
+        pdf_bytes, structured_data, calls = self._run(self.fast_local)
+
+        self.assertNotIn("error", structured_data)
+        self.assertGreater(len(pdf_bytes), 1000)
+        self.assertEqual([c["stage"] for c in calls], ["structure_quotation"]) # Vendor parsing was not paid for again
+        metadata = structured_data["generation_metadata"]
+        self.assertEqual(metadata["resumed_at_node"], "structure_data_for_pdf")
+        self.assertEqual([c["stage"] for c in metadata["llm_calls"]], ["parse_vendor_reply", "structure_quotation"])
+
+    def test_completed_runs_are_not_resumed(self):
+        self._run(self.fast_local)
+        _, structured_data, calls = self._run(self.fast_local)
+        self.assertEqual(len(calls), 2)
+        self.assertNotIn("resumed_at_node", structured_data["generation_metadata"])
+
+    def test_pdf_render_failure_is_retried_without_llm_calls(self):
+        with patch('src.core.quotation_graph_builder.create_pdf_quotation_bytes', side_effect=RuntimeError("font cache corrupt")):
+            self._run(self.fast_local)
+
+        pdf_bytes, structured_data, calls = self._run(self.fast_local)
+        self.assertEqual(calls, [])
+        self.assertGreater(len(pdf_bytes), 1000)
+        self.assertEqual(structured_data["generation_metadata"]["resumed_at_node"], "generate_pdf_document")
+
+    def test_past_runs_can_be_listed_and_inspected(self):
+        self._fail_structuring()
+
+        runs = list_quotation_runs(enquiry_id="enq-42")
+        self.assertEqual(len(runs), 1)
+        self.assertEqual((runs[0]["status"], runs[0]["mode"]), ("failed", "two-stage"))
+
+        history = get_quotation_run_history(runs[0]["thread_id"])
+        self.assertEqual(runs[0]["checkpoints"], len(history))
+        self.assertEqual([step["next"] for step in history[1:]], [
+            ["fetch_enquiry_and_vendor_reply"], ["parse_vendor_text"], ["structure_data_for_pdf"], ["generate_pdf_document"], []
+        ])
+        parsed = history[3]["values"]["parsed_vendor_info_text"]
+        self.assertIn("Taj Kumarakom", parsed)
+        self.assertRegex(history[-1]["values"]["pdf_output_bytes"], r"^<\d+ bytes>$")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+import pytest
+
+from src.llm.telemetry import capture_llm_calls
+from src.core.quotation_graph_builder import run_quotation_generation_graph
+from src.core.quotation_patch import classify_vendor_reply_change, generate_quotation
+from src.utils.vendor_reply_dataset import load_vendor_replies
+
+
+class TestVendorReplyChangeClassification(unittest.TestCase):
+
+    def setUp(self):
+        self.vendor_reply = load_vendor_replies()[0]["vendor_reply"]
+
+    def test_changes_confined_to_patchable_sections(self):
+        cases = {
+            "45,000": ("42,500", ["pricing"]),
+            "Spice Village Resort": ("Blanket Hotel", ["hotels"]),
+            "- Entrance fees": ("- Entrance fees\n- Lunch", ["inclusions_exclusions"]), # Bullet under "Exclusions:"
+        }
+        for old, (new, expected_groups) in cases.items():
+            groups, diff_lines = classify_vendor_reply_change(self.vendor_reply, self.vendor_reply.replace(old, new))
+            self.assertEqual(groups, expected_groups, old)
+            self.assertTrue(diff_lines)
+
+    def test_other_changes_need_a_full_regeneration(self):
+        for old, new in (("Exclusions:", "Day 2: Munnar tea gardens\nExclusions:"), ("Rahul", "Anil")):
+            groups, _ = classify_vendor_reply_change(self.vendor_reply, self.vendor_reply.replace(old, new))
+            self.assertIsNone(groups, new)
+
+    def test_whitespace_only_edit_changes_nothing(self):
+        self.assertEqual(classify_vendor_reply_change(self.vendor_reply, self.vendor_reply + "\n\n"), ([], []))
+
+
+@pytest.mark.usefixtures("fast_local_llm", "recorded_quotation")
+class TestIncrementalRegeneration(unittest.TestCase):
+
+    def setUp(self):
+        _, structured_data = run_quotation_generation_graph(self.enquiry, self.vendor_reply, self.ai_suggestions, "Local", self.ai_conf)
+        self.base_quotation = {"quotation_id": "quotation-1", "structured_data": structured_data,
+                               "vendor_reply_text": self.vendor_reply, "itinerary_id": "itinerary-1"}
+
+    def _generate(self, vendor_reply: str, itinerary_id: str = "itinerary-1"):
+        with capture_llm_calls() as llm_calls:
+            pdf_bytes, structured_data = generate_quotation(
+                self.enquiry, vendor_reply, self.ai_suggestions, "Local", self.ai_conf,
+                base_quotation=self.base_quotation, itinerary_id=itinerary_id)
+        return pdf_bytes, structured_data, llm_calls
+
+    def test_price_correction_patches_pricing_and_keeps_the_itinerary(self):
+        pdf_bytes, structured_data, llm_calls = self._generate(self.vendor_reply.replace("45,000", "42,500"))
+
+        self.assertTrue(pdf_bytes)
+        self.assertEqual([call["stage"] for call in llm_calls], ["patch_quotation_fields"])
+        self.assertEqual(structured_data["cost_per_head"], "INR 42,500")
+        self.assertEqual(structured_data["detailed_itinerary"], self.base_quotation["structured_data"]["detailed_itinerary"])
+        self.assertEqual(structured_data["hotel_details"], self.base_quotation["structured_data"]["hotel_details"])
+        self.assertEqual(structured_data["generation_metadata"]["incremental_patch"]["groups"], ["pricing"])
+
+    def test_itinerary_change_or_new_itinerary_regenerates_in_full(self):
+        edited_reply = self.vendor_reply.replace("Exclusions:", "Day 2: Munnar tea gardens\nExclusions:")
+        for vendor_reply, itinerary_id in ((edited_reply, "itinerary-1"), (self.vendor_reply, "itinerary-2")):
+            _, structured_data, llm_calls = self._generate(vendor_reply, itinerary_id)
+            self.assertNotIn("patch_quotation_fields", [call["stage"] for call in llm_calls])
+            self.assertNotIn("incremental_patch", structured_data["generation_metadata"])
+
+    def test_disabled_incremental_regeneration_regenerates_in_full(self):
+        self.ai_conf.incremental_regeneration = False
+        _, structured_data, _ = self._generate(self.vendor_reply.replace("45,000", "42,500"))
+        self.assertNotIn("incremental_patch", structured_data["generation_metadata"])
+
+
+if __name__ == '__main__':
+    unittest.main()
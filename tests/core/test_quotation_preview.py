@@ -0,0 +1,54 @@
+import unittest
+from unittest.mock import patch
+
+from src.llm.local_provider import LocalChatModel
+from src.core.quotation_graph_builder import run_quotation_generation_graph
+from src.models import AIConfigState
+from src.utils.json_repair import loads_partial_json
+
+ENQUIRY = {"destination": "Kerala", "num_days": 5, "traveler_count": 2, "trip_type": "Leisure", "client_name_actual": "Asha"}
+VENDOR_REPLY = "Package cost INR 45,000 per person. Hotel: Taj Kumarakom Resort (4N)."
+
+
+@patch('src.core.quotation_graph_builder.QUOTATION_PREVIEW_MIN_INTERVAL_SECONDS', 0.0)
+class TestLiveQuotationPreview(unittest.TestCase):
+
+    def setUp(self):
+        self.ai_conf = AIConfigState(selected_ai_provider="Local", selected_model_for_provider="synthetic")
+        self.local_model = LocalChatModel(mode="synthetic", ttft_seconds=0.0, tokens_per_second=5000)
+
+    def _run(self, on_preview=None):
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=self.local_model):
+            return run_quotation_generation_graph(ENQUIRY, VENDOR_REPLY, "Backwaters", "Local", self.ai_conf, on_preview=on_preview)
+
+    def test_preview_fills_in_progressively_before_the_final_pdf(self):
+        previews = []
+        pdf_bytes, structured_data = self._run(on_preview=previews.append)
+
+        self.assertTrue(pdf_bytes)
+        self.assertNotIn("error", structured_data)
+        self.assertGreater(len(previews), 2)
+        day_counts = [len(p.get("detailed_itinerary") or []) for p in previews]
+        self.assertEqual(day_counts, sorted(day_counts))
+        self.assertLess(day_counts[0], 5)
+        self.assertNotIn("inclusions", previews[0])
+        self.assertEqual(previews[-1]["inclusions"], structured_data["inclusions"])
+        self.assertEqual(len(structured_data["detailed_itinerary"]), 5)
+
+    def test_failing_preview_callback_does_not_fail_the_quotation(self):
+        def broken_preview(preview):
+            raise ValueError("widget gone")
+        pdf_bytes, structured_data = self._run(on_preview=broken_preview)
+        self.assertTrue(pdf_bytes)
+        self.assertNotIn("error", structured_data)
+
+    def test_partial_json_parses_every_prefix(self):
+        answer = '{"quotation_title": "Kerala", "detailed_itinerary": [{"day_number": "Day 1", "title": "Arrival"}], "inclusions": ["Stay"]}'
+        self.assertIsNone(loads_partial_json(""))
+        for end in range(1, len(answer) + 1):
+            self.assertIsInstance(loads_partial_json(answer[:end]), dict, answer[:end])
+        self.assertEqual(loads_partial_json(answer[:answer.index(', "title"')]), {"quotation_title": "Kerala", "detailed_itinerary": [{"day_number": "Day 1"}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from src.core.quotation_graph_builder import (
+    run_quotation_generation_graph, arun_quotation_generation_graph, plan_itinerary_segments
+)
+
+
+class TestPlanItinerarySegments(unittest.TestCase):
+
+    def test_segments_follow_cities_and_are_capped(self):
+        cities = ["Kochi", "Munnar", "Munnar", "Munnar", "Munnar", "Alleppey", "kochi "]
+        days = [{"day_number": f"Day {i + 1}", "city": city} for i, city in enumerate(cities)]
+        self.assertEqual(plan_itinerary_segments(days, max_days=3), [[0], [1, 2, 3], [4], [5], [6]])
+
+    def test_days_without_city_are_chunked(self):
+        days = [{"day_number": f"Day {i + 1}"} for i in range(7)]
+        self.assertEqual(plan_itinerary_segments(days, max_days=3), [[0, 1, 2], [3, 4, 5], [6]])
+
+
+@pytest.mark.usefixtures("fast_local_llm", "recorded_quotation")
+class TestSegmentedItineraryGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.enquiry["num_days"] = 8
+        self.ai_conf.segmented_itinerary = True
+
+    def test_days_are_written_by_segment_calls(self):
+        pdf_bytes, structured_data = run_quotation_generation_graph(
+            self.enquiry, self.vendor_reply, self.ai_suggestions, "Local", self.ai_conf)
+
+        self.assertTrue(pdf_bytes)
+        self.assertNotIn("error", structured_data)
+        stages = [c["stage"] for c in structured_data["generation_metadata"]["llm_calls"]]
+        self.assertEqual(stages, ["parse_vendor_reply", "structure_quotation_skeleton"] + ["write_itinerary_segment"] * 3)
+        days = structured_data["detailed_itinerary"]
+        self.assertEqual([d["day_number"] for d in days], [f"Day {i}" for i in range(1, 9)])
+        for day in days:
+            self.assertTrue(day["description"].startswith("A full day discovering"))
+            self.assertNotIn("outline", day)
+            self.assertNotIn("city", day)
+        self.assertNotIn("itinerary_segment_errors", structured_data["generation_metadata"])
+
+    def test_unusable_segment_answer_keeps_the_outline(self):
+        with patch('src.llm.local_provider._synthetic_itinerary_segment', return_value="Sorry, I cannot help."):
+            pdf_bytes, structured_data = run_quotation_generation_graph(
+                self.enquiry, self.vendor_reply, self.ai_suggestions, "Local", self.ai_conf)
+
+        self.assertTrue(pdf_bytes)
+        self.assertNotIn("error", structured_data)
+        self.assertTrue(all(day["description"] for day in structured_data["detailed_itinerary"]))
+        errors = structured_data["generation_metadata"]["itinerary_segment_errors"]
+        self.assertEqual(sum(len(e["days"]) for e in errors), 8)
+
+    def test_async_graph_writes_the_same_days(self):
+        _, structured_data = asyncio.run(arun_quotation_generation_graph(
+            self.enquiry, self.vendor_reply, self.ai_suggestions, "Local", self.ai_conf))
+        self.assertEqual(len(structured_data["detailed_itinerary"]), 8)
+        self.assertEqual(len(structured_data["generation_metadata"]["llm_calls"]), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
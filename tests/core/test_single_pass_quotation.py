@@ -0,0 +1,50 @@
+import os
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.core.quotation_graph_builder import run_quotation_generation_graph, arun_quotation_generation_graph
+from src.models import AIConfigState
+from src.utils.vendor_reply_dataset import quotation_field_checks
+
+
+@pytest.mark.usefixtures("fast_local_llm", "recorded_quotation")
+class TestSinglePassQuotation(unittest.TestCase):
+
+    def setUp(self):
+        self.ai_conf.single_pass_quotation = True
+
+    def test_single_llm_call_reads_the_raw_vendor_reply(self):
+        pdf_bytes, structured_data = run_quotation_generation_graph(
+            self.enquiry, self.vendor_reply, self.ai_suggestions, "Local", self.ai_conf)
+
+        self.assertTrue(pdf_bytes)
+        self.assertNotIn("error", structured_data)
+        self.assertTrue(all(quotation_field_checks(structured_data, self.record)))
+        calls = structured_data["generation_metadata"]["llm_calls"]
+        self.assertEqual([c["stage"] for c in calls], ["structure_quotation_single_pass"])
+
+    def test_async_graph_uses_the_same_mode(self):
+        _, structured_data = asyncio.run(arun_quotation_generation_graph(
+            self.enquiry, self.vendor_reply, self.ai_suggestions, "Local", self.ai_conf))
+        self.assertEqual(len(structured_data["generation_metadata"]["llm_calls"]), 1)
+
+    @patch.dict(os.environ, {"GROQ_API_KEY": "test_groq_key"})
+    def test_errors_keep_the_structuring_error_contract(self):
+        ai_conf = AIConfigState(selected_ai_provider="Groq", selected_model_for_provider="llama3-8b-8192",
+                                single_pass_quotation=True)
+        fake = FakeListChatModel(responses=["Sorry, I cannot help with that."])
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=fake):
+            pdf_bytes, structured_data = run_quotation_generation_graph(
+                self.enquiry, self.vendor_reply, self.ai_suggestions, "Groq", ai_conf)
+
+        self.assertTrue(pdf_bytes) # Error PDF
+        self.assertEqual(structured_data["type"], "JsonParsingError")
+        self.assertIn("Sorry", structured_data["raw_output"])
+
+
+if __name__ == '__main__':
+    unittest.main()
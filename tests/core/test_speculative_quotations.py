@@ -0,0 +1,85 @@
+import time
+import threading
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from src.llm.local_provider import LocalChatModel
+from src.llm.telemetry import capture_llm_calls
+from src.core.quotation_graph_builder import run_quotation_generation_graph
+from src.core.speculative_quotations import SpeculativeQuotationRunner
+
+
+@pytest.mark.usefixtures("fast_local_llm", "recorded_quotation")
+class TestSpeculativeQuotations(unittest.TestCase):
+
+    def setUp(self):
+        self.runner = SpeculativeQuotationRunner(max_workers=1, save_calls=False)
+
+    def tearDown(self):
+        self.runner.clear()
+
+    def _schedule(self, cache_key: str, vendor_reply: str | None = None) -> bool:
+        return self.runner.schedule("enquiry-1", cache_key, self.enquiry, vendor_reply or self.vendor_reply,
+                                    self.ai_suggestions, "Local", self.ai_conf)
+
+    def test_take_returns_the_pre_generated_quotation_once(self):
+        self.assertTrue(self._schedule("key-a"))
+        self.assertFalse(self._schedule("key-a")) # Same inputs: not run twice
+        pdf_bytes, structured_data = self.runner.take("key-a")
+
+        self.assertTrue(pdf_bytes)
+        self.assertNotIn("error", structured_data)
+        self.assertEqual(len(structured_data["generation_metadata"]["llm_calls"]), 2)
+        self.assertGreater(self.runner.tokens_spent_last_hour(), 0)
+        self.assertIsNone(self.runner.take("key-a"))
+
+    def test_expired_result_is_neither_ready_nor_taken(self):
+        self.assertTrue(self._schedule("key-a"))
+        self.runner._jobs["key-a"].future.result(timeout=60)
+        self.assertEqual(self.runner.status("key-a"), "ready")
+
+        self.runner.result_ttl_seconds = 0.0
+        time.sleep(0.01)
+        self.assertIsNone(self.runner.status("key-a"))
+        self.assertIsNone(self.runner.take("key-a"))
+        self.assertNotIn("key-a", self.runner._jobs)
+
+    def test_new_inputs_cancel_the_previous_run(self):
+        slow_local = LocalChatModel(mode="synthetic", ttft_seconds=0.3, tokens_per_second=1e9)
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=slow_local):
+            self._schedule("key-a")
+            stale_future = self.runner._jobs["key-a"].future
+            self._schedule("key-b", vendor_reply=self.vendor_reply + "\nPrices valid till 31 March.")
+
+            self.assertIsNone(self.runner.status("key-a"))
+            self.assertIsNone(stale_future.result(timeout=10)) # Stopped after its current node, nothing stored
+            self.assertIsNone(self.runner.take("key-a"))
+            pdf_bytes, structured_data = self.runner.take("key-b")
+
+        self.assertTrue(pdf_bytes)
+        self.assertNotIn("error", structured_data)
+
+    def test_token_budget_stops_scheduling(self):
+        self.runner.token_budget_per_hour = 1
+        self.assertTrue(self._schedule("key-a"))
+        self.assertIsNotNone(self.runner.take("key-a"))
+        self.assertFalse(self.runner.schedule("enquiry-2", "key-b", self.enquiry, self.vendor_reply,
+                                              self.ai_suggestions, "Local", self.ai_conf))
+        self.assertIsNone(self.runner.status("key-b"))
+
+    def test_cancelled_graph_run_makes_no_llm_calls(self):
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with capture_llm_calls() as llm_calls:
+            pdf_bytes, structured_data = run_quotation_generation_graph(
+                self.enquiry, self.vendor_reply, self.ai_suggestions, "Local", self.ai_conf, cancel_event=cancel_event)
+
+        self.assertIsNone(pdf_bytes)
+        self.assertEqual(structured_data["type"], "Cancelled")
+        self.assertEqual(llm_calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.core.itinerary_generator import stream_places_suggestion_llm
+from src.models import AIConfigState
+
+ENQUIRY = {"destination": "Goa", "num_days": 3, "traveler_count": 2, "trip_type": "Leisure"}
+
+
+@patch.dict(os.environ, {"GROQ_API_KEY": "test_groq_key"})
+class TestStreamingPlacesSuggestion(unittest.TestCase):
+
+    def setUp(self):
+        self.ai_conf = AIConfigState(selected_ai_provider="Groq", selected_model_for_provider="llama3-8b-8192")
+
+    def test_stream_yields_chunks_and_exposes_full_text(self):
+        fake = FakeListChatModel(responses=["Baga Beach, Fort Aguada"])
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=fake):
+            stream = stream_places_suggestion_llm(ENQUIRY, "Groq", self.ai_conf)
+            chunks = list(stream)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), "Baga Beach, Fort Aguada")
+        self.assertEqual(stream.text, "Baga Beach, Fort Aguada")
+        self.assertIsNone(stream.error_info)
+        self.assertIsNotNone(stream.call_info["time_to_first_token_seconds"])
+
+    def test_completed_stream_is_cached_for_next_generation(self):
+        fake = FakeListChatModel(responses=["Baga Beach", "Different answer"])
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=fake):
+            list(stream_places_suggestion_llm(ENQUIRY, "Groq", self.ai_conf))
+            second = stream_places_suggestion_llm(ENQUIRY, "Groq", self.ai_conf)
+            chunks = list(second)
+        self.assertEqual(chunks, ["Baga Beach"])
+        self.assertTrue(second.call_info["cache_hit"])
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_stream_reports_configuration_error_like_sync_path(self):
+        stream = stream_places_suggestion_llm(ENQUIRY, "Groq", self.ai_conf)
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.text, "")
+        self.assertEqual(stream.error_info["type"], "ConfigurationError")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.core.quotation_graph_builder import run_quotation_generation_graph
+from src.models import AIConfigState
+
+ENQUIRY = {"destination": "Goa", "num_days": 2, "traveler_count": 2, "trip_type": "Leisure", "client_name_actual": "Asha"}
+# Trailing commas, an unescaped quote, a bare number and an answer cut off before the closing braces
+MALFORMED_QUOTATION = '''```json
+{
+  "client_name": "Mr./Ms. Asha",
+  "quotation_title": "Your "Sun & Sand" Escape to Goa",
+  "cost_per_head": 40000,
+  "detailed_itinerary": [
+    {"day_number": "Day 1", "title": "Arrival", "description": "Check in, evening at Baga Beach."},
+    {"day_number": "Day 2", "title": "Departure", "description": "Transfer to the airport."},
+  ],
+  "inclusions": ["Breakfast", "Transfers",],
+  "exclusions": ["Flights"'''
+
+
+@patch.dict(os.environ, {"GROQ_API_KEY": "test_groq_key"})
+class TestStructuredQuotationOutput(unittest.TestCase):
+
+    def setUp(self):
+        self.ai_conf = AIConfigState(selected_ai_provider="Groq", selected_model_for_provider="llama3-70b-8192")
+        self.response_formats = []
+
+    def _fake_llm(self, responses):
+        fake = FakeListChatModel(responses=responses)
+        def create(provider, model_name, api_key, temperature, max_tokens, response_format):
+            self.response_formats.append(response_format)
+            return fake
+        return patch('src.llm.llm_providers._create_llm_instance', side_effect=create)
+
+    def test_malformed_json_is_repaired_locally_without_another_call(self):
+        with self._fake_llm(["Price: INR 40000 per person", MALFORMED_QUOTATION, "unused"]):
+            pdf_bytes, structured_data = run_quotation_generation_graph(ENQUIRY, "INR 40000 pp", "Beaches", "Groq", self.ai_conf)
+
+        self.assertTrue(pdf_bytes)
+        self.assertNotIn("error", structured_data)
+        self.assertEqual(structured_data["quotation_title"], 'Your "Sun & Sand" Escape to Goa')
+        self.assertEqual(structured_data["cost_per_head"], "40000") # Coerced to text by the schema
+        self.assertEqual(structured_data["exclusions"], ["Flights"])
+        calls = structured_data["generation_metadata"]["llm_calls"]
+        self.assertEqual(len(calls), 2)
+        self.assertIn("removed trailing comma", calls[-1]["json_repairs"])
+
+    def test_provider_json_mode_is_requested_for_parsing_and_structuring(self):
+        with self._fake_llm(["Price: INR 40000 per person", MALFORMED_QUOTATION]):
+            run_quotation_generation_graph(ENQUIRY, "INR 40000 pp", "Beaches", "Groq", self.ai_conf)
+        self.assertEqual(self.response_formats, [{"type": "json_object"}, {"type": "json_object"}])
+
+    def test_json_that_does_not_match_the_schema_is_a_parsing_error(self):
+        with self._fake_llm(["Price: INR 40000 per person", '{"client_name": "Mr./Ms. Asha"}']):
+            _, structured_data = run_quotation_generation_graph(ENQUIRY, "INR 40000 pp", "Beaches", "Groq", self.ai_conf)
+        self.assertEqual(structured_data["type"], "JsonParsingError")
+        self.assertIn("detailed_itinerary", structured_data["details"])
+
+
+if __name__ == '__main__':
+    unittest.main()
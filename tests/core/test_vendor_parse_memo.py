@@ -0,0 +1,69 @@
+import os
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from src.core.quotation_graph_builder import run_quotation_generation_graph, arun_quotation_generation_graph
+from src.core.vendor_parse_memo import InMemoryVendorParseStore, SupabaseVendorParseStore, configure_vendor_parse_memo
+from src.models import AIConfigState
+
+
+@pytest.mark.usefixtures("fast_local_llm", "recorded_quotation")
+class TestVendorParseMemo(unittest.TestCase):
+
+    def setUp(self):
+        self.store = InMemoryVendorParseStore()
+        configure_vendor_parse_memo(store=self.store, enabled=True)
+
+    def tearDown(self):
+        configure_vendor_parse_memo(store=SupabaseVendorParseStore(), enabled=False)
+
+    def _run(self, enquiry=None, **conf) -> dict:
+        ai_conf = AIConfigState(selected_ai_provider="Local", selected_model_for_provider="synthetic", **conf)
+        _, structured_data = run_quotation_generation_graph(
+            enquiry or self.enquiry, self.vendor_reply, self.ai_suggestions, "Local", ai_conf,
+            vendor_reply_id="reply-1")
+        self.assertNotIn("error", structured_data)
+        return structured_data["generation_metadata"]
+
+    @staticmethod
+    def _stages(metadata: dict) -> list[str]:
+        return [c["stage"] for c in metadata["llm_calls"]]
+
+    def test_later_attempts_skip_the_parsing_call(self):
+        first = self._run(temperature=0.2)
+        self.assertEqual(self._stages(first), ["parse_vendor_reply", "structure_quotation"])
+        self.assertEqual([row["vendor_reply_id"] for row in self.store.rows.values()], ["reply-1"])
+
+        # Temperature is not part of the key
+        second = self._run(temperature=0.9)
+        self.assertEqual(self._stages(second), ["structure_quotation"])
+        self.assertEqual(second["vendor_parse_memo"], "hit")
+
+    def test_key_covers_enquiry_and_parse_model(self):
+        self._run()
+        self.assertEqual(self._stages(self._run(enquiry={**self.enquiry, "num_days": 99})),
+                         ["parse_vendor_reply", "structure_quotation"])
+        ai_conf = AIConfigState(selected_ai_provider="Groq", selected_model_for_provider="llama3-8b-8192")
+        with patch.dict(os.environ, {"GROQ_API_KEY": "test_groq_key"}):
+            _, structured_data = run_quotation_generation_graph(
+                self.enquiry, self.vendor_reply, self.ai_suggestions, "Groq", ai_conf)
+        self.assertEqual(self._stages(structured_data["generation_metadata"])[0], "parse_vendor_reply")
+        self.assertEqual(len(self.store.rows), 3)
+
+    def test_bypassing_the_cache_also_bypasses_the_memo(self):
+        self._run()
+        self.assertEqual(self._stages(self._run(bypass_response_cache=True)), ["parse_vendor_reply", "structure_quotation"])
+
+    def test_async_graph_uses_the_memo(self):
+        self._run()
+        ai_conf = AIConfigState(selected_ai_provider="Local", selected_model_for_provider="synthetic", temperature=0.5)
+        _, structured_data = asyncio.run(arun_quotation_generation_graph(
+            self.enquiry, self.vendor_reply, self.ai_suggestions, "Local", ai_conf))
+        self.assertEqual(self._stages(structured_data["generation_metadata"]), ["structure_quotation"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+import pytest
+
+from src.llm.telemetry import capture_llm_calls
+from src.core.quotation_graph_builder import run_quotation_generation_graph
+from src.core.vendor_preparser import configure_vendor_preparser, preparse_vendor_reply, vendor_preparse_threshold
+from src.utils.vendor_reply_dataset import VENDOR_REPLY_CORPUS_PATH, load_vendor_replies, parsed_reply_checks
+
+
+class TestVendorPreparser(unittest.TestCase):
+
+    def test_templated_reply_is_parsed_with_confidence(self):
+        record, confidence = preparse_vendor_reply(load_vendor_replies()[0]["vendor_reply"])
+
+        self.assertGreaterEqual(confidence, vendor_preparse_threshold())
+        self.assertEqual((record.currency, record.price, record.price_basis), ("INR", "45,000", "per person"))
+        self.assertEqual([(hotel.name, hotel.nights) for hotel in record.hotels],
+                         [("Taj Kumarakom Resort", "2"), ("Spice Village Resort", "2")])
+        self.assertEqual(record.room_configuration, "twin sharing")
+        self.assertEqual(record.exclusions, ["Airfare", "Entrance fees"])
+        self.assertIsNone(record.itinerary_days)
+
+    def test_ambiguous_or_missing_prices_are_left_to_the_llm(self):
+        replies = {
+            "no price": "Hi,\nHotels: Brunton Boatyard Hotel (2N).\nRates will follow once dates are confirmed.\nThanks",
+            "several prices": "Hi,\nOption 1 - Hotel Boss: SGD 1,150 per person\nOption 2 - Marina Bay Sands Hotel: SGD 2,480 per person",
+            "prose": "Dear Partner,\nWe would suggest the Le Meridien Thimphu, and the land cost comes to roughly "
+                     "USD 1,900 per person depending on the season and how long you stay in Punakha.",
+        }
+        for label, reply in replies.items():
+            record, confidence = preparse_vendor_reply(reply)
+            self.assertLess(confidence, vendor_preparse_threshold(), label)
+        self.assertIsNone(preparse_vendor_reply(replies["several prices"])[0].price) # No price picked at random
+
+    def test_confident_parses_match_the_recorded_values(self):
+        records = load_vendor_replies() + load_vendor_replies(VENDOR_REPLY_CORPUS_PATH)
+        hits = 0
+        for record in records:
+            parsed, confidence = preparse_vendor_reply(record["vendor_reply"])
+            if confidence >= vendor_preparse_threshold():
+                hits += 1
+                self.assertTrue(all(parsed_reply_checks(parsed.model_dump(exclude_none=True), record)), record["id"])
+        self.assertGreaterEqual(hits, len(records) // 2)
+
+    @pytest.mark.usefixtures("fast_local_llm", "recorded_quotation")
+    def test_confident_pre_parse_skips_the_parsing_llm_call(self):
+        configure_vendor_preparser(enabled=True)
+        self.addCleanup(configure_vendor_preparser, enabled=False)
+        with capture_llm_calls() as llm_calls:
+            _, structured_data = run_quotation_generation_graph(
+                self.enquiry, self.vendor_reply, self.ai_suggestions, "Local", self.ai_conf)
+
+        self.assertEqual([call["stage"] for call in llm_calls], ["structure_quotation"])
+        self.assertEqual(structured_data["cost_per_head"], "INR 45,000")
+        self.assertEqual(structured_data["generation_metadata"]["vendor_preparse"]["parser"], "rules/v1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import time
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.llm.hedging import ahedged_race, latency_tracker, run_coroutine_sync, InvalidLLMResponse
+from src.llm.llm_invocation import invoke_llm_prompt, is_non_empty_text
+from src.models import AIConfigState
+
+
+def _leg_factory(behaviour: dict, cancelled: list):
+    """behaviour maps provider -> (delay_seconds, result or exception)."""
+    async def leg(provider, ai_conf):
+        delay, outcome = behaviour[provider]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(provider)
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return leg
+
+
+class TestHedgedRace(unittest.TestCase):
+
+    def setUp(self):
+        latency_tracker.reset()
+        self.cancelled = []
+
+    def _race(self, behaviour, delay=0.05):
+        return asyncio.run(ahedged_race(
+            _leg_factory(behaviour, self.cancelled), ("Groq", None), ("Gemini", None), delay
+        ))
+
+    def test_fast_primary_never_starts_backup(self):
+        response, info = self._race({"Groq": (0.0, "primary"), "Gemini": (0.0, "backup")})
+        self.assertEqual(response, "primary")
+        self.assertFalse(info["backup_started"])
+        self.assertEqual(info["winner_role"], "primary")
+
+    def test_slow_primary_loses_to_backup_and_is_cancelled(self):
+        response, info = self._race({"Groq": (1.0, "primary"), "Gemini": (0.0, "backup")})
+        self.assertEqual(response, "backup")
+        self.assertTrue(info["backup_started"])
+        self.assertEqual(info["winner"], "Gemini")
+        self.assertEqual(self.cancelled, ["Groq"])
+        self.assertLess(info["elapsed_seconds"], 1.0)
+
+    def test_invalid_primary_starts_backup_immediately(self):
+        response, info = self._race(
+            {"Groq": (0.0, InvalidLLMResponse("empty")), "Gemini": (0.0, "backup")}, delay=5.0
+        )
+        self.assertEqual(response, "backup")
+        self.assertLess(info["elapsed_seconds"], 1.0)
+
+    def test_sync_bridge_gives_up_and_cancels_a_hung_race(self):
+        hung = ahedged_race(_leg_factory({"Groq": (30.0, "primary"), "Gemini": (30.0, "backup")}, self.cancelled),
+                            ("Groq", None), ("Gemini", None), 0.01)
+        with self.assertRaises(TimeoutError):
+            run_coroutine_sync(hung, timeout=0.2)
+        for _ in range(100): # Cancellation completes on the bridge loop
+            if len(self.cancelled) == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(sorted(self.cancelled), ["Gemini", "Groq"])
+
+    def test_both_legs_failing_raises_primary_error(self):
+        with self.assertRaisesRegex(ValueError, "primary failed"):
+            self._race({"Groq": (0.0, ValueError("primary failed")), "Gemini": (0.0, RuntimeError("backup failed"))})
+
+
+@patch.dict(os.environ, {"GROQ_API_KEY": "test_groq_key", "GOOGLE_API_KEY": "test_google_key"})
+class TestHedgedInvocation(unittest.TestCase):
+
+    def setUp(self):
+        latency_tracker.reset()
+
+    def test_invoke_llm_prompt_returns_backup_answer_and_call_info(self):
+        models = {
+            "Groq": FakeListChatModel(responses=[""]), # Empty answer fails validation
+            "Gemini": FakeListChatModel(responses=["Baga Beach"]),
+        }
+        ai_conf = AIConfigState(
+            selected_ai_provider="Groq", selected_model_for_provider="llama3-8b-8192",
+            hedging_enabled=True, hedge_backup_provider="Gemini", hedge_delay_seconds=5.0
+        )
+        with patch('src.llm.llm_providers._create_llm_instance', side_effect=lambda provider, *args: models[provider]):
+            response, call_info = invoke_llm_prompt(
+                "Suggest places in {destination}", {"destination": "Goa"}, "Groq", ai_conf,
+                validate=is_non_empty_text, stage="places_suggestion"
+            )
+        self.assertEqual(response, "Baga Beach")
+        self.assertEqual(call_info["provider"], "Gemini")
+        self.assertEqual(call_info["stage"], "places_suggestion")
+        self.assertEqual(call_info["hedge"]["winner_role"], "backup")
+
+    def test_hedging_disabled_uses_primary_only(self):
+        fake = FakeListChatModel(responses=["Fort Aguada"])
+        ai_conf = AIConfigState(selected_ai_provider="Groq", selected_model_for_provider="llama3-8b-8192")
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=fake) as mock_create:
+            response, call_info = invoke_llm_prompt("Places in {destination}", {"destination": "Goa"}, "Groq", ai_conf)
+        self.assertEqual(response, "Fort Aguada")
+        self.assertNotIn("hedge", call_info)
+        self.assertEqual(mock_create.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
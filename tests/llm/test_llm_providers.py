@@ -7,13 +7,13 @@ from unittest.mock import patch, MagicMock
 # If it's imported as `from langchain_openai.chat_models import ChatOpenAI`, the patch path needs to reflect that.
 # For now, we'll assume `src.llm.llm_providers.ChatOpenAI` is the correct path to mock.
 
-from src.llm.llm_providers import get_llm_instance
+from src.llm.llm_providers import get_llm_instance, get_llm_chain, invalidate_llm_instances, get_llm_pool_stats
 from src.models import AIConfigState, AppSessionState # Use AppSessionState
 
 # Mock Streamlit's session state
 # No longer needed as we will mock st.session_state directly in tests or via mock_st argument.
 
-@patch('src.llm.llm_providers.st') # Mocking streamlit (st) module used in llm_providers
+@patch('src.llm.llm_providers.st', create=True) # llm_providers no longer imports streamlit; keep the mock harmless
 class TestTogetherAIProvider(unittest.TestCase):
 
     def setUp(self):
@@ -90,5 +90,58 @@ class TestTogetherAIProvider(unittest.TestCase):
             get_llm_instance(provider="TogetherAI", ai_conf=self.mock_ai_config)
         self.assertIn("TOGETHERAI_API_KEY not found", str(context.exception))
 
+class TestLLMInstancePool(unittest.TestCase):
+
+    def setUp(self):
+        self.ai_conf = AIConfigState(selected_model_for_provider="openai/gpt-3.5-turbo", temperature=0.2, max_tokens=100)
+
+    @patch.dict(os.environ, {"OPENROUTER_API_KEY": "test_or_key"})
+    @patch('src.llm.llm_providers.ChatOpenAI')
+    def test_same_settings_reuse_instance(self, mock_chat_openai_class):
+        first = get_llm_instance("OpenRouter", self.ai_conf)
+        second = get_llm_instance("OpenRouter", self.ai_conf)
+        self.assertIs(first, second)
+        mock_chat_openai_class.assert_called_once()
+
+    @patch.dict(os.environ, {"OPENROUTER_API_KEY": "test_or_key"})
+    @patch('src.llm.llm_providers.ChatOpenAI')
+    def test_different_settings_get_separate_instances(self, mock_chat_openai_class):
+        mock_chat_openai_class.side_effect = lambda **kwargs: MagicMock()
+        plain = get_llm_instance("OpenRouter", self.ai_conf)
+        json_mode = get_llm_instance("OpenRouter", self.ai_conf, response_format={"type": "json_object"})
+        warmer = get_llm_instance("OpenRouter", self.ai_conf.model_copy(update={"temperature": 0.9}))
+        self.assertIsNot(plain, json_mode)
+        self.assertIsNot(plain, warmer)
+        _, kwargs = mock_chat_openai_class.call_args_list[1]
+        self.assertEqual(kwargs['model_kwargs'], {"response_format": {"type": "json_object"}})
+
+    @patch.dict(os.environ, {"OPENROUTER_API_KEY": "test_or_key"})
+    @patch('src.llm.llm_providers.ChatOpenAI')
+    def test_invalidate_forces_rebuild(self, mock_chat_openai_class):
+        mock_chat_openai_class.side_effect = lambda **kwargs: MagicMock()
+        first = get_llm_instance("OpenRouter", self.ai_conf)
+        self.assertEqual(invalidate_llm_instances("OpenRouter"), 1)
+        second = get_llm_instance("OpenRouter", self.ai_conf)
+        self.assertIsNot(first, second)
+
+    @patch.dict(os.environ, {"OPENROUTER_API_KEY": "test_or_key"})
+    @patch('src.llm.llm_providers.LLM_POOL_MAX_SIZE', 2)
+    @patch('src.llm.llm_providers.ChatOpenAI')
+    def test_lru_eviction(self, mock_chat_openai_class):
+        mock_chat_openai_class.side_effect = lambda **kwargs: MagicMock()
+        for temp in (0.1, 0.2, 0.3):
+            get_llm_instance("OpenRouter", self.ai_conf.model_copy(update={"temperature": temp}))
+        self.assertEqual(get_llm_pool_stats()["instances"], 2)
+        get_llm_instance("OpenRouter", self.ai_conf.model_copy(update={"temperature": 0.1}))
+        self.assertEqual(mock_chat_openai_class.call_count, 4) # 0.1 was evicted and rebuilt
+
+    @patch.dict(os.environ, {"OPENROUTER_API_KEY": "test_or_key"})
+    def test_chain_is_cached(self):
+        first = get_llm_chain("OpenRouter", self.ai_conf, "Hello {name}")
+        second = get_llm_chain("OpenRouter", self.ai_conf, "Hello {name}")
+        self.assertIs(first, second)
+        self.assertIsNot(first, get_llm_chain("OpenRouter", self.ai_conf, "Hello {name}", output_parser="json"))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,127 @@
+import os
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.llm.llm_providers import invalidate_llm_instances
+from src.llm.llm_invocation import invoke_llm_prompt
+from src.llm.llm_resilience import (
+    CircuitOpenError, classify_llm_error, get_resilience_stats, reset_resilience_state
+)
+from src.llm.model_router import model_health
+from src.core.itinerary_generator import generate_places_suggestion_llm
+from src.models import AIConfigState
+
+PROMPT = "Suggest places to visit in {destination}."
+ENQUIRY = {"destination": "Kerala", "num_days": 3, "traveler_count": 2, "trip_type": "Leisure", "client_name_actual": "Asha"}
+
+
+class _StatusError(Exception):
+    """Mimics provider SDK errors that carry status_code and an httpx-like response."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers={})
+
+
+class _FlakyChatModel(FakeListChatModel):
+    """Raises the queued failures (one per call) before answering normally."""
+    failures: list = []
+    calls: int = 0
+
+    def _call(self, *args, **kwargs):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return super()._call(*args, **kwargs)
+
+
+@patch.dict(os.environ, {"GROQ_API_KEY": "test_groq_key"})
+@patch.multiple("src.llm.llm_resilience", LLM_RETRY_BASE_DELAY_SECONDS=0.0, LLM_RETRY_MAX_DELAY_SECONDS=0.0)
+class TestLLMResilience(unittest.TestCase):
+
+    def setUp(self):
+        reset_resilience_state()
+        model_health.reset()
+        self.ai_conf = AIConfigState(selected_ai_provider="Groq", selected_model_for_provider="llama3-8b-8192")
+
+    def test_classification_of_provider_errors(self):
+        request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+        http_error = httpx.HTTPStatusError("Bad Gateway", request=request, response=httpx.Response(
+            502, request=request, json={"error": {"message": "upstream timed out"}}))
+        info = classify_llm_error(http_error, "Groq", "vendor reply parsing")
+        self.assertEqual((info["type"], info["status_code"], info["retryable"]), ("HttpError", 502, True))
+        self.assertIn("upstream timed out", info["message"])
+
+        groq_error = RuntimeError("Error code: 400 - {'error': {'message': 'model_decommissioned', 'type': 'invalid_request_error'}}")
+        info = classify_llm_error(groq_error, "Groq")
+        self.assertEqual((info["type"], info["status_code"], info["retryable"]), ("ProviderAPIError", 400, False))
+        self.assertIn("model_decommissioned", info["message"])
+
+        # A JSONDecodeError is a ValueError, but it is an output problem, not a configuration one
+        self.assertEqual(classify_llm_error(json.JSONDecodeError("Expecting value", "", 0), "Groq")["type"], "OutputParsingError")
+        self.assertEqual(classify_llm_error(ValueError("GROQ_API_KEY not found"), "Groq")["type"], "ConfigurationError")
+        self.assertTrue(classify_llm_error(httpx.ReadTimeout("timed out"), "Groq")["retryable"])
+
+    def test_transient_failures_are_retried(self):
+        flaky = _FlakyChatModel(responses=["Munnar"], failures=[_StatusError(502), httpx.ConnectError("reset")])
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=flaky):
+            response, call_info = invoke_llm_prompt(PROMPT, {"destination": "Kerala"}, "Groq", self.ai_conf)
+
+        self.assertEqual(response, "Munnar")
+        self.assertEqual(call_info["retries"], 2)
+        self.assertEqual(get_resilience_stats()["Groq"]["retries"], 2)
+        self.assertEqual(get_resilience_stats()["Groq"]["state"], "closed")
+
+    def test_fatal_errors_and_exhausted_budget_are_not_retried_further(self):
+        flaky = _FlakyChatModel(responses=["unused"], failures=[_StatusError(400)])
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=flaky):
+            with self.assertRaises(_StatusError):
+                invoke_llm_prompt(PROMPT, {"destination": "Goa"}, "Groq", self.ai_conf)
+        self.assertEqual(flaky.calls, 1)
+
+        invalidate_llm_instances()
+        flaky = _FlakyChatModel(responses=["unused"], failures=[_StatusError(502)] * 5)
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=flaky):
+            _, error_info = generate_places_suggestion_llm(ENQUIRY, "Groq", self.ai_conf)
+        self.assertEqual(flaky.calls, 3)
+        self.assertTrue(error_info["retryable"])
+        self.assertIn("gave up after 3 attempts", error_info["message"])
+        self.assertEqual(get_resilience_stats()["Groq"]["retries_exhausted"], 1)
+
+    @patch.multiple("src.llm.llm_resilience", LLM_RETRY_MAX_ATTEMPTS=1, LLM_BREAKER_FAILURE_THRESHOLD=2)
+    def test_circuit_opens_fails_fast_and_recovers(self):
+        flaky = _FlakyChatModel(responses=["Alleppey"], failures=[_StatusError(502), _StatusError(502)])
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=flaky):
+            for _ in range(2):
+                with self.assertRaises(_StatusError):
+                    invoke_llm_prompt(PROMPT, {"destination": "Kerala"}, "Groq", self.ai_conf)
+            with self.assertRaises(CircuitOpenError):
+                invoke_llm_prompt(PROMPT, {"destination": "Kerala"}, "Groq", self.ai_conf)
+            self.assertEqual(flaky.calls, 2) # The open circuit never reached the provider
+
+            with patch("src.llm.llm_resilience.LLM_BREAKER_RESET_SECONDS", 0.0):
+                response, _ = invoke_llm_prompt(PROMPT, {"destination": "Kerala"}, "Groq", self.ai_conf)
+
+        self.assertEqual(response, "Alleppey")
+        stats = get_resilience_stats()["Groq"]
+        self.assertEqual((stats["state"], stats["times_opened"], stats["short_circuited"]), ("closed", 1, 1))
+
+    def test_open_circuit_is_reported_by_places_suggestion(self):
+        with patch("src.llm.llm_resilience.LLM_BREAKER_FAILURE_THRESHOLD", 1), \
+             patch("src.llm.llm_resilience.LLM_RETRY_MAX_ATTEMPTS", 1), \
+             patch('src.llm.llm_providers._create_llm_instance', return_value=_FlakyChatModel(responses=["x"], failures=[_StatusError(502)])):
+            generate_places_suggestion_llm(ENQUIRY, "Groq", self.ai_conf)
+            suggestion, error_info = generate_places_suggestion_llm(ENQUIRY, "Groq", self.ai_conf)
+
+        self.assertIsNone(suggestion)
+        self.assertEqual(error_info["type"], "CircuitOpen")
+
+
+if __name__ == '__main__':
+    unittest.main()
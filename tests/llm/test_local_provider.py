@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import HumanMessage
+
+from src.llm import llm_providers
+from src.llm.llm_providers import get_llm_instance, get_llm_chain
+from src.llm.local_provider import LocalChatModel, Cassette, classify_prompt
+from src.core.quotation_graph_builder import run_quotation_generation_graph
+from src.models import AIConfigState
+
+ENQUIRY = {"destination": "Kerala", "num_days": 4, "traveler_count": 2, "trip_type": "Leisure", "client_name_actual": "Asha"}
+VENDOR_REPLY = "Package cost INR 45,000 per person. Stay at Taj Kumarakom Resort for 3 nights."
+
+
+class TestLocalProvider(unittest.TestCase):
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_local_provider_needs_no_api_key(self):
+        llm = get_llm_instance("Local", AIConfigState(selected_ai_provider="Local", selected_model_for_provider="replay"))
+        self.assertIsInstance(llm, LocalChatModel)
+        self.assertEqual(llm.mode, "replay")
+
+    @pytest.mark.usefixtures("fast_local_llm")
+    def test_synthetic_mode_runs_full_quotation_pipeline_offline(self):
+        ai_conf = AIConfigState(selected_ai_provider="Local", selected_model_for_provider="synthetic")
+        pdf_bytes, structured_data = run_quotation_generation_graph(ENQUIRY, VENDOR_REPLY, "Backwaters", "Local", ai_conf)
+        self.assertTrue(pdf_bytes.startswith(b"%PDF"))
+        self.assertNotIn("error", structured_data)
+        self.assertEqual(len(structured_data["detailed_itinerary"]), 4)
+        self.assertEqual(structured_data["client_name"], "Mr./Ms. Asha")
+
+    def test_synthetic_stream_yields_chunks_with_usage(self):
+        llm = LocalChatModel(mode="synthetic", ttft_seconds=0.0, tokens_per_second=1e9)
+        chunks = list(llm.stream([HumanMessage(content="Vendor Reply:\n---\nINR 5,000 total\n---")]))
+        self.assertGreater(len(chunks), 1)
+        record = json.loads("".join(c.content for c in chunks)) # A ParsedVendorReply record
+        self.assertEqual((record["currency"], record["price"], record["price_basis"]), ("INR", "5,000", "total"))
+        self.assertGreater(llm.invoke("anything").usage_metadata["output_tokens"], 0)
+
+    @patch.dict(os.environ, {"GROQ_API_KEY": "test_groq_key"})
+    def test_recorded_cassette_replays_response_and_latency(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cassette_path = os.path.join(tmp_dir, "cassette.jsonl")
+            fake = FakeListChatModel(responses=["- Alleppey houseboat\n- Munnar tea gardens"])
+            ai_conf = AIConfigState(selected_ai_provider="Groq", selected_model_for_provider="llama3-8b-8192")
+            prompt = "You are a helpful travel assistant. Based on the following enquiry, suggest a list of key places in {destination}"
+            with patch.object(llm_providers, "LLM_CASSETTE_RECORD_PATH", cassette_path), \
+                 patch('src.llm.llm_providers._create_llm_instance', return_value=fake):
+                recorded = get_llm_chain("Groq", ai_conf, prompt).invoke({"destination": "Kerala"})
+
+            cassette = Cassette(cassette_path)
+            replay = LocalChatModel(mode="replay", cassette_path=cassette_path, latency_scale=0.0)
+            with patch('src.llm.local_provider.load_cassette', return_value=cassette):
+                exact = replay.invoke(prompt.format(destination="Kerala")).content
+                # A different enquiry falls back to a recorded response of the same prompt kind
+                similar = replay.invoke(prompt.format(destination="Goa")).content
+        self.assertEqual(exact, recorded)
+        self.assertEqual(similar, recorded)
+        self.assertEqual(classify_prompt(prompt), "places_suggestion")
+
+    def test_replay_without_recording_is_a_configuration_error(self):
+        replay = LocalChatModel(mode="replay", cassette_path=os.path.join(tempfile.gettempdir(), "missing-cassette.jsonl"))
+        with self.assertRaises(ValueError):
+            replay.invoke("Vendor Reply:\n---\nnothing\n---")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.llm.llm_invocation import invoke_llm_prompt
+from src.llm.model_router import model_health, route
+from src.core.quotation_graph_builder import run_quotation_generation_graph
+from src.models import AIConfigState
+
+PROMPT = "Suggest places to visit in {destination}."
+ENQUIRY = {"destination": "Kerala", "num_days": 3, "traveler_count": 2, "trip_type": "Leisure", "client_name_actual": "Asha"}
+
+
+class _FailingChatModel(FakeListChatModel):
+    def _call(self, *args, **kwargs):
+        raise RuntimeError("provider unavailable")
+
+
+@patch.dict(os.environ, {"GROQ_API_KEY": "test_groq_key", "GOOGLE_API_KEY": "test_google_key"}, clear=True)
+class TestModelRouter(unittest.TestCase):
+
+    def setUp(self):
+        model_health.reset()
+        self.ai_conf = AIConfigState(selected_ai_provider="Groq", selected_model_for_provider="llama3-8b-8192",
+                                     model_routing_enabled=True)
+
+    def test_configured_order_wins_until_latency_is_observed(self):
+        decision = route("parse_vendor_reply", "Groq", self.ai_conf, input_tokens=500)
+        self.assertEqual([(c["provider"], c["model"]) for c in decision["ranked"]],
+                         [("Groq", "llama3-8b-8192"), ("Gemini", "gemini-1.5-flash-latest")])
+        self.assertIn({"provider": "OpenRouter", "model": "openai/gpt-3.5-turbo", "reason": "not_configured"}, decision["excluded"])
+
+        for _ in range(3):
+            model_health.record_success("Groq", "llama3-8b-8192", 20.0, "parse_vendor_reply")
+        model_health.record_success("Gemini", "gemini-1.5-flash-latest", 1.0, "parse_vendor_reply")
+        decision = route("parse_vendor_reply", "Groq", self.ai_conf, input_tokens=500)
+        self.assertEqual(decision["ranked"][0]["model"], "gemini-1.5-flash-latest")
+        # Latency is tracked per stage: other stages keep the configured preference
+        decision = route("places_suggestion", "Groq", self.ai_conf, input_tokens=500)
+        self.assertEqual(decision["ranked"][0]["model"], "llama3-8b-8192")
+
+    def test_errors_and_input_size_exclude_candidates(self):
+        for _ in range(3):
+            model_health.record_failure("Gemini", "gemini-1.5-flash-latest")
+        decision = route("parse_vendor_reply", "Groq", self.ai_conf, input_tokens=10000)
+        reasons = {c["model"]: c["reason"] for c in decision["excluded"]}
+        self.assertEqual(reasons["llama3-8b-8192"], "context_window")
+        self.assertEqual(reasons["gemini-1.5-flash-latest"], "cooling_down")
+        # Nothing usable left: the sidebar selection is used as before
+        self.assertEqual([(c["provider"], c["model"]) for c in decision["ranked"]], [("Groq", "llama3-8b-8192")])
+
+    def test_failed_candidate_falls_back_and_decision_is_reported(self):
+        def create_instance(provider, model_name, *args):
+            return _FailingChatModel(responses=["unused"]) if provider == "Groq" else FakeListChatModel(responses=["Munnar"])
+
+        with patch('src.llm.llm_providers._create_llm_instance', side_effect=create_instance):
+            response, call_info = invoke_llm_prompt(PROMPT, {"destination": "Kerala"}, "Groq", self.ai_conf, stage="places_suggestion")
+
+        self.assertEqual(response, "Munnar")
+        self.assertEqual(call_info["provider"], "Gemini")
+        self.assertEqual(call_info["routing"]["chosen"]["model"], "gemini-1.5-flash-latest")
+        self.assertEqual(call_info["routing"]["fallbacks"][0]["error"], "RuntimeError")
+        self.assertEqual(model_health.snapshot("Groq", "llama3-8b-8192")["consecutive_failures"], 1)
+
+    @pytest.mark.usefixtures("fast_local_llm")
+    def test_quotation_stages_are_routed_to_different_models(self):
+        _, structured_data = run_quotation_generation_graph(ENQUIRY, "INR 45,000 per person.", "Backwaters", "Groq", self.ai_conf)
+
+        chosen = {c["stage"]: c["routing"]["chosen"]["model"] for c in structured_data["generation_metadata"]["llm_calls"]}
+        self.assertEqual(chosen, {"parse_vendor_reply": "llama3-8b-8192", "structure_quotation": "llama3-70b-8192"})
+
+    def test_routing_disabled_uses_selected_model(self):
+        ai_conf = self.ai_conf.model_copy(update={"model_routing_enabled": False})
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=FakeListChatModel(responses=["Goa"])):
+            _, call_info = invoke_llm_prompt(PROMPT, {"destination": "Goa"}, "Groq", ai_conf, stage="places_suggestion")
+        self.assertNotIn("routing", call_info)
+        self.assertEqual(call_info["model"], "llama3-8b-8192")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+from unittest.mock import patch
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from src.llm.llm_providers import invalidate_llm_instances
+from src.llm.llm_invocation import merge_continuation
+from src.llm.local_provider import LocalChatModel
+from src.llm.response_cache import clear_response_cache
+from src.llm.telemetry import _finish_reason_from_result
+from src.core.quotation_graph_builder import run_quotation_generation_graph
+from src.models import AIConfigState
+
+VENDOR_REPLY = "Package cost INR 85,000 per person. Hotels: Taj Kumarakom Resort (4N), Spice Village Resort (5N)."
+
+
+def _enquiry(num_days: int) -> dict:
+    return {"destination": "Kerala", "num_days": num_days, "traveler_count": 2, "trip_type": "Leisure", "client_name_actual": "Asha"}
+
+
+class TestOutputSizingAndContinuation(unittest.TestCase):
+
+    def setUp(self):
+        self.ai_conf = AIConfigState(selected_ai_provider="Local", selected_model_for_provider="synthetic")
+        self.created_max_tokens = []
+
+    def _local_model(self, output_cap: int | None = None):
+        def create(provider, model_name, api_key, temperature, max_tokens, response_format):
+            self.created_max_tokens.append(max_tokens)
+            return LocalChatModel(mode="synthetic", ttft_seconds=0.0, tokens_per_second=1e9, max_tokens=output_cap or max_tokens)
+        return patch('src.llm.llm_providers._create_llm_instance', side_effect=create)
+
+    def test_max_tokens_is_sized_from_trip_length(self):
+        with self._local_model():
+            _, short_trip = run_quotation_generation_graph(_enquiry(3), VENDOR_REPLY, "Backwaters", "Local", self.ai_conf)
+        invalidate_llm_instances()
+        with self._local_model():
+            _, long_trip = run_quotation_generation_graph(_enquiry(14), VENDOR_REPLY, "Backwaters", "Local", self.ai_conf)
+
+        short_budget = short_trip["generation_metadata"]["llm_calls"][-1]["token_budget"]["output_reservation"]
+        long_budget = long_trip["generation_metadata"]["llm_calls"][-1]["token_budget"]["output_reservation"]
+        self.assertEqual(short_budget % 512, 0)
+        self.assertGreater(long_budget, short_budget)
+        self.assertEqual(len(long_trip["detailed_itinerary"]), 14)
+
+    def test_user_max_tokens_is_respected(self):
+        ai_conf = self.ai_conf.model_copy(update={"max_tokens": 3000})
+        with self._local_model():
+            run_quotation_generation_graph(_enquiry(5), VENDOR_REPLY, "Backwaters", "Local", ai_conf)
+        self.assertEqual(set(self.created_max_tokens), {3000})
+
+    def test_truncated_quotation_json_is_resumed_instead_of_failing(self):
+        # The model stops every answer after 500 tokens, well short of a 14-day quotation
+        with self._local_model(output_cap=500):
+            pdf_bytes, structured_data = run_quotation_generation_graph(_enquiry(14), VENDOR_REPLY, "Backwaters", "Local", self.ai_conf)
+
+        self.assertNotIn("error", structured_data)
+        self.assertTrue(pdf_bytes)
+        self.assertEqual(len(structured_data["detailed_itinerary"]), 14)
+        structuring_call = structured_data["generation_metadata"]["llm_calls"][-1]
+        self.assertEqual(structuring_call["continuations"], 2)
+        self.assertEqual(structuring_call["finish_reason"], "stop")
+
+    def test_truncated_streamed_quotation_is_resumed_like_an_invoked_one(self):
+        with self._local_model(output_cap=500):
+            _, invoked = run_quotation_generation_graph(_enquiry(14), VENDOR_REPLY, "Backwaters", "Local", self.ai_conf)
+        clear_response_cache()
+        previews = []
+        with self._local_model(output_cap=500):
+            pdf_bytes, streamed = run_quotation_generation_graph(_enquiry(14), VENDOR_REPLY, "Backwaters", "Local", self.ai_conf,
+                                                                 on_preview=previews.append)
+
+        self.assertTrue(pdf_bytes and previews)
+        structuring_call = streamed["generation_metadata"]["llm_calls"][-1]
+        self.assertEqual((structuring_call["continuations"], structuring_call["finish_reason"]), (2, "stop"))
+        self.assertEqual({k: v for k, v in streamed.items() if k != "generation_metadata"},
+                         {k: v for k, v in invoked.items() if k != "generation_metadata"})
+
+    def test_quotation_still_cut_off_is_an_error_and_not_cached(self):
+        for on_preview in (None, lambda preview: None):
+            with self._local_model(output_cap=500), patch('src.llm.llm_invocation.LLM_MAX_CONTINUATIONS', 0):
+                _, structured_data = run_quotation_generation_graph(
+                    _enquiry(14), VENDOR_REPLY, "Backwaters", "Local", self.ai_conf, on_preview=on_preview)
+            self.assertEqual(structured_data["type"], "JsonParsingError")
+            self.assertIn("cut off at the output token limit", structured_data["error"])
+
+        with self._local_model(output_cap=500): # The truncated answer was not cached: this run gets all 14 days
+            _, structured_data = run_quotation_generation_graph(_enquiry(14), VENDOR_REPLY, "Backwaters", "Local", self.ai_conf)
+        self.assertFalse(structured_data["generation_metadata"]["llm_calls"][-1]["cache_hit"])
+        self.assertEqual(len(structured_data["detailed_itinerary"]), 14)
+
+    def test_merge_continuation_drops_repeated_text_and_fences(self):
+        partial = '```json\n{"client_name": "Mr./Ms. Asha", "quotation_title": "Your Exclusive'
+        self.assertEqual(merge_continuation(partial, ' Travel Package"}\n```'), partial + ' Travel Package"}\n```')
+        self.assertEqual(merge_continuation(partial, '```json\n"quotation_title": "Your Exclusive Travel Package"}'),
+                         partial + ' Travel Package"}')
+
+    def test_finish_reasons_are_normalised(self):
+        def result(**response_metadata):
+            return LLMResult(generations=[[ChatGeneration(message=AIMessage(content="x", response_metadata=response_metadata))]])
+        self.assertEqual(_finish_reason_from_result(result(finish_reason="length")), "length")
+        self.assertEqual(_finish_reason_from_result(result(finish_reason="MAX_TOKENS")), "length") # Gemini
+        self.assertEqual(_finish_reason_from_result(result(stop_reason="end_turn")), "end_turn")
+        self.assertIsNone(_finish_reason_from_result(result()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import time
+import asyncio
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from src.llm import rate_limiter
+from src.llm.rate_limiter import (
+    AdaptiveRateLimiter, call_with_rate_limit, acall_with_rate_limit, get_rate_limiter_metrics,
+    parse_reset_seconds, parse_retry_after, reset_rate_limiters
+)
+
+
+class ProviderHTTPError(Exception):
+    """Mimics provider SDK errors that carry status_code and an httpx-like response."""
+
+    def __init__(self, status_code: int, headers: dict | None = None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        reset_rate_limiters()
+        self.limiter = AdaptiveRateLimiter("Groq", "llama3-8b-8192")
+
+    def test_concurrency_grows_on_success_and_halves_on_429(self):
+        for _ in range(8):
+            with self.limiter.slot():
+                pass
+        grown = self.limiter.metrics()["concurrency_limit"]
+        self.assertGreater(grown, rate_limiter.RATE_LIMIT_INITIAL_CONCURRENCY)
+
+        with patch.object(rate_limiter, "RATE_LIMIT_DEFAULT_BACKOFF_SECONDS", 0.0):
+            with self.assertRaises(ProviderHTTPError):
+                with self.limiter.slot():
+                    raise ProviderHTTPError(429)
+        self.assertEqual(self.limiter.metrics()["concurrency_limit"], max(1, int(grown * 0.5)))
+        self.assertEqual(self.limiter.metrics()["throttled"], 1)
+
+    def test_non_rate_limit_errors_do_not_shrink_the_window(self):
+        before = self.limiter.metrics()["concurrency_limit"]
+        with self.assertRaises(ValueError):
+            with self.limiter.slot():
+                raise ValueError("bad prompt")
+        self.assertEqual(self.limiter.metrics()["concurrency_limit"], before)
+        self.assertEqual(self.limiter.metrics()["in_flight"], 0)
+
+    def test_retry_after_pauses_next_caller(self):
+        with self.assertRaises(ProviderHTTPError):
+            with self.limiter.slot():
+                raise ProviderHTTPError(429, {"Retry-After": "0.3"})
+        waited = self.limiter.acquire()
+        self.limiter.release()
+        self.assertGreaterEqual(waited, 0.25)
+
+    def test_low_remaining_header_pauses_until_reset(self):
+        self.limiter.observe_headers({"x-ratelimit-remaining": "0", "x-ratelimit-reset": "200ms"})
+        self.assertGreater(self.limiter.metrics()["paused_for_seconds"], 0.1)
+
+    def test_callers_queue_instead_of_failing(self):
+        self.limiter._limit = 1.0
+        self.limiter.acquire()
+        order = []
+
+        def second_caller():
+            with self.limiter.slot():
+                order.append("second")
+
+        worker = threading.Thread(target=second_caller)
+        worker.start()
+        time.sleep(0.1)
+        self.assertEqual(self.limiter.metrics()["queue_depth"], 1)
+        order.append("first")
+        self.limiter.release()
+        worker.join(timeout=2)
+        self.assertEqual(order, ["first", "second"])
+        self.assertEqual(self.limiter.metrics()["queue_depth"], 0)
+
+    def test_cancelled_async_waiter_leaves_the_queue(self):
+        self.limiter._limit = 1.0
+        self.limiter.acquire()
+
+        async def waiter():
+            task = asyncio.create_task(self.limiter.aacquire())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(waiter())
+        self.assertEqual(self.limiter.metrics()["queue_depth"], 0)
+        self.limiter.release()
+
+
+class TestRateLimitedCalls(unittest.TestCase):
+
+    def setUp(self):
+        reset_rate_limiters()
+
+    def test_throttled_call_is_requeued_then_succeeds(self):
+        attempts = []
+
+        def call(callbacks):
+            attempts.append(callbacks)
+            if len(attempts) == 1:
+                raise ProviderHTTPError(429, {"Retry-After": "0"})
+            return "ok"
+
+        self.assertEqual(call_with_rate_limit("Groq", "llama3-8b-8192", call), "ok")
+        self.assertEqual(len(attempts), 2)
+        metrics = get_rate_limiter_metrics()["Groq/llama3-8b-8192"]
+        self.assertEqual(metrics["throttled"], 1)
+        self.assertEqual(metrics["calls"], 2)
+
+    def test_async_call_passes_header_observer(self):
+        async def call(callbacks):
+            return callbacks
+
+        callbacks = asyncio.run(acall_with_rate_limit("OpenRouter", "openai/gpt-3.5-turbo", call))
+        self.assertEqual(len(callbacks), 1)
+
+    def test_header_parsing(self):
+        self.assertEqual(parse_retry_after("2"), 2.0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertEqual(parse_reset_seconds("1m30s"), 90.0)
+        self.assertAlmostEqual(parse_reset_seconds("250ms"), 0.25)
+        self.assertAlmostEqual(parse_reset_seconds(str((time.time() + 5) * 1000)), 5.0, delta=0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
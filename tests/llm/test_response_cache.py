@@ -0,0 +1,96 @@
+import os
+import time
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.llm.llm_invocation import invoke_llm_prompt, is_non_empty_text
+from src.llm.llm_providers import invalidate_llm_instances
+from src.llm.response_cache import ResponseCache, get_response_cache_stats
+from src.models import AIConfigState
+
+PROMPT = "Suggest places in {destination}"
+
+
+@patch.dict(os.environ, {"GROQ_API_KEY": "test_groq_key"})
+class TestCachedInvocation(unittest.TestCase):
+
+    def setUp(self):
+        self.ai_conf = AIConfigState(selected_ai_provider="Groq", selected_model_for_provider="llama3-8b-8192")
+
+    def _invoke(self, fake, ai_conf=None, validate=None):
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=fake):
+            return invoke_llm_prompt(PROMPT, {"destination": "Goa"}, "Groq", ai_conf or self.ai_conf, validate=validate)
+
+    def test_identical_call_is_served_from_cache(self):
+        fake = FakeListChatModel(responses=["Baga Beach", "Fort Aguada"])
+        first, first_info = self._invoke(fake)
+        invalidate_llm_instances()
+        second, second_info = self._invoke(fake)
+        self.assertEqual(first, "Baga Beach")
+        self.assertEqual(second, "Baga Beach")
+        self.assertFalse(first_info["cache_hit"])
+        self.assertTrue(second_info["cache_hit"])
+        self.assertGreaterEqual(get_response_cache_stats()["hits"], 1)
+
+    def test_bypass_flag_and_changed_settings_call_the_provider(self):
+        fake = FakeListChatModel(responses=["Baga Beach", "Fort Aguada", "Dudhsagar Falls"])
+        self._invoke(fake)
+        bypassed, info = self._invoke(fake, self.ai_conf.model_copy(update={"bypass_response_cache": True}))
+        self.assertEqual(bypassed, "Fort Aguada")
+        self.assertFalse(info["cache_hit"])
+        warmer, _ = self._invoke(fake, self.ai_conf.model_copy(update={"temperature": 1.2}))
+        self.assertEqual(warmer, "Dudhsagar Falls")
+
+    def test_responses_failing_validation_are_not_cached(self):
+        fake = FakeListChatModel(responses=["", "Baga Beach"])
+        self._invoke(fake, validate=is_non_empty_text)
+        second, info = self._invoke(fake, validate=is_non_empty_text)
+        self.assertEqual(second, "Baga Beach")
+        self.assertFalse(info["cache_hit"])
+
+
+class TestResponseCacheStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_expired_entries_are_misses(self):
+        cache = ResponseCache(self.path, ttl_seconds=0.05)
+        cache.put("k", {"a": 1}, "Groq", "m")
+        self.assertEqual(cache.get("k"), {"a": 1})
+        time.sleep(0.1)
+        self.assertIsNot(cache.get("k"), {"a": 1})
+        self.assertEqual(cache.stats()["expired"], 1)
+        cache.close()
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResponseCache(self.path, max_entries=2)
+        cache.put("old", "1", "Groq", "m")
+        time.sleep(0.01)
+        cache.put("recent", "2", "Groq", "m")
+        time.sleep(0.01)
+        cache.get("old") # Touch: "recent" is now the LRU entry
+        time.sleep(0.01)
+        cache.put("new", "3", "Groq", "m")
+        self.assertEqual(cache.get("old"), "1")
+        self.assertEqual(cache.get("new"), "3")
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["entries"], 2)
+        cache.close()
+
+    def test_entries_survive_reopening(self):
+        cache = ResponseCache(self.path)
+        cache.put("k", "persisted", "Groq", "m")
+        cache.close()
+        self.assertEqual(ResponseCache(self.path).get("k"), "persisted")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.llm.llm_providers import invalidate_llm_instances
+from src.llm.llm_invocation import invoke_llm_prompt, stream_llm_prompt
+from src.llm.telemetry import capture_llm_calls, estimate_cost_usd, summarize_llm_calls
+from src.core.quotation_graph_builder import run_quotation_generation_graph
+from src.models import AIConfigState
+
+PROMPT = "Suggest places to visit in {destination}."
+
+
+@patch.dict(os.environ, {"GROQ_API_KEY": "test_groq_key"})
+class TestLLMTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        self.ai_conf = AIConfigState(selected_ai_provider="Groq", selected_model_for_provider="llama3-8b-8192")
+
+    def test_invoke_records_timing_tokens_and_cost(self):
+        fake = FakeListChatModel(responses=["Baga Beach, Fort Aguada, Dudhsagar Falls"])
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=fake), capture_llm_calls() as calls:
+            _, call_info = invoke_llm_prompt(PROMPT, {"destination": "Goa"}, "Groq", self.ai_conf, stage="places_suggestion")
+
+        self.assertEqual(calls, [call_info])
+        self.assertEqual(call_info["stage"], "places_suggestion")
+        self.assertGreaterEqual(call_info["queue_seconds"], 0.0)
+        self.assertIsNotNone(call_info["time_to_first_token_seconds"])
+        # The fake model reports no usage, so tokens are estimated from the text
+        self.assertTrue(call_info["tokens_estimated"])
+        self.assertGreater(call_info["completion_tokens"], 0)
+        self.assertGreater(call_info["estimated_cost_usd"], 0.0)
+
+    def test_cache_hits_and_failures_are_recorded(self):
+        fake = FakeListChatModel(responses=["Baga Beach"])
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=fake), capture_llm_calls() as calls:
+            invoke_llm_prompt(PROMPT, {"destination": "Goa"}, "Groq", self.ai_conf)
+            invoke_llm_prompt(PROMPT, {"destination": "Goa"}, "Groq", self.ai_conf)
+        invalidate_llm_instances()
+        with patch('src.llm.llm_providers._create_llm_instance', side_effect=RuntimeError("boom")), capture_llm_calls() as failed:
+            with self.assertRaises(RuntimeError):
+                invoke_llm_prompt(PROMPT, {"destination": "Kerala"}, "Groq", self.ai_conf)
+
+        self.assertEqual([c["cache_hit"] for c in calls], [False, True])
+        self.assertEqual(calls[1]["estimated_cost_usd"], 0.0)
+        self.assertEqual(failed[0]["error_type"], "RuntimeError")
+
+    def test_stream_records_time_to_first_chunk(self):
+        fake = FakeListChatModel(responses=["Baga Beach, Fort Aguada"])
+        with patch('src.llm.llm_providers._create_llm_instance', return_value=fake), capture_llm_calls() as calls:
+            list(stream_llm_prompt(PROMPT, {"destination": "Goa"}, "Groq", self.ai_conf, stage="places_suggestion"))
+        self.assertEqual(len(calls), 1)
+        self.assertLessEqual(calls[0]["time_to_first_token_seconds"], calls[0]["latency_seconds"])
+
+    @pytest.mark.usefixtures("fast_local_llm")
+    def test_quotation_graph_nodes_are_captured_with_provider_usage(self):
+        ai_conf = AIConfigState(selected_ai_provider="Local", selected_model_for_provider="synthetic")
+        enquiry = {"destination": "Kerala", "num_days": 3, "traveler_count": 2, "trip_type": "Leisure", "client_name_actual": "Asha"}
+        with capture_llm_calls() as calls:
+            run_quotation_generation_graph(enquiry, "INR 45,000 per person.", "Backwaters", "Local", ai_conf)
+
+        self.assertEqual([c["stage"] for c in calls], ["parse_vendor_reply", "structure_quotation"])
+        for call in calls:
+            self.assertFalse(call["tokens_estimated"]) # Local messages carry usage_metadata
+            self.assertEqual(call["estimated_cost_usd"], 0.0)
+
+    def test_cost_estimates_and_provider_summary(self):
+        self.assertEqual(estimate_cost_usd("OpenRouter", "google/gemma-3-27b-it:free", 1000, 1000), 0.0)
+        self.assertIsNone(estimate_cost_usd("OpenRouter", "some/unpriced-model", 1000, 1000))
+        self.assertAlmostEqual(estimate_cost_usd("OpenRouter", "openai/gpt-3.5-turbo", 1_000_000, 0), 0.5)
+
+        calls = [{"provider": "Groq", "latency_seconds": s, "estimated_cost_usd": 0.001} for s in (1.0, 2.0, 3.0, 10.0)]
+        calls.append({"provider": "Groq", "latency_seconds": 0.0, "cache_hit": True, "estimated_cost_usd": 0.0})
+        summary = summarize_llm_calls(calls)["Groq"]
+        self.assertEqual(summary["calls"], 5)
+        self.assertEqual(summary["cache_hits"], 1)
+        self.assertEqual(summary["p50_latency_seconds"], 2.5)
+        self.assertEqual(summary["p95_latency_seconds"], 10.0)
+        self.assertAlmostEqual(summary["estimated_cost_usd"], 0.004)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+
+import pytest
+
+from src.llm.token_budget import (
+    ContextBudgetExceeded, count_tokens, fit_inputs_to_context, strip_boilerplate, DROPPED_MARKER
+)
+from src.core.quotation_graph_builder import run_quotation_generation_graph
+from src.models import AIConfigState
+
+PROMPT = "Suggestions:\n{suggestions}\n\nVendor reply:\n{vendor}\n\nReturn the quotation JSON."
+TRIMMABLE = (("suggestions", "truncate"), ("vendor", "boilerplate"))
+
+VENDOR_EMAIL = """Dear Team,
+Package cost INR 45,000 per person including breakfast.
+Hotel: Taj Kumarakom Resort (3N).
+
+Warm regards,
+Ravi | Kerala Holidays
+
+This email and any attachments are confidential and intended solely for the intended recipient.
+
+On Mon, 3 Jun 2024 at 10:00, Agent <agent@example.com> wrote:
+> Please share your best rates for Kerala.
+"""
+
+ENQUIRY = {"destination": "Kerala", "num_days": 3, "traveler_count": 2, "trip_type": "Leisure", "client_name_actual": "Asha"}
+
+
+class TestTokenBudget(unittest.TestCase):
+
+    def test_prompt_within_budget_is_untouched(self):
+        inputs = {"suggestions": "Alleppey", "vendor": "INR 45,000"}
+        fitted, report = fit_inputs_to_context(PROMPT, inputs, "llama3-8b-8192", 2048, TRIMMABLE)
+        self.assertEqual(fitted, inputs)
+        self.assertEqual(report["trimmed"], [])
+        self.assertEqual(report["context_window"], 8192)
+
+    def test_suggestions_are_trimmed_first_to_fit_small_context(self):
+        inputs = {"suggestions": "- Visit the Munnar tea gardens\n" * 2000, "vendor": VENDOR_EMAIL}
+        fitted, report = fit_inputs_to_context(PROMPT, inputs, "llama3-8b-8192", 2048, TRIMMABLE)
+
+        self.assertEqual([t["input"] for t in report["trimmed"]], ["suggestions"])
+        self.assertEqual(report["trimmed"][0]["action"], "truncated")
+        self.assertLessEqual(report["prompt_tokens"], 8192 - 2048)
+        self.assertEqual(fitted["vendor"], VENDOR_EMAIL)
+
+    def test_vendor_boilerplate_removed_after_suggestions_are_dropped(self):
+        padded_email = VENDOR_EMAIL + "> earlier quoted thread line\n" * 4000
+        inputs = {"suggestions": "- Alleppey houseboat\n" * 50, "vendor": padded_email}
+        fitted, report = fit_inputs_to_context(PROMPT, inputs, "llama3-8b-8192", 2048, TRIMMABLE)
+
+        self.assertEqual([(t["input"], t["action"]) for t in report["trimmed"]],
+                         [("suggestions", "dropped"), ("vendor", "boilerplate_removed")])
+        self.assertEqual(fitted["suggestions"], DROPPED_MARKER)
+        self.assertIn("INR 45,000", fitted["vendor"])
+
+    def test_untrimmable_prompt_raises_with_report(self):
+        inputs = {"suggestions": "", "vendor": "INR 45,000 per person. " * 5000}
+        with self.assertRaises(ContextBudgetExceeded) as ctx:
+            fit_inputs_to_context(PROMPT, inputs, "llama3-8b-8192", 2048, TRIMMABLE)
+        self.assertGreater(ctx.exception.report["prompt_tokens"], 8192 - 2048)
+
+    def test_strip_boilerplate_keeps_commercial_content(self):
+        stripped = strip_boilerplate(VENDOR_EMAIL)
+        self.assertIn("INR 45,000 per person", stripped)
+        self.assertIn("Taj Kumarakom", stripped)
+        for boilerplate in ("Warm regards", "confidential", "wrote:", "best rates"):
+            self.assertNotIn(boilerplate, stripped)
+        self.assertLess(count_tokens(stripped), count_tokens(VENDOR_EMAIL))
+
+
+@pytest.mark.usefixtures("fast_local_llm")
+class TestTokenBudgetInQuotationGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.ai_conf = AIConfigState(selected_ai_provider="Local", selected_model_for_provider="synthetic")
+
+    def test_long_suggestions_are_trimmed_and_reported(self):
+        long_suggestions = "- Alleppey backwater cruise with lunch on board\n" * 1500
+        pdf_bytes, structured_data = run_quotation_generation_graph(ENQUIRY, VENDOR_EMAIL, long_suggestions, "Local", self.ai_conf)
+
+        self.assertNotIn("error", structured_data)
+        structuring_call = structured_data["generation_metadata"]["llm_calls"][-1]
+        self.assertEqual(structuring_call["token_budget"]["trimmed"][0]["input"], "ai_suggested_itinerary_text")
+
+    def test_oversized_vendor_reply_reports_budget_in_error_payload(self):
+        huge_reply = "Day rate INR 4,500 for the cab with driver allowance. " * 3000
+        _, structured_data = run_quotation_generation_graph(ENQUIRY, huge_reply, "Backwaters", "Local", self.ai_conf)
+
+        self.assertIn("too long for the selected Local model", structured_data["error"])
+        self.assertEqual(structured_data["token_budget"]["context_window"], 8192)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import json
+import unittest
+
+from src.utils.json_repair import extract_json_text, loads_json_with_repair, repair_json
+
+
+class TestJsonRepair(unittest.TestCase):
+
+    def test_valid_json_is_extracted_without_repairs(self):
+        answer = 'Here is the quotation:\n```json\n{"title": "Forts {and} palaces", "days": [1, 2]}\n```\nLet me know!'
+        self.assertEqual(extract_json_text(answer), '{"title": "Forts {and} palaces", "days": [1, 2]}')
+        self.assertEqual(loads_json_with_repair(answer), ({"title": "Forts {and} palaces", "days": [1, 2]}, []))
+
+    def test_common_defects_are_repaired(self):
+        value, repairs = loads_json_with_repair(
+            '{"title": "The "Venice of the East" cruise", "notes": ["Rs. 45,000, per person", "Breakfast",],\n'
+            ' "desc": "Line one\nline two", "private": True "nights": 3,}'
+        )
+        self.assertEqual(value, {"title": 'The "Venice of the East" cruise', "notes": ["Rs. 45,000, per person", "Breakfast"],
+                                 "desc": "Line one\nline two", "private": True, "nights": 3})
+        self.assertIn("escaped quote inside string", repairs)
+        self.assertIn("removed trailing comma", repairs)
+
+    def test_truncated_answers_keep_every_complete_member(self):
+        prefix = '{"client_name": "Asha", "detailed_itinerary": [{"day_number": "Day 1", "title": "Arrival"}, {"day_number": "Day 2", "ti'
+        value, repairs = loads_json_with_repair(prefix)
+        self.assertEqual(value, {"client_name": "Asha", "detailed_itinerary": [
+            {"day_number": "Day 1", "title": "Arrival"}, {"day_number": "Day 2"}]})
+        self.assertIn("dropped incomplete member", repairs)
+
+        # Every prefix of a streamed answer is parseable once it has started the object
+        document = json.dumps({"a": [1, {"b": "c, d"}], "e": None, "f": "g"})
+        for end in range(1, len(document) + 1):
+            json.loads(repair_json(document[:end])[0])
+
+    def test_text_without_json_is_rejected(self):
+        with self.assertRaises(json.JSONDecodeError):
+            loads_json_with_repair("Sorry, I cannot help with that.")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+import pytest
+
+from src.core.quotation_graph_builder import run_quotation_generation_graph
+from src.core.vendor_parse_memo import InMemoryVendorParseStore, SupabaseVendorParseStore, configure_vendor_parse_memo
+from src.utils.parsed_vendor_reply import NOTHING_PARSED_TEXT, format_parsed_vendor_reply, parse_vendor_reply_record
+
+
+class TestParsedVendorReply(unittest.TestCase):
+
+    def test_record_is_formatted_compactly_without_missing_values(self):
+        record, repairs = parse_vendor_reply_record(
+            '{"price": 45000, "currency": "INR", "price_basis": "per person", "pax_basis": null,'
+            ' "hotels": [{"name": "Taj Kumarakom Resort", "city": "Kumarakom", "nights": 2, "category": null}],'
+            ' "inclusions": ["Daily breakfast", ""], "exclusions": [], "itinerary_days": [{"day": "1", "summary": "Arrive Kochi"}],}')
+
+        self.assertEqual(repairs, ["removed trailing comma"])
+        self.assertEqual(format_parsed_vendor_reply(record), "\n".join([
+            "Price: INR 45000 per person",
+            "Hotels:",
+            "- Taj Kumarakom Resort (Kumarakom, 2 nights)",
+            "Inclusions:",
+            "- Daily breakfast",
+            "Vendor itinerary:",
+            "- Day 1: Arrive Kochi",
+        ]))
+
+    def test_empty_record_says_nothing_was_parsed(self):
+        record, _ = parse_vendor_reply_record({"hotels": None, "inclusions": []})
+        self.assertEqual(format_parsed_vendor_reply(record), NOTHING_PARSED_TEXT)
+
+    def test_prose_is_not_a_record(self):
+        with self.assertRaises(ValueError):
+            parse_vendor_reply_record("1. **Hotel Details:** Taj Kumarakom Resort")
+
+    @pytest.mark.usefixtures("fast_local_llm", "recorded_quotation")
+    def test_parse_stage_stores_the_record_and_passes_compact_text_on(self):
+        store = InMemoryVendorParseStore()
+        configure_vendor_parse_memo(store=store, enabled=True)
+        self.addCleanup(configure_vendor_parse_memo, store=SupabaseVendorParseStore(), enabled=False)
+        _, structured_data = run_quotation_generation_graph(
+            self.enquiry, self.vendor_reply, self.ai_suggestions, "Local", self.ai_conf)
+
+        self.assertNotIn("error", structured_data)
+        (row,) = store.rows.values()
+        self.assertEqual([hotel["name"] for hotel in row["parsed_data"]["hotels"]], self.record["expected"]["hotels"])
+        self.assertEqual(row["parsed_data"]["exclusions"], ["Airfare", "Entrance fees"])
+        self.assertTrue(row["parsed_text"].startswith("Price: INR 45,000 per person\nHotels:\n- Taj Kumarakom Resort"))
+        self.assertEqual(structured_data["cost_per_head"], "INR 45,000")
+
+
+if __name__ == '__main__':
+    unittest.main()
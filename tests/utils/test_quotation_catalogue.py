@@ -0,0 +1,42 @@
+import unittest
+
+import pytest
+
+from src.llm.llm_prompts import QUOTATION_STRUCTURE_JSON_PROMPT_TEMPLATE_STRING, QUOTATION_SINGLE_PASS_JSON_PROMPT_TEMPLATE_STRING
+from src.core.quotation_graph_builder import run_quotation_generation_graph
+from src.utils.quotation_catalogue import QUOTATION_CATALOGUE, QUOTATION_CATALOGUE_VERSION, merge_quotation_catalogue
+
+
+class TestQuotationCatalogue(unittest.TestCase):
+
+    def test_prompts_no_longer_ask_for_catalogue_fields(self):
+        for prompt in (QUOTATION_STRUCTURE_JSON_PROMPT_TEMPLATE_STRING, QUOTATION_SINGLE_PASS_JSON_PROMPT_TEMPLATE_STRING):
+            for field in QUOTATION_CATALOGUE:
+                self.assertNotIn(f'"{field}"', prompt)
+
+    def test_catalogue_replaces_fixed_text_and_keeps_extra_notes(self):
+        merged = merge_quotation_catalogue({
+            "currency": "INR",
+            "company_phone": "+1-555-0100", # Model-written contact details are not trusted
+            "important_notes": ["Houseboat check-in is at 12:00 hrs.", QUOTATION_CATALOGUE["important_notes"][0]],
+        })
+        self.assertEqual(merged["currency"], "INR")
+        self.assertEqual(merged["company_phone"], QUOTATION_CATALOGUE["company_phone"])
+        self.assertEqual(merged["important_notes"],
+                         QUOTATION_CATALOGUE["important_notes"] + ["Houseboat check-in is at 12:00 hrs."])
+        self.assertEqual(merged["catalogue_version"], QUOTATION_CATALOGUE_VERSION)
+        merged["standard_exclusions_list"].append("mutated")
+        self.assertNotIn("mutated", QUOTATION_CATALOGUE["standard_exclusions_list"])
+
+    @pytest.mark.usefixtures("fast_local_llm", "recorded_quotation")
+    def test_generated_quotation_carries_the_catalogue(self):
+        pdf_bytes, structured_data = run_quotation_generation_graph(
+            self.enquiry, self.vendor_reply, self.ai_suggestions, "Local", self.ai_conf)
+
+        self.assertTrue(pdf_bytes)
+        self.assertEqual(structured_data["tcs_rules_full"], QUOTATION_CATALOGUE["tcs_rules_full"])
+        self.assertEqual(structured_data["catalogue_version"], QUOTATION_CATALOGUE_VERSION)
+
+
+if __name__ == '__main__':
+    unittest.main()